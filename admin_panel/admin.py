@@ -42,7 +42,7 @@ class BroadcastMessageAdmin(admin.ModelAdmin):
     readonly_fields = [
         'status', 'total_recipients', 'sent_count', 'failed_count',
         'created_by', 'created_at', 'updated_at', 'started_at', 'completed_at',
-        'error_message', 'recipients_preview',
+        'error_message', 'recipients_preview', 'last_recipient_id',
     ]
     filter_horizontal = ['custom_recipients']
     actions = ['action_send_now', 'action_cancel']
@@ -69,7 +69,7 @@ class BroadcastMessageAdmin(admin.ModelAdmin):
             'fields': (
                 'status', 'total_recipients', 'sent_count', 'failed_count',
                 'error_message', 'created_by', 'created_at', 'updated_at',
-                'started_at', 'completed_at',
+                'started_at', 'completed_at', 'last_recipient_id',
             ),
             'classes': ('collapse',),
         }),
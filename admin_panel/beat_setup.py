@@ -132,6 +132,14 @@ def ensure_periodic_tasks(startup: bool = False) -> None:
             queue='maintenance',
         )
 
+        # 04:00 MSK daily — Reconcile daily operation totals
+        upsert(
+            name='reconcile-daily-totals',
+            task='expense_bot.celery_tasks.reconcile_daily_totals',
+            crontab_schedule=crontab(minute='0', hour='4'),
+            queue='maintenance',
+        )
+
         # 05:00 MSK daily — Update Top-5 keyboards
         upsert(
             name='update-top5-keyboards',
@@ -173,6 +181,22 @@ def ensure_periodic_tasks(startup: bool = False) -> None:
             queue='notifications',
         )
 
+        # Every minute — flush buffered keyword usage counters to DB
+        upsert(
+            name='flush-keyword-usage',
+            task='expense_bot.celery_tasks.flush_keyword_usage',
+            interval_schedule=interval(1, IntervalSchedule.MINUTES),
+            queue='maintenance',
+        )
+
+        # Every minute — flush buffered last_activity timestamps to DB
+        upsert(
+            name='flush-profile-activity',
+            task='expense_bot.celery_tasks.flush_profile_activity',
+            interval_schedule=interval(1, IntervalSchedule.MINUTES),
+            queue='maintenance',
+        )
+
         # Cleanup stale/deprecated tasks from DB
         stale_tasks = [
             'process-held-affiliate-commissions',
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0003_add_crontabschedule_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='last_recipient_id',
+            field=models.BigIntegerField(
+                blank=True,
+                help_text='Контрольная точка отправки (id профиля), с неё продолжается прерванная рассылка',
+                null=True,
+                verbose_name='Последний обработанный получатель',
+            ),
+        ),
+    ]
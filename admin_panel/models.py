@@ -141,6 +141,13 @@ class BroadcastMessage(models.Model):
         verbose_name='Сообщение об ошибке'
     )
     
+    last_recipient_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Последний обработанный получатель',
+        help_text='Контрольная точка отправки (id профиля), с неё продолжается прерванная рассылка'
+    )
+    
     class Meta:
         verbose_name = 'Рассылка'
         verbose_name_plural = 'Рассылки'
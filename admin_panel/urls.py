@@ -20,6 +20,7 @@ urlpatterns = [
     
     # API endpoints для AJAX
     path('api/stats/', views.api_stats, name='api_stats'),
+    path('api/activity/', views.api_activity, name='api_activity'),
     path('api/users/search/', views.api_users_search, name='api_users_search'),
 
     # Партнёрская программа (кастомная админка)
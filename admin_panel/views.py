@@ -36,6 +36,19 @@ def _claim_broadcast_for_sending(broadcast_id, *, total_recipients=None):
         ).update(**update_kwargs)
 
 
+def _count_active_profiles(since, until=None):
+    """Активные пользователи из sorted set в Redis (актуальнее и без скана users_profile), иначе из БД"""
+    from bot.services.profile_activity import count_active_profiles
+
+    count = count_active_profiles(since, until)
+    if count is not None:
+        return count
+    queryset = Profile.objects.filter(last_activity__gte=since)
+    if until is not None:
+        queryset = queryset.filter(last_activity__lt=until)
+    return queryset.count()
+
+
 @login_required
 @admin_required
 def dashboard(request):
@@ -49,9 +62,11 @@ def dashboard(request):
     
     # Основные метрики
     total_users = Profile.objects.count()
-    active_today = Profile.objects.filter(last_activity__date=today).count()
-    active_yesterday = Profile.objects.filter(last_activity__date=yesterday).count()
-    active_week = Profile.objects.filter(last_activity__gte=week_ago_datetime).count()
+    today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    yesterday_start = today_start - timedelta(days=1)
+    active_today = _count_active_profiles(today_start)
+    active_yesterday = _count_active_profiles(yesterday_start, today_start)
+    active_week = _count_active_profiles(week_ago_datetime)
     
     # Метрики по тратам
     expenses_today = Expense.objects.filter(expense_date=today).count()
@@ -498,14 +513,11 @@ def broadcast_detail(request, broadcast_id):
             broadcast.started_at = None
             broadcast.completed_at = None
             broadcast.error_message = ''
+            broadcast.last_recipient_id = None
             broadcast.save()
             
-            # Сбрасываем статусы получателей
-            BroadcastRecipient.objects.filter(broadcast=broadcast).update(
-                status='pending',
-                sent_at=None,
-                error_message=''
-            )
+            # Записи получателей создаются заново по мере отправки
+            BroadcastRecipient.objects.filter(broadcast=broadcast).delete()
             
             # Запускаем заново
             if _claim_broadcast_for_sending(broadcast.id, total_recipients=broadcast.total_recipients):
@@ -527,11 +539,12 @@ def broadcast_detail(request, broadcast_id):
         return redirect('panel:broadcast_detail', broadcast_id=broadcast.id)
     
     # Получаем статистику по получателям
+    # Счётчики ведёт отправка (постранично, вместе с контрольной точкой)
     recipients_stats = {
-        'total': broadcast.recipients.count(),
-        'sent': broadcast.recipients.filter(status='sent').count(),
-        'failed': broadcast.recipients.filter(status='failed').count(),
-        'pending': broadcast.recipients.filter(status='pending').count(),
+        'total': broadcast.total_recipients,
+        'sent': broadcast.sent_count,
+        'failed': broadcast.failed_count,
+        'pending': max(broadcast.total_recipients - broadcast.sent_count - broadcast.failed_count, 0),
     }
     
     # Получаем последние ошибки
@@ -561,9 +574,7 @@ def api_stats(request):
     today = now.date()
     
     stats = {
-        'active_now': Profile.objects.filter(
-            last_activity__gte=now - timedelta(minutes=5)
-        ).count(),
+        'active_now': _count_active_profiles(now - timedelta(minutes=5)),
         'expenses_today': Expense.objects.filter(expense_date=today).count(),
         'new_users_today': Profile.objects.filter(created_at__date=today).count(),
     }
@@ -571,6 +582,29 @@ def api_stats(request):
     return JsonResponse(stats)
 
 
+@login_required
+@admin_required
+def api_activity(request):
+    """API endpoint: дневная статистика активности бота (из Redis, пишет ActivityTracker)"""
+    from django_redis import get_redis_connection
+    from bot.utils.activity_metrics import read_activity_snapshot
+
+    day = None
+    if request.GET.get('date'):
+        try:
+            day = datetime.strptime(request.GET['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
+
+    try:
+        snapshot = read_activity_snapshot(get_redis_connection("default"), day)
+    except Exception as e:
+        logger.error(f"Error reading activity snapshot: {e}")
+        return JsonResponse({'error': 'activity metrics unavailable'}, status=503)
+
+    return JsonResponse(snapshot)
+
+
 @login_required
 @admin_required
 def api_users_search(request):
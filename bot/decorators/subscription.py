@@ -7,6 +7,7 @@ from aiogram import types
 from aiogram.fsm.context import FSMContext
 from bot.services.subscription import check_subscription, subscription_required_message, get_subscription_button
 from bot.utils.logging_safe import log_safe_id
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, TokenBucketLimiter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -126,37 +127,22 @@ def rate_limit(max_calls: int = 10, period: int = 60):
             ...
     """
     def decorator(func):
-        # Словарь для хранения истории вызовов
-        call_history = {}
+        # Token bucket на пользователя, память ограничена LRU
+        limiter = TokenBucketLimiter(LocalBucketStore(max_subjects=10_000))
+        bucket = Bucket.per_window(func.__name__, max_calls, period)
         
         @wraps(func)
         async def wrapper(message: Union[types.Message, types.CallbackQuery], *args, **kwargs):
-            import time
-            
             user_id = message.from_user.id
-            current_time = time.time()
-            
-            # Инициализируем историю для пользователя
-            if user_id not in call_history:
-                call_history[user_id] = []
-            
-            # Удаляем старые вызовы
-            call_history[user_id] = [
-                call_time for call_time in call_history[user_id]
-                if current_time - call_time < period
-            ]
             
             # Проверяем лимит
-            if len(call_history[user_id]) >= max_calls:
+            if not limiter.check(user_id, (bucket,)).allowed:
                 if isinstance(message, types.CallbackQuery):
                     await message.answer("⚠️ Слишком много запросов. Попробуйте позже.")
                 else:
                     await message.answer("⚠️ Слишком много запросов. Попробуйте через минуту.")
                 return
             
-            # Добавляем текущий вызов
-            call_history[user_id].append(current_time)
-            
             # Выполняем функцию
             return await func(message, *args, **kwargs)
             
@@ -51,11 +51,12 @@ from .middlewares import (
     PrivacyCheckMiddleware,
     BotUnblockMiddleware,
     GroupChatGuardMiddleware,
+    RequestContextMiddleware,
 )
 from .middlewares.fsm_cleanup import FSMCleanupMiddleware
 from .middlewares.state_reset import StateResetMiddleware
 from .middlewares.voice_to_text import VoiceToTextMiddleware
-from .middleware import ActivityTrackerMiddleware, RateLimitMiddleware as AdminRateLimitMiddleware
+from .middleware import ActivityTrackerMiddleware
 from .handlers import error_router
 from .utils.commands import set_bot_commands
 from .utils.telegram_client import create_telegram_bot
@@ -119,6 +120,15 @@ async def on_shutdown(bot: Bot):
                 logger.info(f"Closed {provider_type} AI service")
     except Exception as e:
         logger.warning(f"Error closing AI services: {e}")
+
+    # Соединения с БД держатся открытыми между апдейтами (DatabaseMiddleware)
+    try:
+        from asgiref.sync import sync_to_async
+        from .middlewares.database import close_connections, get_connection_stats
+        await sync_to_async(close_connections, thread_sensitive=True)()
+        logger.info("Closed DB connections, stats: %s", get_connection_stats())
+    except Exception as e:
+        logger.warning(f"Error closing DB connections: {e}")
     
     logger.info("Бот остановлен")
 
@@ -178,11 +188,6 @@ def create_dispatcher() -> Dispatcher:
     dp.message.middleware(activity_tracker)
     dp.callback_query.middleware(activity_tracker)
     
-    # 2. Admin Rate Limiter - более строгий rate limiter с уведомлениями
-    admin_rate_limiter = AdminRateLimitMiddleware()
-    dp.message.middleware(admin_rate_limiter)
-    dp.callback_query.middleware(admin_rate_limiter)
-    
     # 3. Logging - логирует все запросы
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
@@ -195,16 +200,21 @@ def create_dispatcher() -> Dispatcher:
     dp.message.middleware(SecurityCheckMiddleware())
     dp.callback_query.middleware(SecurityCheckMiddleware())
 
-    # 6. Rate Limiting - ограничивает частоту запросов
-    from bot.middleware.rate_limit import CommandRateLimitMiddleware
-    dp.message.middleware(CommandRateLimitMiddleware())
-    dp.message.middleware(RateLimitMiddleware())
-    dp.callback_query.middleware(RateLimitMiddleware())
+    # 6. Rate Limiting - единый token bucket лимитер (сообщения, burst, команды;
+    # уведомляет админа о превышении часового лимита)
+    rate_limiter = RateLimitMiddleware()
+    dp.message.middleware(rate_limiter)
+    dp.callback_query.middleware(rate_limiter)
 
     # 7. Database - подключает БД
     dp.message.middleware(DatabaseMiddleware())
     dp.callback_query.middleware(DatabaseMiddleware())
 
+    # 7.3. Request Context - профиль, настройки и язык одним запросом на апдейт
+    # (data['request_context'] + ContextVar для сервисов)
+    dp.message.middleware(RequestContextMiddleware())
+    dp.callback_query.middleware(RequestContextMiddleware())
+
     # 7.5. Privacy Check - КРИТИЧЕСКИ ВАЖНО! Проверяет принятие политики (GDPR compliance)
     # ДОЛЖЕН быть ПОСЛЕ DatabaseMiddleware (чтобы профиль был создан/получен)
     # и ДО всех остальных (блокирует использование без принятия политики)
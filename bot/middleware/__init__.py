@@ -1,6 +1,6 @@
 """
 Middleware модули для бота
 """
-from .activity_tracker import ActivityTrackerMiddleware, RateLimitMiddleware
+from .activity_tracker import ActivityTrackerMiddleware
 
-__all__ = ['ActivityTrackerMiddleware', 'RateLimitMiddleware']
\ No newline at end of file
+__all__ = ['ActivityTrackerMiddleware']
\ No newline at end of file
@@ -7,24 +7,29 @@ from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 from django.core.cache import cache
-from django.conf import settings
-import asyncio
+import time
 
+from bot.services.profile_activity import record_profile_activity
+from bot.utils.activity_metrics import ActivityMetrics, flush_activity_batch
 from bot.utils.logging_safe import log_safe_id, sanitize_callback_action
 
 logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 60
+SUSPICIOUS_REQUESTS_PER_HOUR = 100
 
 
 class ActivityTrackerMiddleware(BaseMiddleware):
     """Middleware для отслеживания активности пользователей"""
     
-    def __init__(self):
-        self.stats = {
-            'total_requests': 0,
-            'unique_users': set(),
-            'commands': {},
-            'errors': []
-        }
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS, connection=None):
+        # Память ограничена: HyperLogLog, top-k команд, кольцевой буфер ошибок
+        self.metrics = ActivityMetrics()
+        self.flush_interval = flush_interval
+        self._connection = connection
+        self._flushed_at = time.monotonic()
+        # Ошибок с последнего алерта админу
+        self._errors_since_alert = 0
         self.last_report_time = datetime.now()
         
     async def __call__(
@@ -48,15 +53,14 @@ class ActivityTrackerMiddleware(BaseMiddleware):
             command = f"callback:{callback_action}"
             
         if user:
-            # Обновляем статистику
-            self.stats['total_requests'] += 1
-            self.stats['unique_users'].add(user.id)
-            
-            if command:
-                self.stats['commands'][command] = self.stats['commands'].get(command, 0) + 1
-            
-            # Отслеживаем активность пользователя
-            await self._track_user_activity(user.id)
+            # Обновляем статистику (в Redis уходит пачкой раз в flush_interval)
+            self.metrics.record_request(user.id, command)
+            # last_activity: ZADD в Redis, в БД пишет Celery (flush_profile_activity)
+            if not record_profile_activity(user.id):
+                from bot.services.profile import update_profile_activity
+                await update_profile_activity(user.id)
+            if self.metrics.pending_full or time.monotonic() - self._flushed_at >= self.flush_interval:
+                await self.flush()
         
         try:
             # Вызываем основной обработчик
@@ -69,30 +73,39 @@ class ActivityTrackerMiddleware(BaseMiddleware):
                 'error': str(e),
                 'command': command
             }
-            self.stats['errors'].append(error_info)
+            self.metrics.record_error(error_info)
+            self._errors_since_alert += 1
             
             # Отправляем уведомление админу о критической ошибке
-            if len(self.stats['errors']) >= 5:
+            if self._errors_since_alert >= 5:
                 await self._send_error_alert()
                 
             raise
-            
-    async def _track_user_activity(self, user_id: int):
-        """Отслеживание активности пользователя"""
-        activity_key = f"user_activity:{user_id}"
-        last_activity_key = f"user_last_activity:{user_id}"
-        
-        # Получаем текущую активность
-        activity_count = cache.get(activity_key, 0)
-        activity_count += 1
-        
-        # Сохраняем обновленную активность
-        cache.set(activity_key, activity_count, 3600)  # Храним час
-        cache.set(last_activity_key, datetime.now().isoformat(), 86400)  # Храним сутки
-        
+
+    def _get_connection(self):
+        if self._connection is None:
+            from django_redis import get_redis_connection
+            self._connection = get_redis_connection("default")
+        return self._connection
+
+    async def flush(self):
+        """Перенос накопленной статистики в Redis и проверка почасовой активности"""
+        self._flushed_at = time.monotonic()
+        batch = self.metrics.drain()
+        if not batch:
+            return
+
+        try:
+            hourly_counts = flush_activity_batch(self._get_connection(), batch)
+        except Exception as e:
+            # Статистика не критична: дельту отбрасываем, память не растёт
+            logger.warning(f"Activity metrics flush failed: {e}")
+            hourly_counts = batch.users
+
         # Проверяем подозрительную активность
-        if activity_count > 100:  # Более 100 запросов в час
-            await self._send_suspicious_activity_alert(user_id, activity_count)
+        for user_id, activity_count in hourly_counts.items():
+            if activity_count > SUSPICIOUS_REQUESTS_PER_HOUR:
+                await self._send_suspicious_activity_alert(user_id, activity_count)
             
                 
     async def _send_suspicious_activity_alert(self, user_id: int, activity_count: int):
@@ -123,7 +136,7 @@ class ActivityTrackerMiddleware(BaseMiddleware):
         if not cache.get(alert_key):
             from bot.services.admin_notifier import send_admin_alert
             
-            recent_errors = self.stats['errors'][-5:]
+            recent_errors = list(self.metrics.errors)[-5:]
             error_details = "\n".join([
                 f"• {err['time']}: {err['command'] or 'unknown'} - {err['error'][:50]}"
                 for err in recent_errors
@@ -131,7 +144,7 @@ class ActivityTrackerMiddleware(BaseMiddleware):
             
             message = (
                 f"🚨 *\\[Coins\\] Множественные ошибки в боте*\n\n"
-                f"Количество ошибок: {len(self.stats['errors'])}\n"
+                f"Количество ошибок: {self._errors_since_alert}\n"
                 f"Последние ошибки:\n{error_details}\n\n"
                 f"Требуется проверка логов\\!"
             )
@@ -139,102 +152,15 @@ class ActivityTrackerMiddleware(BaseMiddleware):
             try:
                 await send_admin_alert(message)
                 cache.set(alert_key, True, 600)  # Не отправляем повторно 10 минут
-                self.stats['errors'] = []  # Очищаем список ошибок
+                self._errors_since_alert = 0
             except Exception as e:
                 logger.error(f"Ошибка отправки алерта об ошибках: {e}")
                 
     async def get_daily_stats(self) -> Dict:
         """Получение статистики за день"""
-        return {
-            'total_requests': self.stats['total_requests'],
-            'unique_users': len(self.stats['unique_users']),
-            'popular_commands': sorted(
-                self.stats['commands'].items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:10],
-            'errors_count': len(self.stats['errors'])
-        }
+        return self.metrics.snapshot()
         
     def reset_stats(self):
         """Сброс статистики"""
-        self.stats = {
-            'total_requests': 0,
-            'unique_users': set(),
-            'commands': {},
-            'errors': []
-        }
+        self.metrics.reset()
         self.last_report_time = datetime.now()
-
-
-class RateLimitMiddleware(BaseMiddleware):
-    """Middleware для ограничения частоты запросов"""
-
-    def __init__(self, messages_per_minute: int = 120, messages_per_hour: int = 3000):
-        self.messages_per_minute = messages_per_minute
-        self.messages_per_hour = messages_per_hour
-        
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: Dict[str, Any]
-    ) -> Any:
-        """Проверка rate limit"""
-        user = None
-        
-        if isinstance(event, (Message, CallbackQuery)):
-            user = event.from_user
-            
-        if user:
-            # Проверяем лимиты
-            if not await self._check_rate_limit(user.id):
-                # Отправляем предупреждение пользователю
-                if isinstance(event, Message):
-                    await event.answer(
-                        "⚠️ Слишком много запросов. Пожалуйста, подождите немного.",
-                        show_alert=False
-                    )
-                elif isinstance(event, CallbackQuery):
-                    await event.answer(
-                        "⚠️ Слишком много запросов. Подождите немного.",
-                        show_alert=True
-                    )
-                return None
-                
-        return await handler(event, data)
-        
-    async def _check_rate_limit(self, user_id: int) -> bool:
-        """Проверка rate limit для пользователя"""
-        # Ключи для минутного и часового лимитов
-        minute_key = f"rate_limit:minute:{user_id}"
-        hour_key = f"rate_limit:hour:{user_id}"
-        
-        # Получаем текущие счетчики
-        minute_count = cache.get(minute_key, 0)
-        hour_count = cache.get(hour_key, 0)
-        
-        # Проверяем лимиты
-        if minute_count >= self.messages_per_minute:
-            logger.warning("Rate limit превышен для %s (минутный)", log_safe_id(user_id, "user"))
-            return False
-            
-        if hour_count >= self.messages_per_hour:
-            logger.warning("Rate limit превышен для %s (часовой)", log_safe_id(user_id, "user"))
-            
-            # Отправляем уведомление админу о блокировке
-            from bot.services.admin_notifier import send_admin_alert
-            message = (
-                f"🚫 *\\[Coins\\] Пользователь заблокирован rate limiter*\n\n"
-                f"User: `{log_safe_id(user_id, 'user')}`\n"
-                f"Превышен часовой лимит: {hour_count}/{self.messages_per_hour}\n"
-                f"Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            asyncio.create_task(send_admin_alert(message))
-            return False
-            
-        # Увеличиваем счетчики
-        cache.set(minute_key, minute_count + 1, 60)
-        cache.set(hour_key, hour_count + 1, 3600)
-        
-        return True
@@ -10,6 +10,7 @@ from .privacy_check import PrivacyCheckMiddleware
 from .fsm_cleanup import FSMCleanupMiddleware
 from .bot_unblock import BotUnblockMiddleware
 from .group_guard import GroupChatGuardMiddleware
+from .request_context import RequestContextMiddleware
 
 __all__ = [
     "DatabaseMiddleware",
@@ -23,4 +24,5 @@ __all__ = [
     "FSMCleanupMiddleware",
     "BotUnblockMiddleware",
     "GroupChatGuardMiddleware",
+    "RequestContextMiddleware",
 ]
\ No newline at end of file
@@ -1,16 +1,69 @@
 """
 Database middleware для подключения Django ORM
+
+Режимы работы с соединениями (settings.BOT_DB_PERSISTENT_CONNECTIONS):
+
+- persistent (по умолчанию): после апдейта соединение остаётся открытым
+  и переиспользуется следующими апдейтами. Закрываются только устаревшие
+  (старше BOT_DB_CONN_MAX_AGE), сломанные (после ошибок БД не проходят
+  is_usable()) и оставшиеся с незавершённой транзакцией — та же логика,
+  что у Django для CONN_MAX_AGE между HTTP-запросами. Перед первым
+  запросом следующего апдейта Django проверяет соединение (health check).
+- close: соединения закрываются после каждого апдейта (старое поведение).
+
+Все ORM-вызовы бота идут через sync_to_async(thread_sensitive=True), то
+есть в одном потоке, поэтому на процесс держится одно соединение.
 """
-from typing import Callable, Dict, Any, Awaitable
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import django
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-import django
-from django.db import connections
 from asgiref.sync import sync_to_async
-import logging
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
 
 logger = logging.getLogger(__name__)
 
+STATS_LOG_EVERY_UPDATES = 1000
+
+_stats = {'opened': 0, 'reused': 0, 'closed': 0, 'updates': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += value
+
+
+def get_connection_stats() -> Dict[str, int]:
+    """
+    Счётчики соединений процесса бота:
+    opened — открыто новых, reused — оставлено открытым после апдейта
+    для следующих, closed — закрыто как устаревшие/сломанные.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_connection_stats() -> None:
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _connection_opened(sender, connection, **kwargs):
+    # Срок жизни и health check задаются только для процесса бота,
+    # не меняя CONN_MAX_AGE веб-процесса и Celery
+    max_age = getattr(settings, 'BOT_DB_CONN_MAX_AGE', 0)
+    connection.close_at = None if max_age is None else time.monotonic() + max_age
+    connection.health_check_enabled = True
+    _count('opened')
+
 
 def close_connections():
     """Синхронная функция для закрытия соединений"""
@@ -18,12 +71,33 @@ def close_connections():
         conn.close()
 
 
+def release_connections():
+    """Оставляет открытыми только исправные соединения текущего потока"""
+    kept = closed = 0
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is None:
+            continue
+        # Закрывает устаревшие, сломанные и с незавершённой транзакцией
+        conn.close_if_unusable_or_obsolete()
+        if conn.connection is None:
+            closed += 1
+        else:
+            kept += 1
+    _count('reused', kept)
+    _count('closed', closed)
+
+
 class DatabaseMiddleware(BaseMiddleware):
     """Middleware для работы с Django ORM в async контексте"""
-    
-    def __init__(self):
+
+    def __init__(self, persistent: bool = None):
         django.setup()
-    
+        if persistent is None:
+            persistent = getattr(settings, 'BOT_DB_PERSISTENT_CONNECTIONS', False)
+        self.persistent = persistent
+        if persistent:
+            connection_created.connect(_connection_opened, dispatch_uid='bot_db_connection_opened')
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -34,7 +108,23 @@ class DatabaseMiddleware(BaseMiddleware):
             # Обрабатываем запрос
             result = await handler(event, data)
         finally:
-            # Закрываем все соединения для текущего потока
-            await sync_to_async(close_connections, thread_sensitive=True)()
-        
-        return result
\ No newline at end of file
+            if self.persistent:
+                await sync_to_async(release_connections, thread_sensitive=True)()
+            else:
+                # Закрываем все соединения для текущего потока
+                await sync_to_async(close_connections, thread_sensitive=True)()
+            self._log_stats()
+
+        return result
+
+    @staticmethod
+    def _log_stats() -> None:
+        with _stats_lock:
+            _stats['updates'] += 1
+            if _stats['updates'] % STATS_LOG_EVERY_UPDATES:
+                return
+            snapshot = dict(_stats)
+        logger.info(
+            "DB connections after %s updates: opened=%s reused=%s closed=%s",
+            snapshot['updates'], snapshot['opened'], snapshot['reused'], snapshot['closed'],
+        )
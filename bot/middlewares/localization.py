@@ -32,9 +32,13 @@ class LocalizationMiddleware(BaseMiddleware):
             
         if user and telegram_id:
             # Пытаемся получить язык из профиля пользователя в БД
+            context = data.get('request_context')
             try:
-                from expenses.models import Profile
-                profile = await sync_to_async(Profile.objects.filter(telegram_id=telegram_id).first)()
+                if context is not None and context.telegram_id == telegram_id:
+                    profile = context.profile
+                else:
+                    from expenses.models import Profile
+                    profile = await sync_to_async(Profile.objects.filter(telegram_id=telegram_id).first)()
                 
                 if profile and profile.language_code:
                     # Используем язык из профиля
@@ -61,6 +65,8 @@ class LocalizationMiddleware(BaseMiddleware):
                 lang_code = lang_code[:2]
                 
             data['lang'] = lang_code
+            if context is not None and context.telegram_id == telegram_id:
+                context.language = lang_code
         else:
             data['lang'] = 'ru'
             
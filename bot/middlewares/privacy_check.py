@@ -62,11 +62,15 @@ class PrivacyCheckMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
 
-        # Пытаемся получить профиль пользователя
-        try:
-            profile = await Profile.objects.aget(telegram_id=user.id)
-        except Profile.DoesNotExist:
-            profile = None
+        # Профиль уже загружен RequestContextMiddleware
+        context = data.get('request_context')
+        if context is not None and context.telegram_id == user.id:
+            profile = context.profile
+        else:
+            try:
+                profile = await Profile.objects.aget(telegram_id=user.id)
+            except Profile.DoesNotExist:
+                profile = None
 
         # Если профиль не существует или политика не принята - показываем политику
         if profile is None or not profile.accepted_privacy:
@@ -1,31 +1,74 @@
 """
 Rate limiting middleware для Expense Bot
+
+Единственный лимитер в цепочке middleware (раньше их было три:
+этот, bot/middleware/rate_limit.py с лимитами команд и лимитер
+ActivityTracker). Все лимиты — token bucket'ы (bot/utils/rate_limiter.py)
+с общим состоянием в Redis и ограниченным по памяти локальным fallback:
+
+- burst: burst_size запросов подряд, пополнение burst_size за 2 секунды;
+  исчерпание — блокировка на BURST_BLOCK_SECONDS;
+- минутный и часовой лимиты сообщений;
+- лимиты отдельных команд (/start, /add, /chat, ...).
 """
-import time
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Dict, Any, Callable, Awaitable
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
 from aiogram import BaseMiddleware
-from aiogram.types import Update, Message, CallbackQuery
+from aiogram.types import CallbackQuery, Message, Update
 from django.conf import settings
-import asyncio
+from django.core.cache import cache
+
+from bot.utils.logging_safe import log_safe_id
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, RedisBucketStore, TokenBucketLimiter
 
-from .security import RateLimiter, log_security_event
+from .security import log_security_event
 
 logger = logging.getLogger(__name__)
 
+BURST_WINDOW_SECONDS = 2
+BURST_BLOCK_SECONDS = 300
+STATS_REPORT_SECONDS = 3600
+BLOCKED_WARNING_EVERY = 10
+
+# Лимиты команд: (количество, окно в секундах)
+COMMAND_LIMITS = {
+    '/start': (10, 60),
+    '/help': (15, 60),
+    '/add': (200, 86400),
+    '/categories': (30, 60),
+    '/recurring': (30, 60),
+    '/settings': (30, 60),
+    '/today': (50, 60),
+    '/month': (50, 60),
+    '/chat': (60, 60),
+}
+DEFAULT_COMMAND_LIMIT = (40, 60)
+
+
+def _command_of(event: Any) -> Optional[str]:
+    if not isinstance(event, Message) or not event.text:
+        return None
+    text = event.text.strip()
+    if not text.startswith('/'):
+        return None
+    return text.split()[0].split('@')[0].lower()
+
 
 class RateLimitMiddleware(BaseMiddleware):
     """Advanced rate limiting middleware с поддержкой aiogram 3.x"""
-    
-    def __init__(self, 
+
+    def __init__(self,
                  requests_per_minute: int = None,
                  requests_per_hour: int = None,
                  burst_size: int = 10,
-                 use_redis: bool = True):
+                 use_redis: bool = True,
+                 max_local_users: int = 50_000):
         super().__init__()
-        
+
         # Используем настройки из settings.py или переданные параметры
         self.requests_per_minute = requests_per_minute or getattr(
             settings, 'BOT_RATE_LIMIT_MESSAGES_PER_MINUTE', 100
@@ -34,24 +77,34 @@ class RateLimitMiddleware(BaseMiddleware):
             settings, 'BOT_RATE_LIMIT_MESSAGES_PER_HOUR', 2000
         )
         self.burst_size = burst_size
-        self.use_redis = use_redis
-        
-        # Локальное хранилище (резервное)
-        self.user_requests: Dict[int, list] = defaultdict(list)
-        self.user_warnings: Dict[int, int] = defaultdict(int)
-        self.blocked_users: Dict[int, datetime] = {}
-        
+
+        local_store = LocalBucketStore(max_subjects=max_local_users)
+        store = RedisBucketStore(fallback=local_store) if use_redis else local_store
+        self.limiter = TokenBucketLimiter(store)
+
+        self.burst_bucket = Bucket.per_window('burst', burst_size, BURST_WINDOW_SECONDS)
+        self.message_buckets = (
+            self.burst_bucket,
+            Bucket.per_window('minute', self.requests_per_minute, 60),
+            Bucket.per_window('hour', self.requests_per_hour, 3600),
+        )
+        self.command_buckets = {
+            command: Bucket.per_window(command, limit, window)
+            for command, (limit, window) in COMMAND_LIMITS.items()
+        }
+        self.default_command_bucket = Bucket.per_window('command', *DEFAULT_COMMAND_LIMIT)
+
+        # Счётчик обращений заблокированных пользователей (ограничен по размеру)
+        self._blocked_attempts: 'OrderedDict[int, int]' = OrderedDict()
+        self._max_local_users = max_local_users
+
         # Статистика
         self.stats = {
             'total_requests': 0,
             'blocked_requests': 0,
-            'unique_users': set(),
         }
-        
-        # Запускаем периодическую очистку
-        asyncio.create_task(self._cleanup_loop())
-        asyncio.create_task(self._stats_reporter())
-    
+        self._stats_reported_at = time.monotonic()
+
     async def __call__(
         self,
         handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
@@ -59,124 +112,85 @@ class RateLimitMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         """Обработчик middleware для aiogram 3.x"""
-        # Получаем пользователя из события
-        user = None
-        if isinstance(event, Message):
-            user = event.from_user
-        elif isinstance(event, CallbackQuery):
-            user = event.from_user
-        elif hasattr(event, 'from_user'):
-            user = event.from_user
-        
+        user = getattr(event, 'from_user', None)
         if not user:
             return await handler(event, data)
-        
+
         user_id = user.id
-        now = datetime.now()
-        
-        # Обновляем статистику
         self.stats['total_requests'] += 1
-        self.stats['unique_users'].add(user_id)
-        
-        # Проверяем Redis rate limiter если доступен
-        if self.use_redis:
-            try:
-                # Проверяем минутный лимит
-                if not RateLimiter.check_rate_limit(
-                    user_id, 'messages_minute', 
-                    self.requests_per_minute, 60
-                ):
-                    await self._handle_rate_limit_exceeded(
-                        event, user_id, 'minute', 
-                        RateLimiter.get_remaining_time(user_id, 'messages_minute')
-                    )
-                    return
-                
-                # Проверяем часовой лимит
-                if not RateLimiter.check_rate_limit(
-                    user_id, 'messages_hour',
-                    self.requests_per_hour, 3600
-                ):
-                    await self._handle_rate_limit_exceeded(
-                        event, user_id, 'hour',
-                        RateLimiter.get_remaining_time(user_id, 'messages_hour')
-                    )
-                    return
-                    
-            except Exception as e:
-                logger.error(f"Redis rate limiter error: {e}")
-                # Fallback на локальный rate limiter
-        
-        # Локальная проверка (резервная или основная)
-        if not self.use_redis or True:  # Всегда проверяем burst
-            # Проверяем блокировку
-            if user_id in self.blocked_users:
-                if now < self.blocked_users[user_id]:
-                    remaining = (self.blocked_users[user_id] - now).seconds
-                    await self._handle_blocked_user(event, user_id, remaining)
-                    return
-                else:
-                    del self.blocked_users[user_id]
-                    self.user_warnings[user_id] = 0
-            
-            # Очищаем старые запросы
-            self._cleanup_user_requests(user_id, now)
-            
-            # Проверяем burst
-            if self._check_burst(user_id):
-                self.blocked_users[user_id] = now + timedelta(minutes=5)
-                await self._handle_burst_detected(event, user_id)
+        self._maybe_report_stats()
+
+        command = _command_of(event)
+        if command is not None:
+            # Лимит команды — отдельный субъект, чтобы ведра команд не смешивались
+            command_bucket = self.command_buckets.get(command) or self.default_command_bucket
+            decision = self.limiter.check(f"{user_id}:{command}", (command_bucket,))
+            if not decision.allowed:
+                self.stats['blocked_requests'] += 1
+                await self._handle_command_limit_exceeded(event, user_id, command)
                 return
-            
-            # Добавляем текущий запрос
-            self.user_requests[user_id].append(now)
-        
-        # Передаем управление следующему обработчику
-        return await handler(event, data)
-    
-    def _cleanup_user_requests(self, user_id: int, now: datetime):
-        """Очистка старых запросов пользователя"""
-        minute_ago = now - timedelta(minutes=1)
-        hour_ago = now - timedelta(hours=1)
-        
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id]
-            if req_time > hour_ago
-        ]
-    
-    def _check_burst(self, user_id: int) -> bool:
-        """Проверка на burst активность"""
-        if len(self.user_requests[user_id]) < self.burst_size:
-            return False
-        
-        recent_requests = self.user_requests[user_id][-self.burst_size:]
-        time_diff = (recent_requests[-1] - recent_requests[0]).total_seconds()
-        
-        return time_diff < 2  # burst_size запросов за 2 секунды
-    
-    async def _handle_rate_limit_exceeded(self, event: Any, user_id: int, 
+
+        decision = self.limiter.check(user_id, self.message_buckets)
+        if decision.allowed:
+            self._blocked_attempts.pop(user_id, None)
+            return await handler(event, data)
+
+        self.stats['blocked_requests'] += 1
+        if decision.blocked:
+            await self._handle_blocked_user(event, user_id, decision.retry_after_seconds)
+        elif decision.bucket is self.burst_bucket:
+            self.limiter.block(user_id, BURST_BLOCK_SECONDS)
+            await self._handle_burst_detected(event, user_id)
+        else:
+            limit_type = decision.bucket.name
+            if limit_type == 'hour':
+                self._notify_admin_hour_limit(user_id)
+            await self._handle_rate_limit_exceeded(event, user_id, limit_type, decision.retry_after_seconds)
+
+    async def _handle_rate_limit_exceeded(self, event: Any, user_id: int,
                                          limit_type: str, remaining_seconds: int):
         """Обработка превышения rate limit"""
-        self.stats['blocked_requests'] += 1
-        
         log_security_event(
             'rate_limit_exceeded',
             user_id,
             {'type': limit_type, 'remaining_seconds': remaining_seconds}
         )
-        
+
         if limit_type == 'minute':
             message = f"⚠️ Превышен лимит сообщений в минуту ({self.requests_per_minute}).\n"
         else:
             message = f"⚠️ Превышен часовой лимит сообщений ({self.requests_per_hour}).\n"
-        
+
         message += f"Попробуйте через {remaining_seconds} секунд."
-        
-        if isinstance(event, Message):
-            await event.answer(message)
-        elif isinstance(event, CallbackQuery):
-            await event.answer(message, show_alert=True)
-    
+
+        await self._answer(event, message)
+
+    async def _handle_command_limit_exceeded(self, event: Message, user_id: int, command: str):
+        """Обработка превышения лимита команды"""
+        logger.warning(
+            "Command rate limit exceeded for %s, command %s",
+            log_safe_id(user_id, "user"),
+            command,
+        )
+
+        if command == '/add':
+            limit = COMMAND_LIMITS['/add'][0]
+            message = (
+                f"⚠️ Достигнут дневной лимит добавления расходов ({limit} записей).\n"
+                "Попробуйте завтра."
+            )
+        elif command == '/chat':
+            message = (
+                "⚠️ AI чат временно недоступен из-за превышения лимита запросов.\n"
+                "Попробуйте через минуту."
+            )
+        else:
+            message = (
+                f"⚠️ Слишком много запросов команды {command}.\n"
+                f"Подождите немного и попробуйте снова."
+            )
+        await event.answer(message)
+
     async def _handle_burst_detected(self, event: Any, user_id: int):
         """Обработка обнаружения burst"""
         log_security_event(
@@ -184,68 +198,60 @@ class RateLimitMiddleware(BaseMiddleware):
             user_id,
             {'burst_size': self.burst_size}
         )
-        
+
         message = "⛔ Обнаружена подозрительная активность.\nВы временно заблокированы на 5 минут."
-        
-        if isinstance(event, Message):
-            await event.answer(message)
-        elif isinstance(event, CallbackQuery):
-            await event.answer(message, show_alert=True)
-    
-    async def _handle_blocked_user(self, event: Any, user_id: int, 
+        await self._answer(event, message)
+
+    async def _handle_blocked_user(self, event: Any, user_id: int,
                                   remaining_seconds: int):
         """Обработка заблокированного пользователя"""
-        self.user_warnings[user_id] += 1
-        
+        attempts = self._blocked_attempts.pop(user_id, 0) + 1
+        self._blocked_attempts[user_id] = attempts
+        while len(self._blocked_attempts) > self._max_local_users:
+            self._blocked_attempts.popitem(last=False)
+
         # Показываем сообщение только каждое 10-е обращение
-        if self.user_warnings[user_id] % 10 == 0:
+        if attempts % BLOCKED_WARNING_EVERY == 0:
             message = f"🚫 Вы временно заблокированы.\nОсталось: {remaining_seconds} секунд."
-            
-            if isinstance(event, Message):
-                await event.answer(message)
-            elif isinstance(event, CallbackQuery):
-                await event.answer(message, show_alert=True)
-    
-    async def _cleanup_loop(self):
-        """Периодическая очистка данных"""
-        while True:
-            await asyncio.sleep(300)  # Каждые 5 минут
-            try:
-                now = datetime.now()
-                hour_ago = now - timedelta(hours=1)
-                
-                # Очищаем старые запросы
-                for user_id in list(self.user_requests.keys()):
-                    self.user_requests[user_id] = [
-                        req_time for req_time in self.user_requests[user_id]
-                        if req_time > hour_ago
-                    ]
-                    if not self.user_requests[user_id]:
-                        del self.user_requests[user_id]
-                
-                # Очищаем истекшие блокировки
-                for user_id in list(self.blocked_users.keys()):
-                    if self.blocked_users[user_id] < now:
-                        del self.blocked_users[user_id]
-                        if user_id in self.user_warnings:
-                            del self.user_warnings[user_id]
-                
-            except Exception as e:
-                logger.error(f"Error in cleanup loop: {e}")
-    
-    async def _stats_reporter(self):
+            await self._answer(event, message)
+
+    def _notify_admin_hour_limit(self, user_id: int) -> None:
+        """Уведомление админа — не чаще раза в час на пользователя"""
+        try:
+            if not cache.add(f"rate_limit:admin_alert:{user_id}", 1, 3600):
+                return
+        except Exception as e:
+            logger.debug("Rate limit alert dedup failed: %s", e)
+            return
+
+        import asyncio
+        from bot.services.admin_notifier import send_admin_alert
+
+        message = (
+            f"🚫 *\\[Coins\\] Пользователь заблокирован rate limiter*\n\n"
+            f"User: `{log_safe_id(user_id, 'user')}`\n"
+            f"Превышен часовой лимит: {self.requests_per_hour}/час\n"
+            f"Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+        asyncio.create_task(send_admin_alert(message))
+
+    @staticmethod
+    async def _answer(event: Any, message: str) -> None:
+        if isinstance(event, Message):
+            await event.answer(message)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(message, show_alert=True)
+
+    def _maybe_report_stats(self) -> None:
         """Периодический отчет статистики"""
-        while True:
-            await asyncio.sleep(3600)  # Каждый час
-            try:
-                logger.info(
-                    f"Rate limiter stats: "
-                    f"requests={self.stats['total_requests']}, "
-                    f"blocked={self.stats['blocked_requests']}, "
-                    f"unique_users={len(self.stats['unique_users'])}"
-                )
-                # Сброс статистики
-                self.stats['blocked_requests'] = 0
-                self.stats['unique_users'].clear()
-            except Exception as e:
-                logger.error(f"Error in stats reporter: {e}")
\ No newline at end of file
+        now = time.monotonic()
+        if now - self._stats_reported_at < STATS_REPORT_SECONDS:
+            return
+        self._stats_reported_at = now
+        logger.info(
+            "Rate limiter stats: requests=%s, blocked=%s, tracked_users=%s",
+            self.stats['total_requests'],
+            self.stats['blocked_requests'],
+            self.limiter.tracked_subjects,
+        )
+        self.stats['blocked_requests'] = 0
@@ -0,0 +1,53 @@
+"""
+Request context middleware - один запрос профиля на апдейт
+"""
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from asgiref.sync import sync_to_async
+import logging
+
+from bot.utils.logging_safe import log_safe_id
+from bot.utils.request_context import (
+    activate_request_context,
+    deactivate_request_context,
+    load_request_context_sync,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContextMiddleware(BaseMiddleware):
+    """
+    Загружает профиль и настройки пользователя один раз на апдейт.
+
+    Контекст доступен как data['request_context'] и через
+    bot.utils.request_context.get_request_context() в сервисах.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = None
+        if isinstance(event, (Message, CallbackQuery)):
+            user = event.from_user
+
+        if not user:
+            return await handler(event, data)
+
+        try:
+            context = await sync_to_async(load_request_context_sync)(user.id)
+        except Exception as e:
+            # Без контекста сервисы работают как раньше — сами читают профиль
+            logger.error("Failed to load request context for %s: %s", log_safe_id(user.id, "user"), e)
+            return await handler(event, data)
+
+        data['request_context'] = context
+        token = activate_request_context(context)
+        try:
+            return await handler(event, data)
+        finally:
+            deactivate_request_context(token)
@@ -3,16 +3,107 @@ Security middleware для проверки контента в Expense Bot
 """
 import hashlib
 import logging
+import re
 from collections import defaultdict
-from typing import Dict, Any, Callable, Awaitable, Set
+from typing import Dict, Any, Callable, Awaitable, Iterable, List, Set, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Update, Message, CallbackQuery
 from django.conf import settings
 
+from bot.utils.logging_safe import log_safe_id
+
 from .security import SecurityValidator, FileValidator, log_security_event
 
 logger = logging.getLogger(__name__)
 
+# SQL-паттерны ищутся как отдельные слова: f' {pattern} ' in f' {text} '
+SQL_PATTERN_PREFIXES = ('drop', 'delete', 'insert', 'update')
+# 'script' срабатывает только в подозрительном контексте ("description",
+# "transcript" разрешены)
+SCRIPT_CONTEXTS = ('<script', 'javascript:', 'src=', 'onload=', 'onerror=')
+
+# Системные callback без проверки
+SAFE_CALLBACK_PREFIXES = (
+    'subscription_', 'sub_', 'menu_', 'expenses_', 'close',
+    'pdf_', 'cashback_', 'referral_', 'settings_', 'category_'
+)
+
+# 11+ одинаковых символов подряд
+REPEATED_CHARS_RE = re.compile(r'(.)\1{10}', re.DOTALL)
+
+
+class PatternScanner:
+    """
+    Поиск подозрительных паттернов и honeypot-токенов за один проход.
+
+    Все подстроки-индикаторы собраны в одно регулярное выражение вида
+    (?=(a|b|...)), которое в C находит вхождения на каждой позиции текста.
+    Альтернативы упорядочены по убыванию длины, поэтому на позиции
+    находится самая длинная подстрока; более короткие, совпавшие на той же
+    позиции, — её префиксы, они добавляются по заранее посчитанной таблице.
+    Результат совпадает с поочерёдными проверками `in` по каждому паттерну.
+    """
+
+    def __init__(self, patterns: Iterable[str], honeypot_tokens: Iterable[str]):
+        self.honeypot_tokens = tuple(token.lower() for token in honeypot_tokens)
+        # (паттерн, вид проверки, подстроки)
+        self.rules: List[Tuple[str, str, Tuple[str, ...]]] = []
+        needles = set(self.honeypot_tokens)
+
+        for pattern in patterns:
+            pattern_lower = pattern.lower()
+            if pattern_lower.startswith('<') or '=' in pattern_lower or pattern_lower.startswith('javascript'):
+                rule = (pattern, 'substring', (pattern_lower,))
+            elif pattern_lower.startswith(SQL_PATTERN_PREFIXES):
+                rule = (pattern, 'word', (pattern_lower,))
+            elif pattern_lower == 'script':
+                rule = (pattern, 'substring', SCRIPT_CONTEXTS)
+            else:
+                rule = (pattern, 'substring', (pattern_lower,))
+            self.rules.append(rule)
+            needles.update(rule[2])
+
+        ordered = sorted(needles, key=len, reverse=True)
+        self._regex = re.compile('(?=(' + '|'.join(map(re.escape, ordered)) + '))')
+        self._prefixes = {
+            needle: tuple(other for other in needles if needle.startswith(other))
+            for needle in needles
+        }
+
+    def find(self, text_lower: str) -> Dict[str, List[int]]:
+        """{подстрока: позиции вхождений}"""
+        found: Dict[str, List[int]] = {}
+        for match in self._regex.finditer(text_lower):
+            start = match.start()
+            for needle in self._prefixes[match.group(1)]:
+                found.setdefault(needle, []).append(start)
+        return found
+
+    def scan(self, text: str) -> Tuple[List[str], bool]:
+        """(сработавшие паттерны в порядке списка, найден ли honeypot-токен)"""
+        text_lower = text.lower()
+        found = self.find(text_lower)
+        if not found:
+            return [], False
+
+        detected = []
+        for pattern, kind, needles in self.rules:
+            if kind == 'word':
+                needle = needles[0]
+                hit = any(_is_word_at(text_lower, start, len(needle)) for start in found.get(needle, ()))
+            else:
+                hit = any(needle in found for needle in needles)
+            if hit:
+                detected.append(pattern)
+
+        honeypot = any(token in found for token in self.honeypot_tokens)
+        return detected, honeypot
+
+
+def _is_word_at(text: str, start: int, length: int) -> bool:
+    end = start + length
+    return (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' ')
+
 
 class SecurityCheckMiddleware(BaseMiddleware):
     """Enhanced security middleware для проверки контента"""
@@ -57,6 +148,9 @@ class SecurityCheckMiddleware(BaseMiddleware):
         
         # Максимальная длина сообщения
         self.max_message_length = getattr(settings, 'BOT_MAX_MESSAGE_LENGTH', 4096)
+
+        # Паттерны и honeypot-токены, скомпилированные для поиска за один проход
+        self.scanner = PatternScanner(self.suspicious_patterns, self.honeypot_tokens)
     
     async def __call__(
         self,
@@ -80,10 +174,7 @@ class SecurityCheckMiddleware(BaseMiddleware):
             text = event.data
             
             # Пропускаем проверку для системных callback
-            if text and any(text.startswith(prefix) for prefix in [
-                'subscription_', 'sub_', 'menu_', 'expenses_', 'close',
-                'pdf_', 'cashback_', 'referral_', 'settings_', 'category_'
-            ]):
+            if text and text.startswith(SAFE_CALLBACK_PREFIXES):
                 return await handler(event, data)
         
         if not user:
@@ -118,16 +209,16 @@ class SecurityCheckMiddleware(BaseMiddleware):
             if message_hash in self.checked_messages:
                 return await handler(event, data)  # Уже проверено
             
-            # Проверка на подозрительные паттерны
-            detected_patterns = self._check_patterns(text)
+            # Проверка на подозрительные паттерны и honeypot токены (один проход)
+            detected_patterns, honeypot_triggered = self._check_patterns(text)
             if detected_patterns:
                 await self._handle_suspicious_content(
                     event, user_id, 'patterns', detected_patterns
                 )
                 return
             
-            # Проверка на honeypot токены
-            if self._check_honeypot(text):
+            if honeypot_triggered:
+                self.security_stats['honeypot_triggered'] += 1
                 await self._handle_suspicious_content(
                     event, user_id, 'honeypot', ['honeypot_triggered']
                 )
@@ -167,63 +258,21 @@ class SecurityCheckMiddleware(BaseMiddleware):
         # Передаем управление следующему обработчику
         return await handler(event, data)
     
-    def _check_patterns(self, text: str) -> list:
-        """Проверка на опасные паттерны"""
-        text_lower = text.lower()
-        detected = []
-        
-        for pattern in self.suspicious_patterns:
-            pattern_lower = pattern.lower()
-            # Для HTML/JS паттернов проверяем точное вхождение
-            if pattern_lower.startswith('<') or '=' in pattern_lower or pattern_lower.startswith('javascript'):
-                if pattern_lower in text_lower:
-                    detected.append(pattern)
-                    self.security_stats[f'pattern_{pattern}'] += 1
-            # Для SQL команд проверяем с пробелами
-            elif pattern_lower.startswith('drop') or pattern_lower.startswith('delete') or pattern_lower.startswith('insert') or pattern_lower.startswith('update'):
-                if f' {pattern_lower} ' in f' {text_lower} ':
-                    detected.append(pattern)
-                    self.security_stats[f'pattern_{pattern}'] += 1
-            # Для паттернов типа 'script' проверяем как отдельное слово или в подозрительном контексте
-            elif pattern_lower == 'script':
-                # Разрешаем "description", "transcript", etc., но блокируем "<script>", "javascript:", etc.
-                if any(suspicious_context in text_lower for suspicious_context in ['<script', 'javascript:', 'src=', 'onload=', 'onerror=']):
-                    detected.append(pattern)
-                    self.security_stats[f'pattern_{pattern}'] += 1
-            # Для остальных - обычная проверка
-            elif pattern_lower in text_lower:
-                detected.append(pattern)
-                self.security_stats[f'pattern_{pattern}'] += 1
-        
-        return detected
-    
-    def _check_honeypot(self, text: str) -> bool:
-        """Проверка honeypot токенов"""
-        text_lower = text.lower()
-        for token in self.honeypot_tokens:
-            if token in text_lower:
-                self.security_stats['honeypot_triggered'] += 1
-                return True
-        return False
+    def _check_patterns(self, text: str) -> Tuple[list, bool]:
+        """Проверка на опасные паттерны и honeypot токены"""
+        detected, honeypot_triggered = self.scanner.scan(text)
+        for pattern in detected:
+            self.security_stats[f'pattern_{pattern}'] += 1
+        return detected, honeypot_triggered
     
     def _check_spam_patterns(self, text: str) -> bool:
         """Проверка на спам паттерны"""
-        # Проверка на повторяющиеся символы
-        for i in range(len(text) - 2):
-            if text[i] == text[i+1] == text[i+2]:
-                # 3+ одинаковых символа подряд
-                char_count = 3
-                for j in range(i+3, len(text)):
-                    if text[j] == text[i]:
-                        char_count += 1
-                    else:
-                        break
-                if char_count > 10:  # Более 10 одинаковых символов
-                    return True
+        # Более 10 одинаковых символов подряд
+        if REPEATED_CHARS_RE.search(text):
+            return True
         
         # Проверка на CAPS LOCK спам
-        upper_count = sum(1 for c in text if c.isupper())
-        if len(text) > 10 and upper_count / len(text) > 0.7:
+        if len(text) > 10 and sum(map(str.isupper, text)) / len(text) > 0.7:
             return True
         
         return False
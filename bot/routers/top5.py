@@ -13,6 +13,7 @@ from bot.utils.message_utils import send_message_with_cleanup, safe_delete_messa
 from bot.services.top5 import (
     calculate_top5_sync, build_top5_keyboard, save_snapshot,
 )
+from bot.services.top5_counters import calculate_top5_from_counters, counters_seeded
 from expenses.models import Profile, Top5Snapshot, Top5Pin
 from asgiref.sync import sync_to_async
 
@@ -42,8 +43,12 @@ async def show_top5(callback: CallbackQuery, state: FSMContext, lang: str = 'ru'
             await callback.answer(get_text('error_occurred', lang), show_alert=True)
             return
 
-        # Всегда пересчитываем топ-5 для актуальности данных
-        items, digest = await calculate_top5_sync(profile, window_start, window_end)
+        # Всегда пересчитываем топ-5 для актуальности данных: по дневным счётчикам,
+        # если они заполнены, иначе по операциям за 90 дней
+        if counters_seeded():
+            items, digest = await sync_to_async(calculate_top5_from_counters)(profile, window_start, window_end)
+        else:
+            items, digest = await calculate_top5_sync(profile, window_start, window_end)
 
         # Проверяем нужно ли обновить снепшот
         snapshot = await sync_to_async(Top5Snapshot.objects.filter(profile=profile).first)()
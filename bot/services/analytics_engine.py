@@ -0,0 +1,251 @@
+"""
+Колоночный срез операций профиля для AI-функций (ExpenseFunctions).
+
+AI-чат на один вопрос часто вызывает несколько функций подряд
+("самый дорогой день", "по дням недели", "прогноз на месяц"), и каждая
+делала свой ORM-запрос с перебором моделей и Decimal -> float.
+Здесь операции профиля одного типа за запрошенный период загружаются
+одним values_list в NumPy-массивы:
+
+    ids, даты (ordinal), суммы (в копейках, int64), id категорий, коды валют
+
+и агрегаты (дни, дни недели, месяцы, min/max, диапазоны сумм) считаются
+векторно. Суммы хранятся в копейках, поэтому итоги совпадают с SUM в БД.
+
+Кеш — LRU в памяти процесса с коротким TTL: на профиль хранится последнее
+загруженное окно дат, период внутри него отдаётся без запроса, пересекающийся
+период расширяет окно. Сигналы Expense/Income (expenses/signals.py) после
+коммита обновляют "версию" среза профиля в Redis — срез пересобирают все
+процессы, а не только тот, где изменилась операция.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from bot.utils.logging_safe import log_safe_id
+
+logger = logging.getLogger(__name__)
+
+EXPENSE = 'expense'
+INCOME = 'income'
+
+FRAME_CACHE_TTL_SECONDS = 120
+FRAME_CACHE_MAX_PROFILES = 128
+FRAME_VERSION_CACHE_TIMEOUT = 24 * 60 * 60
+FRAME_VERSION_KEY = 'operations_frame:{kind}:version:{profile_id}'
+
+# date(1970, 1, 1).toordinal(): сдвиг ordinal -> datetime64[D]
+_EPOCH_ORDINAL = 719163
+
+
+class OperationsFrame:
+    """Операции профиля одного типа в виде параллельных NumPy-массивов"""
+
+    __slots__ = ('ids', 'dates', 'cents', 'category_ids', 'currency_codes', 'currencies')
+
+    def __init__(self, ids: np.ndarray, dates: np.ndarray, cents: np.ndarray,
+                 category_ids: np.ndarray, currency_codes: np.ndarray, currencies: List[str]):
+        self.ids = ids
+        self.dates = dates
+        self.cents = cents
+        self.category_ids = category_ids
+        self.currency_codes = currency_codes
+        self.currencies = currencies
+
+    @classmethod
+    def from_rows(cls, rows) -> 'OperationsFrame':
+        """rows: (id, дата, сумма, id категории, валюта)"""
+        size = len(rows)
+        if not size:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(empty, empty, empty, empty, np.empty(0, dtype=np.int64), [])
+        ids, dates, amounts, category_ids, currencies = zip(*rows)
+        currency_list, currency_codes = np.unique(
+            np.array([currency or '' for currency in currencies]), return_inverse=True
+        )
+        return cls(
+            np.fromiter(ids, dtype=np.int64, count=size),
+            np.fromiter((op_date.toordinal() for op_date in dates), dtype=np.int64, count=size),
+            # Суммы с двумя знаками: округление до копейки после * 100 точно
+            np.rint(np.fromiter(amounts, dtype=np.float64, count=size) * 100).astype(np.int64),
+            np.fromiter((category_id or 0 for category_id in category_ids), dtype=np.int64, count=size),
+            currency_codes.astype(np.int64),
+            [str(currency) for currency in currency_list],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _select(self, mask: np.ndarray) -> 'OperationsFrame':
+        return OperationsFrame(
+            self.ids[mask], self.dates[mask], self.cents[mask],
+            self.category_ids[mask], self.currency_codes[mask], self.currencies,
+        )
+
+    def between(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> 'OperationsFrame':
+        """Операции с датой в [start_date, end_date]"""
+        mask = np.ones(len(self), dtype=bool)
+        if start_date is not None:
+            mask &= self.dates >= start_date.toordinal()
+        if end_date is not None:
+            mask &= self.dates <= end_date.toordinal()
+        return self._select(mask)
+
+    def amount_between(self, min_amount: Optional[float] = None, max_amount: Optional[float] = None) -> 'OperationsFrame':
+        """Операции с суммой в [min_amount, max_amount]"""
+        mask = np.ones(len(self), dtype=bool)
+        if min_amount is not None:
+            mask &= self.cents >= _to_cents(min_amount, ROUND_CEILING)
+        if max_amount is not None:
+            mask &= self.cents <= _to_cents(max_amount, ROUND_FLOOR)
+        return self._select(mask)
+
+    def total(self) -> float:
+        return int(self.cents.sum()) / 100
+
+    def active_days(self) -> int:
+        return len(np.unique(self.dates))
+
+    def daily_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(дни-ordinal, суммы в копейках, количество операций) по возрастанию даты"""
+        days, inverse = np.unique(self.dates, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.cents, minlength=len(days)).astype(np.int64)
+        counts = np.bincount(inverse, minlength=len(days))
+        return days, totals, counts
+
+    def max_day(self) -> Optional[Tuple[date, float]]:
+        """День с максимальной суммой операций (при равенстве — самый поздний)"""
+        if not len(self):
+            return None
+        days, totals, _ = self.daily_totals()
+        # argmax возвращает первый максимум — ищем по развёрнутым массивам
+        index = len(days) - 1 - int(np.argmax(totals[::-1]))
+        return date.fromordinal(int(days[index])), int(totals[index]) / 100
+
+    def weekday_totals(self) -> Tuple[List[float], List[int]]:
+        """Суммы и количество операций по дням недели (0 = понедельник)"""
+        # date.fromordinal(1) — понедельник
+        weekdays = (self.dates - 1) % 7
+        totals = np.bincount(weekdays, weights=self.cents, minlength=7).astype(np.int64)
+        counts = np.bincount(weekdays, minlength=7)
+        return [int(value) / 100 for value in totals], [int(value) for value in counts]
+
+    def monthly_totals(self) -> Dict[Tuple[int, int], float]:
+        """{(год, месяц): сумма}"""
+        if not len(self):
+            return {}
+        months = (self.dates - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        unique_months, inverse = np.unique(months, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.cents).astype(np.int64)
+        return {
+            (1970 + int(month) // 12, int(month) % 12 + 1): int(total) / 100
+            for month, total in zip(unique_months, totals)
+        }
+
+    def max_id(self) -> Optional[int]:
+        """id операции с максимальной суммой"""
+        if not len(self):
+            return None
+        return int(self.ids[np.argmax(self.cents)])
+
+    def min_id(self) -> Optional[int]:
+        """id операции с минимальной суммой"""
+        if not len(self):
+            return None
+        return int(self.ids[np.argmin(self.cents)])
+
+    def top_ids(self, limit: int) -> List[int]:
+        """id операций по убыванию суммы, затем даты"""
+        order = np.lexsort((-self.dates, -self.cents))
+        return [int(op_id) for op_id in self.ids[order[:limit]]]
+
+
+def _to_cents(amount, rounding: str) -> int:
+    return int(Decimal(str(amount)).scaleb(2).to_integral_value(rounding=rounding))
+
+
+def build_operations_frame(profile_id: int, kind: str, start_date: date, end_date: date) -> OperationsFrame:
+    """Операции профиля за [start_date, end_date] одним запросом"""
+    from expenses.models import Expense, Income
+
+    if kind == INCOME:
+        model, date_field = Income, 'income_date'
+    else:
+        model, date_field = Expense, 'expense_date'
+
+    rows = list(
+        model.objects
+        .filter(profile_id=profile_id, **{f'{date_field}__gte': start_date, f'{date_field}__lte': end_date})
+        .order_by()
+        .values_list('id', date_field, 'amount', 'category_id', 'currency')
+    )
+    return OperationsFrame.from_rows(rows)
+
+
+# (kind, profile_id) -> (срез, начало окна, конец окна, версия, истекает)
+_frames: 'OrderedDict[Tuple[str, int], tuple]' = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def _version_key(kind: str, profile_id: int) -> str:
+    return FRAME_VERSION_KEY.format(kind=kind, profile_id=profile_id)
+
+
+def get_operations_frame_sync(profile_id: int, kind: str, start_date: date, end_date: date) -> OperationsFrame:
+    """Операции профиля одного типа за [start_date, end_date] (из кеша или одним запросом)"""
+    cache_key = (kind, profile_id)
+    version = cache.get(_version_key(kind, profile_id))
+    now = time.monotonic()
+    load_start, load_end = start_date, end_date
+
+    with _frames_lock:
+        cached = _frames.get(cache_key)
+        if cached is not None:
+            frame, cached_start, cached_end, cached_version, expires_at = cached
+            if cached_version != version or now >= expires_at:
+                del _frames[cache_key]
+            elif cached_start <= start_date and end_date <= cached_end:
+                _frames.move_to_end(cache_key)
+                return frame.between(start_date, end_date)
+            elif start_date <= cached_end + timedelta(days=1) and cached_start <= end_date + timedelta(days=1):
+                # Периоды соседних вызовов пересекаются — загружаем общее окно
+                load_start, load_end = min(start_date, cached_start), max(end_date, cached_end)
+
+    frame = build_operations_frame(profile_id, kind, load_start, load_end)
+
+    with _frames_lock:
+        _frames[cache_key] = (frame, load_start, load_end, version, now + FRAME_CACHE_TTL_SECONDS)
+        _frames.move_to_end(cache_key)
+        while len(_frames) > FRAME_CACHE_MAX_PROFILES:
+            _frames.popitem(last=False)
+
+    logger.debug(
+        "Built %s operations frame for %s (%s..%s): %s rows",
+        kind, log_safe_id(profile_id, "profile"), load_start, load_end, len(frame),
+    )
+    return frame.between(start_date, end_date)
+
+
+def invalidate_operations_frames(kind: str, profile_ids) -> None:
+    """Операции профилей изменились: новые версии срезов одним запросом, локальные копии сбрасываются"""
+    profile_ids = set(profile_ids)
+    if not profile_ids:
+        return
+    version = time.time_ns()
+    cache.set_many({_version_key(kind, profile_id): version for profile_id in profile_ids}, FRAME_VERSION_CACHE_TIMEOUT)
+    with _frames_lock:
+        for profile_id in profile_ids:
+            _frames.pop((kind, profile_id), None)
+
+
+def clear_operations_frames() -> None:
+    """Очищает локальный кеш срезов (для тестов)"""
+    with _frames_lock:
+        _frames.clear()
@@ -0,0 +1,222 @@
+"""
+Массовые рассылки из админки (send_broadcast_message).
+
+Получатели читаются страницами по ключу (id > last_recipient_id ORDER BY id),
+queryset целиком в память не загружается. Страница отправляется параллельно
+(не больше BROADCAST_CONCURRENCY одновременно) через общий для всех воркеров
+token bucket (~25 сообщений/с). TelegramRetryAfter блокирует ведро для всех
+воркеров на retry_after секунд, после чего сообщение повторяется.
+
+После каждой страницы в одной транзакции: результаты получателей пишутся
+одним upsert BroadcastRecipient, заблокировавшие бота профили отмечаются
+одним UPDATE, а счётчики и контрольная точка last_recipient_id — одним
+UPDATE BroadcastMessage. Упавший воркер продолжает с контрольной точки
+(process_scheduled_broadcasts перезапускает рассылки без блокировки),
+повторно может уйти только незавершённая страница.
+
+Блокировка воркера продлевается после каждой страницы и, пока страница
+отправляется, каждые BROADCAST_LOCK_REFRESH_SECONDS: длинная пауза
+TelegramRetryAfter не даёт ей истечь и запустить рассылку второй раз.
+"""
+import asyncio
+import logging
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from bot.services.expense_reminders import BLOCKED_ERRORS
+from bot.services.monthly_reports import TELEGRAM_SEND_BUCKETS, TELEGRAM_SEND_SUBJECT
+from bot.utils.logging_safe import log_safe_id
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_PAGE_SIZE = 100
+BROADCAST_CONCURRENCY = 8
+BROADCAST_MAX_ATTEMPTS = 3
+# Продлевается во время отправки; после падения воркера истекает,
+# и рассылку подхватывает process_scheduled_broadcasts
+BROADCAST_LOCK_TIMEOUT = 10 * 60
+BROADCAST_LOCK_REFRESH_SECONDS = 60
+
+SENT = 'sent'
+BLOCKED = 'blocked'
+FAILED = 'failed'
+
+# (profile_id, telegram_id)
+Recipient = Tuple[int, int]
+# (profile_id, статус SENT / BLOCKED / FAILED, текст ошибки)
+SendResult = Tuple[int, str, str]
+
+
+def broadcast_lock_key(broadcast_id: int) -> str:
+    return f"broadcast:send:{broadcast_id}"
+
+
+def recipient_pages(recipient_qs, after_id: int, page_size: int = BROADCAST_PAGE_SIZE) -> Iterator[List[Recipient]]:
+    """Страницы получателей по ключу id > after_id (профили с заблокированным ботом пропускаются)"""
+    recipients = recipient_qs.filter(bot_blocked=False).order_by('id').values_list('id', 'telegram_id')
+    while True:
+        page = list(recipients.filter(id__gt=after_id)[:page_size])
+        if not page:
+            return
+        yield page
+        after_id = page[-1][0]
+
+
+async def send_page(
+    bot,
+    recipients: Sequence[Recipient],
+    text: str,
+    limiter,
+    concurrency: int = BROADCAST_CONCURRENCY,
+    keep_lock: Optional[Callable[[], None]] = None,
+) -> List[SendResult]:
+    """
+    Отправляет сообщение получателям страницы, не больше concurrency одновременно.
+
+    Args:
+        limiter: TokenBucketLimiter, общий для всех воркеров (create_send_limiter)
+        keep_lock: продление блокировки рассылки, вызывается каждые
+            BROADCAST_LOCK_REFRESH_SECONDS, пока страница отправляется
+            (в том числе во время паузы после TelegramRetryAfter)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(profile_id: int, telegram_id: int) -> SendResult:
+        error = ''
+        async with semaphore:
+            for _ in range(BROADCAST_MAX_ATTEMPTS):
+                await limiter.wait(TELEGRAM_SEND_SUBJECT, TELEGRAM_SEND_BUCKETS)
+                try:
+                    await bot.send_message(chat_id=telegram_id, text=text, parse_mode='Markdown')
+                    return profile_id, SENT, ''
+                except TelegramRetryAfter as e:
+                    # Пауза для всех воркеров: limiter.wait ждёт, пока блокировка не истечёт
+                    limiter.block(TELEGRAM_SEND_SUBJECT, e.retry_after)
+                    logger.warning("Broadcast throttled by Telegram for %ss", e.retry_after)
+                    error = str(e)
+                except Exception as e:
+                    if isinstance(e, TelegramForbiddenError) or any(
+                        marker in str(e).lower() for marker in BLOCKED_ERRORS
+                    ):
+                        return profile_id, BLOCKED, str(e)
+                    logger.error(
+                        "Error sending broadcast message to %s: %s",
+                        log_safe_id(telegram_id, "user"),
+                        e,
+                    )
+                    return profile_id, FAILED, str(e)
+        return profile_id, FAILED, error
+
+    async def refresh_lock():
+        while True:
+            await asyncio.sleep(BROADCAST_LOCK_REFRESH_SECONDS)
+            try:
+                keep_lock()
+            except Exception as e:
+                logger.warning("Failed to extend broadcast lock: %s", e)
+
+    refresher = asyncio.ensure_future(refresh_lock()) if keep_lock is not None else None
+    try:
+        return list(await asyncio.gather(*(send(profile_id, telegram_id) for profile_id, telegram_id in recipients)))
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+
+
+def save_page(broadcast, results: Sequence[SendResult], last_recipient_id: int) -> None:
+    """Результаты страницы, блокировки бота, счётчики и контрольная точка — одной транзакцией"""
+    from django.db import transaction
+    from django.db.models import F
+    from django.utils import timezone
+    from admin_panel.models import BroadcastMessage, BroadcastRecipient
+    from bot.services.expense_reminders import mark_bot_blocked
+
+    now = timezone.now()
+    rows = [
+        BroadcastRecipient(
+            broadcast_id=broadcast.pk,
+            profile_id=profile_id,
+            status='sent' if status == SENT else 'failed',
+            sent_at=now if status == SENT else None,
+            error_message=error,
+        )
+        for profile_id, status, error in results
+    ]
+    sent = sum(1 for _, status, _ in results if status == SENT)
+    failed = len(results) - sent
+
+    with transaction.atomic():
+        BroadcastRecipient.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['broadcast', 'profile'],
+            update_fields=['status', 'sent_at', 'error_message'],
+        )
+        mark_bot_blocked([profile_id for profile_id, status, _ in results if status == BLOCKED], now)
+        BroadcastMessage.objects.filter(pk=broadcast.pk).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+            last_recipient_id=last_recipient_id,
+        )
+
+    broadcast.sent_count += sent
+    broadcast.failed_count += failed
+    broadcast.last_recipient_id = last_recipient_id
+
+
+def run_broadcast(
+    broadcast,
+    recipient_qs,
+    send: Callable[[List[Recipient]], List[SendResult]],
+    on_page: Optional[Callable[[], None]] = None,
+    page_size: int = BROADCAST_PAGE_SIZE,
+) -> bool:
+    """
+    Отправляет рассылку постранично, начиная с контрольной точки.
+
+    Args:
+        send: отправка страницы (send_page в event loop задачи)
+        on_page: вызывается после каждой сохранённой страницы (продление блокировки)
+
+    Returns:
+        True — рассылка завершена, False — отменена во время отправки
+    """
+    from django.utils import timezone
+    from admin_panel.models import BroadcastRecipient
+
+    if broadcast.last_recipient_id is None:
+        # Новый запуск: записи получателей создаются по мере отправки
+        BroadcastRecipient.objects.filter(broadcast=broadcast, status='pending').delete()
+        broadcast.total_recipients = recipient_qs.filter(bot_blocked=False).count()
+        broadcast.save(update_fields=['total_recipients'])
+        after_id = 0
+    else:
+        after_id = broadcast.last_recipient_id
+        logger.info(
+            "Broadcast %s resumed after recipient %s (%s sent, %s failed)",
+            broadcast.pk,
+            after_id,
+            broadcast.sent_count,
+            broadcast.failed_count,
+        )
+
+    for page in recipient_pages(recipient_qs, after_id, page_size):
+        # Проверяем, не отменена ли рассылка
+        broadcast.refresh_from_db(fields=['status'])
+        if broadcast.status == 'cancelled':
+            logger.info("Broadcast %s was cancelled during sending", broadcast.pk)
+            return False
+
+        save_page(broadcast, send(page), page[-1][0])
+        if on_page is not None:
+            on_page()
+
+    broadcast.refresh_from_db(fields=['sent_count', 'failed_count'])
+    if broadcast.failed_count > 0 and broadcast.sent_count == 0:
+        broadcast.status = 'failed'
+    else:
+        broadcast.status = 'completed'
+    broadcast.completed_at = timezone.now()
+    broadcast.save(update_fields=['status', 'completed_at'])
+    return True
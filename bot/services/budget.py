@@ -24,6 +24,8 @@ from django.db.models import Q, Sum
 
 from expenses.models import Budget, Expense, ExpenseCategory, Profile
 
+from bot.utils.db_executor import parallel_read, run_read
+
 from .conversion_helper import get_user_local_date
 from .subscription import check_subscription
 
@@ -319,10 +321,10 @@ async def get_limit_status(profile_id: int, category_id: Optional[int],
         today = get_user_local_date(budget.profile)
         return _build_status(profile_id, budget, today, expense=expense)
 
-    return await sync_to_async(_do)()
+    return await run_read(_do)
 
 
-@sync_to_async
+@parallel_read
 def get_expense_limit_statuses(profile_id: int, expense) -> dict:
     """Возвращает статусы категорийного и общего лимитов для новой траты.
 
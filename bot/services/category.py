@@ -5,12 +5,14 @@ from typing import List, Optional, Set
 from expenses.models import ExpenseCategory, IncomeCategory, Profile, CategoryKeyword
 from asgiref.sync import sync_to_async
 from django.db.models import Sum, Count, Q
+from bot.utils.db_executor import parallel_read
 from bot.utils.db_utils import get_or_create_user_profile_sync
 from bot.utils.category_helpers import get_category_display_name, get_category_name_without_emoji
 from difflib import get_close_matches
 import logging
 # ВАЖНО: Импортируем из централизованного модуля (включает ZWJ для композитных эмодзи)
 from bot.utils.emoji_utils import EMOJI_PREFIX_RE, normalize_category_for_matching, strip_leading_emoji
+from bot.utils.keyword_matcher import invalidate_expense_keyword_matcher
 from bot.utils.logging_safe import log_safe_id, summarize_text
 
 logger = logging.getLogger(__name__)
@@ -290,32 +292,37 @@ get_or_create_category = sync_to_async(get_or_create_category_sync)
 
 
 @sync_to_async
-def get_user_categories(user_id: int) -> List[ExpenseCategory]:
+def _create_profile(user_id: int) -> Profile:
+    profile, _ = Profile.objects.get_or_create(telegram_id=user_id)
+    return profile
+
+
+async def get_user_categories(user_id: int) -> List[ExpenseCategory]:
     """Получить все категории пользователя"""
-    try:
-        profile = Profile.objects.get(telegram_id=user_id)
-    except Profile.DoesNotExist:
-        # Если профиля нет, создаем его
-        profile = Profile.objects.create(telegram_id=user_id)
-    
-    # Получаем категории пользователя (с refresh из БД)
-    from django.db import connection
-    connection.ensure_connection()
-    
-    categories = ExpenseCategory.objects.filter(
-        profile=profile
-    )
-    
-    # Force evaluation of queryset
-    categories_count = categories.count()
+    categories = await _read_user_categories(user_id)
+    if categories is None:
+        # Если профиля нет, создаем его — запись идёт в общем потоке ORM,
+        # а не в пуле чтений; у нового профиля категорий ещё нет
+        await _create_profile(user_id)
+        return []
+    return categories
+
+
+@parallel_read
+def _read_user_categories(user_id: int) -> Optional[List[ExpenseCategory]]:
+    """Категории пользователя ("Прочие расходы" в конце); None — профиля нет"""
+    profile = Profile.objects.filter(telegram_id=user_id).first()
+    if profile is None:
+        return None
+
+    categories_list = list(ExpenseCategory.objects.filter(profile=profile))
     logger.info(
         "get_user_categories for %s: found %s categories in DB",
         log_safe_id(user_id, "user"),
-        categories_count,
+        len(categories_list),
     )
-    
+
     # Сортируем так, чтобы "Прочие расходы" были в конце
-    categories_list = list(categories)
     regular_categories = []
     other_category = None
     
@@ -772,6 +779,9 @@ def create_default_categories_sync(user_id: int) -> bool:
             ExpenseCategory.objects.bulk_create(categories)
             logger.info("Created all %s default categories for %s", len(categories), log_safe_id(user_id, "user"))
 
+        # bulk_create не отправляет post_save — сбрасываем матчер keywords явно
+        invalidate_expense_keyword_matcher(profile.id)
+
         return True
     except Exception as exc:
         logger.error("Failed to create default categories for %s: %s", log_safe_id(user_id, "user"), exc)
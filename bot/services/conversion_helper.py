@@ -5,7 +5,7 @@
 import logging
 from decimal import Decimal
 from datetime import date
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
 import pytz
 from django.utils import timezone
@@ -27,6 +27,24 @@ def get_user_local_date(profile) -> date:
         return timezone.localdate()
 
 
+def no_rate_source(input_currency: str, user_currency: str, operation_date: date, profile=None) -> bool:
+    """Экзотическая валюта + историческая дата = нет источника курса"""
+    is_from_exotic = input_currency in CurrencyConverter.CBRF_UNAVAILABLE
+    is_to_exotic = user_currency in CurrencyConverter.CBRF_UNAVAILABLE
+    is_exotic = is_from_exotic or is_to_exotic
+    today = get_user_local_date(profile) if profile else timezone.localdate()
+    is_historical = operation_date < today
+
+    if is_exotic and is_historical:
+        # Fawaz @latest не поддерживает исторические даты
+        logger.warning(
+            f"No historical rates for exotic currency {input_currency} "
+            f"on {operation_date}, keeping original"
+        )
+        return True
+    return False
+
+
 async def maybe_convert_amount(
     amount: Decimal,
     input_currency: str,
@@ -70,19 +88,7 @@ async def maybe_convert_amount(
         else:
             operation_date = timezone.localdate()
 
-    # Проверяем: экзотика + историческая дата = нет источника
-    is_from_exotic = input_currency in CurrencyConverter.CBRF_UNAVAILABLE
-    is_to_exotic = user_currency in CurrencyConverter.CBRF_UNAVAILABLE
-    is_exotic = is_from_exotic or is_to_exotic
-    today = get_user_local_date(profile) if profile else timezone.localdate()
-    is_historical = operation_date < today
-
-    if is_exotic and is_historical:
-        # Fawaz @latest не поддерживает исторические даты
-        logger.warning(
-            f"No historical rates for exotic currency {input_currency} "
-            f"on {operation_date}, keeping original"
-        )
+    if no_rate_source(input_currency, user_currency, operation_date, profile):
         return amount, input_currency, None, None, None
 
     # Пытаемся конвертировать
@@ -111,3 +117,43 @@ async def maybe_convert_amount(
     except Exception as e:
         logger.error(f"Conversion error: {e}")
         return amount, input_currency, None, None, None
+
+
+async def fetch_conversion_rates(
+    pairs: Iterable[Tuple[str, str]],
+    operation_date: date,
+) -> Dict[Tuple[str, str], Optional[Decimal]]:
+    """
+    Курсы для набора пар (валюта ввода, валюта пользователя) на одну дату.
+
+    Для пакетной обработки: курс запрашивается один раз на пару, а не на
+    каждую операцию. None — курса нет (операция остаётся в исходной валюте).
+    """
+    rates: Dict[Tuple[str, str], Optional[Decimal]] = {}
+    for input_currency, user_currency in pairs:
+        try:
+            _, rate = await currency_converter.convert_with_details(
+                amount=Decimal('1'),
+                from_currency=input_currency,
+                to_currency=user_currency,
+                conversion_date=operation_date
+            )
+        except Exception as e:
+            logger.error(f"Conversion rate error {input_currency} -> {user_currency}: {e}")
+            rate = None
+        rates[(input_currency, user_currency)] = rate
+    return rates
+
+
+def convert_with_rate(
+    amount: Decimal,
+    input_currency: str,
+    user_currency: str,
+    rate: Optional[Decimal],
+) -> Tuple[Decimal, str, Optional[Decimal], Optional[str], Optional[Decimal]]:
+    """То же, что maybe_convert_amount, по заранее полученному курсу"""
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    if rate is None:
+        return amount, input_currency, None, None, None
+    return (amount * rate).quantize(Decimal('0.01')), user_currency, amount, input_currency, rate
@@ -0,0 +1,264 @@
+"""
+Дневные итоги операций (DailyCategoryTotal).
+
+Аналитика (get_daily_totals, тренды, прогноз, сравнение периодов,
+история для месячных инсайтов, лист "Итоги 12 мес" в экспорте) раньше
+сканировала все траты/доходы профиля за период. Здесь поддерживается
+rollup по ключу (профиль, дата, тип операции, категория, валюта):
+
+- сигналы Expense/Income (expenses/signals.py) применяют дельту в той же
+  транзакции, что и изменение операции: создание +1, изменение —
+  вычитание старого ключа и добавление нового; удаление -1 применяют
+  места удаления (expenses.signals.operations_deleted);
+- удаление категории и снятие её с операций queryset.update(category=None)
+  переносят её итоги в "без категории" (expenses.signals.operations_category_cleared);
+- bulk_create и queryset.delete() применяют места записи
+  (operations_bulk_created, operations_deleted_in_bulk);
+- оставшиеся расхождения (правки в обход ORM, гонки параллельных
+  изменений одной операции) исправляет ночная reconcile_daily_totals,
+  вручную — команда rebuild_daily_totals.
+
+Существующая история заполняется миграцией 0070_backfill_daily_category_total.
+"""
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from bot.utils.logging_safe import log_safe_id
+from expenses.models import DailyCategoryTotal, Expense, Income
+
+logger = logging.getLogger(__name__)
+
+EXPENSE = DailyCategoryTotal.OP_EXPENSE
+INCOME = DailyCategoryTotal.OP_INCOME
+
+# Атрибут экземпляра, в котором pre_save сохраняет ключ операции до изменения
+_PREVIOUS_ATTR = '_daily_total_previous'
+
+# (профиль, дата, категория, валюта)
+TotalKey = Tuple[int, date, int, str]
+
+# Сколько профилей сверяется за одну транзакцию (reconcile_daily_totals)
+RECONCILE_BATCH_SIZE = 200
+
+_OPERATION_MODELS = {
+    EXPENSE: (Expense, 'expense_date'),
+    INCOME: (Income, 'income_date'),
+}
+
+
+def _model_and_date_field(op_type: str):
+    return _OPERATION_MODELS[op_type]
+
+
+def _key_and_amount(profile_id: int, op_date: date, category_id: Optional[int],
+                    currency: str, amount) -> Tuple[TotalKey, Decimal]:
+    key = (profile_id, op_date, category_id or DailyCategoryTotal.NO_CATEGORY, currency or '')
+    # Сумма могла быть передана float'ом или строкой
+    return key, Decimal(str(amount)).quantize(Decimal('0.01'))
+
+
+def _instance_key(op_type: str, instance) -> Tuple[TotalKey, Decimal]:
+    _, date_field = _model_and_date_field(op_type)
+    return _key_and_amount(
+        instance.profile_id, getattr(instance, date_field), instance.category_id,
+        instance.currency, instance.amount,
+    )
+
+
+def _apply_delta(op_type: str, key: TotalKey, amount: Decimal, count: int) -> None:
+    profile_id, op_date, category_id, currency = key
+    rows = DailyCategoryTotal.objects.filter(
+        profile_id=profile_id, date=op_date, op_type=op_type,
+        category_id=category_id, currency=currency,
+    )
+    if rows.update(total=F('total') + amount, count=F('count') + count):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        # Строки уже нет (удаление профиля каскадом, пересборка) — нечего вычитать
+        return
+    try:
+        with transaction.atomic():
+            DailyCategoryTotal.objects.create(
+                profile_id=profile_id, date=op_date, op_type=op_type,
+                category_id=category_id, currency=currency, total=amount, count=count,
+            )
+    except IntegrityError:
+        # Параллельная транзакция успела создать строку
+        rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+def _apply_safely(op_type: str, profile_id: int, changes) -> None:
+    """
+    Применяет список (ключ, сумма, количество) в savepoint.
+
+    Ошибка rollup не должна ломать сохранение операции: она логируется,
+    расхождение исправляет rebuild_daily_totals.
+    """
+    try:
+        with transaction.atomic():
+            for key, amount, count in changes:
+                _apply_delta(op_type, key, amount, count)
+    except DatabaseError as e:
+        logger.error(
+            "Failed to update daily totals (%s) for %s: %s",
+            op_type, log_safe_id(profile_id, "profile"), e,
+        )
+
+
+def remember_previous(op_type: str, instance) -> None:
+    """
+    pre_save: запоминает ключ и сумму операции в БД до изменения.
+
+    Берёт значения, прочитанные вместе с экземпляром (LoadedValuesModel);
+    SELECT — только если нужные поля не загружались (only/defer, экземпляр
+    собран вручную).
+    """
+    previous = None
+    if instance.pk is not None and not instance._state.adding:
+        model, date_field = _model_and_date_field(op_type)
+        fields = ('profile_id', date_field, 'category_id', 'currency', 'amount')
+        row = instance.loaded_values(fields)
+        if row is None:
+            row = model.objects.filter(pk=instance.pk).values_list(*fields).first()
+        if row is not None:
+            previous = _key_and_amount(*row)
+    setattr(instance, _PREVIOUS_ATTR, previous)
+
+
+def operation_saved(op_type: str, instance, created: bool) -> None:
+    """post_save: применяет разницу между старым и новым состоянием операции"""
+    previous = None if created else getattr(instance, _PREVIOUS_ATTR, None)
+    current = _instance_key(op_type, instance)
+    setattr(instance, _PREVIOUS_ATTR, current)
+    if previous == current:
+        return
+
+    changes = []
+    if previous is not None:
+        changes.append((previous[0], -previous[1], -1))
+    changes.append((current[0], current[1], 1))
+    _apply_safely(op_type, instance.profile_id, changes)
+
+
+def operation_deleted(op_type: str, instance) -> None:
+    """После удаления операции: вычитает её из итогов"""
+    key, amount = _instance_key(op_type, instance)
+    _apply_safely(op_type, instance.profile_id, [(key, -amount, -1)])
+
+
+def category_deleted(op_type: str, category_id: int) -> None:
+    """Перед снятием категории с операций: переносит её итоги в "без категории" """
+    rows = list(
+        DailyCategoryTotal.objects
+        .filter(op_type=op_type, category_id=category_id)
+        .values_list('id', 'profile_id', 'date', 'currency', 'total', 'count')
+    )
+    if not rows:
+        return
+    with transaction.atomic():
+        for _, profile_id, op_date, currency, total, count in rows:
+            _apply_delta(op_type, (profile_id, op_date, DailyCategoryTotal.NO_CATEGORY, currency), total, count)
+        DailyCategoryTotal.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+
+def compute_daily_totals(op_type: str, profile_ids: Iterable[int]) -> Dict[TotalKey, Tuple[Decimal, int]]:
+    """Итоги по сырым операциям (одним GROUP BY) — эталон для пересборки и проверки"""
+    model, date_field = _model_and_date_field(op_type)
+    rows = (
+        model.objects
+        .filter(profile_id__in=list(profile_ids))
+        .order_by()
+        .values_list('profile_id', date_field, 'category_id', 'currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    totals: Dict[TotalKey, Tuple[Decimal, int]] = {}
+    for profile_id, op_date, category_id, currency, total, count in rows:
+        key = (profile_id, op_date, category_id or DailyCategoryTotal.NO_CATEGORY, currency or '')
+        prev_total, prev_count = totals.get(key, (Decimal('0'), 0))
+        totals[key] = (prev_total + total, prev_count + count)
+    return totals
+
+
+def stored_daily_totals(op_type: str, profile_ids: Iterable[int]) -> Dict[TotalKey, Tuple[Decimal, int]]:
+    rows = (
+        DailyCategoryTotal.objects
+        .filter(op_type=op_type, profile_id__in=list(profile_ids))
+        .values_list('profile_id', 'date', 'category_id', 'currency', 'total', 'count')
+    )
+    return {
+        (profile_id, op_date, category_id, currency): (total, count)
+        for profile_id, op_date, category_id, currency, total, count in rows
+    }
+
+
+def rebuild_daily_totals(profile_ids: Iterable[int], dry_run: bool = False) -> int:
+    """
+    Сверяет итоги профилей с сырыми операциями и исправляет расхождения.
+
+    Returns:
+        Количество расходящихся строк (добавленных, изменённых и удалённых)
+    """
+    profile_ids = list(profile_ids)
+    mismatched = 0
+
+    for op_type in (EXPENSE, INCOME):
+        with transaction.atomic():
+            if not dry_run:
+                # Блокируем итоги профилей, чтобы сигналы не писали в них во время сверки
+                list(
+                    DailyCategoryTotal.objects
+                    .select_for_update()
+                    .filter(op_type=op_type, profile_id__in=profile_ids)
+                    .values_list('id', flat=True)
+                )
+            expected = compute_daily_totals(op_type, profile_ids)
+            stored = stored_daily_totals(op_type, profile_ids)
+
+            stale = [key for key in stored if key not in expected]
+            changed = {key: value for key, value in expected.items() if stored.get(key) != value}
+            mismatched += len(stale) + len(changed)
+            if dry_run or not (stale or changed):
+                continue
+
+            for profile_id, op_date, category_id, currency in stale:
+                DailyCategoryTotal.objects.filter(
+                    profile_id=profile_id, date=op_date, op_type=op_type,
+                    category_id=category_id, currency=currency,
+                ).delete()
+            missing = []
+            for key, (total, count) in changed.items():
+                profile_id, op_date, category_id, currency = key
+                if key in stored:
+                    DailyCategoryTotal.objects.filter(
+                        profile_id=profile_id, date=op_date, op_type=op_type,
+                        category_id=category_id, currency=currency,
+                    ).update(total=total, count=count)
+                else:
+                    missing.append(DailyCategoryTotal(
+                        profile_id=profile_id, date=op_date, op_type=op_type,
+                        category_id=category_id, currency=currency, total=total, count=count,
+                    ))
+            DailyCategoryTotal.objects.bulk_create(missing, batch_size=1000)
+
+    return mismatched
+
+
+def daily_totals_queryset(op_type: str, start_date: date, end_date: date,
+                          profile=None, household_id: Optional[int] = None):
+    """
+    Строки rollup за период [start_date, end_date] для профиля или семьи.
+
+    Аналог Expense/Income.objects.filter(profile=..., *_date__range=...):
+    суммы по всем валютам, фильтр по валюте — на стороне вызывающего.
+    """
+    queryset = DailyCategoryTotal.objects.filter(op_type=op_type, date__gte=start_date, date__lte=end_date)
+    if household_id:
+        return queryset.filter(profile__household_id=household_id)
+    return queryset.filter(profile=profile)
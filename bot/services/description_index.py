@@ -0,0 +1,253 @@
+"""
+Индекс описаний трат и доходов профиля для подсказок "старой цены".
+
+find_similar_expenses() вызывается, когда пользователь пишет описание
+без суммы, и раньше на каждый вызов читал все траты за год, разбирал
+описания регуляркой и сравнивал слова для каждой строки. Здесь операции
+профиля сворачиваются по уникальному описанию:
+
+    описание -> (сумма, валюта, категория) -> {(дата, время): количество}
+
+Нечёткое сравнение делается один раз на уникальное описание (обычно
+десятки), а count/last_date считаются по агрегатам с учётом периода.
+
+Поддержка актуальности (по аналогии с keyword_matcher):
+- сигналы Expense/Income (expenses/signals.py) после коммита применяют
+  создание к индексу текущего процесса инкрементально, изменение
+  существующей операции сбрасывает индекс; удаления и массовые записи
+  сбрасывают индекс профиля один раз за транзакцию (profiles_changed);
+- каждое изменение обновляет "версию" индекса профиля в Redis, другие
+  процессы (Celery создаёт регулярные операции) пересобирают индекс;
+- TTL как страховка на случай недоступности Redis.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.core.cache import cache
+
+from bot.utils.logging_safe import log_safe_id
+from bot.utils.text_similarity import extract_words
+
+logger = logging.getLogger(__name__)
+
+EXPENSE = 'expense'
+INCOME = 'income'
+
+INDEX_WINDOW_DAYS = 365
+INDEX_CACHE_TTL_SECONDS = 600
+INDEX_CACHE_MAX_PROFILES = 1024
+INDEX_VERSION_CACHE_TIMEOUT = 24 * 60 * 60
+INDEX_VERSION_KEY = 'description_index:{kind}:version:{profile_id}'
+# Нечёткое сравнение — только для стольких последних описаний (подстрока — для всех)
+FUZZY_CANDIDATES_LIMIT = 500
+
+# (сумма, валюта, id категории)
+GroupKey = Tuple[Decimal, str, Optional[int]]
+# (дата, время) операции
+Stamp = Tuple[date, dt_time]
+
+
+class DescriptionEntry:
+    """Все операции профиля с одним описанием (без учёта регистра)"""
+
+    __slots__ = ('description', 'words', 'groups')
+
+    def __init__(self, description: str):
+        self.description = description
+        self.words = extract_words(description)
+        self.groups: Dict[GroupKey, Counter] = {}
+
+    def stats(self, start_date: date, end_date: date) -> Iterator[Tuple[GroupKey, int, Stamp]]:
+        """(группа, количество, последние дата/время) для операций в периоде"""
+        for group_key, stamps in self.groups.items():
+            count = 0
+            last = None
+            for stamp, stamp_count in stamps.items():
+                if start_date <= stamp[0] <= end_date:
+                    count += stamp_count
+                    if last is None or stamp > last:
+                        last = stamp
+            if count:
+                yield group_key, count, last
+
+    def last_stamp(self) -> Stamp:
+        return max(max(stamps) for stamps in self.groups.values())
+
+
+class DescriptionIndex:
+    """Агрегаты операций профиля по уникальным описаниям"""
+
+    def __init__(self, window_start: date):
+        self.window_start = window_start
+        self.entries: Dict[str, DescriptionEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def fuzzy_candidates(self, limit: int = FUZZY_CANDIDATES_LIMIT) -> set:
+        """Ключи описаний для нечёткого сравнения: не больше limit последних использованных"""
+        if len(self.entries) <= limit:
+            return set(self.entries)
+        return set(heapq.nlargest(limit, self.entries, key=lambda key: self.entries[key].last_stamp()))
+
+    def add(self, description: str, amount: Decimal, currency: str, category_id: Optional[int],
+            op_date: date, op_time: Optional[dt_time], count: int = 1) -> None:
+        if op_date < self.window_start:
+            return
+        description = description or ''
+        key = description.lower().strip()
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = DescriptionEntry(description)
+        stamps = entry.groups.setdefault((amount, currency, category_id), Counter())
+        stamps[(op_date, op_time or dt_time.min)] += count
+
+
+_indexes: 'OrderedDict[Tuple[str, int], tuple]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _version_key(kind: str, profile_id: int) -> str:
+    return INDEX_VERSION_KEY.format(kind=kind, profile_id=profile_id)
+
+
+def _operation_currency(kind: str, currency: Optional[str], profile_currency: Optional[str]) -> str:
+    if kind == INCOME:
+        return currency
+    from bot.constants import DEFAULT_CURRENCY_CODE
+
+    return currency or profile_currency or DEFAULT_CURRENCY_CODE
+
+
+def build_description_index(profile, kind: str, window_start: date) -> DescriptionIndex:
+    """Собирает индекс одним GROUP BY запросом"""
+    from django.db.models import Count
+    from expenses.models import Expense, Income
+
+    if kind == INCOME:
+        model, date_field, time_field = Income, 'income_date', 'income_time'
+    else:
+        model, date_field, time_field = Expense, 'expense_date', 'expense_time'
+
+    rows = (
+        model.objects
+        .filter(profile=profile, **{f'{date_field}__gte': window_start})
+        .order_by()
+        .values_list('description', 'amount', 'currency', 'category_id', date_field, time_field)
+        .annotate(n=Count('id'))
+    )
+
+    index = DescriptionIndex(window_start)
+    for description, amount, currency, category_id, op_date, op_time, n in rows:
+        index.add(
+            description, amount, _operation_currency(kind, currency, profile.currency),
+            category_id, op_date, op_time, n,
+        )
+    return index
+
+
+def get_description_index_sync(profile, kind: str, days_back: int = INDEX_WINDOW_DAYS) -> DescriptionIndex:
+    """
+    Возвращает индекс описаний профиля из кеша или собирает новый.
+
+    Для периода длиннее INDEX_WINDOW_DAYS индекс собирается без кеширования.
+    """
+    today = date.today()
+    if days_back > INDEX_WINDOW_DAYS:
+        return build_description_index(profile, kind, today - timedelta(days=days_back))
+
+    cache_key = (kind, profile.id)
+    version = cache.get(_version_key(kind, profile.id))
+    now = time.monotonic()
+
+    with _indexes_lock:
+        cached = _indexes.get(cache_key)
+        if cached is not None:
+            index, cached_version, expires_at = cached
+            if cached_version == version and now < expires_at:
+                _indexes.move_to_end(cache_key)
+                return index
+            del _indexes[cache_key]
+
+    index = build_description_index(profile, kind, today - timedelta(days=INDEX_WINDOW_DAYS))
+
+    with _indexes_lock:
+        _indexes[cache_key] = (index, version, now + INDEX_CACHE_TTL_SECONDS)
+        while len(_indexes) > INDEX_CACHE_MAX_PROFILES:
+            _indexes.popitem(last=False)
+
+    logger.debug(
+        "Built %s description index for %s: %s descriptions",
+        kind, log_safe_id(profile.id, "profile"), len(index),
+    )
+    return index
+
+
+def _apply_change(kind: str, profile_id: int, change) -> None:
+    """
+    Обновляет версию индекса в Redis и применяет change(index) к локальной копии.
+    change=None сбрасывает локальную копию.
+    """
+    version_key = _version_key(kind, profile_id)
+    version = time.time_ns()
+    if not cache.set(version_key, version, INDEX_VERSION_CACHE_TIMEOUT):
+        # Бэкенд не подтвердил запись (Redis недоступен или set() ничего
+        # не возвращает): сверяемся с тем, что реально увидит следующий get()
+        version = cache.get(version_key)
+
+    cache_key = (kind, profile_id)
+    with _indexes_lock:
+        cached = _indexes.get(cache_key)
+        if cached is None:
+            return
+        if change is None:
+            del _indexes[cache_key]
+            return
+        index, _, expires_at = cached
+        change(index)
+        _indexes[cache_key] = (index, version, expires_at)
+
+
+def _operation_args(kind: str, instance) -> tuple:
+    if kind == INCOME:
+        op_date, op_time = instance.income_date, instance.income_time
+        currency = instance.currency
+    else:
+        op_date, op_time = instance.expense_date, instance.expense_time
+        currency = instance.currency or _operation_currency(kind, None, instance.profile.currency)
+    # Сумма могла быть передана float'ом, а в индексе лежат Decimal из БД
+    amount = Decimal(str(instance.amount)).quantize(Decimal('0.01'))
+    return instance.description, amount, currency, instance.category_id, op_date, op_time
+
+
+def operation_saved(kind: str, instance, created: bool) -> None:
+    """Создание применяется инкрементально, изменение сбрасывает индекс профиля"""
+    if not created:
+        _apply_change(kind, instance.profile_id, None)
+        return
+    args = _operation_args(kind, instance)
+    _apply_change(kind, instance.profile_id, lambda index: index.add(*args))
+
+
+def profiles_changed(kind: str, profile_ids) -> None:
+    """Массовое изменение операций: новые версии индексов одним запросом, локальные копии сбрасываются"""
+    profile_ids = set(profile_ids)
+    if not profile_ids:
+        return
+    version = time.time_ns()
+    cache.set_many({_version_key(kind, profile_id): version for profile_id in profile_ids}, INDEX_VERSION_CACHE_TIMEOUT)
+    with _indexes_lock:
+        for profile_id in profile_ids:
+            _indexes.pop((kind, profile_id), None)
+
+
+def clear_description_indexes() -> None:
+    """Очищает локальный кеш индексов (для тестов)"""
+    with _indexes_lock:
+        _indexes.clear()
@@ -21,9 +21,12 @@ from bot.constants import (
     MAX_TRANSACTION_AMOUNT,
     ONE_YEAR_DAYS,
 )
+from bot.utils.db_executor import parallel_read, run_read
 from bot.utils.db_utils import get_or_create_user_profile_sync
 from bot.utils.category_helpers import get_category_display_name
 from bot.utils.logging_safe import log_safe_id, summarize_text
+from bot.utils.text_similarity import best_match, extract_words
+from bot.services.description_index import EXPENSE as EXPENSE_INDEX, get_description_index_sync
 
 # Предзагрузка Celery задач для устранения "холодного старта"
 # Импортируем заранее, чтобы при первом вызове не было задержки 6+ секунд
@@ -343,41 +346,58 @@ def get_user_expenses(
 # Helper functions for get_expenses_summary (refactored for lower complexity)
 # =============================================================================
 
-def _get_expenses_queryset(
-    profile: Profile,
+def _get_summary_profile_currencies(profile: Profile, household_mode: bool = False) -> Dict[int, Optional[str]]:
+    """
+    Get profiles included in the summary with their default currencies.
+
+    Returns:
+        Dict profile_id -> profile currency (all household members in household mode)
+    """
+    if household_mode and profile.household_id:
+        return dict(
+            Profile.objects.filter(household_id=profile.household_id).values_list('id', 'currency')
+        )
+    return {profile.id: profile.currency}
+
+
+def _get_expense_summary_rows(
+    profile_currencies: Dict[int, Optional[str]],
     start_date: date,
-    end_date: date,
-    household_mode: bool = False
-):
+    end_date: date
+) -> List[Dict]:
     """
-    Get expenses queryset with optional household mode.
+    Aggregate expenses with a single grouped query (rows are never materialized).
 
     Returns:
-        QuerySet of expenses and list of household profiles (or None)
+        Rows with profile_id, category_id, currency, total, count.
+        Empty currency is replaced with the profile currency.
     """
-    if household_mode and profile.household:
-        household_profiles = Profile.objects.filter(household=profile.household)
-        expenses = Expense.objects.filter(
-            profile__in=household_profiles,
+    rows = (
+        Expense.objects.filter(
+            profile_id__in=list(profile_currencies),
             expense_date__gte=start_date,
             expense_date__lte=end_date
-        ).select_related('category')
-        return expenses, household_profiles
-    else:
-        expenses = Expense.objects.filter(
-            profile=profile,
-            expense_date__gte=start_date,
-            expense_date__lte=end_date
-        ).select_related('category')
-        return expenses, None
+        )
+        .order_by()
+        .values('profile_id', 'category_id', 'currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+
+    result = []
+    for row in rows:
+        row['currency'] = row['currency'] or profile_currencies.get(row['profile_id']) or DEFAULT_CURRENCY_CODE
+        row['total'] = row['total'] or Decimal('0')
+        result.append(row)
+    return result
 
 
 def _group_expenses_by_category(
-    expenses,
+    rows: List[Dict],
+    category_map: Dict[int, ExpenseCategory],
     user_lang: str
 ) -> tuple:
     """
-    Group expenses by category and currency.
+    Group aggregated expense rows by category and currency.
 
     Returns:
         Tuple of (expenses_by_currency, categories, total_count)
@@ -388,22 +408,23 @@ def _group_expenses_by_category(
     categories = {}
     total_count = 0
 
-    for expense in expenses:
-        currency = expense.currency or expense.profile.currency or DEFAULT_CURRENCY_CODE
+    for row in rows:
+        currency = row['currency']
+        amount = row['total']
+        count = row['count']
 
         # Currency statistics
-        if currency not in expenses_by_currency:
-            expenses_by_currency[currency] = {'total': Decimal('0'), 'count': 0}
-
-        expenses_by_currency[currency]['total'] += expense.amount
-        expenses_by_currency[currency]['count'] += 1
-        total_count += 1
+        currency_data = expenses_by_currency.setdefault(currency, {'total': Decimal('0'), 'count': 0})
+        currency_data['total'] += amount
+        currency_data['count'] += count
+        total_count += count
 
         # Category grouping
-        if expense.category:
-            cat_id = expense.category.id
-            cat_icon = expense.category.icon or ''
-            cat_name = get_category_display_name(expense.category, user_lang)
+        category = category_map.get(row['category_id'])
+        if category:
+            cat_id = category.id
+            cat_icon = category.icon or ''
+            cat_name = get_category_display_name(category, user_lang)
         else:
             cat_id = 0
             cat_name = get_text('no_category', user_lang)
@@ -418,23 +439,21 @@ def _group_expenses_by_category(
                 'count': 0
             }
 
-        if currency not in categories[cat_id]['amounts']:
-            categories[cat_id]['amounts'][currency] = Decimal('0')
-
-        categories[cat_id]['amounts'][currency] += expense.amount
-        categories[cat_id]['count'] += 1
+        amounts = categories[cat_id]['amounts']
+        amounts[currency] = amounts.get(currency, Decimal('0')) + amount
+        categories[cat_id]['count'] += count
 
     return expenses_by_currency, categories, total_count
 
 
 def _get_income_summary(
     profile: Profile,
+    profile_ids: List[int],
     start_date: date,
-    end_date: date,
-    household_mode: bool = False
+    end_date: date
 ) -> Dict:
     """
-    Get income summary for the period.
+    Get income summary for the period with a single grouped query.
 
     Returns:
         Dict with income_total, income_count, by_income_category
@@ -444,28 +463,20 @@ def _get_income_summary(
 
     user_lang = profile.language_code or 'ru'
 
-    if household_mode and profile.household:
-        household_profiles = Profile.objects.filter(household=profile.household)
-        incomes = Income.objects.filter(
-            profile__in=household_profiles,
-            income_date__gte=start_date,
-            income_date__lte=end_date
-        )
-    else:
-        incomes = Income.objects.filter(
-            profile=profile,
-            income_date__gte=start_date,
-            income_date__lte=end_date
-        )
+    incomes = Income.objects.filter(
+        profile_id__in=profile_ids,
+        income_date__gte=start_date,
+        income_date__lte=end_date
+    )
 
-    income_total = incomes.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    income_count = incomes.count()
+    income_total = Decimal('0')
+    income_count = 0
 
     # Группируем по категории и валюте. Общие total сохраняют старый контракт,
     # а amounts/income_currency_totals используются точными шкалами целей.
     grouped_categories = {}
     income_currency_totals = {}
-    category_currency_rows = incomes.values('category__id', 'currency').annotate(
+    category_currency_rows = incomes.order_by().values('category__id', 'currency').annotate(
         total=Sum('amount'),
         count=Count('id'),
     )
@@ -475,6 +486,8 @@ def _get_income_summary(
         total = row['total'] or Decimal('0')
         count = row['count'] or 0
 
+        income_total += total
+        income_count += count
         income_currency_totals[currency] = (
             income_currency_totals.get(currency, Decimal('0')) + total
         )
@@ -574,7 +587,7 @@ def _calculate_personal_cashback(
 
 
 def _calculate_household_cashback(
-    expenses,
+    rows: List[Dict],
     main_currency: str,
     current_month: int
 ) -> Decimal:
@@ -585,21 +598,15 @@ def _calculate_household_cashback(
 
     # Collect totals by category for each household member
     member_totals: Dict[int, Dict[int, Decimal]] = {}
-    for exp in expenses:
-        if (exp.currency or exp.profile.currency or DEFAULT_CURRENCY_CODE) != main_currency:
+    for row in rows:
+        if row['currency'] != main_currency:
             continue
-        if not exp.category_id:
+        if not row['category_id']:
             continue
 
-        pid = exp.profile_id
-        cid = exp.category_id
-
-        if pid not in member_totals:
-            member_totals[pid] = {}
-        if cid not in member_totals[pid]:
-            member_totals[pid][cid] = Decimal('0')
-
-        member_totals[pid][cid] += exp.amount
+        cat_totals = member_totals.setdefault(row['profile_id'], {})
+        cid = row['category_id']
+        cat_totals[cid] = cat_totals.get(cid, Decimal('0')) + row['total']
 
     # Apply each member's cashback rules
     cashback_rules: Dict[int, Dict[int | None, list]] = {}
@@ -648,8 +655,7 @@ def _build_empty_summary() -> Dict:
     }
 
 
-@sync_to_async
-def get_expenses_summary(
+async def get_expenses_summary(
     user_id: int,
     start_date: date,
     end_date: date,
@@ -674,6 +680,23 @@ def get_expenses_summary(
             'potential_cashback': Decimal
         }
     """
+    summary = await _read_expenses_summary(user_id, start_date, end_date, household_mode)
+    if summary is None:
+        # Если профиля нет, создаем его — запись идёт в общем потоке ORM,
+        # а не в пуле чтений; затем сводка читается уже для нового профиля
+        await sync_to_async(get_or_create_user_profile_sync)(user_id)
+        summary = await _read_expenses_summary(user_id, start_date, end_date, household_mode)
+    return summary if summary is not None else _build_empty_summary()
+
+
+@parallel_read
+def _read_expenses_summary(
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    household_mode: bool = False
+) -> Optional[Dict]:
+    """Сводка трат за период; None — профиля нет"""
     logger.debug(
         "get_expenses_summary called for %s: start=%s, end=%s, household=%s",
         log_safe_id(user_id, "user"),
@@ -681,38 +704,34 @@ def get_expenses_summary(
         end_date,
         household_mode,
     )
-    profile = get_or_create_user_profile_sync(user_id)
+    profile = Profile.objects.filter(telegram_id=user_id).first()
+    if profile is None:
+        return None
     logger.debug("Profile resolved for %s: profile_id=%s", log_safe_id(user_id, "user"), profile.id)
 
     try:
-        # Get user language for multilingual categories
-        from bot.utils.language import get_user_language
-        from asgiref.sync import async_to_sync
-        user_lang = async_to_sync(get_user_language)(user_id)
-
-        # Get expenses queryset
-        expenses, household_profiles = _get_expenses_queryset(
-            profile, start_date, end_date, household_mode
-        )
-        if household_profiles:
-            logger.debug(
-                "Household mode summary for %s: members=%s, expenses=%s",
-                log_safe_id(user_id, "user"),
-                household_profiles.count(),
-                expenses.count(),
-            )
+        # User language for multilingual categories
+        user_lang = profile.language_code or 'ru'
+        household_summary = bool(household_mode and profile.household_id)
+
+        # One grouped query for expenses, categories resolved by id
+        profile_currencies = _get_summary_profile_currencies(profile, household_mode)
+        expense_rows = _get_expense_summary_rows(profile_currencies, start_date, end_date)
+        category_ids = {row['category_id'] for row in expense_rows if row['category_id']}
+        category_map = ExpenseCategory.objects.in_bulk(category_ids) if category_ids else {}
         logger.debug(
-            "Expense summary query for %s: profile_id=%s, start=%s, end=%s, expenses=%s",
+            "Expense summary query for %s: profile_id=%s, members=%s, start=%s, end=%s, groups=%s",
             log_safe_id(user_id, "user"),
             profile.id,
+            len(profile_currencies),
             start_date,
             end_date,
-            expenses.count(),
+            len(expense_rows),
         )
 
         # Group expenses by category and currency
         expenses_by_currency, categories, total_count = _group_expenses_by_category(
-            expenses, user_lang
+            expense_rows, category_map, user_lang
         )
 
         # Convert categories to sorted list
@@ -730,26 +749,31 @@ def get_expenses_summary(
         currency_totals = {cur: data['total'] for cur, data in expenses_by_currency.items()}
 
         # Determine main currency and totals (for backward compatibility)
+        default_currency = profile.currency or DEFAULT_CURRENCY_CODE
         if expenses_by_currency:
-            main_currency = max(expenses_by_currency.items(), key=lambda x: x[1]['count'])[0]
+            # При равном количестве трат предпочитаем валюту профиля
+            main_currency = max(
+                expenses_by_currency.items(),
+                key=lambda x: (x[1]['count'], x[0] == default_currency)
+            )[0]
             total = expenses_by_currency[main_currency]['total']
             count = total_count
         else:
-            main_currency = profile.currency or DEFAULT_CURRENCY_CODE
+            main_currency = default_currency
             total = Decimal('0')
             count = 0
 
         # Get income summary
-        income_data = _get_income_summary(profile, start_date, end_date, household_mode)
+        income_data = _get_income_summary(profile, list(profile_currencies), start_date, end_date)
 
         # Calculate balance
         balance = income_data['income_total'] - total
 
         # Calculate potential cashback
         current_month = start_date.month
-        if household_mode and profile.household and expenses_by_currency:
+        if household_summary and expenses_by_currency:
             potential_cashback = _calculate_household_cashback(
-                expenses, main_currency, current_month
+                expense_rows, main_currency, current_month
             )
         else:
             potential_cashback = _calculate_personal_cashback(
@@ -966,91 +990,6 @@ def get_user_expenses(
         return []
 
 
-def normalize_russian_word(word: str) -> str:
-    """
-    Простая нормализация русского слова - убирает типичные окончания.
-    Это не полноценный стеммер, но достаточно для поиска.
-
-    Примеры:
-        капельницы -> капельниц
-        капельница -> капельниц
-        продукты -> продукт
-        кофе -> кофе (не меняется)
-    """
-    word = word.lower().strip()
-    if len(word) < 4:
-        return word
-
-    # Русские окончания (от длинных к коротким)
-    endings = [
-        # Существительные множественное число
-        'ами', 'ями', 'ами', 'ях', 'ов', 'ев', 'ей', 'ий',
-        # Существительные единственное число
-        'ом', 'ем', 'ой', 'ей', 'ью', 'ия', 'ие', 'ье',
-        # Прилагательные
-        'ого', 'его', 'ому', 'ему', 'ым', 'им', 'ой', 'ей',
-        'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
-        # Глаголы
-        'ть', 'ла', 'ло', 'ли', 'ет', 'ит', 'ут', 'ют',
-        # Короткие окончания (в конце, чтобы не срезать раньше времени)
-        'ы', 'и', 'а', 'я', 'у', 'ю', 'е', 'о',
-    ]
-
-    for ending in endings:
-        if word.endswith(ending) and len(word) - len(ending) >= 3:
-            return word[:-len(ending)]
-
-    return word
-
-
-def _calculate_similarity(word1: str, word2: str) -> float:
-    """
-    Вычисляет процент схожести двух слов используя расстояние Левенштейна.
-
-    Args:
-        word1: Первое слово
-        word2: Второе слово
-
-    Returns:
-        Процент схожести (0.0 - 1.0)
-
-    Examples:
-        >>> _calculate_similarity("тралик", "тралики")
-        0.857  # 85.7% схожести
-        >>> _calculate_similarity("магнит", "магнитрон")
-        0.778  # 77.8% схожести
-    """
-    if word1 == word2:
-        return 1.0
-
-    # Расстояние Левенштейна
-    def levenshtein_distance(s1: str, s2: str) -> int:
-        if len(s1) < len(s2):
-            return levenshtein_distance(s2, s1)
-        if len(s2) == 0:
-            return len(s1)
-
-        previous_row = range(len(s2) + 1)
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                # j+1 вместо j так как previous_row и current_row на 1 длиннее s2
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-
-        return previous_row[-1]
-
-    distance = levenshtein_distance(word1.lower(), word2.lower())
-    max_len = max(len(word1), len(word2))
-
-    # Схожесть = 1 - (расстояние / максимальная длина)
-    similarity = 1.0 - (distance / max_len)
-    return similarity
-
-
 @sync_to_async
 def find_similar_expenses(
     telegram_id: int,
@@ -1076,86 +1015,71 @@ def find_similar_expenses(
         start_date = end_date - timedelta(days=days_back)
 
         # Нормализуем описание для поиска - извлекаем только буквы, без пунктуации
-        search_desc = description.lower().strip()
-        import re
-        search_words = re.findall(r'[а-яёa-z]+', search_desc)
+        search_words = extract_words(description.strip())
 
         # Если нет слов для поиска - возвращаем пустой результат
         if not search_words:
             return []
 
-        # Ищем траты с похожим описанием
-        queryset = Expense.objects.filter(
-            profile=profile,
-            expense_date__gte=start_date,
-            expense_date__lte=end_date
-        )
+        # Сравниваем с уникальными описаниями из индекса, а не с каждой тратой
+        index = get_description_index_sync(profile, EXPENSE_INDEX, days_back)
 
         # Фильтруем по описанию с учетом схожести (85% порог)
         SIMILARITY_THRESHOLD = 0.85
-        similar_expenses = []
-
-        for expense in queryset.select_related('category'):
-            if expense.description:
-                exp_desc = expense.description.lower().strip()
-                # Извлекаем слова без пунктуации
-                exp_words = re.findall(r'[а-яёa-z]+', exp_desc)
-
-                # Проверяем что все слова из поиска имеют похожие слова в описании траты
-                match_found = True
-                for search_word in search_words:
-                    # Ищем хотя бы одно слово в описании с схожестью >= 85%
-                    word_matched = False
-                    for exp_word in exp_words:
-                        similarity = _calculate_similarity(search_word, exp_word)
-                        if similarity >= SIMILARITY_THRESHOLD:
-                            word_matched = True
-                            logger.debug(
-                                "[SIMILAR EXPENSE] Candidate match for %s: query=%s, expense=%s, similarity=%.2f",
-                                log_safe_id(telegram_id, "user"),
-                                summarize_text(description),
-                                summarize_text(expense.description),
-                                similarity,
-                            )
-                            break
-
-                    if not word_matched:
-                        match_found = False
-                        break
-
-                if match_found:
-                    similar_expenses.append(expense)
-        
-        # Получаем язык пользователя для правильного отображения
-        from bot.utils.language import get_user_language
-        from asgiref.sync import async_to_sync
-        user_lang = async_to_sync(get_user_language)(telegram_id)
-        
+        matched_stats = []
+
+        for entry in list(index.entries.values()):
+            # Проверяем что все слова из поиска имеют похожие слова в описании траты
+            match_found = bool(entry.words)
+            for search_word in search_words:
+                # Ищем слово в описании с схожестью >= 85%
+                match = best_match(search_word, entry.words, SIMILARITY_THRESHOLD)
+                if match is None:
+                    match_found = False
+                    break
+                logger.debug(
+                    "[SIMILAR EXPENSE] Candidate match for %s: query=%s, expense=%s, similarity=%.2f",
+                    log_safe_id(telegram_id, "user"),
+                    summarize_text(description),
+                    summarize_text(entry.description),
+                    match[1],
+                )
+
+            if match_found:
+                matched_stats.extend(entry.stats(start_date, end_date))
+
+        # Язык пользователя для правильного отображения
+        user_lang = profile.language_code or 'ru'
+        category_ids = {category_id for (_, _, category_id), _, _ in matched_stats if category_id}
+        categories = ExpenseCategory.objects.in_bulk(category_ids) if category_ids else {}
+
         # Группируем по уникальным суммам и категориям
         unique_amounts = {}
-        for expense in similar_expenses:
-            category_display = expense.category.get_display_name(user_lang) if expense.category else ('Прочие расходы' if user_lang == 'ru' else 'Other Expenses')
-            currency = expense.currency or expense.profile.currency or DEFAULT_CURRENCY_CODE
-            key = (float(expense.amount), currency, category_display)
-            if key not in unique_amounts:
-                unique_amounts[key] = {
-                    'amount': float(expense.amount),
-                    'currency': currency,
-                    'category': category_display,
-                    'count': 1,
-                    'last_date': expense.expense_date
-                }
+        for (amount, currency, category_id), count, last_stamp in matched_stats:
+            category = categories.get(category_id)
+            category_display = category.get_display_name(user_lang) if category else ('Прочие расходы' if user_lang == 'ru' else 'Other Expenses')
+            key = (float(amount), currency, category_display)
+            if key not in unique_amounts:
+                unique_amounts[key] = {
+                    'amount': float(amount),
+                    'currency': currency,
+                    'category': category_display,
+                    'count': count,
+                    'last_stamp': last_stamp
+                }
             else:
-                unique_amounts[key]['count'] += 1
-                if expense.expense_date > unique_amounts[key]['last_date']:
-                    unique_amounts[key]['last_date'] = expense.expense_date
-        
+                unique_amounts[key]['count'] += count
+                if last_stamp > unique_amounts[key]['last_stamp']:
+                    unique_amounts[key]['last_stamp'] = last_stamp
+
         # Сортируем по дате последнего использования (последняя трата первой)
         result = sorted(
             unique_amounts.values(),
-            key=lambda x: x['last_date'],
+            key=lambda x: x['last_stamp'],
             reverse=True
         )
+        for item in result:
+            item['last_date'] = item.pop('last_stamp')[0]
         
         return result[:5]  # Возвращаем топ-5 вариантов
         
@@ -1186,8 +1110,12 @@ def delete_expense(telegram_id: int, expense_id: int) -> bool:
         return False
     
     try:
+        from expenses.signals import operations_deleted
+
         expense = Expense.objects.get(id=expense_id, profile=profile)
-        expense.delete()
+        with transaction.atomic():
+            expense.delete()
+            operations_deleted('expense', [expense])
         
         logger.info("Deleted expense %s for %s", expense_id, log_safe_id(telegram_id, "user"))
         return True
@@ -1225,20 +1153,19 @@ async def get_today_summary(user_id: int) -> Dict[str, Any]:
     from expenses.models import Profile
     
     try:
-        profile = await Profile.objects.aget(telegram_id=user_id)
         today = date.today()
-        default_currency = profile.currency or DEFAULT_CURRENCY_CODE
         
-        @sync_to_async
         def get_today_expenses():
-            return list(
+            profile = Profile.objects.get(telegram_id=user_id)
+            return profile, list(
                 Expense.objects.filter(
                     profile=profile,
                     expense_date=today
                 ).select_related('category')
             )
         
-        expenses = await get_today_expenses()
+        profile, expenses = await run_read(get_today_expenses)
+        default_currency = profile.currency or DEFAULT_CURRENCY_CODE
         
         # Group by currency
         currency_totals = {}
@@ -1395,7 +1322,7 @@ async def get_date_summary(user_id: int, target_date: date) -> Dict[str, Any]:
         return {'total': 0, 'count': 0, 'categories': [], 'currency': DEFAULT_CURRENCY_CODE, 'currency_totals': {}, 'single_currency': True}
 
 
-@sync_to_async
+@parallel_read
 def get_last_expenses(telegram_id: int, limit: int = 30) -> List[Expense]:
     """
     Получить последние расходы пользователя
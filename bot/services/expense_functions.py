@@ -13,6 +13,10 @@ from bot.utils.category_helpers import get_category_display_name
 from bot.utils.currency_display import operation_currency_fields
 from bot.utils.language import get_user_language, get_text
 from bot.utils.logging_safe import log_safe_id, summarize_text
+from bot.utils.text_similarity import best_match, extract_words, normalize_russian_word
+from bot.services.text_search import build_substring_filter, is_postgres_search_available, postgres_search
+from bot.services.daily_totals import EXPENSE as DAILY_EXPENSE, daily_totals_queryset
+from bot.services.analytics_engine import EXPENSE as FRAME_EXPENSE, INCOME as FRAME_INCOME, get_operations_frame_sync
 import logging
 
 logger = logging.getLogger(__name__)
@@ -78,32 +82,35 @@ def _apply_date_filters(queryset, start_date: str, end_date: str):
     return queryset
 
 
+EXPENSE_SEARCH_CATEGORY_FIELDS = ('category__name', 'category__name_ru', 'category__name_en')
+
+
 def _build_search_filter(query_parts: list):
     """Build Q filter for expense search."""
-    from functools import reduce
-    from operator import or_
-
-    q_filters = []
-    for qpart in query_parts:
-        q_filters.append(
-            Q(description__icontains=qpart) |
-            Q(category__name__icontains=qpart) |
-            Q(category__name_ru__icontains=qpart) |
-            Q(category__name_en__icontains=qpart)
-        )
+    return build_substring_filter(query_parts, ('description', *EXPENSE_SEARCH_CATEGORY_FIELDS))
 
-    if q_filters:
-        return reduce(or_, q_filters)
-    return None
+
+def _search_expenses_queryset(queryset, query_parts: list):
+    """
+    Build queryset of matching expenses.
+
+    PostgreSQL: trigram + full-text search ranked by relevance (bot/services/text_search.py).
+    SQLite: icontains filter ordered by date; fuzzy matching is done by _fuzzy_search_expenses.
+    Returns None if the query has no searchable parts.
+    """
+    if not query_parts:
+        return None
+    if is_postgres_search_available(queryset):
+        return postgres_search(
+            queryset, query_parts, 'description', EXPENSE_SEARCH_CATEGORY_FIELDS
+        ).order_by('-search_rank', '-expense_date', '-expense_time')
+    return queryset.filter(_build_search_filter(query_parts)).order_by('-expense_date', '-expense_time')
 
 
 def _fuzzy_search_expenses(queryset, query_parts: list, limit: int) -> list:
     """
     Perform fuzzy search on expenses when standard search returns nothing.
     """
-    import re
-    from bot.services.expense import normalize_russian_word, _calculate_similarity
-
     FUZZY_SEARCH_LIMIT = 500
     SIMILARITY_THRESHOLD = 0.75
 
@@ -132,28 +139,25 @@ def _expense_matches_query(
     threshold: float
 ) -> bool:
     """Check if expense matches any of the query parts."""
-    import re
-    from bot.services.expense import normalize_russian_word, _calculate_similarity
+    desc_lower = exp.description.lower() if exp.description else ''
+    desc_words_normalized = None
 
     for query_lower, query_normalized in zip(query_parts_lower, query_parts_normalized):
         # Check description
-        if exp.description:
-            desc_lower = exp.description.lower()
-
+        if desc_lower:
             # Exact match
             if query_lower in desc_lower or query_normalized in desc_lower:
                 return True
 
             # Fuzzy match on words
-            desc_words = re.findall(r'[а-яёa-z]+', desc_lower)
-            for word in desc_words:
-                word_normalized = normalize_russian_word(word)
-                if query_normalized == word_normalized:
+            if desc_words_normalized is None:
+                desc_words_normalized = [normalize_russian_word(word) for word in extract_words(desc_lower)]
+            if query_normalized in desc_words_normalized:
+                return True
+            if len(query_normalized) >= 3:
+                candidates = [word for word in desc_words_normalized if len(word) >= 3]
+                if best_match(query_normalized, candidates, threshold):
                     return True
-                if len(query_normalized) >= 3 and len(word_normalized) >= 3:
-                    similarity = _calculate_similarity(query_normalized, word_normalized)
-                    if similarity >= threshold:
-                        return True
 
         # Check category
         if exp.category:
@@ -166,6 +170,15 @@ def _expense_matches_query(
     return False
 
 
+def _search_incomes_queryset(queryset, query: str):
+    """
+    Поиск доходов по описанию: trigram/full-text на PostgreSQL, icontains на SQLite.
+    """
+    if is_postgres_search_available(queryset):
+        return postgres_search(queryset, [query], 'description').order_by('-search_rank', '-income_date')
+    return queryset.filter(description__icontains=query).order_by('-income_date')
+
+
 def _format_search_results(expenses, lang: str) -> tuple:
     """Format expenses for search results."""
     results = []
@@ -291,33 +304,28 @@ class ExpenseFunctions:
                 end_date = date.today()
                 start_date = end_date - timedelta(days=60)
             
-            # Получаем траты за период
-            expenses = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).values('expense_date').annotate(
-                total=Sum('amount')
-            ).order_by('-total')
+            # Траты за период из колоночного среза
+            expenses = get_operations_frame_sync(profile.id, FRAME_EXPENSE, start_date, end_date)
+            max_day = expenses.max_day()
             
-            logger.debug("[get_max_expense_day] Found %s days with expenses", len(expenses))
+            logger.debug("[get_max_expense_day] Found %s expenses in period", len(expenses))
             
             # Получаем язык пользователя
             lang = profile.language_code or 'ru'
             
-            if not expenses:
+            if max_day is None:
                 from bot.utils import get_text
                 return {
                     'success': False,
                     'message': get_text('no_expenses_period', lang)
                 }
             
-            max_day = expenses.first()
+            max_date, max_total = max_day
             
             # Получаем детали трат за этот день
             day_expenses = Expense.objects.filter(
                 profile=profile,
-                expense_date=max_day['expense_date']
+                expense_date=max_date
             ).select_related('category')
 
             from bot.utils import get_text
@@ -335,14 +343,14 @@ class ExpenseFunctions:
                 })
             
             # Добавляем день недели
-            weekday_num = max_day['expense_date'].weekday()
+            weekday_num = max_date.weekday()
             weekday = get_text(['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'][weekday_num], lang)
             
             return {
                 'success': True,
-                'date': max_day['expense_date'].isoformat(),
+                'date': max_date.isoformat(),
                 'weekday': weekday,
-                'total': float(max_day['total']),
+                'total': max_total,
                 'currency': profile.currency or 'RUB',
                 'count': len(details),
                 'details': details
@@ -598,22 +606,20 @@ class ExpenseFunctions:
             end_date = date.today()
             start_date = end_date - timedelta(days=days)
             
-            # Получаем траты по дням
-            daily = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).values('expense_date').annotate(
-                total=Sum('amount'),
-                count=Count('id')
-            ).order_by('expense_date')
+            # Получаем траты по дням (из дневных итогов)
+            daily = daily_totals_queryset(
+                DAILY_EXPENSE, start_date, end_date, profile=profile
+            ).values('date').annotate(
+                day_total=Sum('total'),
+                day_count=Sum('count')
+            ).order_by('date')
             
             # Формируем результат
             daily_data = {}
             for day in daily:
-                daily_data[day['expense_date'].isoformat()] = {
-                    'amount': float(day['total']),
-                    'count': day['count']
+                daily_data[day['date'].isoformat()] = {
+                    'amount': float(day['day_total']),
+                    'count': day['day_count']
                 }
             
             # Заполняем пропущенные дни нулями
@@ -698,24 +704,20 @@ class ExpenseFunctions:
             queryset = Expense.objects.filter(profile=profile)
             queryset = _apply_date_filters(queryset, start_date, end_date)
 
-            # Try standard SQL search first
-            search_filter = _build_search_filter(query_parts)
+            # SQL search first (trigram/full-text on PostgreSQL, icontains on SQLite)
+            matching_qs = _search_expenses_queryset(queryset, query_parts)
             total_count = 0
             total_amount = Decimal('0')
             used_fuzzy = False
-            if search_filter:
-                matching_qs = queryset.filter(search_filter)
+            if matching_qs is not None:
                 total_count = matching_qs.count()
                 total_amount = matching_qs.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-                expenses = list(
-                    matching_qs.select_related('category')
-                    .order_by('-expense_date', '-expense_time')[:limit]
-                )
+                expenses = list(matching_qs.select_related('category')[:limit])
             else:
                 expenses = []
 
-            # If nothing found - use fuzzy search
-            if not expenses:
+            # If nothing found - use fuzzy search (PostgreSQL already matched typos via pg_trgm)
+            if not expenses and not is_postgres_search_available(queryset):
                 expenses = _fuzzy_search_expenses(queryset, query_parts, limit)
                 logger.debug("search_expenses: extended search found %s expenses", len(expenses))
                 if expenses:
@@ -754,8 +756,8 @@ class ExpenseFunctions:
                         prev_expenses = _fuzzy_search_expenses(prev_queryset, query_parts, limit=1000)
                         prev_count = len(prev_expenses)
                         prev_total = sum((exp.amount for exp in prev_expenses), Decimal('0'))
-                    elif search_filter:
-                        prev_matching_qs = prev_queryset.filter(search_filter)
+                    elif matching_qs is not None:
+                        prev_matching_qs = _search_expenses_queryset(prev_queryset, query_parts)
                         prev_count = prev_matching_qs.count()
                         prev_total = prev_matching_qs.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
                     else:
@@ -841,28 +843,24 @@ class ExpenseFunctions:
             start_date = end_date - timedelta(days=period_days)
             
             # Получаем все траты за период
-            expenses = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            )
+            expenses = get_operations_frame_sync(profile.id, FRAME_EXPENSE, start_date, end_date)
             
-            total = expenses.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            count = expenses.count()
+            total = expenses.total()
+            count = len(expenses)
             
             # Считаем количество дней с тратами
-            days_with_expenses = expenses.values('expense_date').distinct().count()
+            days_with_expenses = expenses.active_days()
             
             return {
                 'success': True,
                 'user_id': user_id,
                 'period_days': period_days,
-                'total': float(total),
+                'total': total,
                 'count': count,
                 'days_with_expenses': days_with_expenses,
-                'average_per_day': float(total / period_days) if period_days > 0 else 0,
-                'average_per_active_day': float(total / days_with_expenses) if days_with_expenses > 0 else 0,
-                'average_per_expense': float(total / count) if count > 0 else 0,
+                'average_per_day': total / period_days if period_days > 0 else 0,
+                'average_per_active_day': total / days_with_expenses if days_with_expenses > 0 else 0,
+                'average_per_expense': total / count if count > 0 else 0,
                 'currency': profile.currency or 'RUB'
             }
             
@@ -985,11 +983,8 @@ class ExpenseFunctions:
                 end_date = date.today()
                 start_date = end_date - timedelta(days=60)
 
-            max_expense = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).select_related('category').order_by('-amount').first()
+            max_id = get_operations_frame_sync(profile.id, FRAME_EXPENSE, start_date, end_date).max_id()
+            max_expense = Expense.objects.select_related('category').filter(id=max_id).first() if max_id else None
             
             if not max_expense:
                 return {
@@ -1048,11 +1043,8 @@ class ExpenseFunctions:
                 end_date = date.today()
                 start_date = end_date - timedelta(days=60)
 
-            min_expense = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).select_related('category').order_by('amount').first()
+            min_id = get_operations_frame_sync(profile.id, FRAME_EXPENSE, start_date, end_date).min_id()
+            min_expense = Expense.objects.select_related('category').filter(id=min_id).first() if min_id else None
 
             if not min_expense:
                 return {
@@ -1277,17 +1269,13 @@ class ExpenseFunctions:
             p2_start, p2_end = get_period_dates(period2)
             
             # Получаем суммы
-            total1 = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=p1_start,
-                expense_date__lte=p1_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            total1 = daily_totals_queryset(
+                DAILY_EXPENSE, p1_start, p1_end, profile=profile
+            ).aggregate(Sum('total'))['total__sum'] or Decimal('0')
             
-            total2 = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=p2_start,
-                expense_date__lte=p2_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            total2 = daily_totals_queryset(
+                DAILY_EXPENSE, p2_start, p2_end, profile=profile
+            ).aggregate(Sum('total'))['total__sum'] or Decimal('0')
             
             difference = total1 - total2
             if total2 > 0:
@@ -1386,24 +1374,31 @@ class ExpenseFunctions:
             
             trends = []
             
-            if group_by == 'month':
+            if group_by == 'month' and periods > 0:
+                month_starts = []
                 for i in range(periods):
                     # Вычисляем месяц
                     month_date = today - timedelta(days=i*30)
-                    month_start = month_date.replace(day=1)
-                    
-                    # Последний день месяца
-                    if month_start.month == 12:
-                        month_end = month_start.replace(year=month_start.year+1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        month_end = month_start.replace(month=month_start.month+1, day=1) - timedelta(days=1)
-                    
-                    total = Expense.objects.filter(
-                        profile=profile,
-                        expense_date__gte=month_start,
-                        expense_date__lte=month_end
-                    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-                    
+                    month_starts.append(month_date.replace(day=1))
+                
+                # Последний день текущего месяца
+                last_start = month_starts[0]
+                if last_start.month == 12:
+                    month_end = last_start.replace(year=last_start.year+1, month=1, day=1) - timedelta(days=1)
+                else:
+                    month_end = last_start.replace(month=last_start.month+1, day=1) - timedelta(days=1)
+                
+                # Все месяцы одним запросом по дневным итогам
+                monthly = daily_totals_queryset(
+                    DAILY_EXPENSE, month_starts[-1], month_end, profile=profile
+                ).values('date__year', 'date__month').annotate(month_total=Sum('total'))
+                totals = {
+                    (row['date__year'], row['date__month']): row['month_total']
+                    for row in monthly
+                }
+                
+                for month_start in month_starts:
+                    total = totals.get((month_start.year, month_start.month)) or Decimal('0')
                     trends.append({
                         'period': month_start.strftime('%Y-%m'),
                         'total': float(total)
@@ -1440,16 +1435,14 @@ class ExpenseFunctions:
             weekday_keys = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
             stats = {i: {'total': 0, 'count': 0} for i in range(7)}
 
-            expenses = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            )
+            daily = daily_totals_queryset(
+                DAILY_EXPENSE, start_date, end_date, profile=profile
+            ).values('date').annotate(day_total=Sum('total'), day_count=Sum('count'))
 
-            for exp in expenses:
-                weekday = exp.expense_date.weekday()
-                stats[weekday]['total'] += float(exp.amount)
-                stats[weekday]['count'] += 1
+            for day in daily:
+                weekday = day['date'].weekday()
+                stats[weekday]['total'] += float(day['day_total'])
+                stats[weekday]['count'] += day['day_count']
 
             result = []
             for i in range(7):
@@ -1497,11 +1490,9 @@ class ExpenseFunctions:
             days_in_month = (next_month - month_start).days
             
             # Текущие траты
-            current_total = Expense.objects.filter(
-                profile=profile,
-                expense_date__gte=month_start,
-                expense_date__lte=today
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            current_total = daily_totals_queryset(
+                DAILY_EXPENSE, month_start, today, profile=profile
+            ).aggregate(Sum('total'))['total__sum'] or Decimal('0')
             
             # Средние траты в день
             avg_per_day = current_total / days_passed if days_passed > 0 else Decimal('0')
@@ -1907,12 +1898,12 @@ class ExpenseFunctions:
                 defaults={'language_code': 'ru'}
             )
             
-            # Группируем доходы по дням
-            incomes = Income.objects.filter(profile=profile).values('income_date').annotate(
+            # Группируем доходы по дням (за всю историю — агрегат в БД)
+            max_day = Income.objects.filter(profile=profile).values('income_date').annotate(
                 total=Sum('amount')
-            ).order_by('-total')
+            ).order_by('-total', '-income_date').first()
             
-            if not incomes:
+            if max_day is None:
                 return {
                     'success': True,
                     'message': 'Нет данных о доходах',
@@ -1920,7 +1911,6 @@ class ExpenseFunctions:
                     'total': 0
                 }
             
-            max_day = incomes[0]
             date_obj = max_day['income_date']
             
             # Получаем детали этого дня
@@ -2023,11 +2013,8 @@ class ExpenseFunctions:
                 end_date = date.today()
                 start_date = end_date - timedelta(days=60)
 
-            max_income = Income.objects.filter(
-                profile=profile,
-                income_date__gte=start_date,
-                income_date__lte=end_date
-            ).order_by('-amount').first()
+            max_id = get_operations_frame_sync(profile.id, FRAME_INCOME, start_date, end_date).max_id()
+            max_income = Income.objects.select_related('category').filter(id=max_id).first() if max_id else None
 
             if not max_income:
                 return {
@@ -2081,11 +2068,8 @@ class ExpenseFunctions:
                 end_date = date.today()
                 start_date = end_date - timedelta(days=60)
 
-            min_income = Income.objects.filter(
-                profile=profile,
-                income_date__gte=start_date,
-                income_date__lte=end_date
-            ).order_by('amount').first()
+            min_id = get_operations_frame_sync(profile.id, FRAME_INCOME, start_date, end_date).min_id()
+            min_income = Income.objects.select_related('category').filter(id=min_id).first() if min_id else None
 
             if not min_income:
                 return {
@@ -2206,33 +2190,25 @@ class ExpenseFunctions:
             
             # За последние 30 дней
             month_ago = today - timedelta(days=30)
-            month_incomes = Income.objects.filter(
-                profile=profile,
-                income_date__gte=month_ago,
-                income_date__lte=today
-            )
+            month_incomes = get_operations_frame_sync(profile.id, FRAME_INCOME, month_ago, today)
             
-            month_total = month_incomes.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            month_count = month_incomes.count()
+            month_total = month_incomes.total()
+            month_count = len(month_incomes)
             
             # За последние 7 дней
             week_ago = today - timedelta(days=7)
-            week_incomes = Income.objects.filter(
-                profile=profile,
-                income_date__gte=week_ago,
-                income_date__lte=today
-            )
+            week_incomes = month_incomes.between(week_ago, today)
             
-            week_total = week_incomes.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            week_count = week_incomes.count()
+            week_total = week_incomes.total()
+            week_count = len(week_incomes)
             
             return {
                 'success': True,
                 'user_id': user_id,
-                'daily_average': float(month_total / 30) if month_total else 0,
-                'weekly_average': float(week_total) if week_total else 0,
-                'monthly_average': float(month_total) if month_total else 0,
-                'average_per_income': float(month_total / month_count) if month_count > 0 else 0,
+                'daily_average': month_total / 30 if month_total else 0,
+                'weekly_average': week_total if week_total else 0,
+                'monthly_average': month_total if month_total else 0,
+                'average_per_income': month_total / month_count if month_count > 0 else 0,
                 'incomes_per_month': month_count,
                 'incomes_per_week': week_count
             }
@@ -2266,10 +2242,7 @@ class ExpenseFunctions:
                 start_date, end_date = get_period_dates(period)
 
             # Базовый фильтр
-            incomes_qs = Income.objects.filter(
-                profile=profile,
-                description__icontains=query
-            )
+            incomes_qs = _search_incomes_queryset(Income.objects.filter(profile=profile), query)
 
             # Добавляем фильтр по датам если указан период
             if start_date and end_date:
@@ -2278,7 +2251,7 @@ class ExpenseFunctions:
                     income_date__lte=end_date
                 )
 
-            incomes = incomes_qs.order_by('-income_date')[:limit]
+            incomes = incomes_qs[:limit]
 
             # Подсчёт общей суммы и количества без лимита
             total_amount = incomes_qs.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
@@ -2308,11 +2281,13 @@ class ExpenseFunctions:
                     logger.debug("search_incomes: comparing with previous period %s to %s", prev_start_date, prev_end_date)
 
                     # Получаем доходы за предыдущий период с тем же фильтром
-                    prev_incomes = Income.objects.filter(
-                        profile=profile,
-                        description__icontains=query,
-                        income_date__gte=prev_start_date,
-                        income_date__lte=prev_end_date
+                    prev_incomes = _search_incomes_queryset(
+                        Income.objects.filter(
+                            profile=profile,
+                            income_date__gte=prev_start_date,
+                            income_date__lte=prev_end_date
+                        ),
+                        query
                     )
 
                     prev_total = prev_incomes.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
@@ -2390,7 +2365,16 @@ class ExpenseFunctions:
                 defaults={'language_code': 'ru'}
             )
             
-            incomes = Income.objects.filter(profile=profile)
+            # За всю историю: итоги по дням в БД, раскладка по дням недели здесь
+            totals = [0.0] * 7
+            counts = [0] * 7
+            daily = Income.objects.filter(profile=profile).values('income_date').annotate(
+                day_total=Sum('amount'), day_count=Count('id')
+            ).order_by()
+            for day in daily:
+                weekday = day['income_date'].weekday()
+                totals[weekday] += float(day['day_total'])
+                counts[weekday] += day['day_count']
 
             from bot.utils.language import get_text
             user_lang = profile.language_code or 'ru'
@@ -2400,14 +2384,10 @@ class ExpenseFunctions:
 
             for i in range(7):
                 day_name = get_text(weekday_keys[i], user_lang)
-                day_incomes = incomes.filter(income_date__week_day=(i + 2) % 7 or 7)  # Django week_day: 1=Sunday
-                total = day_incomes.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-                count = day_incomes.count()
-
                 weekday_stats[day_name] = {
-                    'total': float(total),
-                    'count': count,
-                    'average': float(total / count) if count > 0 else 0
+                    'total': totals[i],
+                    'count': counts[i],
+                    'average': totals[i] / counts[i] if counts[i] > 0 else 0
                 }
             
             return {
@@ -2433,11 +2413,7 @@ class ExpenseFunctions:
             
             # Доходы с начала месяца
             month_start = today.replace(day=1)
-            current_incomes = Income.objects.filter(
-                profile=profile,
-                income_date__gte=month_start,
-                income_date__lte=today
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            current_incomes = get_operations_frame_sync(profile.id, FRAME_INCOME, month_start, today).total()
             
             days_passed = today.day
             days_in_month = 30  # Упрощенно
@@ -2446,15 +2422,15 @@ class ExpenseFunctions:
                 daily_rate = current_incomes / days_passed
                 predicted = daily_rate * days_in_month
             else:
-                predicted = Decimal('0')
+                predicted = 0.0
             
             return {
                 'success': True,
-                'current_total': float(current_incomes),
-                'predicted_total': float(predicted),
+                'current_total': current_incomes,
+                'predicted_total': predicted,
                 'days_passed': days_passed,
                 'days_remaining': days_in_month - days_passed,
-                'daily_rate': float(daily_rate) if days_passed > 0 else 0
+                'daily_rate': daily_rate if days_passed > 0 else 0
             }
         except Exception as e:
             logger.error(f"Error in predict_month_income: {e}")
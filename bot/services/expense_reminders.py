@@ -0,0 +1,146 @@
+"""
+Напоминания о внесении операций (send_expense_reminders, 20:00).
+
+Кандидаты выбираются одним запросом: последняя трата и последний доход
+считаются подзапросами Max(created_at), последняя активность (или дата
+регистрации у пользователя без операций) сравнивается с окном 24-48 часов
+прямо в SQL. Флаги "напоминание отправлено" читаются одним MGET
+(cache.get_many), отправка идёт параллельно через общий с рассылками
+token bucket. Стоимость задачи зависит от числа кандидатов, а не от
+числа всех пользователей.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+
+from bot.utils.logging_safe import log_safe_id
+
+logger = logging.getLogger(__name__)
+
+REMINDER_KEY_PREFIX = 'expense_reminder_sent'
+REMINDER_WINDOW = (timedelta(hours=24), timedelta(hours=48))
+REMINDERS_CONCURRENCY = 8
+
+SENT = 'sent'
+BLOCKED = 'blocked'
+FAILED = 'failed'
+
+BLOCKED_ERRORS = ('bot was blocked by the user', 'forbidden')
+
+
+def reminder_flag_key(telegram_id: int) -> str:
+    return f"{REMINDER_KEY_PREFIX}:{telegram_id}"
+
+
+def reminder_candidates(now: datetime) -> List:
+    """
+    Активные профили, чья последняя операция (или регистрация, если операций
+    нет) была от 24 до 48 часов назад. Профили с заблокированным ботом
+    отсеиваются сразу.
+    """
+    from django.db.models import Max, OuterRef, Subquery
+    from django.db.models.functions import Coalesce, Greatest
+    from expenses.models import Expense, Income, Profile
+
+    newest, oldest = now - REMINDER_WINDOW[0], now - REMINDER_WINDOW[1]
+
+    def last_created(model):
+        return Subquery(
+            model.objects.filter(profile=OuterRef('pk'))
+            .values('profile')
+            .annotate(last=Max('created_at'))
+            .values('last')[:1]
+        )
+
+    return list(
+        Profile.objects.filter(is_active=True, bot_blocked=False, created_at__lt=newest)
+        .annotate(last_expense_at=last_created(Expense), last_income_at=last_created(Income))
+        .annotate(
+            # Greatest от NULL в SQLite даёт NULL, поэтому пустую сторону подменяем другой
+            last_activity_at=Coalesce(
+                Greatest(
+                    Coalesce('last_expense_at', 'last_income_at'),
+                    Coalesce('last_income_at', 'last_expense_at'),
+                ),
+                'created_at',
+            )
+        )
+        .filter(last_activity_at__gt=oldest, last_activity_at__lt=newest)
+        .order_by('id')
+    )
+
+
+def split_already_reminded(profiles: Sequence) -> Tuple[List, int]:
+    """(профили без флага напоминания, число профилей с флагом) — один MGET"""
+    from django.core.cache import cache
+
+    if not profiles:
+        return [], 0
+    flags = cache.get_many([reminder_flag_key(profile.telegram_id) for profile in profiles])
+    pending = [profile for profile in profiles if not flags.get(reminder_flag_key(profile.telegram_id))]
+    return pending, len(profiles) - len(pending)
+
+
+def mark_bot_blocked(profile_ids: Set[int], now: datetime) -> int:
+    from expenses.models import Profile
+
+    if not profile_ids:
+        return 0
+    return Profile.objects.filter(id__in=profile_ids).update(bot_blocked=True, bot_blocked_at=now)
+
+
+async def send_reminders(
+    bot,
+    profiles: Sequence,
+    throttle: Optional[Callable[[], Awaitable[None]]] = None,
+    concurrency: int = REMINDERS_CONCURRENCY,
+) -> Tuple[Counter, Set[int]]:
+    """
+    Отправляет напоминания параллельно, не больше concurrency одновременно.
+
+    Флаг ставится сразу после успешной отправки, чтобы повторный запуск
+    после сбоя не напомнил дважды.
+
+    Returns:
+        (Counter статусов SENT / BLOCKED / FAILED, id профилей, заблокировавших бота)
+    """
+    from django.core.cache import cache
+    from bot.texts import get_text
+
+    semaphore = asyncio.Semaphore(concurrency)
+    blocked: Set[int] = set()
+
+    async def send(profile) -> str:
+        async with semaphore:
+            if throttle is not None:
+                await throttle()
+            try:
+                await bot.send_message(
+                    chat_id=profile.telegram_id,
+                    text=get_text('expense_reminder', profile.language_code or 'ru'),
+                    parse_mode='HTML',
+                )
+            except Exception as e:
+                if any(marker in str(e).lower() for marker in BLOCKED_ERRORS):
+                    blocked.add(profile.id)
+                    logger.info(
+                        "[REMINDER] %s has blocked the bot. Profile marked.",
+                        log_safe_id(profile.telegram_id, "user"),
+                    )
+                    return BLOCKED
+                logger.error(
+                    "[REMINDER] Failed to send reminder to %s: %s",
+                    log_safe_id(profile.telegram_id, "user"),
+                    e,
+                )
+                return FAILED
+
+            # Бессрочно: сбрасывается только новой операцией (clear_expense_reminder)
+            cache.set(reminder_flag_key(profile.telegram_id), True, timeout=None)
+            logger.info("[REMINDER] Sent reminder to %s", log_safe_id(profile.telegram_id, "user"))
+            return SENT
+
+    statuses = Counter(await asyncio.gather(*(send(profile) for profile in profiles)))
+    return statuses, blocked
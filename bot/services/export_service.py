@@ -26,7 +26,10 @@ try:
 except ImportError:
     RichText = Paragraph = ParagraphProperties = CharacterProperties = None
 
-from expenses.models import Expense, Income, Cashback, Profile
+from django.db.models import Count, Sum
+
+from expenses.models import Expense, ExpenseCategory, Income, IncomeCategory, Cashback, Profile
+from bot.services.daily_totals import EXPENSE as DAILY_EXPENSE, INCOME as DAILY_INCOME, daily_totals_queryset
 from bot.utils.language import get_text
 from bot.utils.logging_safe import log_safe_id
 
@@ -311,6 +314,109 @@ class ExportService:
         else:
             return f"{month_names_en[month-1]}-{year}"
 
+    @staticmethod
+    def _category_names(category_model, category_ids, lang: str) -> Dict[int, str]:
+        categories = category_model.objects.in_bulk([cid for cid in category_ids if cid])
+        return {cid: category.get_display_name(lang) for cid, category in categories.items()}
+
+    @staticmethod
+    def _load_category_month_totals(
+        op_type: str,
+        category_model,
+        profile_id: int,
+        household_id: int | None,
+        start_date: date,
+        end_date: date,
+        months_list: List[Tuple[int, int]],
+        lang: str
+    ) -> Tuple[Dict[Tuple[int, int], Dict[str, float]], Dict[Tuple[int, int], Dict[str, int]]]:
+        """
+        Суммы и количество операций по месяцам и категориям из дневных итогов
+        (~дни × категории строк вместо всех операций за 12 месяцев).
+        """
+        rows = list(
+            daily_totals_queryset(op_type, start_date, end_date, profile=profile_id, household_id=household_id)
+            .values('date__year', 'date__month', 'category_id')
+            .annotate(month_total=Sum('total'), month_count=Sum('count'))
+        )
+        category_names = ExportService._category_names(category_model, {row['category_id'] for row in rows}, lang)
+
+        totals_by_month: Dict[Tuple[int, int], Dict[str, float]] = {m: {} for m in months_list}
+        counts_by_month: Dict[Tuple[int, int], Dict[str, int]] = {m: {} for m in months_list}
+        for row in rows:
+            year_month = (row['date__year'], row['date__month'])
+            if year_month not in totals_by_month:
+                continue
+            category_name = category_names.get(row['category_id'], 'Без категории')
+            totals_by_month[year_month][category_name] = (
+                totals_by_month[year_month].get(category_name, 0) + float(row['month_total'])
+            )
+            counts_by_month[year_month][category_name] = (
+                counts_by_month[year_month].get(category_name, 0) + row['month_count']
+            )
+        return totals_by_month, counts_by_month
+
+    @staticmethod
+    def _load_operations(
+        model,
+        date_field: str,
+        category_model,
+        profile_id: int,
+        household_id: int | None,
+        start_date: date,
+        end_date: date,
+        month_index: Dict[Tuple[int, int], int],
+        lang: str
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Операции (описание+валюта) по месяцам для топ-10.
+
+        В дневных итогах нет описаний, поэтому группировка делается в БД
+        по сырым операциям (от новых месяцев к старым: описание и категория
+        операции берутся из самого свежего месяца).
+        """
+        if household_id:
+            queryset = model.objects.filter(profile__household_id=household_id)
+        else:
+            queryset = model.objects.filter(profile_id=profile_id)
+        rows = list(
+            queryset.filter(**{f'{date_field}__gte': start_date, f'{date_field}__lte': end_date})
+            .values(
+                'description', 'currency', 'profile__currency', 'category_id',
+                f'{date_field}__year', f'{date_field}__month'
+            )
+            .annotate(op_total=Sum('amount'), op_count=Count('id'))
+            .order_by(f'-{date_field}__year', f'-{date_field}__month')
+        )
+        category_names = ExportService._category_names(category_model, {row['category_id'] for row in rows}, lang)
+
+        operations: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in rows:
+            year_month = (row[f'{date_field}__year'], row[f'{date_field}__month'])
+            desc_display = (row['description'] or 'Без описания').strip()
+            desc_norm = desc_display.lower()
+            currency = row['currency'] or row['profile__currency'] or 'RUB'
+            key = (desc_norm, currency)
+            if key not in operations:
+                operations[key] = {
+                    'description': desc_display if desc_display else 'Без описания',
+                    'category': category_names.get(row['category_id'], 'Без категории'),
+                    'currency': currency,
+                    'monthly_totals': [0 for _ in month_index],
+                    'monthly_counts': [0 for _ in month_index],
+                    'total': 0.0,
+                    'count': 0,
+                }
+            op = operations[key]
+            amount = float(row['op_total'])
+            idx = month_index.get(year_month)
+            if idx is not None:
+                op['monthly_totals'][idx] += amount
+                op['monthly_counts'][idx] += row['op_count']
+            op['total'] += amount
+            op['count'] += row['op_count']
+        return operations
+
     @staticmethod
     def _load_12_months_data(
         profile_id: int,
@@ -346,105 +452,19 @@ class ExportService:
         last_day = calendar.monthrange(end_year, end_month)[1]
         end_date = date(end_year, end_month, last_day)
 
-        # Загружаем расходы
-        if household_id:
-            expenses = Expense.objects.filter(
-                profile__household_id=household_id,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).select_related('category', 'profile')
-        else:
-            expenses = Expense.objects.filter(
-                profile_id=profile_id,
-                expense_date__gte=start_date,
-                expense_date__lte=end_date
-            ).select_related('category', 'profile')
-
-        # Группируем расходы по месяцам и категориям + по операциям (описание+валюта)
-        expenses_by_month: Dict[Tuple[int, int], Dict[str, float]] = {m: {} for m in months_list}
-        expenses_counts_by_month: Dict[Tuple[int, int], Dict[str, int]] = {m: {} for m in months_list}
-        expense_operations: Dict[Tuple[str, str], Dict[str, Any]] = {}
-        for expense in expenses:
-            year_month = (expense.expense_date.year, expense.expense_date.month)
-            category_name = expense.category.get_display_name(lang) if expense.category else 'Без категории'
-            if year_month in expenses_by_month:
-                if category_name not in expenses_by_month[year_month]:
-                    expenses_by_month[year_month][category_name] = 0
-                    expenses_counts_by_month[year_month][category_name] = 0
-                expenses_by_month[year_month][category_name] += float(expense.amount)
-                expenses_counts_by_month[year_month][category_name] += 1
-
-            desc_display = (expense.description or 'Без описания').strip()
-            desc_norm = desc_display.lower()
-            expense_currency = expense.currency or expense.profile.currency or 'RUB'
-            key = (desc_norm, expense_currency)
-            if key not in expense_operations:
-                expense_operations[key] = {
-                    'description': desc_display if desc_display else 'Без описания',
-                    'category': category_name,
-                    'currency': expense_currency,
-                    'monthly_totals': [0 for _ in months_list],
-                    'monthly_counts': [0 for _ in months_list],
-                    'total': 0.0,
-                    'count': 0,
-                }
-            op = expense_operations[key]
-            idx = month_index.get(year_month)
-            if idx is not None:
-                op['monthly_totals'][idx] += float(expense.amount)
-                op['monthly_counts'][idx] += 1
-            op['total'] += float(expense.amount)
-            op['count'] += 1
+        expenses_by_month, expenses_counts_by_month = ExportService._load_category_month_totals(
+            DAILY_EXPENSE, ExpenseCategory, profile_id, household_id, start_date, end_date, months_list, lang
+        )
+        incomes_by_month, incomes_counts_by_month = ExportService._load_category_month_totals(
+            DAILY_INCOME, IncomeCategory, profile_id, household_id, start_date, end_date, months_list, lang
+        )
 
-        # Загружаем доходы
-        if household_id:
-            incomes = Income.objects.filter(
-                profile__household_id=household_id,
-                income_date__gte=start_date,
-                income_date__lte=end_date
-            ).select_related('category', 'profile')
-        else:
-            incomes = Income.objects.filter(
-                profile_id=profile_id,
-                income_date__gte=start_date,
-                income_date__lte=end_date
-            ).select_related('category', 'profile')
-
-        # Группируем доходы по месяцам и категориям + по операциям (описание+валюта)
-        incomes_by_month: Dict[Tuple[int, int], Dict[str, float]] = {m: {} for m in months_list}
-        incomes_counts_by_month: Dict[Tuple[int, int], Dict[str, int]] = {m: {} for m in months_list}
-        income_operations: Dict[Tuple[str, str], Dict[str, Any]] = {}
-        for income in incomes:
-            year_month = (income.income_date.year, income.income_date.month)
-            category_name = income.category.get_display_name(lang) if income.category else 'Без категории'
-            if year_month in incomes_by_month:
-                if category_name not in incomes_by_month[year_month]:
-                    incomes_by_month[year_month][category_name] = 0
-                    incomes_counts_by_month[year_month][category_name] = 0
-                incomes_by_month[year_month][category_name] += float(income.amount)
-                incomes_counts_by_month[year_month][category_name] += 1
-
-            desc_display = (income.description or 'Без описания').strip()
-            desc_norm = desc_display.lower()
-            income_currency = income.currency or income.profile.currency or 'RUB'
-            key = (desc_norm, income_currency)
-            if key not in income_operations:
-                income_operations[key] = {
-                    'description': desc_display if desc_display else 'Без описания',
-                    'category': category_name,
-                    'currency': income_currency,
-                    'monthly_totals': [0 for _ in months_list],
-                    'monthly_counts': [0 for _ in months_list],
-                    'total': 0.0,
-                    'count': 0,
-                }
-            op = income_operations[key]
-            idx = month_index.get(year_month)
-            if idx is not None:
-                op['monthly_totals'][idx] += float(income.amount)
-                op['monthly_counts'][idx] += 1
-            op['total'] += float(income.amount)
-            op['count'] += 1
+        expense_operations = ExportService._load_operations(
+            Expense, 'expense_date', ExpenseCategory, profile_id, household_id, start_date, end_date, month_index, lang
+        )
+        income_operations = ExportService._load_operations(
+            Income, 'income_date', IncomeCategory, profile_id, household_id, start_date, end_date, month_index, lang
+        )
 
         return expenses_by_month, incomes_by_month, expenses_counts_by_month, incomes_counts_by_month, months_list, expense_operations, income_operations
 
@@ -8,6 +8,7 @@ from django.db import transaction
 from expenses.models import Profile, Household, FamilyInvite, Expense, Income
 import logging
 from bot.utils.logging_safe import log_safe_id
+from bot.utils.request_context import forget_request_profile
 
 logger = logging.getLogger(__name__)
 
@@ -230,6 +231,8 @@ class HouseholdService:
 
                 # Отвязываем всех участников
                 Profile.objects.filter(household=household).update(household=None)
+                # update() в обход save(): перечитываем профиль в контексте апдейта
+                forget_request_profile(profile.telegram_id)
                 # Деактивируем домохозяйство
                 household.is_active = False
                 household.save()
@@ -8,7 +8,7 @@ from typing import Dict, List, Optional, Any
 
 from asgiref.sync import sync_to_async
 from django.db import transaction
-from django.db.models import Q, Sum, Count
+from django.db.models import Sum, Count
 from django.utils import timezone
 
 from expenses.models import Income, IncomeCategory, Profile
@@ -28,6 +28,8 @@ from bot.utils.category_validators import (
 from bot.utils.language import get_text
 from bot.utils.emoji_utils import EMOJI_PREFIX_RE
 from bot.utils.logging_safe import log_safe_id, summarize_text
+from bot.utils.text_similarity import best_match
+from bot.services.description_index import INCOME as INCOME_INDEX, get_description_index_sync
 
 # Предзагрузка Celery задач для устранения "холодного старта"
 # Импортируем заранее, чтобы при первом вызове не было задержки 6+ секунд
@@ -730,13 +732,16 @@ def delete_income(
     try:
         profile = get_or_create_user_profile_sync(telegram_id)
         
+        from expenses.signals import operations_deleted
+
         # Удаляем доход
-        deleted_count, _ = Income.objects.filter(
-            id=income_id,
-            profile=profile
-        ).delete()
+        income = Income.objects.filter(id=income_id, profile=profile).first()
+        if income is not None:
+            with transaction.atomic():
+                income.delete()
+                operations_deleted('income', [income])
         
-        if deleted_count > 0:
+        if income is not None:
             logger.info("Deleted income %s for %s", income_id, log_safe_id(telegram_id, "user"))
             return True
         else:
@@ -1058,54 +1063,73 @@ def find_similar_incomes(
     try:
         profile = get_or_create_user_profile_sync(telegram_id)
         
-        # Определяем период поиска
-        end_date = timezone.now().date()
+        # Определяем период поиска в локальной дате, как и индекс описаний
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days_back)
         
-        # Поиск похожих доходов
-        similar_incomes = Income.objects.filter(
-            profile=profile,
-            income_date__gte=start_date,
-            income_date__lte=end_date
-        )
+        # Сравниваем с уникальными описаниями из индекса, а не с каждым доходом
+        index = get_description_index_sync(profile, INCOME_INDEX, days_back)
         
-        # Фильтруем по описанию
+        # Фильтруем по описанию: подстрока или похожее слово (опечатки, окончания)
+        SIMILARITY_THRESHOLD = 0.85
+        search_words = []
         if description:
-            words = description.lower().split()
-            q_filter = Q()
-            for word in words:
-                if len(word) >= 3:  # Игнорируем короткие слова
-                    q_filter |= Q(description__icontains=word)
-            
-            if q_filter:
-                similar_incomes = similar_incomes.filter(q_filter)
+            # Игнорируем короткие слова
+            search_words = [word for word in description.lower().split() if len(word) >= 3]
+
+        # Опечатки ищем только среди последних описаний, подстроку — среди всех
+        fuzzy_keys = index.fuzzy_candidates() if search_words else set()
+
+        def matches_description(key, entry) -> bool:
+            if not search_words:
+                return True
+            income_description = entry.description.lower()
+            if not income_description:
+                return False
+            if any(word in income_description for word in search_words):
+                return True
+            return key in fuzzy_keys and any(
+                best_match(word, entry.words, SIMILARITY_THRESHOLD) for word in search_words
+            )
         
         # Группируем по уникальным суммам
         user_lang = profile.language_code or 'ru'
         unique_amounts = {}
-        for income in similar_incomes.select_related('category'):
-            amount_key = f"{income.amount}_{income.currency}"
-            if amount_key not in unique_amounts:
-                unique_amounts[amount_key] = {
-                    'amount': float(income.amount),
-                    'currency': income.currency,
-                    'category': get_category_display_name(income.category, user_lang) if income.category else None,
-                    'description': income.description,
-                    'count': 1,
-                    'last_date': income.income_date
-                }
-            else:
-                unique_amounts[amount_key]['count'] += 1
-                if income.income_date > unique_amounts[amount_key]['last_date']:
-                    unique_amounts[amount_key]['last_date'] = income.income_date
-                    unique_amounts[amount_key]['description'] = income.description
+        for key, entry in list(index.entries.items()):
+            if not matches_description(key, entry):
+                continue
+            for (amount, currency, category_id), count, last_stamp in entry.stats(start_date, end_date):
+                amount_key = (amount, currency)
+                if amount_key not in unique_amounts:
+                    unique_amounts[amount_key] = {
+                        'amount': float(amount),
+                        'currency': currency,
+                        'category_id': category_id,
+                        'description': entry.description,
+                        'count': count,
+                        'last_stamp': last_stamp
+                    }
+                else:
+                    unique_amounts[amount_key]['count'] += count
+                    if last_stamp > unique_amounts[amount_key]['last_stamp']:
+                        unique_amounts[amount_key]['last_stamp'] = last_stamp
+                        unique_amounts[amount_key]['category_id'] = category_id
+                        unique_amounts[amount_key]['description'] = entry.description
         
         # Сортируем по дате последнего использования (последний доход первым)
         sorted_amounts = sorted(
             unique_amounts.values(),
-            key=lambda x: x['last_date'],
+            key=lambda x: x['last_stamp'],
             reverse=True
         )[:5]
+
+        # Категория и описание - как у последнего дохода с этой суммой
+        category_ids = {item['category_id'] for item in sorted_amounts if item['category_id']}
+        categories = IncomeCategory.objects.in_bulk(category_ids) if category_ids else {}
+        for item in sorted_amounts:
+            category = categories.get(item.pop('category_id'))
+            item['category'] = get_category_display_name(category, user_lang) if category else None
+            item['last_date'] = item.pop('last_stamp')[0]
         
         return sorted_amounts
         
@@ -1376,12 +1400,17 @@ def delete_income_category(telegram_id: int, category_id: int) -> bool:
         has_incomes = Income.objects.filter(category=category).exists()
         
         if has_incomes:
-            # Мягкое удаление - просто деактивируем
-            category.is_active = False
-            category.save()
-            
-            # Убираем категорию у всех связанных доходов
-            Income.objects.filter(category=category).update(category=None)
+            from expenses.signals import operations_category_cleared
+
+            with transaction.atomic():
+                # Мягкое удаление - просто деактивируем
+                category.is_active = False
+                category.save()
+
+                # Убираем категорию у всех связанных доходов (update без сигналов:
+                # итоги и счётчики переносим явно)
+                operations_category_cleared('income', category)
+                Income.objects.filter(category=category).update(category=None)
         else:
             # Если нет связанных доходов, удаляем полностью
             category.delete()
@@ -7,6 +7,7 @@ from asgiref.sync import sync_to_async
 
 from expenses.models import IncomeCategory, Income, IncomeCategoryKeyword, Profile
 from .ai_selector import get_service, get_fallback_chain, AISelector
+from .keyword_usage import INCOME, record_keyword_usage
 from bot.utils.category_helpers import get_category_display_name
 from bot.utils.income_category_definitions import (
     get_income_category_display_name as get_income_category_display_for_key,
@@ -267,9 +268,8 @@ def find_category_by_keywords(text: str, profile: Profile) -> Optional[IncomeCat
         matched, match_type = match_keyword_in_text(keyword_obj.keyword, text)
         if matched:
             # Нашли совпадение! Благодаря строгой уникальности это единственная категория с этим словом
-            # Обновляем статистику использования
-            keyword_obj.usage_count += 1
-            keyword_obj.save(update_fields=['usage_count', 'last_used'])  # last_used обновится auto_now
+            # Обновляем статистику использования (буфер, flush задачей Celery)
+            record_keyword_usage(keyword_obj.id, kind=INCOME)
 
             logger.info(
                 "[INCOME KEYWORD MATCH] %s: keyword=%s text=%s",
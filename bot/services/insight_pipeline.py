@@ -0,0 +1,191 @@
+"""
+Пакетная генерация месячных AI-инсайтов с распределением по воркерам.
+
+generate_monthly_insights (beat, 1-го числа) выбирает профили без инсайта
+за период и ставит задачи generate_monthly_insights_chunk по
+INSIGHTS_CHUNK_SIZE профилей. Внутри чанка инсайты генерируются
+параллельно. ProviderLimits ограничивает запросы к каждому провайдеру
+(в т.ч. к резервным из fallback-цепочки): частота — общим для всех
+воркеров token bucket в Redis под лимит API провайдера (запросов в
+минуту), одновременные запросы внутри воркера — семафором.
+Повторы запросов к AI идут с jitter-паузой (MonthlyInsightsService).
+
+Контрольная точка — сама строка MonthlyInsight: она сохраняется сразу
+после генерации инсайта пользователя, а выборка и чанк пропускают
+профили, у которых она уже есть. После падения воркера или повторного
+запуска задачи обрабатываются только оставшиеся пользователи.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from bot.utils.fanout import BatchProgress
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, RedisBucketStore, TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+INSIGHTS_CHUNK_SIZE = 50
+
+# Одновременных запросов к провайдеру в одном воркере (под лимиты API).
+# Переопределяется переменной окружения AI_INSIGHTS_CONCURRENCY_<PROVIDER>
+DEFAULT_PROVIDER_CONCURRENCY = {
+    'deepseek': 8,
+    'openai': 8,
+    'google': 4,
+    'qwen': 4,
+    'openrouter': 4,
+}
+FALLBACK_PROVIDER_CONCURRENCY = 2
+
+# Запросов в минуту к провайдеру со всех воркеров вместе (лимиты API).
+# Переопределяется переменной окружения AI_INSIGHTS_RPM_<PROVIDER>
+DEFAULT_PROVIDER_RATE_LIMITS = {
+    'deepseek': 60,
+    'openai': 60,
+    'google': 30,
+    'qwen': 60,
+    'openrouter': 20,
+}
+FALLBACK_PROVIDER_RATE_LIMIT = 10
+
+AI_INSIGHTS_SUBJECT = 'ai_insights'
+
+VALID_PROVIDERS = {'google', 'openai', 'deepseek', 'qwen', 'openrouter'}
+
+GENERATED = 'generated'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+def get_insights_provider() -> str:
+    """Основной провайдер инсайтов из окружения (по умолчанию deepseek)"""
+    provider = (os.getenv('AI_PROVIDER_INSIGHTS') or os.getenv('AI_PROVIDER_DEFAULT') or 'deepseek').lower()
+    if provider not in VALID_PROVIDERS:
+        logger.warning(f"Unknown AI provider for insights: {provider}, falling back to deepseek")
+        provider = 'deepseek'
+    return provider
+
+
+def _with_env_overrides(defaults: Dict[str, int], env_prefix: str) -> Dict[str, int]:
+    values = dict(defaults)
+    for provider in values:
+        override = os.getenv(f'{env_prefix}_{provider.upper()}')
+        if override:
+            values[provider] = int(override)
+    return values
+
+
+def create_insights_limiter() -> TokenBucketLimiter:
+    """Лимитер запросов к AI, общий для всех воркеров (локальный при недоступности Redis)"""
+    return TokenBucketLimiter(RedisBucketStore(fallback=LocalBucketStore(max_subjects=len(VALID_PROVIDERS))))
+
+
+class ProviderLimits:
+    """
+    Лимиты запросов к AI провайдерам.
+
+    slot(provider) пропускает запрос, когда в ведре провайдера есть токен
+    (limiter — общий для всех воркеров, create_insights_limiter) и в воркере
+    свободен семафор провайдера. Семафоры создаются в работающем event loop
+    при первом запросе.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        rate_limits: Optional[Dict[str, int]] = None,
+        limiter: Optional[TokenBucketLimiter] = None,
+    ):
+        self.limits = _with_env_overrides(DEFAULT_PROVIDER_CONCURRENCY, 'AI_INSIGHTS_CONCURRENCY')
+        self.limits.update(limits or {})
+        self.rate_limits = _with_env_overrides(DEFAULT_PROVIDER_RATE_LIMITS, 'AI_INSIGHTS_RPM')
+        self.rate_limits.update(rate_limits or {})
+        self.limiter = limiter if limiter is not None else TokenBucketLimiter()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def limit(self, provider: str) -> int:
+        return max(1, self.limits.get(provider, FALLBACK_PROVIDER_CONCURRENCY))
+
+    def bucket(self, provider: str) -> Bucket:
+        """Ведро провайдера: rate_limit запросов в минуту"""
+        rate_limit = max(1, self.rate_limits.get(provider, FALLBACK_PROVIDER_RATE_LIMIT))
+        return Bucket.per_window(provider, rate_limit, 60)
+
+    @asynccontextmanager
+    async def slot(self, provider: str):
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            semaphore = self._semaphores[provider] = asyncio.Semaphore(self.limit(provider))
+        async with semaphore:
+            await self.limiter.wait(f"{AI_INSIGHTS_SUBJECT}:{provider}", (self.bucket(provider),))
+            yield
+
+
+def insight_progress(year: int, month: int) -> BatchProgress:
+    return BatchProgress(f"monthly_insights:{year}-{month:02d}")
+
+
+def pending_insight_profile_ids(year: int, month: int, month_start: date, month_end: date) -> List[int]:
+    """Профили с тратами за период, у которых ещё нет инсайта"""
+    from expenses.models import Expense, MonthlyInsight
+
+    done = MonthlyInsight.objects.filter(year=year, month=month).values('profile_id')
+    return list(
+        Expense.objects.filter(expense_date__gte=month_start, expense_date__lte=month_end)
+        .exclude(profile_id__in=done)
+        .order_by('profile_id')
+        .values_list('profile_id', flat=True)
+        .distinct()
+    )
+
+
+async def generate_insights_chunk(
+    profiles: Sequence,
+    year: int,
+    month: int,
+    provider: str,
+    limits: ProviderLimits,
+    service_factory=None,
+) -> Counter:
+    """
+    Генерирует инсайты профилям чанка параллельно.
+
+    У каждого профиля свой MonthlyInsightsService: сервис хранит текущего
+    провайдера и переключает его при fallback. Общий только ProviderLimits.
+
+    Returns:
+        Counter статусов GENERATED / SKIPPED / FAILED
+    """
+    if service_factory is None:
+        from bot.services.monthly_insights import MonthlyInsightsService
+
+        def service_factory():
+            return MonthlyInsightsService(provider_limits=limits)
+
+    # Сверх лимита провайдера задачи только ждут семафор — не держим их все сразу
+    gate = asyncio.Semaphore(limits.limit(provider) * 2)
+
+    async def generate(profile) -> str:
+        async with gate:
+            try:
+                insight = await service_factory().generate_insight(
+                    profile=profile,
+                    year=year,
+                    month=month,
+                    provider=provider,
+                    force_regenerate=False,
+                )
+            except Exception as e:
+                logger.error(f"Error generating insight for user {profile.telegram_id}: {e}")
+                return FAILED
+            if insight:
+                logger.info(f"Generated insight for user {profile.telegram_id} for {month}/{year}")
+                return GENERATED
+            logger.info(f"Skipped insight for user {profile.telegram_id} (insufficient data)")
+            return SKIPPED
+
+    return Counter(await asyncio.gather(*(generate(profile) for profile in profiles)))
@@ -0,0 +1,160 @@
+"""
+Буферизованный учёт использования keywords (usage_count / last_used).
+
+Раньше каждое совпадение keyword в парсере делало синхронный
+UPDATE ... SET usage_count = usage_count + 1 прямо в обработчике сообщения.
+Теперь совпадения копятся в Redis (HINCRBY + HSET), а периодическая задача
+Celery flush_keyword_usage переносит их в БД пачками.
+
+Надёжность flush:
+1. Lua-скрипт атомарно переименовывает "живые" хеши в ":flushing".
+   Новые совпадения в это время пишутся в новый "живой" хеш.
+2. Если ":flushing" уже существует (прошлый flush упал), сначала
+   дообрабатывается он — данные не теряются.
+3. ":flushing" удаляется только после коммита транзакции в БД.
+   Если процесс упадёт между коммитом и удалением, пачка применится
+   повторно (at-least-once) — для статистики это допустимо.
+
+Если Redis недоступен, используется прежний прямой UPDATE через F().
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_USAGE_KEY_PREFIX = 'keyword_usage'
+FLUSH_BATCH_SIZE = 500
+
+EXPENSE = 'expense'
+INCOME = 'income'
+
+# KEYS: counts, last_used, counts:flushing, last_used:flushing
+# Возвращает 1, если есть пачка для обработки
+_CLAIM_BATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('RENAME', KEYS[1], KEYS[3])
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[4])
+    end
+end
+return 1
+"""
+
+
+def _get_keyword_model(kind: str):
+    from expenses.models import CategoryKeyword, IncomeCategoryKeyword
+
+    return IncomeCategoryKeyword if kind == INCOME else CategoryKeyword
+
+
+def _keys(kind: str):
+    base = f"{KEYWORD_USAGE_KEY_PREFIX}:{kind}"
+    return (
+        f"{base}:counts",
+        f"{base}:last_used",
+        f"{base}:counts:flushing",
+        f"{base}:last_used:flushing",
+    )
+
+
+def _get_connection():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def record_keyword_usage(keyword_id: int, kind: str = EXPENSE) -> None:
+    """
+    Учитывает одно использование keyword.
+
+    Args:
+        keyword_id: ID CategoryKeyword или IncomeCategoryKeyword
+        kind: EXPENSE или INCOME
+    """
+    counts_key, last_used_key, _, _ = _keys(kind)
+    now = timezone.now()
+    try:
+        pipe = _get_connection().pipeline(transaction=True)
+        pipe.hincrby(counts_key, keyword_id, 1)
+        pipe.hset(last_used_key, keyword_id, now.timestamp())
+        pipe.execute()
+        return
+    except Exception as e:
+        logger.debug(f"Keyword usage buffer unavailable, writing directly: {e}")
+
+    # Fallback: прямой атомарный апдейт (при .update() auto_now не срабатывает)
+    _get_keyword_model(kind).objects.filter(id=keyword_id).update(
+        usage_count=F('usage_count') + 1,
+        last_used=now,
+    )
+
+
+arecord_keyword_usage = sync_to_async(record_keyword_usage)
+
+
+def apply_keyword_usage(kind: str, counts: Dict[int, int], last_used: Dict[int, datetime]) -> int:
+    """
+    Применяет накопленные счётчики пачками UPDATE ... CASE WHEN.
+
+    Returns:
+        Количество обновлённых строк
+    """
+    model = _get_keyword_model(kind)
+    keyword_ids = sorted(counts)
+    updated = 0
+    now = timezone.now()
+
+    with transaction.atomic():
+        for start in range(0, len(keyword_ids), FLUSH_BATCH_SIZE):
+            batch = keyword_ids[start:start + FLUSH_BATCH_SIZE]
+            updated += model.objects.filter(id__in=batch).update(
+                usage_count=F('usage_count') + Case(
+                    *[When(id=keyword_id, then=Value(counts[keyword_id])) for keyword_id in batch],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                last_used=Case(
+                    *[When(id=keyword_id, then=Value(last_used.get(keyword_id, now))) for keyword_id in batch],
+                    default=F('last_used'),
+                    output_field=DateTimeField(),
+                ),
+            )
+    return updated
+
+
+def flush_keyword_usage(kind: str = EXPENSE) -> int:
+    """
+    Переносит буфер из Redis в БД.
+
+    Returns:
+        Количество обновлённых keywords
+    """
+    counts_key, last_used_key, counts_flushing, last_used_flushing = _keys(kind)
+    conn = _get_connection()
+
+    if not conn.eval(_CLAIM_BATCH_SCRIPT, 4, counts_key, last_used_key, counts_flushing, last_used_flushing):
+        return 0
+
+    raw_counts = conn.hgetall(counts_flushing)
+    raw_last_used = conn.hgetall(last_used_flushing)
+
+    counts = {int(keyword_id): int(count) for keyword_id, count in raw_counts.items()}
+    last_used = {
+        int(keyword_id): datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+        for keyword_id, ts in raw_last_used.items()
+    }
+
+    updated = apply_keyword_usage(kind, counts, last_used) if counts else 0
+    conn.delete(counts_flushing, last_used_flushing)
+
+    logger.info(f"Flushed keyword usage ({kind}): {len(counts)} buffered, {updated} updated")
+    return updated
@@ -4,16 +4,19 @@ Service for generating AI-powered monthly insights about user's expenses
 import logging
 import asyncio
 import json
+import random
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, Any, Optional, List
-from django.db.models import Sum, Count, Q, Avg
+from django.db.models import Sum, Q, Avg
 from django.utils import timezone
 from expenses.models import (
     Profile, Expense, Income, MonthlyInsight,
     ExpenseCategory, IncomeCategory, UserSettings
 )
 from bot.utils.logging_safe import log_safe_id
+from bot.services.daily_totals import EXPENSE as DAILY_EXPENSE, INCOME as DAILY_INCOME, daily_totals_queryset
 from .ai_selector import get_service, get_model, get_provider_settings, get_fallback_chain
 from bot.utils.formatters import format_currency
 
@@ -24,15 +27,31 @@ _last_fallback_notification = {}
 _last_failure_notification = {}
 NOTIFICATION_THROTTLE_HOURS = 1  # Only notify once per hour
 
+# Пауза перед повтором запроса к AI: случайная в [0, base * 2**попытка) секунд
+AI_RETRY_BACKOFF_SECONDS = 2.0
+
 
 class MonthlyInsightsService:
     """Service for generating monthly financial insights using AI"""
 
-    def __init__(self):
-        """Initialize the service"""
+    def __init__(self, provider_limits=None):
+        """
+        Initialize the service
+
+        Args:
+            provider_limits: ProviderLimits (bot/services/insight_pipeline.py) —
+                ограничение частоты и одновременных запросов к каждому AI провайдеру
+                при пакетной генерации
+        """
         self.ai_service = None
         self.ai_provider = None
         self.ai_model = None
+        self.provider_limits = provider_limits
+
+    def _provider_slot(self, provider: str):
+        if self.provider_limits is None:
+            return nullcontext()
+        return self.provider_limits.slot(provider)
 
     def _initialize_ai(self, provider: str = 'deepseek'):
         """Initialize AI service based on provider"""
@@ -226,54 +245,29 @@ class MonthlyInsightsService:
         current_date = datetime(year, month, 1).date()
         start_date = current_date - relativedelta(months=months_back)
 
-        def expense_filters():
-            filters: Dict[str, object] = {
-                "expense_date__gte": start_date,
-                "expense_date__lt": current_date,
-                "currency": primary_currency
-            }
-            if household_mode and getattr(profile, 'household', None):
-                filters["profile__household"] = profile.household
-            else:
-                filters["profile"] = profile
-            return filters
-
-        def income_filters():
-            filters: Dict[str, object] = {
-                "income_date__gte": start_date,
-                "income_date__lt": current_date,
-                "currency": primary_currency
-            }
-            if household_mode and getattr(profile, 'household', None):
-                filters["profile__household"] = profile.household
-            else:
-                filters["profile"] = profile
-            return filters
-
-        expenses_data = await asyncio.to_thread(
-            lambda: list(
-                Expense.objects.filter(**expense_filters())
-                .values('expense_date__year', 'expense_date__month')
-                .annotate(total=Sum('amount'), count=Count('id'))
-            )
-        )
+        household_id = profile.household_id if household_mode else None
 
-        incomes_data = await asyncio.to_thread(
-            lambda: list(
-                Income.objects.filter(**income_filters())
-                .values('income_date__year', 'income_date__month')
-                .annotate(total=Sum('amount'), count=Count('id'))
+        def monthly_totals(op_type: str) -> Dict[tuple, Dict[str, Any]]:
+            # Дневные итоги вместо скана всех операций за полгода
+            rows = (
+                daily_totals_queryset(
+                    op_type, start_date, current_date - timedelta(days=1),
+                    profile=profile, household_id=household_id
+                )
+                .filter(currency=primary_currency)
+                .values('date__year', 'date__month')
+                .annotate(month_total=Sum('total'), month_count=Sum('count'))
             )
-        )
+            return {
+                (item['date__year'], item['date__month']): {
+                    'total': item['month_total'],
+                    'count': item['month_count'],
+                }
+                for item in rows
+            }
 
-        expenses_by_month = {
-            (item['expense_date__year'], item['expense_date__month']): item
-            for item in expenses_data
-        }
-        incomes_by_month = {
-            (item['income_date__year'], item['income_date__month']): item
-            for item in incomes_data
-        }
+        expenses_by_month = await asyncio.to_thread(monthly_totals, DAILY_EXPENSE)
+        incomes_by_month = await asyncio.to_thread(monthly_totals, DAILY_INCOME)
 
         historical_data: List[Dict[str, Any]] = []
         for i in range(1, months_back + 1):
@@ -629,16 +623,19 @@ IMPORTANT:
                     )
                     self.ai_service = None
                     self._initialize_ai(provider)
+                    # Jitter: параллельные запросы, упавшие на rate limit, не повторяются разом
+                    await asyncio.sleep(random.uniform(0, AI_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)))
 
                 # Call AI service with function calling disabled
                 # (insights generation requires JSON response, not function calls)
-                response = await self.ai_service.chat(
-                    message=prompt,
-                    context=[],
-                    user_context={'user_id': profile.telegram_id},
-                    disable_functions=True,  # IMPORTANT: Skip function calling for JSON response
-                    timeout=60.0  # Increased timeout for large prompts with historical data
-                )
+                async with self._provider_slot(provider):
+                    response = await self.ai_service.chat(
+                        message=prompt,
+                        context=[],
+                        user_context={'user_id': profile.telegram_id},
+                        disable_functions=True,  # IMPORTANT: Skip function calling for JSON response
+                        timeout=60.0  # Increased timeout for large prompts with historical data
+                    )
 
                 # Check if response is an error message
                 error_phrases = [
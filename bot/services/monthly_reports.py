@@ -0,0 +1,112 @@
+"""
+Рассылка месячных отчётов с распределением по воркерам.
+
+send_monthly_reports (beat, 1-го числа) только выбирает получателей
+и ставит задачи send_monthly_reports_chunk по REPORTS_CHUNK_SIZE профилей.
+Каждый чанк отправляет отчёты параллельно (не больше REPORTS_CONCURRENCY
+одновременно), а сами сообщения проходят через общий для всех воркеров
+token bucket в Redis (~25 сообщений/с — лимит Telegram на массовые
+рассылки одного бота).
+
+Повторный запуск безопасен: получатели с записью MonthlyReportLog за
+период отсеиваются ещё при выборке, а NotificationService дополнительно
+проверяет журнал перед отправкой. Прогресс (sent/skipped/retry/failed/
+remaining) лежит в BatchProgress и пишется в лог после каждого чанка.
+"""
+import asyncio
+import logging
+from calendar import monthrange
+from collections import Counter
+from datetime import date
+from typing import Callable, List, Sequence, Tuple
+
+from bot.utils.fanout import BatchProgress
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, RedisBucketStore, TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+REPORTS_CHUNK_SIZE = 100
+REPORTS_CONCURRENCY = 8
+
+TELEGRAM_SEND_SUBJECT = 'telegram_bulk_send'
+TELEGRAM_SEND_BUCKETS = (Bucket.per_window('telegram_send', 25, 1),)
+
+SENT = 'sent'
+SKIPPED = 'skipped'
+RETRY = 'retry'
+FAILED = 'failed'
+
+
+def previous_month_period(today: date) -> Tuple[int, int, date, date]:
+    """(год, месяц, первый день, последний день) предыдущего месяца"""
+    if today.month == 1:
+        year, month = today.year - 1, 12
+    else:
+        year, month = today.year, today.month - 1
+    return year, month, date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def report_progress(year: int, month: int) -> BatchProgress:
+    return BatchProgress(f"monthly_reports:{year}-{month:02d}")
+
+
+def pending_report_profile_ids(year: int, month: int, month_start: date, month_end: date) -> List[int]:
+    """Профили с тратами за период, которым отчёт ещё не отправлен"""
+    from expenses.models import Expense, MonthlyReportLog
+
+    delivered = MonthlyReportLog.objects.filter(year=year, month=month).values('profile_id')
+    return list(
+        Expense.objects.filter(expense_date__gte=month_start, expense_date__lte=month_end)
+        .exclude(profile_id__in=delivered)
+        .order_by('profile_id')
+        .values_list('profile_id', flat=True)
+        .distinct()
+    )
+
+
+def create_send_limiter() -> TokenBucketLimiter:
+    """Лимитер отправки, общий для всех воркеров (локальный при недоступности Redis)"""
+    return TokenBucketLimiter(RedisBucketStore(fallback=LocalBucketStore(max_subjects=1)))
+
+
+def create_send_throttle(limiter: TokenBucketLimiter):
+    async def throttle():
+        await limiter.wait(TELEGRAM_SEND_SUBJECT, TELEGRAM_SEND_BUCKETS)
+    return throttle
+
+
+async def send_reports_chunk(
+    service,
+    profiles: Sequence,
+    year: int,
+    month: int,
+    handle_error: Callable[[object, Exception], str],
+    concurrency: int = REPORTS_CONCURRENCY,
+) -> Counter:
+    """
+    Отправляет отчёты профилям чанка, не больше concurrency одновременно.
+
+    Args:
+        service: NotificationService (с send_throttle для общего лимита)
+        handle_error: (profile, ошибка) -> RETRY или FAILED
+
+    Returns:
+        Counter статусов SENT / SKIPPED / RETRY / FAILED
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(profile) -> str:
+        async with semaphore:
+            try:
+                sent = await service.send_monthly_report_notification(
+                    profile.telegram_id,
+                    profile,
+                    year,
+                    month,
+                    attempt=1,
+                )
+            except Exception as e:
+                return handle_error(profile, e)
+            return SENT if sent else SKIPPED
+
+    return Counter(await asyncio.gather(*(send(profile) for profile in profiles)))
@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from decimal import Decimal
 
 from aiogram import Bot
@@ -18,8 +18,10 @@ logger = logging.getLogger(__name__)
 
 
 class NotificationService:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, send_throttle: Optional[Callable[[], Awaitable[None]]] = None):
         self.bot = bot
+        # Ожидание общего лимита отправки при массовых рассылках (см. monthly_reports)
+        self.send_throttle = send_throttle
         
     async def send_monthly_report_notification(
         self,
@@ -197,6 +199,8 @@ class NotificationService:
             return False
 
         try:
+            if self.send_throttle is not None:
+                await self.send_throttle()
             # Let Telegram exceptions bubble up so Celery can decide retry strategy.
             await self.bot.send_message(
                 chat_id=user_id,
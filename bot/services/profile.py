@@ -14,6 +14,7 @@ from bot.constants import (
     get_default_currency_for_language,
 )
 from bot.utils.logging_safe import log_safe_id
+from bot.utils.request_context import get_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,10 @@ def get_user_settings(telegram_id: int) -> UserSettings:
     Returns:
         UserSettings instance
     """
+    context = get_request_context(telegram_id)
+    if context is not None and context.get_settings_sync() is not None:
+        return context.get_settings_sync()
+
     try:
         profile = Profile.objects.get(telegram_id=telegram_id)
         if not hasattr(profile, 'settings'):
@@ -106,6 +111,11 @@ def get_or_create_profile(telegram_id: int, **user_data) -> Profile:
         language_code = user_data.get('language_code', DEFAULT_LANGUAGE_CODE)[:2]
         default_currency = get_default_currency_for_language(language_code)
         
+        context = get_request_context(telegram_id)
+        if context is not None and context.profile is not None and context.get_settings_sync() is not None:
+            # Профиль и настройки уже загружены для текущего апдейта
+            return context.profile
+        
         profile, created = Profile.objects.get_or_create(
             telegram_id=telegram_id,
             defaults={
@@ -160,6 +170,9 @@ def get_profile_settings(telegram_id: int) -> UserSettings:
         UserSettings instance
     """
     try:
+        context = get_request_context(telegram_id)
+        if context is not None and context.get_settings_sync() is not None:
+            return context.get_settings_sync()
         profile = Profile.objects.get(telegram_id=telegram_id)
         return profile.settings
     except Profile.DoesNotExist:
@@ -0,0 +1,205 @@
+"""
+Буферизованная запись Profile.last_activity.
+
+Обработчик апдейта не пишет в PostgreSQL: время активности кладётся
+в Redis (ZADD в два sorted set'а: telegram_id -> unix time):
+
+- profile_activity:last_seen — последняя активность всех пользователей
+  за RETENTION_DAYS. Из него админка считает "активны сегодня/вчера/за
+  неделю" (count_active_profiles) без запросов к users_profile;
+- profile_activity:pending — кто был активен с прошлого flush.
+
+Пока last_seen не заполнен из БД (метка profile_activity:seeded ставится
+первым flush), админка считает по Profile.last_activity.
+
+Celery-задача flush_profile_activity раз в минуту атомарно забирает
+pending (Lua RENAME в ':flushing', как в keyword_usage) и пишет
+last_activity пачками: на PostgreSQL — один UPDATE ... FROM (VALUES ...)
+на пачку, на SQLite — UPDATE ... CASE WHEN. ':flushing' удаляется только
+после коммита, оставшаяся от упавшего flush пачка применяется первой.
+
+Если Redis недоступен, используется прямой UPDATE (update_profile_activity),
+а следующая попытка обратиться к Redis — не раньше чем через
+REDIS_RETRY_SECONDS.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Optional
+
+from django.db import connections, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = 'profile_activity:last_seen'
+PENDING_KEY = 'profile_activity:pending'
+FLUSHING_KEY = f'{PENDING_KEY}:flushing'
+# Метка: last_seen заполнен из БД (после первого деплоя или потери данных Redis)
+SEEDED_KEY = 'profile_activity:seeded'
+
+RETENTION_DAYS = 8
+FLUSH_BATCH_SIZE = 1000
+REDIS_RETRY_SECONDS = 30
+
+# KEYS: pending, flushing. Возвращает 1, если есть пачка для обработки
+_CLAIM_BATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return 1
+"""
+
+_retry_at = 0.0
+
+
+def _get_connection():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _redis_failed(error: Exception) -> None:
+    global _retry_at
+    logger.warning(f"Profile activity buffer unavailable: {error}")
+    _retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+def record_profile_activity(telegram_id: int, now: Optional[datetime] = None) -> bool:
+    """
+    Записывает активность пользователя в Redis.
+
+    Returns:
+        False, если Redis недоступен и нужно писать в БД напрямую
+    """
+    if time.monotonic() < _retry_at:
+        return False
+    timestamp = (now or timezone.now()).timestamp()
+    try:
+        pipe = _get_connection().pipeline(transaction=False)
+        pipe.zadd(LAST_SEEN_KEY, {telegram_id: timestamp})
+        pipe.zadd(PENDING_KEY, {telegram_id: timestamp})
+        pipe.execute()
+        return True
+    except Exception as e:
+        _redis_failed(e)
+        return False
+
+
+def count_active_profiles(since: datetime, until: Optional[datetime] = None) -> Optional[int]:
+    """
+    Количество пользователей, последняя активность которых в [since, until).
+
+    Returns:
+        None, если Redis недоступен (считать по Profile.last_activity)
+    """
+    try:
+        conn = _get_connection()
+        if not conn.exists(SEEDED_KEY):
+            return None
+        maximum = f'({until.timestamp()}' if until is not None else '+inf'
+        return conn.zcount(LAST_SEEN_KEY, since.timestamp(), maximum)
+    except Exception as e:
+        logger.warning(f"Cannot count active profiles in Redis: {e}")
+        return None
+
+
+def _apply_postgres(batch, activity: Dict[int, datetime]) -> int:
+    from expenses.models import Profile
+
+    table = Profile._meta.db_table
+    values_sql = ', '.join(['(%s::bigint, %s::timestamptz)'] * len(batch))
+    params = []
+    for telegram_id in batch:
+        params.extend((telegram_id, activity[telegram_id]))
+    sql = (
+        f'UPDATE "{table}" AS p SET last_activity = v.last_activity '
+        f'FROM (VALUES {values_sql}) AS v(telegram_id, last_activity) '
+        f'WHERE p.telegram_id = v.telegram_id '
+        f'AND (p.last_activity IS NULL OR p.last_activity < v.last_activity)'
+    )
+    with connections[Profile.objects.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _apply_generic(batch, activity: Dict[int, datetime]) -> int:
+    from expenses.models import Profile
+
+    return Profile.objects.filter(telegram_id__in=batch).update(
+        last_activity=Case(
+            *[When(telegram_id=telegram_id, then=Value(activity[telegram_id])) for telegram_id in batch],
+            output_field=DateTimeField(),
+        ),
+    )
+
+
+def apply_profile_activity(activity: Dict[int, datetime]) -> int:
+    """
+    Записывает last_activity пачками (время не откатывается назад на PostgreSQL).
+
+    Returns:
+        Количество обновлённых профилей
+    """
+    from expenses.models import Profile
+
+    telegram_ids = sorted(activity)
+    is_postgres = connections[Profile.objects.db].vendor == 'postgresql'
+    apply_batch = _apply_postgres if is_postgres else _apply_generic
+    updated = 0
+
+    with transaction.atomic():
+        for start in range(0, len(telegram_ids), FLUSH_BATCH_SIZE):
+            updated += apply_batch(telegram_ids[start:start + FLUSH_BATCH_SIZE], activity)
+    return updated
+
+
+def seed_last_seen(conn) -> int:
+    """Заполняет last_seen из Profile.last_activity, не перезаписывая более свежие значения"""
+    from expenses.models import Profile
+
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    rows = Profile.objects.filter(last_activity__gte=cutoff).values_list('telegram_id', 'last_activity')
+    seeded = 0
+    pipe = conn.pipeline(transaction=False)
+    for telegram_id, last_activity in rows.iterator(chunk_size=FLUSH_BATCH_SIZE):
+        pipe.zadd(LAST_SEEN_KEY, {telegram_id: last_activity.timestamp()}, nx=True)
+        seeded += 1
+        if seeded % FLUSH_BATCH_SIZE == 0:
+            pipe.execute()
+    pipe.set(SEEDED_KEY, 1)
+    pipe.execute()
+    logger.info(f"Seeded profile activity from DB: {seeded} profiles")
+    return seeded
+
+
+def flush_profile_activity() -> int:
+    """
+    Переносит накопленную активность из Redis в Profile.last_activity.
+
+    Returns:
+        Количество обновлённых профилей
+    """
+    conn = _get_connection()
+    if not conn.exists(SEEDED_KEY):
+        seed_last_seen(conn)
+    # Старше RETENTION_DAYS не нужно ни одной метрике админки
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    conn.zremrangebyscore(LAST_SEEN_KEY, '-inf', f'({cutoff.timestamp()}')
+
+    if not conn.eval(_CLAIM_BATCH_SCRIPT, 2, PENDING_KEY, FLUSHING_KEY):
+        return 0
+
+    activity = {
+        int(telegram_id): datetime.fromtimestamp(score, tz=dt_timezone.utc)
+        for telegram_id, score in conn.zrange(FLUSHING_KEY, 0, -1, withscores=True)
+    }
+    updated = apply_profile_activity(activity) if activity else 0
+    conn.delete(FLUSHING_KEY)
+
+    logger.info(f"Flushed profile activity: {len(activity)} buffered, {updated} updated")
+    return updated
@@ -1,18 +1,21 @@
 """
 Сервис для работы с ежемесячными платежами
 """
-from typing import List, Optional
+import asyncio
+from typing import Awaitable, Callable, List, Optional
 from datetime import date, datetime
 from decimal import Decimal
-from expenses.models import RecurringPayment, Profile, Expense, UserSettings
+from expenses.models import RecurringPayment, Profile, Expense, Income, UserSettings
 from asgiref.sync import sync_to_async, async_to_sync
-from django.db import transaction
+from django.db import DatabaseError, transaction
 import logging
 from bot.utils.category_helpers import get_category_display_name
 from bot.utils.logging_safe import log_safe_id, summarize_text
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATIONS_CONCURRENCY = 8
+
 
 @sync_to_async
 def get_user_recurring_payments(user_id: int, active_only: bool = False) -> List[RecurringPayment]:
@@ -146,137 +149,231 @@ def get_recurring_payment_by_id(user_id: int, payment_id: int) -> Optional[Recur
         return None
 
 
+def _due_payments(today: date):
+    """Активные платежи на сегодня, ещё не обработанные сегодня"""
+    import calendar
+    last_day_of_month = calendar.monthrange(today.year, today.month)[1]
+
+    # Если сегодня последний день месяца, обрабатываем все операции
+    # запланированные на дни больше или равные текущему дню
+    if today.day == last_day_of_month:
+        # Это покрывает случаи февраля (29-30 число → 28/29 февраля)
+        payments = RecurringPayment.objects.filter(day_of_month__gte=today.day, is_active=True)
+    else:
+        payments = RecurringPayment.objects.filter(day_of_month=today.day, is_active=True)
+    return payments.exclude(last_processed=today).select_related('profile', 'expense_category', 'income_category')
+
+
+def _build_operation(payment: RecurringPayment, today: date, conversion: tuple, expense_time):
+    final_amount, final_currency, orig_amount, orig_currency, rate = conversion
+    fields = dict(
+        profile=payment.profile,
+        amount=final_amount,
+        currency=final_currency,
+        original_amount=orig_amount,
+        original_currency=orig_currency,
+        exchange_rate_used=rate,
+        description=f"[Ежемесячный] {payment.description}",
+        is_recurring=True,
+    )
+    if payment.operation_type == RecurringPayment.OPERATION_TYPE_INCOME:
+        return Income(category=payment.income_category, income_date=today, **fields), 'income'
+    return Expense(category=payment.expense_category, expense_date=today, expense_time=expense_time, **fields), 'expense'
+
+
+def _insert_operations(model, entries: list) -> list:
+    """
+    Вставляет операции [(платёж, операция)] одним bulk_create в savepoint.
+
+    Если пакет не прошёл (ошибка БД на одной из строк), операции вставляются
+    по одной, каждая в своём savepoint: ошибка одного платежа логируется и
+    не откатывает остальные.
+
+    Returns:
+        вставленные (платёж, операция)
+    """
+    if not entries:
+        return []
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([operation for _, operation in entries])
+        return entries
+    except DatabaseError as e:
+        logger.warning("Recurring %s batch insert failed, inserting one by one: %s", model.__name__, e)
+
+    inserted = []
+    for payment, operation in entries:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([operation])
+        except DatabaseError:
+            logger.error(
+                "Error processing recurring payment payment_id=%s user=%s",
+                payment.id,
+                log_safe_id(payment.profile.telegram_id, "user"),
+                exc_info=True,
+            )
+            continue
+        inserted.append((payment, operation))
+    return inserted
+
+
 @sync_to_async
-@transaction.atomic
 def process_recurring_payments_for_today() -> tuple[int, list]:
     """
     Обработать регулярные платежи на сегодня
     Возвращает количество обработанных платежей и список обработанных платежей
+
+    Платежи обрабатываются пакетом: настройки пользователей читаются одним
+    запросом, курс запрашивается один раз на пару валют (до транзакции),
+    операции создаются bulk_create в одной транзакции с отметкой last_processed.
+    Платёж, который не удалось подготовить или вставить, пропускается
+    (остаётся необработанным) и не мешает остальным.
     """
+    from .conversion_helper import convert_with_rate, fetch_conversion_rates, no_rate_source
+    from expenses.signals import operations_bulk_created
+    from expenses.tasks import clear_expense_reminders
+
     today = date.today()
-    current_day = today.day
-    
-    # Получаем последний день текущего месяца
-    import calendar
-    last_day_of_month = calendar.monthrange(today.year, today.month)[1]
-    
-    # Если сегодня последний день месяца, обрабатываем все операции 
-    # запланированные на дни больше или равные текущему дню
-    if current_day == last_day_of_month:
-        # Обрабатываем операции на текущий день и все дни > last_day_of_month
-        # Это покрывает случаи февраля (29-30 число → 28/29 февраля)
-        payments = RecurringPayment.objects.filter(
-            day_of_month__gte=current_day,
-            is_active=True
-        ).select_related('profile', 'expense_category', 'income_category')
-    else:
-        # Обычная обработка для дней, которые не являются последним днем месяца
-        payments = RecurringPayment.objects.filter(
-            day_of_month=current_day,
-            is_active=True
-        ).select_related('profile', 'expense_category', 'income_category')
-    
-    processed_count = 0
+    payments = list(_due_payments(today))
+    if not payments:
+        return 0, []
+
+    # Настройки автоконвертации всех пользователей одним запросом (нет настроек — конвертируем)
+    auto_convert = dict(
+        UserSettings.objects.filter(profile_id__in={payment.profile_id for payment in payments})
+        .values_list('profile_id', 'auto_convert_currency')
+    )
+
+    def conversion_pair(payment):
+        user_currency = payment.profile.currency
+        if not auto_convert.get(payment.profile_id, True) or payment.currency == user_currency:
+            return None
+        if no_rate_source(payment.currency, user_currency, today, payment.profile):
+            return None
+        return payment.currency, user_currency
+
+    pairs = {payment.id: conversion_pair(payment) for payment in payments}
+    needed = {pair for pair in pairs.values() if pair}
+    rates = async_to_sync(fetch_conversion_rates)(needed, today) if needed else {}
+
+    expense_time = datetime.now().time()
+    entries = {'expense': [], 'income': []}
+    built = []
     processed_payments = []
-    
-    for payment in payments:
-        # Проверяем, не был ли уже обработан платеж сегодня
-        if payment.last_processed == today:
-            logger.info("Recurring payment already processed payment_id=%s", payment.id)
-            continue
 
-        try:
-            # Получаем настройки пользователя для конвертации валют
-            user_settings = UserSettings.objects.filter(profile=payment.profile).first()
-            auto_convert = user_settings.auto_convert_currency if user_settings else True
-
-            # Конвертируем если нужно
-            if auto_convert and payment.currency != payment.profile.currency:
-                from .conversion_helper import maybe_convert_amount
-                convert_result = async_to_sync(maybe_convert_amount)(
-                    amount=payment.amount,
-                    input_currency=payment.currency,
-                    user_currency=payment.profile.currency,
-                    auto_convert_enabled=True,
-                    operation_date=today,
-                    profile=payment.profile
-                )
-                final_amount, final_currency, orig_amount, orig_currency, rate = convert_result
-            else:
-                final_amount = payment.amount
-                final_currency = payment.currency
-                orig_amount = orig_currency = rate = None
-
-            # Создаем операцию в зависимости от типа
-            if payment.operation_type == RecurringPayment.OPERATION_TYPE_INCOME:
-                # Создаем доход
-                from expenses.models import Income
-                operation = Income.objects.create(
-                    profile=payment.profile,
-                    category=payment.income_category,
-                    amount=final_amount,
-                    currency=final_currency,
-                    original_amount=orig_amount,
-                    original_currency=orig_currency,
-                    exchange_rate_used=rate,
-                    description=f"[Ежемесячный] {payment.description}",
-                    income_date=today,
-                    is_recurring=True,
-                )
-                operation_type = 'income'
-
-                # Сбрасываем флаг напоминания о внесении операций при автоматическом доходе
-                from expenses.tasks import clear_expense_reminder
-                clear_expense_reminder(payment.profile.telegram_id)
-            else:
-                # Создаем расход
-                operation = Expense.objects.create(
-                    profile=payment.profile,
-                    category=payment.expense_category,
-                    amount=final_amount,
-                    currency=final_currency,
-                    original_amount=orig_amount,
-                    original_currency=orig_currency,
-                    exchange_rate_used=rate,
-                    description=f"[Ежемесячный] {payment.description}",
-                    expense_date=today,
-                    expense_time=datetime.now().time(),
-                    is_recurring=True,
+    with transaction.atomic():
+        # Параллельный запуск мог успеть обработать часть платежей
+        due_ids = set(
+            RecurringPayment.objects.select_for_update()
+            .filter(id__in=[payment.id for payment in payments])
+            .exclude(last_processed=today)
+            .values_list('id', flat=True)
+        )
+        for payment in payments:
+            if payment.id not in due_ids:
+                logger.info("Recurring payment already processed payment_id=%s", payment.id)
+                continue
+
+            try:
+                pair = pairs[payment.id]
+                if pair:
+                    conversion = convert_with_rate(payment.amount, pair[0], pair[1], rates.get(pair))
+                else:
+                    conversion = (payment.amount, payment.currency, None, None, None)
+                operation, operation_type = _build_operation(payment, today, conversion, expense_time)
+            except Exception:
+                logger.error(
+                    "Error processing recurring payment payment_id=%s user=%s",
+                    payment.id,
+                    log_safe_id(payment.profile.telegram_id, "user"),
+                    exc_info=True,
                 )
-                operation_type = 'expense'
+                continue
+            entries[operation_type].append((payment, operation))
+            built.append((payment, operation, operation_type))
 
-                # Сбрасываем флаг напоминания о внесении трат при автоматическом платеже
-                from expenses.tasks import clear_expense_reminder
-                clear_expense_reminder(payment.profile.telegram_id)
+        inserted = set()
+        for operation_type, model in (('expense', Expense), ('income', Income)):
+            created = [operation for _, operation in _insert_operations(model, entries[operation_type])]
+            # Итоги, индексы и счётчики, которые ведут сигналы сохранения
+            operations_bulk_created(operation_type, created)
+            inserted.update(id(operation) for operation in created)
 
-            # Обновляем дату последней обработки
+        for payment, operation, operation_type in built:
+            if id(operation) not in inserted:
+                continue
             payment.last_processed = today
-            payment.save()
-            
-            processed_count += 1
             processed_payments.append({
                 'user_id': payment.profile.telegram_id,
                 'operation': operation,
                 'operation_type': operation_type,
                 'payment': payment
             })
-            logger.info(
-                "Processed recurring payment_id=%s type=%s user=%s description=%s",
-                payment.id,
-                operation_type,
-                log_safe_id(payment.profile.telegram_id, "user"),
-                summarize_text(payment.description),
-            )
-            
-        except Exception as e:
-            logger.error(
-                "Error processing recurring payment payment_id=%s user=%s",
-                payment.id,
-                log_safe_id(payment.profile.telegram_id, "user"),
-                exc_info=True,
-            )
-    
-    return processed_count, processed_payments
+
+        # Обновляем дату последней обработки
+        RecurringPayment.objects.filter(
+            id__in=[info['payment'].id for info in processed_payments]
+        ).update(last_processed=today)
+
+    # Сбрасываем флаги напоминания о внесении операций при автоматических операциях
+    clear_expense_reminders(info['user_id'] for info in processed_payments)
+
+    for info in processed_payments:
+        logger.info(
+            "Processed recurring payment_id=%s type=%s user=%s description=%s",
+            info['payment'].id,
+            info['operation_type'],
+            log_safe_id(info['user_id'], "user"),
+            summarize_text(info['payment'].description),
+        )
+
+    return len(processed_payments), processed_payments
+
+
+async def send_recurring_notifications(
+    processed_payments: list,
+    notify: Callable[[dict], Awaitable[None]],
+    throttle: Optional[Callable[[], Awaitable[None]]] = None,
+    concurrency: int = NOTIFICATIONS_CONCURRENCY,
+) -> int:
+    """
+    Рассылает уведомления об обработанных платежах параллельно по пользователям.
+
+    Уведомления одного пользователя уходят последовательно, разные
+    пользователи — не больше concurrency одновременно.
+
+    Returns:
+        количество отправленных уведомлений
+    """
+    by_user = {}
+    for payment_info in processed_payments:
+        by_user.setdefault(payment_info['user_id'], []).append(payment_info)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_user(user_payments) -> int:
+        sent = 0
+        async with semaphore:
+            for payment_info in user_payments:
+                if throttle is not None:
+                    await throttle()
+                try:
+                    await notify(payment_info)
+                except Exception:
+                    logger.exception(
+                        "Error sending recurring notification to user %s",
+                        log_safe_id(payment_info.get('user_id'), "user"),
+                    )
+                    continue
+                sent += 1
+                logger.info(
+                    "Sent notification to user %s about recurring payment",
+                    log_safe_id(payment_info['user_id'], "user"),
+                )
+        return sent
+
+    return sum(await asyncio.gather(*(send_user(user_payments) for user_payments in by_user.values())))
 
 
 @sync_to_async
@@ -2,11 +2,14 @@
 Сервис для работы с подписками
 """
 from aiogram import Bot
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from expenses.models import Profile, Subscription, UserSettings
 from datetime import datetime, timedelta
 from typing import Optional
 
+from bot.services.subscription_cache import get_entitlement_sync
+from bot.utils.request_context import get_request_context
 from bot.utils.telegram_client import create_telegram_bot
 
 
@@ -17,31 +20,24 @@ async def check_subscription(telegram_id: int, include_trial: bool = True) -> bo
         telegram_id: ID пользователя в Telegram
         include_trial: Учитывать ли пробный период как подписку
     """
-    try:
-        profile = await Profile.objects.aget(telegram_id=telegram_id)
-        
-        # Бета-тестеры имеют полный доступ без подписки
-        if profile.is_beta_tester:
-            return True
-        
-        # Проверяем наличие активной подписки
-        if include_trial:
-            # Учитываем любую активную подписку включая пробный период
-            has_subscription = await profile.subscriptions.filter(
-                is_active=True,
-                end_date__gt=timezone.now()
-            ).aexists()
-        else:
-            # Исключаем пробный период
-            has_subscription = await profile.subscriptions.filter(
-                is_active=True,
-                end_date__gt=timezone.now()
-            ).exclude(type='trial').aexists()
-        
-        return has_subscription
-    except Profile.DoesNotExist:
+    context = get_request_context(telegram_id)
+    if context is not None:
+        cached = context.get_subscription(include_trial)
+        if cached is not None:
+            return cached
+
+    if context is not None and context.profile is None:
         return False
 
+    # Бета-тестер / окончание подписки из кеша (subscription_cache),
+    # при промахе — один агрегирующий запрос
+    entitlement = await sync_to_async(get_entitlement_sync)(telegram_id)
+    has_subscription = entitlement.is_active(include_trial)
+
+    if context is not None:
+        context.set_subscription(include_trial, has_subscription)
+    return has_subscription
+
 
 async def is_trial_active(telegram_id: int) -> bool:
     """Проверка активного пробного периода"""
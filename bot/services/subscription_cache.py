@@ -0,0 +1,182 @@
+"""
+Кеш статуса подписки пользователя.
+
+check_subscription вызывается почти на каждый апдейт (require_subscription,
+голосовые, бюджеты, цели) и раньше делал 2 запроса в БД: Profile и
+EXISTS по подпискам. Статус подписки меняется редко и предсказуемо —
+по времени окончания, поэтому кешируется не булев флаг, а «права»:
+
+    beta        — бета-тестер (полный доступ без подписки)
+    paid_until  — окончание последней активной платной подписки
+    any_until   — окончание последней активной подписки, включая trial
+
+Активность проверяется сравнением с текущим временем, так что запись не
+устаревает при истечении подписки. Два уровня:
+
+- LRU в памяти процесса с коротким TTL;
+- Redis (django cache), общий для бота, Celery и админки, с TTL до
+  окончания подписки (но не дольше ENTITLEMENT_MAX_TTL_SECONDS).
+
+Сигналы Subscription/Profile (expenses/signals.py) после коммита
+сбрасывают оба уровня; массовые update() должны вызывать
+invalidate_subscription_status().
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.cache import cache
+from django.db.models import Max, Q
+
+from bot.utils.logging_safe import log_safe_id
+
+logger = logging.getLogger(__name__)
+
+ENTITLEMENT_CACHE_KEY = 'subscription:entitlement:{telegram_id}'
+ENTITLEMENT_MAX_TTL_SECONDS = 24 * 3600
+ENTITLEMENT_EMPTY_TTL_SECONDS = 3600
+
+LOCAL_CACHE_TTL_SECONDS = 30
+LOCAL_CACHE_MAX_USERS = 4096
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """Права пользователя на премиум-функции"""
+    beta: bool = False
+    paid_until: Optional[float] = None  # timestamp
+    any_until: Optional[float] = None  # timestamp
+
+    def is_active(self, include_trial: bool = True, now: Optional[float] = None) -> bool:
+        if self.beta:
+            return True
+        until = self.any_until if include_trial else self.paid_until
+        if until is None:
+            return False
+        return until > (time.time() if now is None else now)
+
+    def cache_ttl(self, now: float) -> int:
+        """TTL записи в Redis: до окончания подписки"""
+        if self.any_until is None or self.any_until <= now:
+            return ENTITLEMENT_EMPTY_TTL_SECONDS
+        return max(1, min(int(self.any_until - now) + 1, ENTITLEMENT_MAX_TTL_SECONDS))
+
+    def to_dict(self) -> dict:
+        return {'beta': self.beta, 'paid_until': self.paid_until, 'any_until': self.any_until}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Entitlement':
+        return cls(
+            beta=bool(data.get('beta')),
+            paid_until=data.get('paid_until'),
+            any_until=data.get('any_until'),
+        )
+
+
+NO_ENTITLEMENT = Entitlement()
+
+
+def _cache_key(telegram_id: int) -> str:
+    return ENTITLEMENT_CACHE_KEY.format(telegram_id=telegram_id)
+
+
+def _timestamp(value) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def load_entitlement_sync(telegram_id: int) -> Entitlement:
+    """Права пользователя одним запросом к БД"""
+    from expenses.models import Profile
+
+    active = Q(subscriptions__is_active=True)
+    row = (
+        Profile.objects
+        .filter(telegram_id=telegram_id)
+        .annotate(
+            any_until=Max('subscriptions__end_date', filter=active),
+            paid_until=Max('subscriptions__end_date', filter=active & ~Q(subscriptions__type='trial')),
+        )
+        .values('is_beta_tester', 'any_until', 'paid_until')
+        .first()
+    )
+    if row is None:
+        return NO_ENTITLEMENT
+    return Entitlement(
+        beta=bool(row['is_beta_tester']),
+        paid_until=_timestamp(row['paid_until']),
+        any_until=_timestamp(row['any_until']),
+    )
+
+
+_local: 'OrderedDict[int, tuple]' = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _local_get(telegram_id: int, now: float) -> Optional[Entitlement]:
+    with _local_lock:
+        cached = _local.get(telegram_id)
+        if cached is None:
+            return None
+        entitlement, expires_at = cached
+        if now >= expires_at:
+            del _local[telegram_id]
+            return None
+        _local.move_to_end(telegram_id)
+        return entitlement
+
+
+def _local_set(telegram_id: int, entitlement: Entitlement, now: float) -> None:
+    with _local_lock:
+        _local[telegram_id] = (entitlement, now + LOCAL_CACHE_TTL_SECONDS)
+        _local.move_to_end(telegram_id)
+        while len(_local) > LOCAL_CACHE_MAX_USERS:
+            _local.popitem(last=False)
+
+
+def get_entitlement_sync(telegram_id: int) -> Entitlement:
+    """Права пользователя: локальный LRU -> Redis -> БД"""
+    monotonic_now = time.monotonic()
+    entitlement = _local_get(telegram_id, monotonic_now)
+    if entitlement is not None:
+        return entitlement
+
+    key = _cache_key(telegram_id)
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning("Subscription cache read failed for %s: %s", log_safe_id(telegram_id, "user"), e)
+        data = None
+
+    if data is not None:
+        entitlement = Entitlement.from_dict(data)
+    else:
+        entitlement = load_entitlement_sync(telegram_id)
+        try:
+            cache.set(key, entitlement.to_dict(), entitlement.cache_ttl(time.time()))
+        except Exception as e:
+            logger.warning("Subscription cache write failed for %s: %s", log_safe_id(telegram_id, "user"), e)
+
+    _local_set(telegram_id, entitlement, monotonic_now)
+    return entitlement
+
+
+def invalidate_subscription_status(*telegram_ids: int) -> None:
+    """Сбрасывает статус подписки в локальном кеше и Redis"""
+    if not telegram_ids:
+        return
+    with _local_lock:
+        for telegram_id in telegram_ids:
+            _local.pop(telegram_id, None)
+    try:
+        cache.delete_many([_cache_key(telegram_id) for telegram_id in telegram_ids])
+    except Exception as e:
+        logger.warning("Subscription cache invalidation failed: %s", e)
+
+
+def clear_local_subscription_cache() -> None:
+    """Очищает локальный кеш (для тестов)"""
+    with _local_lock:
+        _local.clear()
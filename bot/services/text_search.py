@@ -0,0 +1,92 @@
+"""
+Бэкенд текстового поиска по тратам и доходам.
+
+На PostgreSQL используется pg_trgm + полнотекстовый поиск:
+- GIN-индекс gin_trgm_ops по description (оператор %> / word_similarity)
+  находит опечатки и части слов без выгрузки строк в Python;
+- GIN-индекс по to_tsvector('russian', description) находит словоформы
+  ("обеды" -> "обед", "продуктов" -> "продукты");
+- результаты ранжируются по максимуму из substring/trigram/ts_rank.
+
+Индексы создаются миграцией expenses/0067_description_search_indexes.
+
+На SQLite (dev/тесты) остаётся прежний путь: icontains + fuzzy-поиск
+в Python (_fuzzy_search_expenses) по последним записям.
+"""
+from functools import reduce
+from operator import or_
+from typing import Iterable, List, Optional, Sequence
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'russian'
+
+# Части запроса короче этого ищутся только как подстрока:
+# у них слишком мало триграмм для осмысленного сравнения
+TRIGRAM_MIN_QUERY_LENGTH = 3
+
+
+def is_postgres_search_available(queryset) -> bool:
+    """True, если queryset выполняется на PostgreSQL (есть pg_trgm и tsvector)"""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def build_substring_filter(query_parts: Iterable[str], fields: Sequence[str]) -> Optional[Q]:
+    """Q-фильтр "любая часть запроса входит в любое из полей" (icontains)"""
+    q_filters = [
+        reduce(or_, (Q(**{f'{field}__icontains': part}) for field in fields))
+        for part in query_parts
+    ]
+    if q_filters:
+        return reduce(or_, q_filters)
+    return None
+
+
+def _search_query(query_parts: List[str]):
+    from django.contrib.postgres.search import SearchQuery
+
+    return reduce(or_, (SearchQuery(part, config=SEARCH_CONFIG, search_type='plain') for part in query_parts))
+
+
+def postgres_search(queryset, query_parts: List[str], text_field: str, name_fields: Sequence[str] = ()):
+    """
+    Поиск с ранжированием на PostgreSQL.
+
+    Args:
+        queryset: базовый queryset (профиль, даты)
+        query_parts: части запроса (см. _parse_search_query)
+        text_field: поле описания с trigram/tsvector индексами
+        name_fields: дополнительные поля (названия категорий), ищутся как подстрока
+
+    Returns:
+        queryset с аннотацией search_rank, отфильтрованный по совпадениям.
+        Сортировку задаёт вызывающий код (обычно '-search_rank', затем дата)
+    """
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import SearchRank, SearchVector, TrigramWordSimilarity
+
+    substring_filter = build_substring_filter(query_parts, (text_field, *name_fields))
+    vector = SearchVector(text_field, config=SEARCH_CONFIG)
+    search_query = _search_query(query_parts)
+
+    trigram_parts = [part for part in query_parts if len(part) >= TRIGRAM_MIN_QUERY_LENGTH]
+
+    # %> попадает в GIN-индекс gin_trgm_ops
+    match_filter = substring_filter | Q(search_vector=search_query)
+    for part in trigram_parts:
+        match_filter |= Q(TrigramWordSimilar(F(text_field), Value(part)))
+
+    rank_terms = [
+        Case(When(substring_filter, then=Value(1.0)), default=Value(0.0), output_field=FloatField()),
+        SearchRank(vector, search_query),
+    ]
+    rank_terms.extend(TrigramWordSimilarity(Value(part), text_field) for part in trigram_parts)
+
+    return (
+        queryset
+        .alias(search_vector=vector)
+        .filter(match_filter)
+        .annotate(search_rank=Greatest(*rank_terms, output_field=FloatField()))
+    )
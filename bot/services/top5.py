@@ -32,85 +32,33 @@ def _make_id(title_norm: str, category_id: int, amount_norm: Decimal, currency:
     return h[:16]  # compact id
 
 
-@sync_to_async
-def calculate_top5_sync(profile: Profile, window_start: date, window_end: date) -> Tuple[List[Dict], str]:
-    """Собрать топ-5 за окно по правилам. Возвращает (items, hash).
+def _add_to_group(groups: Dict[Tuple, Dict], description: str, category_id: int, amount: Decimal,
+                  currency: str, op_type: str, count: int, last_at: datetime) -> None:
+    """Добавить в группу count операций с одинаковыми полями; last_at — самая свежая из них"""
+    title_norm = _norm_title(description)
+    amount_norm = _norm_amount(amount, currency)
+    key = (title_norm, category_id or 0, str(amount_norm), currency.upper(), op_type)
+    g = groups.setdefault(key, {
+        'title_norm': title_norm,
+        'title_display': description or '',
+        'category_id': category_id or 0,
+        'category_kind': op_type,
+        'amount': Decimal(amount),
+        'amount_norm': amount_norm,
+        'currency': currency.upper(),
+        'op_type': op_type,
+        'count': 0,
+        'last_at': None,
+    })
+    g['count'] += count
+    # Берём самое свежее название
+    if not g['last_at'] or last_at > g['last_at']:
+        g['last_at'] = last_at
+        g['title_display'] = description or ''
 
-    Каждый item содержит:
-      id, title_display, title_norm, category_id, category_kind (expense|income), amount, amount_norm,
-      currency, op_type (expense|income), count, last_at
-    """
-    default_currency = profile.currency or 'RUB'
 
-    # Собираем расходы.
-    # Операции, созданные автоматически из регулярных платежей (is_recurring=True),
-    # исключаем: топ-5 — это быстрые кнопки для ручного повторения частых операций,
-    # а регулярные и так создаются сами.
-    expense_qs = Expense.objects.filter(
-        profile=profile,
-        expense_date__gte=window_start,
-        expense_date__lte=window_end,
-    ).exclude(is_recurring=True).select_related('category')
-
-    # Собираем доходы (регулярные исключаем по той же причине)
-    income_qs = Income.objects.filter(
-        profile=profile,
-        income_date__gte=window_start,
-        income_date__lte=window_end,
-    ).exclude(is_recurring=True).select_related('category')
-
-    groups: Dict[Tuple, Dict] = {}
-
-    # Группировка расходов
-    for e in expense_qs:
-        title_norm = _norm_title(e.description)
-        currency = e.currency or default_currency
-        amount_norm = _norm_amount(e.amount, currency)
-        key = (title_norm, e.category_id or 0, str(amount_norm), currency.upper(), 'expense')
-        g = groups.setdefault(key, {
-            'title_norm': title_norm,
-            'title_display': e.description or '',
-            'category_id': e.category_id or 0,
-            'category_kind': 'expense',
-            'amount': Decimal(e.amount),
-            'amount_norm': amount_norm,
-            'currency': currency.upper(),
-            'op_type': 'expense',
-            'count': 0,
-            'last_at': None,
-        })
-        g['count'] += 1
-        # Берём самое свежее название
-        last_dt = datetime.combine(e.expense_date, e.expense_time)
-        if not g['last_at'] or last_dt > g['last_at']:
-            g['last_at'] = last_dt
-            g['title_display'] = e.description or ''
-
-    # Группировка доходов
-    for inc in income_qs:
-        title_norm = _norm_title(inc.description)
-        currency = inc.currency or default_currency
-        amount_norm = _norm_amount(inc.amount, currency)
-        key = (title_norm, inc.category_id or 0, str(amount_norm), currency.upper(), 'income')
-        g = groups.setdefault(key, {
-            'title_norm': title_norm,
-            'title_display': inc.description or '',
-            'category_id': inc.category_id or 0,
-            'category_kind': 'income',
-            'amount': Decimal(inc.amount),
-            'amount_norm': amount_norm,
-            'currency': currency.upper(),
-            'op_type': 'income',
-            'count': 0,
-            'last_at': None,
-        })
-        g['count'] += 1
-        last_dt = datetime.combine(inc.income_date, inc.income_time)
-        if not g['last_at'] or last_dt > g['last_at']:
-            g['last_at'] = last_dt
-            g['title_display'] = inc.description or ''
-
-    # Оставляем только группы с count >= 2
+def _rank_top5(groups: Dict[Tuple, Dict]) -> List[Dict]:
+    """Первые 5 групп с count >= 2 (расходы и доходы вместе) с id и подсказкой категории"""
     candidates = [v for v in groups.values() if v['count'] >= 2]
 
     # Сортируем все операции вместе (расходы и доходы) по count, last_at, title
@@ -134,18 +82,22 @@ def calculate_top5_sync(profile: Profile, window_start: date, window_end: date)
     for it in final:
         kk = (it['title_norm'], str(it['amount_norm']), it['currency'], it['op_type'])
         it['needs_category_hint'] = key_counts[kk] > 1
+    return final
+
 
+def _top5_category_ids(final: List[Dict]) -> Tuple[set, set]:
     expense_category_ids = {
         it['category_id'] for it in final if it['category_kind'] == 'expense' and it['category_id']
     }
     income_category_ids = {
         it['category_id'] for it in final if it['category_kind'] == 'income' and it['category_id']
     }
-    expense_categories = ExpenseCategory.objects.in_bulk(expense_category_ids)
-    income_categories = IncomeCategory.objects.in_bulk(income_category_ids)
+    return expense_category_ids, income_category_ids
 
-    # Подготовка к сериализации для JSONField с предзагрузкой эмодзи категорий
-    user_lang = profile.language_code or 'ru'
+
+def _serialize_top5(final: List[Dict], expense_categories: Dict, income_categories: Dict,
+                    user_lang: str, default_currency: str) -> List[Dict]:
+    """Подготовка к сериализации для JSONField с предзагрузкой эмодзи категорий"""
     serialized: List[Dict] = []
     for it in final:
         # Получаем эмодзи и название категории для сохранения в снепшот
@@ -180,13 +132,69 @@ def calculate_top5_sync(profile: Profile, window_start: date, window_end: date)
             'last_at': (it.get('last_at').isoformat() if it.get('last_at') else None),
             'needs_category_hint': bool(it.get('needs_category_hint', False)),
         })
+    return serialized
+
 
-    # Хэш состава (включая порядок)
+def _top5_digest(items: List[Dict]) -> str:
+    """Хэш состава (включая порядок)"""
     def serial(it: Dict) -> str:
-        return f"{it['id']}|{it['count']}"
-    digest = hashlib.sha1('|'.join(serial(i) for i in serialized).encode('utf-8')).hexdigest()
+        return f"{it['id']}|{int(it['count'])}"
+    return hashlib.sha1('|'.join(serial(i) for i in items).encode('utf-8')).hexdigest()
 
-    return serialized, digest
+
+@sync_to_async
+def calculate_top5_sync(profile: Profile, window_start: date, window_end: date) -> Tuple[List[Dict], str]:
+    """Собрать топ-5 за окно по правилам. Возвращает (items, hash).
+
+    Каждый item содержит:
+      id, title_display, title_norm, category_id, category_kind (expense|income), amount, amount_norm,
+      currency, op_type (expense|income), count, last_at
+    """
+    default_currency = profile.currency or 'RUB'
+
+    # Собираем расходы.
+    # Операции, созданные автоматически из регулярных платежей (is_recurring=True),
+    # исключаем: топ-5 — это быстрые кнопки для ручного повторения частых операций,
+    # а регулярные и так создаются сами.
+    expense_qs = Expense.objects.filter(
+        profile=profile,
+        expense_date__gte=window_start,
+        expense_date__lte=window_end,
+    ).exclude(is_recurring=True)
+
+    # Собираем доходы (регулярные исключаем по той же причине)
+    income_qs = Income.objects.filter(
+        profile=profile,
+        income_date__gte=window_start,
+        income_date__lte=window_end,
+    ).exclude(is_recurring=True)
+
+    groups: Dict[Tuple, Dict] = {}
+
+    # Группировка расходов
+    for e in expense_qs:
+        _add_to_group(
+            groups, e.description, e.category_id, e.amount, e.currency or default_currency, 'expense',
+            1, datetime.combine(e.expense_date, e.expense_time),
+        )
+
+    # Группировка доходов
+    for inc in income_qs:
+        _add_to_group(
+            groups, inc.description, inc.category_id, inc.amount, inc.currency or default_currency, 'income',
+            1, datetime.combine(inc.income_date, inc.income_time),
+        )
+
+    final = _rank_top5(groups)
+
+    expense_category_ids, income_category_ids = _top5_category_ids(final)
+    expense_categories = ExpenseCategory.objects.in_bulk(expense_category_ids)
+    income_categories = IncomeCategory.objects.in_bulk(income_category_ids)
+
+    serialized = _serialize_top5(
+        final, expense_categories, income_categories, profile.language_code or 'ru', default_currency,
+    )
+    return serialized, _top5_digest(serialized)
 
 
 @sync_to_async
@@ -258,16 +266,3 @@ def get_current_cashback_amount(profile: Profile, category_id: int, amount: Deci
         return val
     except Exception:
         return Decimal('0')
-
-
-@sync_to_async
-def get_profiles_with_activity(window_start: date, window_end: date) -> List[Profile]:
-    from django.db.models import Q
-    expense_profiles = Expense.objects.filter(
-        expense_date__gte=window_start, expense_date__lte=window_end
-    ).values_list('profile_id', flat=True).distinct()
-    income_profiles = Income.objects.filter(
-        income_date__gte=window_start, income_date__lte=window_end
-    ).values_list('profile_id', flat=True).distinct()
-    ids = set(list(expense_profiles) + list(income_profiles))
-    return list(Profile.objects.filter(id__in=ids))
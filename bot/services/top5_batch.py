@@ -0,0 +1,177 @@
+"""
+Пакетный пересчёт Топ‑5 для всех пользователей (update_top5_keyboards, 05:00).
+
+Вместо построчного обхода операций каждого профиля — два GROUP BY по
+(профиль, описание, категория, сумма, валюта) для трат и доходов,
+которые читаются серверным курсором в порядке profile_id и сливаются
+в один поток. Нормализация названия и округление суммы до точности
+валюты делаются в Python над уже сгруппированными строками теми же
+функциями, что и calculate_top5_sync, поэтому состав и хэш совпадают.
+
+Хэши снепшотов загружаются одним запросом; сериализация, запись
+снепшота и обновление закрепа выполняются только для профилей, у
+которых Топ‑5 изменился.
+"""
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Set, Tuple
+
+from bot.services.top5 import (
+    _add_to_group,
+    _rank_top5,
+    _serialize_top5,
+    _top5_category_ids,
+    _top5_digest,
+)
+
+logger = logging.getLogger(__name__)
+
+TOP5_WINDOW_DAYS = 90
+STREAM_CHUNK_SIZE = 2000
+SAVE_BATCH_SIZE = 500
+
+
+@dataclass
+class Top5RefreshResult:
+    processed: int = 0
+    changed: int = 0
+    # Новые items профилей с закреплённым Топ‑5 — для обновления клавиатуры
+    pinned_items: Dict[int, List[Dict]] = field(default_factory=dict)
+
+
+def rolling_window(today: date) -> Tuple[date, date]:
+    """Окно последних 90 дней включительно, заканчивается сегодня"""
+    return today - timedelta(days=TOP5_WINDOW_DAYS - 1), today
+
+
+def _parse_last_at(value: str) -> datetime:
+    # 'YYYY-MM-DD HH:MM:SS[.ffffff]'; PostgreSQL отбрасывает хвостовые нули дробной части
+    date_part, _, time_part = value.partition(' ')
+    hms, _, fraction = time_part.partition('.')
+    return datetime.fromisoformat(f"{date_part}T{hms}").replace(microsecond=int((fraction + '000000')[:6]))
+
+
+def _stream_groups(model, date_field: str, time_field: str, op_type: str,
+                   window_start: date, window_end: date) -> Iterator[Dict]:
+    from django.db.models import CharField, Count, Max, Value
+    from django.db.models.functions import Cast, Concat
+
+    # Самая свежая операция группы: ISO-строки даты и времени сравниваются лексикографически
+    last_at = Max(Concat(
+        Cast(date_field, CharField()), Value(' '), Cast(time_field, CharField()),
+        output_field=CharField(),
+    ))
+    rows = (
+        model.objects.filter(**{f'{date_field}__gte': window_start, f'{date_field}__lte': window_end})
+        .exclude(is_recurring=True)
+        .values('profile_id', 'profile__currency', 'description', 'category_id', 'amount', 'currency')
+        .annotate(operations=Count('id'), last_at=last_at)
+        .order_by('profile_id')
+    )
+    for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        row['op_type'] = op_type
+        yield row
+
+
+def iter_profile_top5(window_start: date, window_end: date) -> Iterator[Tuple[int, List[Dict]]]:
+    """(profile_id, ранжированный Топ‑5) для каждого профиля с операциями в окне"""
+    from expenses.models import Expense, Income
+
+    rows = heapq.merge(
+        _stream_groups(Expense, 'expense_date', 'expense_time', 'expense', window_start, window_end),
+        _stream_groups(Income, 'income_date', 'income_time', 'income', window_start, window_end),
+        key=itemgetter('profile_id'),
+    )
+    for profile_id, profile_rows in groupby(rows, key=itemgetter('profile_id')):
+        groups: Dict[Tuple, Dict] = {}
+        for row in profile_rows:
+            _add_to_group(
+                groups,
+                row['description'],
+                row['category_id'],
+                row['amount'],
+                row['currency'] or row['profile__currency'] or 'RUB',
+                row['op_type'],
+                row['operations'],
+                _parse_last_at(row['last_at']),
+            )
+        yield profile_id, _rank_top5(groups)
+
+
+def _save_changed(batch: List[Tuple[int, List[Dict], str]], window_start: date, window_end: date,
+                  pinned: Set[int], result: Top5RefreshResult) -> None:
+    from expenses.models import ExpenseCategory, IncomeCategory, Profile, Top5Snapshot
+
+    profiles = Profile.objects.in_bulk([profile_id for profile_id, _, _ in batch])
+    expense_category_ids, income_category_ids = _top5_category_ids(
+        [it for _, final, _ in batch for it in final]
+    )
+    expense_categories = ExpenseCategory.objects.in_bulk(expense_category_ids)
+    income_categories = IncomeCategory.objects.in_bulk(income_category_ids)
+
+    snapshots = []
+    for profile_id, final, digest in batch:
+        profile = profiles.get(profile_id)
+        if profile is None:
+            continue
+        items = _serialize_top5(
+            final, expense_categories, income_categories, profile.language_code or 'ru', profile.currency or 'RUB',
+        )
+        snapshots.append(Top5Snapshot(
+            profile_id=profile_id, window_start=window_start, window_end=window_end, items=items, hash=digest,
+        ))
+        if profile_id in pinned:
+            result.pinned_items[profile_id] = items
+
+    Top5Snapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['profile'],
+        update_fields=['window_start', 'window_end', 'items', 'hash', 'updated_at'],
+    )
+    result.changed += len(snapshots)
+
+
+def refresh_top5_snapshots(window_start: date, window_end: date) -> Top5RefreshResult:
+    """
+    Пересчитывает Топ‑5 всех профилей и сохраняет только изменившиеся снепшоты.
+
+    Профили, у которых все операции вышли из окна, получают пустой снепшот.
+    У неизменившихся снепшотов окно не обновляется: по нему никто не читает,
+    а меню Топ‑5 пересчитывает снепшот само.
+    """
+    from expenses.models import Top5Pin, Top5Snapshot
+
+    known = dict(Top5Snapshot.objects.values_list('profile_id', 'hash'))
+    pinned = set(Top5Pin.objects.values_list('profile_id', flat=True))
+    result = Top5RefreshResult()
+    batch: List[Tuple[int, List[Dict], str]] = []
+
+    def flush():
+        if batch:
+            _save_changed(batch, window_start, window_end, pinned, result)
+            batch.clear()
+
+    for profile_id, final in iter_profile_top5(window_start, window_end):
+        result.processed += 1
+        digest = _top5_digest(final)
+        if known.pop(profile_id, None) == digest:
+            continue
+        batch.append((profile_id, final, digest))
+        if len(batch) >= SAVE_BATCH_SIZE:
+            flush()
+
+    # Снепшоты профилей без операций в окне: Топ‑5 опустел
+    empty_digest = _top5_digest([])
+    for profile_id, old_digest in known.items():
+        if old_digest != empty_digest:
+            batch.append((profile_id, [], empty_digest))
+            if len(batch) >= SAVE_BATCH_SIZE:
+                flush()
+    flush()
+
+    return result
@@ -0,0 +1,384 @@
+"""
+Инкрементальные счётчики Топ‑5 (Top5Counter).
+
+Ключ строки — (профиль, дата, группа), где группа та же, что в
+calculate_top5_sync: нормализованное название, категория, сумма с
+точностью валюты, валюта и тип операции. Поэтому Топ‑5 за любое окно
+собирается из строк счётчиков теми же _rank_top5/_top5_digest, а
+состав и хэш совпадают с расчётом по сырым операциям.
+
+- сигналы Expense/Income (expenses/signals.py) обновляют счётчики в той же
+  транзакции: создание +1, изменение пересчитывает затронутые ячейки
+  (профиль, дата, группа) по сырым операциям этого дня; удаление так же
+  применяют места удаления (expenses.signals.operations_deleted);
+- после коммита Топ‑5 профиля пересчитывается по счётчикам, и только если
+  хэш изменился, обновляется снепшот и ставится обновление закрепа;
+- ночная update_top5_keyboards удаляет строки, вышедшие из окна, и
+  пересчитывает только профили, у которых они были;
+- удаление категории (SET_NULL у операций без сигналов) и массовые
+  операции в обход сигналов исправляются пересборкой
+  (rebuild_top5_counters), она же делает первичное заполнение.
+
+Пока счётчики не заполнены (нет SEEDED_KEY), меню и ночная задача
+работают по сырым операциям, как раньше.
+"""
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+
+from bot.services.top5 import (
+    _make_id,
+    _norm_amount,
+    _norm_title,
+    _rank_top5,
+    _serialize_top5,
+    _top5_category_ids,
+    _top5_digest,
+)
+from bot.services.top5_batch import SAVE_BATCH_SIZE, Top5RefreshResult, _save_changed, rolling_window
+from bot.utils.fanout import chunked
+from bot.utils.logging_safe import log_safe_id
+from expenses.models import Expense, ExpenseCategory, Income, IncomeCategory, Top5Counter, Top5Pin, Top5Snapshot
+
+logger = logging.getLogger(__name__)
+
+SEEDED_KEY = 'top5_counters:seeded'
+
+# Атрибут экземпляра, в котором pre_save сохраняет ячейку операции до изменения
+_PREVIOUS_ATTR = '_top5_counter_previous'
+
+_OPERATION_MODELS = {
+    'expense': (Expense, 'expense_date', 'expense_time'),
+    'income': (Income, 'income_date', 'income_time'),
+}
+
+_ROW_FIELDS = ('profile_id', 'profile__currency', 'description', 'category_id', 'amount', 'currency', 'is_recurring')
+
+# (профиль, дата, group_id)
+CellKey = Tuple[int, date, str]
+
+
+def counters_seeded() -> bool:
+    try:
+        return bool(cache.get(SEEDED_KEY))
+    except Exception:
+        return False
+
+
+def mark_seeded() -> None:
+    cache.set(SEEDED_KEY, True, timeout=None)
+
+
+def _entry(op_type: str, profile_id: int, default_currency: Optional[str], description: str,
+           category_id: Optional[int], amount, currency: Optional[str], is_recurring: bool,
+           op_date: date, op_time: Optional[time]) -> Optional[Dict]:
+    """Ячейка и поля группы для одной операции; None — операция в Топ‑5 не участвует"""
+    if is_recurring:
+        return None
+    currency = (currency or default_currency or 'RUB').upper()
+    title_norm = _norm_title(description)
+    amount_norm = _norm_amount(amount, currency)
+    return {
+        'key': (profile_id, op_date, _make_id(title_norm, category_id or 0, amount_norm, currency, op_type)),
+        'op_type': op_type,
+        'title_norm': title_norm,
+        'title_display': description or '',
+        'category_id': category_id or 0,
+        'amount_norm': amount_norm,
+        'currency': currency,
+        'last_time': op_time or time.min,
+    }
+
+
+def _raw_entries(op_type: str, queryset) -> Iterable[Dict]:
+    _, date_field, time_field = _OPERATION_MODELS[op_type]
+    for row in queryset.values_list(*_ROW_FIELDS, date_field, time_field):
+        profile_id, default_currency, description, category_id, amount, currency, is_recurring, op_date, op_time = row
+        entry = _entry(
+            op_type, profile_id, default_currency, description, category_id, amount, currency, is_recurring,
+            op_date, op_time,
+        )
+        if entry is not None:
+            yield entry
+
+
+def _instance_entry(op_type: str, instance) -> Optional[Dict]:
+    _, date_field, time_field = _OPERATION_MODELS[op_type]
+    currency = instance.currency
+    default_currency = None
+    if not currency:
+        default_currency = instance.profile.currency
+    return _entry(
+        op_type, instance.profile_id, default_currency, instance.description, instance.category_id,
+        instance.amount, currency, instance.is_recurring,
+        getattr(instance, date_field), getattr(instance, time_field),
+    )
+
+
+def _merge(cells: Dict[CellKey, Dict], entry: Dict) -> None:
+    cell = cells.get(entry['key'])
+    if cell is None:
+        cells[entry['key']] = dict(entry, count=1)
+        return
+    cell['count'] += 1
+    # Берём самое свежее название
+    if entry['last_time'] > cell['last_time']:
+        cell['last_time'] = entry['last_time']
+        cell['title_display'] = entry['title_display']
+
+
+def _counter(cell: Dict) -> Top5Counter:
+    profile_id, op_date, group_id = cell['key']
+    return Top5Counter(
+        profile_id=profile_id,
+        date=op_date,
+        group_id=group_id,
+        op_type=cell['op_type'],
+        title_norm=cell['title_norm'],
+        title_display=cell['title_display'],
+        category_id=cell['category_id'],
+        amount_norm=cell['amount_norm'],
+        currency=cell['currency'],
+        count=cell['count'],
+        last_time=cell['last_time'],
+    )
+
+
+def _increment(entry: Dict) -> None:
+    profile_id, op_date, group_id = entry['key']
+    rows = Top5Counter.objects.filter(profile_id=profile_id, date=op_date, group_id=group_id)
+    if rows.update(count=F('count') + 1):
+        rows.filter(last_time__lt=entry['last_time']).update(
+            last_time=entry['last_time'], title_display=entry['title_display'],
+        )
+        return
+    try:
+        with transaction.atomic():
+            _counter(dict(entry, count=1)).save()
+    except IntegrityError:
+        # Параллельная транзакция успела создать строку
+        _increment(entry)
+
+
+def _recount_cell(op_type: str, entry: Dict) -> None:
+    """Пересчитывает ячейку по сырым операциям профиля за этот день"""
+    model, date_field, _ = _OPERATION_MODELS[op_type]
+    profile_id, op_date, group_id = entry['key']
+    queryset = model.objects.filter(profile_id=profile_id, **{date_field: op_date}).exclude(is_recurring=True)
+    if entry['category_id']:
+        queryset = queryset.filter(category_id=entry['category_id'])
+    else:
+        queryset = queryset.filter(category__isnull=True)
+
+    cells: Dict[CellKey, Dict] = {}
+    for raw in _raw_entries(op_type, queryset):
+        if raw['key'] == entry['key']:
+            _merge(cells, raw)
+
+    rows = Top5Counter.objects.filter(profile_id=profile_id, date=op_date, group_id=group_id)
+    cell = cells.get(entry['key'])
+    if cell is None:
+        rows.delete()
+    elif not rows.update(count=cell['count'], last_time=cell['last_time'], title_display=cell['title_display']):
+        _counter(cell).save()
+
+
+def _apply_safely(profile_id: int, apply) -> None:
+    """Ошибка счётчиков не должна ломать сохранение операции — её исправит пересборка"""
+    try:
+        with transaction.atomic():
+            apply()
+    except DatabaseError as e:
+        logger.error("Failed to update Top-5 counters for %s: %s", log_safe_id(profile_id, "profile"), e)
+
+
+def remember_previous(op_type: str, instance) -> None:
+    """
+    pre_save: запоминает ячейку операции в БД до изменения.
+
+    Как и daily_totals.remember_previous, берёт значения, прочитанные
+    вместе с экземпляром, а SELECT делает, только если их нет.
+    """
+    previous = None
+    if instance.pk is not None and not instance._state.adding:
+        model, date_field, time_field = _OPERATION_MODELS[op_type]
+        row = instance.loaded_values(('profile_id',) + _ROW_FIELDS[2:] + (date_field, time_field))
+        if row is not None and row[4]:
+            # Значения, прочитанные вместе с экземпляром; валюта профиля не нужна
+            previous = _entry(op_type, row[0], None, *row[1:])
+        else:
+            previous = next(iter(_raw_entries(op_type, model.objects.filter(pk=instance.pk))), None)
+    setattr(instance, _PREVIOUS_ATTR, previous)
+
+
+def operation_saved(op_type: str, instance, created: bool) -> None:
+    """post_save: +1 новой операции или пересчёт старой и новой ячеек при изменении"""
+    previous = None if created else getattr(instance, _PREVIOUS_ATTR, None)
+    current = _instance_entry(op_type, instance)
+    setattr(instance, _PREVIOUS_ATTR, current)
+    if previous == current or (created and current is None):
+        return
+    if created and current['key'][1] < rolling_window(date.today())[0]:
+        # Операция задним числом за пределами окна — в Топ‑5 не попадёт
+        return
+
+    def apply():
+        if created:
+            _increment(current)
+            return
+        for entry in {e['key']: e for e in (previous, current) if e is not None}.values():
+            _recount_cell(op_type, entry)
+
+    _apply_safely(instance.profile_id, apply)
+    transaction.on_commit(lambda: profile_operations_changed(instance.profile_id))
+
+
+def operation_deleted(op_type: str, instance) -> None:
+    """После удаления операции: пересчитывает её ячейку"""
+    entry = _instance_entry(op_type, instance)
+    if entry is None:
+        return
+    _apply_safely(instance.profile_id, lambda: _recount_cell(op_type, entry))
+    transaction.on_commit(lambda: profile_operations_changed(instance.profile_id))
+
+
+def category_deleted(op_type: str, category_id: int) -> None:
+    """pre_delete категории: операции уйдут в "без категории" — пересобираем счётчики их профилей"""
+    profile_ids = list(
+        Top5Counter.objects.filter(op_type=op_type, category_id=category_id)
+        .values_list('profile_id', flat=True).distinct()
+    )
+    if profile_ids:
+        transaction.on_commit(lambda: rebuild_top5_counters(profile_ids))
+
+
+def top5_from_counters(profile_ids: Sequence[int], window_start: date, window_end: date) -> Dict[int, List[Dict]]:
+    """Ранжированный Топ‑5 профилей за окно по счётчикам"""
+    groups: Dict[int, Dict[str, Dict]] = {}
+    rows = Top5Counter.objects.filter(
+        profile_id__in=list(profile_ids), date__gte=window_start, date__lte=window_end,
+    )
+    for row in rows:
+        last_at = datetime.combine(row.date, row.last_time)
+        profile_groups = groups.setdefault(row.profile_id, {})
+        g = profile_groups.get(row.group_id)
+        if g is None:
+            profile_groups[row.group_id] = {
+                'title_norm': row.title_norm,
+                'title_display': row.title_display,
+                'category_id': row.category_id,
+                'category_kind': row.op_type,
+                'amount': Decimal(row.amount_norm),
+                # Точность валюты, а не decimal_places поля: от неё зависит id элемента
+                'amount_norm': _norm_amount(row.amount_norm, row.currency),
+                'currency': row.currency,
+                'op_type': row.op_type,
+                'count': row.count,
+                'last_at': last_at,
+            }
+            continue
+        g['count'] += row.count
+        if last_at > g['last_at']:
+            g['last_at'] = last_at
+            g['title_display'] = row.title_display
+    return {profile_id: _rank_top5(profile_groups) for profile_id, profile_groups in groups.items()}
+
+
+def calculate_top5_from_counters(profile, window_start: date, window_end: date) -> Tuple[List[Dict], str]:
+    """То же, что calculate_top5_sync, но по счётчикам (синхронно)"""
+    final = top5_from_counters([profile.id], window_start, window_end).get(profile.id, [])
+    expense_category_ids, income_category_ids = _top5_category_ids(final)
+    serialized = _serialize_top5(
+        final,
+        ExpenseCategory.objects.in_bulk(expense_category_ids),
+        IncomeCategory.objects.in_bulk(income_category_ids),
+        profile.language_code or 'ru',
+        profile.currency or 'RUB',
+    )
+    return serialized, _top5_digest(serialized)
+
+
+def refresh_snapshots_from_counters(profile_ids: Sequence[int], window_start: date,
+                                    window_end: date) -> Top5RefreshResult:
+    """Пересчитывает Топ‑5 профилей по счётчикам и пишет только изменившиеся снепшоты"""
+    result = Top5RefreshResult()
+    for batch in chunked(list(profile_ids), SAVE_BATCH_SIZE):
+        finals = top5_from_counters(batch, window_start, window_end)
+        known = dict(Top5Snapshot.objects.filter(profile_id__in=batch).values_list('profile_id', 'hash'))
+        pinned = set(Top5Pin.objects.filter(profile_id__in=batch).values_list('profile_id', flat=True))
+        changed = []
+        for profile_id in batch:
+            result.processed += 1
+            final = finals.get(profile_id, [])
+            digest = _top5_digest(final)
+            if known.get(profile_id) == digest or (profile_id not in known and not final):
+                continue
+            changed.append((profile_id, final, digest))
+        if changed:
+            _save_changed(changed, window_start, window_end, pinned, result)
+    return result
+
+
+def profile_operations_changed(profile_id: int) -> None:
+    """После коммита операции: обновить снепшот и закреп, только если Топ‑5 изменился"""
+    if not counters_seeded():
+        return
+    try:
+        result = refresh_snapshots_from_counters([profile_id], *rolling_window(date.today()))
+    except Exception as e:
+        logger.error("Failed to refresh Top-5 snapshot for %s: %s", log_safe_id(profile_id, "profile"), e)
+        return
+    if result.pinned_items:
+        from expense_bot.celery_tasks import refresh_top5_pin
+
+        refresh_top5_pin.delay(profile_id)
+
+
+def decay_top5_counters(window_start: date, window_end: date) -> Top5RefreshResult:
+    """Удаляет строки, вышедшие из окна, и пересчитывает Топ‑5 только их профилей"""
+    expired = Top5Counter.objects.filter(date__lt=window_start)
+    profile_ids = sorted(set(expired.values_list('profile_id', flat=True)))
+    expired.delete()
+    return refresh_snapshots_from_counters(profile_ids, window_start, window_end)
+
+
+def compute_top5_counters(profile_ids: Iterable[int], window_start: date) -> Dict[CellKey, Dict]:
+    """Счётчики по сырым операциям с window_start — эталон для пересборки"""
+    profile_ids = list(profile_ids)
+    cells: Dict[CellKey, Dict] = {}
+    for op_type, (model, date_field, _) in _OPERATION_MODELS.items():
+        queryset = model.objects.filter(profile_id__in=profile_ids, **{f'{date_field}__gte': window_start})
+        for entry in _raw_entries(op_type, queryset):
+            _merge(cells, entry)
+    return cells
+
+
+def rebuild_top5_counters(profile_ids: Iterable[int]) -> int:
+    """
+    Заполняет счётчики профилей заново по сырым операциям окна
+    и обновляет их снепшоты.
+
+    Returns:
+        Количество записанных строк счётчиков
+    """
+    profile_ids = list(profile_ids)
+    window_start, window_end = rolling_window(date.today())
+
+    with transaction.atomic():
+        # Блокируем строки профилей, чтобы сигналы не писали в них во время пересборки
+        list(
+            Top5Counter.objects.select_for_update()
+            .filter(profile_id__in=profile_ids)
+            .values_list('id', flat=True)
+        )
+        cells = compute_top5_counters(profile_ids, window_start)
+        Top5Counter.objects.filter(profile_id__in=profile_ids).delete()
+        Top5Counter.objects.bulk_create([_counter(cell) for cell in cells.values()], batch_size=1000)
+
+    refresh_snapshots_from_counters(profile_ids, window_start, window_end)
+    return len(cells)
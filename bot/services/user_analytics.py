@@ -0,0 +1,152 @@
+"""
+Ежедневная аналитика пользователей (UserAnalytics) для collect_daily_analytics.
+
+Вместо нескольких запросов на каждого активного пользователя — четыре
+GROUP BY по всем профилям за день (траты с разбивкой AI/вручную, траты по
+категориям, доходы, профили с новыми подписками), сборка строк в памяти
+и один upsert bulk_create(update_conflicts=True).
+
+voice_messages и photos_sent в upsert не входят: их инкрементируют в
+течение дня VoiceToTextMiddleware и handle_photo_expense
+(increment_analytics_counter), новая строка получает default=0.
+"""
+import logging
+from datetime import date, datetime, time
+from typing import Dict, List
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from expenses.models import Expense, Income, Subscription, UserAnalytics
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 1000
+
+# Всё, что пересчитывается по операциям дня (кроме счётчиков реального времени)
+UPSERT_FIELDS = [
+    'messages_sent',
+    'commands_used',
+    'expenses_added',
+    'incomes_added',
+    'categories_used',
+    'ai_categorizations',
+    'manual_categorizations',
+    'cashback_calculated',
+    'cashback_transactions',
+    'errors_encountered',
+    'error_types',
+    'total_session_time',
+    'peak_hour',
+    'pdf_reports_generated',
+    'recurring_payments_processed',
+    'budget_checks',
+    'updated_at',
+]
+
+
+def _day_bounds(target_date: date):
+    return (
+        timezone.make_aware(datetime.combine(target_date, time.min)),
+        timezone.make_aware(datetime.combine(target_date, time.max)),
+    )
+
+
+def build_daily_analytics(target_date: date) -> List[UserAnalytics]:
+    """Строки UserAnalytics за день для всех профилей с тратами, доходами или подписками"""
+    target_start, target_end = _day_bounds(target_date)
+    created = {'created_at__gte': target_start, 'created_at__lte': target_end}
+
+    expense_stats = {
+        row['profile_id']: row
+        for row in Expense.objects.filter(**created)
+        .order_by()
+        .values('profile_id')
+        .annotate(
+            count=Count('id'),
+            ai_categorized_count=Count('id', filter=Q(ai_categorized=True)),
+            manual_categorized_count=Count('id', filter=Q(ai_categorized=False)),
+        )
+    }
+
+    categories_used: Dict[int, Dict[str, int]] = {}
+    category_rows = (
+        Expense.objects.filter(category__isnull=False, **created)
+        .order_by()
+        .values_list('profile_id', 'category_id')
+        .annotate(count=Count('id'))
+    )
+    for profile_id, category_id, count in category_rows:
+        categories_used.setdefault(profile_id, {})[str(category_id)] = count
+
+    income_counts = dict(
+        Income.objects.filter(**created)
+        .order_by()
+        .values_list('profile_id')
+        .annotate(count=Count('id'))
+    )
+
+    subscribed = set(
+        Subscription.objects.filter(**created).order_by().values_list('profile_id', flat=True).distinct()
+    )
+
+    rows = []
+    for profile_id in sorted(set(expense_stats) | set(income_counts) | subscribed):
+        stats = expense_stats.get(profile_id, {})
+        expenses_count = stats.get('count', 0)
+        incomes_count = income_counts.get(profile_id, 0)
+
+        # Определяем команды (заглушка)
+        commands_used = {}
+        if expenses_count:
+            commands_used['expense_add'] = expenses_count
+        if incomes_count:
+            commands_used['income_add'] = incomes_count
+
+        # Кешбэк, ошибки, время сессии, PDF, регулярные платежи и бюджеты — пока заглушки
+        rows.append(UserAnalytics(
+            profile_id=profile_id,
+            date=target_date,
+            # messages_sent — примерно по количеству расходов (заглушка)
+            messages_sent=expenses_count,
+            commands_used=commands_used,
+            expenses_added=expenses_count,
+            incomes_added=incomes_count,
+            categories_used=categories_used.get(profile_id, {}),
+            ai_categorizations=stats.get('ai_categorized_count', 0),
+            manual_categorizations=stats.get('manual_categorized_count', 0),
+            cashback_calculated=0,
+            cashback_transactions=0,
+            errors_encountered=0,
+            error_types={},
+            total_session_time=0,
+            peak_hour=None,
+            pdf_reports_generated=0,
+            recurring_payments_processed=0,
+            budget_checks=0,
+        ))
+    return rows
+
+
+def collect_user_analytics(target_date: date) -> Dict[str, int]:
+    """
+    Пересчитывает UserAnalytics за день одним upsert.
+
+    Returns:
+        processed_profiles, created_analytics, updated_analytics
+    """
+    rows = build_daily_analytics(target_date)
+    existing = set(UserAnalytics.objects.filter(date=target_date).values_list('profile_id', flat=True))
+    UserAnalytics.objects.bulk_create(
+        rows,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['profile', 'date'],
+        update_fields=UPSERT_FIELDS,
+    )
+    created = sum(1 for row in rows if row.profile_id not in existing)
+    return {
+        'processed_profiles': len(rows),
+        'created_analytics': created,
+        'updated_analytics': len(rows) - created,
+    }
@@ -0,0 +1,249 @@
+"""
+Ограниченная по памяти статистика активности бота.
+
+Раньше ActivityTrackerMiddleware копил множество всех user_id, словарь
+всех команд и список ошибок — память долгоживущего процесса росла
+с числом пользователей. Здесь размер каждой структуры фиксирован:
+
+- HyperLogLog — оценка числа уникальных пользователей (4 КБ, ошибка ~1.6%);
+- TopKCounter — Space-Saving счётчик самых частых команд (не больше k ключей);
+- deque(maxlen) — кольцевой буфер последних ошибок.
+
+Дельты между сбросами (запросы, пользователи, команды, ошибки) копятся
+отдельно и раз в интервал одним pipeline переносятся в Redis
+(flush_activity_batch). Там лежит общая для всех инстансов дневная
+статистика — её читает read_activity_snapshot (админка, /panel/api/activity/).
+"""
+import hashlib
+import json
+import math
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+ACTIVITY_KEY_PREFIX = 'activity'
+ACTIVITY_KEY_TTL = 8 * 86400
+USER_ACTIVITY_TTL = 3600
+ERRORS_KEEP = 50
+
+DEFAULT_TOP_COMMANDS = 50
+DEFAULT_MAX_ERRORS = 50
+DEFAULT_MAX_PENDING_USERS = 10_000
+
+
+class HyperLogLog:
+    """Оценка количества уникальных значений в фиксированной памяти (2**precision байт)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, value: Any) -> None:
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __len__(self) -> int:
+        estimate = self._alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Поправка для малых значений (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def clear(self) -> None:
+        self.registers = bytearray(self.size)
+
+
+class TopKCounter:
+    """
+    Счётчик частых ключей (алгоритм Space-Saving) не больше чем на capacity ключей.
+
+    При переполнении вытесняется ключ с минимальным счётчиком, а новый ключ
+    наследует его значение + 1. Для ключей из top-k счётчики завышены не
+    больше чем на минимальный счётчик.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_COMMANDS):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, key: str, count: int = 1) -> None:
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(evicted) + count
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return items if n is None else items[:n]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def clear(self) -> None:
+        self.counts = {}
+
+
+@dataclass
+class ActivityBatch:
+    """Дельта статистики между двумя сбросами в Redis"""
+    requests: int = 0
+    users: Counter = field(default_factory=Counter)  # user_id -> запросов
+    commands: Dict[str, int] = field(default_factory=dict)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.requests or self.errors)
+
+
+class ActivityMetrics:
+    """Статистика процесса бота с фиксированным потолком памяти"""
+
+    def __init__(self,
+                 top_commands: int = DEFAULT_TOP_COMMANDS,
+                 max_errors: int = DEFAULT_MAX_ERRORS,
+                 max_pending_users: int = DEFAULT_MAX_PENDING_USERS):
+        self.top_commands = top_commands
+        self.max_errors = max_errors
+        self.max_pending_users = max_pending_users
+
+        self.total_requests = 0
+        self.unique_users = HyperLogLog()
+        self.commands = TopKCounter(top_commands)
+        self.errors: Deque[Dict[str, Any]] = deque(maxlen=max_errors)
+        self.errors_count = 0
+        self.started_at = datetime.now()
+
+        self._pending = self._new_batch()
+
+    def _new_batch(self) -> ActivityBatch:
+        return ActivityBatch(errors=deque(maxlen=self.max_errors))
+
+    def record_request(self, user_id: int, command: Optional[str] = None) -> None:
+        self.total_requests += 1
+        self.unique_users.add(user_id)
+        self._pending.requests += 1
+        self._pending.users[user_id] += 1
+        if command:
+            self.commands.add(command)
+            # Дельта команд ограничена тем же потолком, что и top-k
+            if command in self._pending.commands or len(self._pending.commands) < self.top_commands:
+                self._pending.commands[command] = self._pending.commands.get(command, 0) + 1
+
+    def record_error(self, error_info: Dict[str, Any]) -> None:
+        self.errors_count += 1
+        self.errors.append(error_info)
+        self._pending.errors.append(error_info)
+
+    @property
+    def pending_full(self) -> bool:
+        """Пора сбрасывать досрочно — буфер пользователей заполнен"""
+        return len(self._pending.users) >= self.max_pending_users
+
+    def drain(self) -> ActivityBatch:
+        """Забирает накопленную дельту и начинает новую"""
+        batch, self._pending = self._pending, self._new_batch()
+        batch.errors = list(batch.errors)
+        return batch
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            'since': self.started_at.isoformat(),
+            'total_requests': self.total_requests,
+            'unique_users': len(self.unique_users),
+            'popular_commands': self.commands.most_common(top),
+            'errors_count': self.errors_count,
+            'recent_errors': list(self.errors)[-5:],
+        }
+
+    def reset(self) -> None:
+        self.total_requests = 0
+        self.unique_users.clear()
+        self.commands.clear()
+        self.errors.clear()
+        self.errors_count = 0
+        self.started_at = datetime.now()
+
+
+def _day_key(day: date, suffix: str) -> str:
+    return f"{ACTIVITY_KEY_PREFIX}:{day.isoformat()}:{suffix}"
+
+
+def _user_activity_key(user_id: int, now: datetime) -> str:
+    return f"user_activity:{user_id}:{now.strftime('%Y%m%d%H')}"
+
+
+def flush_activity_batch(connection, batch: ActivityBatch, now: Optional[datetime] = None) -> Dict[int, int]:
+    """
+    Переносит дельту в Redis одним pipeline.
+
+    Returns:
+        {user_id: запросов за текущий час по всем инстансам}
+    """
+    now = now or datetime.now()
+    day = now.date()
+    pipe = connection.pipeline(transaction=False)
+
+    if batch.requests:
+        requests_key = _day_key(day, 'requests')
+        pipe.incrby(requests_key, batch.requests)
+        pipe.expire(requests_key, ACTIVITY_KEY_TTL)
+    if batch.users:
+        users_key = _day_key(day, 'users')
+        pipe.pfadd(users_key, *batch.users)
+        pipe.expire(users_key, ACTIVITY_KEY_TTL)
+    if batch.commands:
+        commands_key = _day_key(day, 'commands')
+        for command, count in batch.commands.items():
+            pipe.zincrby(commands_key, count, command)
+        pipe.expire(commands_key, ACTIVITY_KEY_TTL)
+    if batch.errors:
+        errors_key = f"{ACTIVITY_KEY_PREFIX}:errors"
+        pipe.lpush(errors_key, *[json.dumps(error, ensure_ascii=False) for error in batch.errors])
+        pipe.ltrim(errors_key, 0, ERRORS_KEEP - 1)
+
+    user_ids = list(batch.users)
+    for user_id in user_ids:
+        key = _user_activity_key(user_id, now)
+        pipe.incrby(key, batch.users[user_id])
+        pipe.expire(key, USER_ACTIVITY_TTL)
+
+    results = pipe.execute()
+    # Последние 2 * len(user_ids) результатов — пары (INCRBY, EXPIRE)
+    user_results = results[len(results) - 2 * len(user_ids):]
+    return {user_id: int(user_results[2 * i]) for i, user_id in enumerate(user_ids)}
+
+
+def read_activity_snapshot(connection, day: Optional[date] = None, top: int = 10) -> Dict[str, Any]:
+    """Дневная статистика всех инстансов бота из Redis"""
+    day = day or datetime.now().date()
+    pipe = connection.pipeline(transaction=False)
+    pipe.get(_day_key(day, 'requests'))
+    pipe.pfcount(_day_key(day, 'users'))
+    pipe.zrevrange(_day_key(day, 'commands'), 0, top - 1, withscores=True)
+    pipe.lrange(f"{ACTIVITY_KEY_PREFIX}:errors", 0, 9)
+    requests, users, commands, errors = pipe.execute()
+
+    def _text(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    return {
+        'date': day.isoformat(),
+        'total_requests': int(requests or 0),
+        'unique_users': int(users or 0),
+        'popular_commands': [(_text(command), int(score)) for command, score in commands],
+        'recent_errors': [json.loads(_text(error)) for error in errors],
+    }
+
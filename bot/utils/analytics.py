@@ -32,9 +32,14 @@ def increment_analytics_counter(
         value: На сколько увеличить счётчик (по умолчанию 1)
     """
     from expenses.models import Profile, UserAnalytics
+    from bot.utils.request_context import get_request_context
 
     try:
-        profile = Profile.objects.filter(telegram_id=telegram_id).first()
+        context = get_request_context(telegram_id)
+        if context is not None:
+            profile = context.profile
+        else:
+            profile = Profile.objects.filter(telegram_id=telegram_id).first()
         if not profile:
             logger.warning(
                 f"[Analytics] Profile not found for telegram_id={telegram_id}"
@@ -0,0 +1,80 @@
+"""
+Параллельное выполнение чтений из БД в процессе бота.
+
+sync_to_async (и async ORM Django: aget, afirst, async for — внутри это
+тот же sync_to_async) по умолчанию thread_sensitive: вся работа с БД
+процесса идёт в одном потоке, и пользователи ждут друг друга в очереди.
+
+Горячие чтения (язык, категории, сводки, последние траты, статусы
+лимитов) выполняются через @parallel_read в отдельном ограниченном пуле
+потоков (settings.BOT_DB_READ_THREADS): у каждого потока своё соединение,
+поэтому одновременно идёт до BOT_DB_READ_THREADS запросов.
+
+После каждого вызова соединение потока освобождается так же, как в
+DatabaseMiddleware: устаревшие и сломанные закрываются, остальные
+переиспользуются. Записи и транзакции остаются в общем потоке ORM
+(обычный sync_to_async) — так их порядок не меняется.
+BOT_DB_PARALLEL_READS=false возвращает выполнение в общий поток.
+"""
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BOT_DB_READ_THREADS', 4),
+                    thread_name_prefix='db-read',
+                )
+    return _executor
+
+
+def _release_thread_connections() -> None:
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is None:
+            continue
+        try:
+            conn.close_if_unusable_or_obsolete()
+        except Exception as e:
+            # Результат чтения уже получен — не теряем его из-за соединения
+            logger.warning("Failed to release DB connection %s: %s", conn.alias, e)
+
+
+def _run_and_release(func: Callable, *args, **kwargs) -> Any:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _release_thread_connections()
+
+
+async def run_read(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронное чтение из БД в пуле потоков чтения"""
+    if not getattr(settings, 'BOT_DB_PARALLEL_READS', False):
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(
+        _run_and_release, thread_sensitive=False, executor=_get_executor()
+    )(func, *args, **kwargs)
+
+
+def parallel_read(func: Callable) -> Callable:
+    """Аналог @sync_to_async для функций, которые только читают из БД"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_read(func, *args, **kwargs)
+
+    return wrapper
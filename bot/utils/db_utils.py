@@ -4,7 +4,9 @@
 import logging
 from typing import Optional
 from asgiref.sync import sync_to_async
+from bot.utils.db_executor import parallel_read
 from bot.utils.logging_safe import log_safe_id
+from bot.utils.request_context import get_request_context, remember_profile
 from expenses.models import Profile, ExpenseCategory
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,10 @@ def get_or_create_user_profile_sync(telegram_id: int, **defaults) -> Profile:
     Returns:
         Profile: Профиль пользователя
     """
+    context = get_request_context(telegram_id)
+    if context is not None and context.profile is not None:
+        return context.profile
+
     profile, created = Profile.objects.get_or_create(
         telegram_id=telegram_id,
         defaults={
@@ -30,6 +36,7 @@ def get_or_create_user_profile_sync(telegram_id: int, **defaults) -> Profile:
     )
     if created:
         logger.info("Created new profile for %s", log_safe_id(telegram_id, "user"))
+    remember_profile(profile)
     return profile
 
 
@@ -45,6 +52,10 @@ def get_or_create_user_profile(telegram_id: int, **defaults) -> Profile:
     Returns:
         Profile: Профиль пользователя
     """
+    context = get_request_context(telegram_id)
+    if context is not None and context.profile is not None:
+        return context.profile
+
     profile, created = Profile.objects.get_or_create(
         telegram_id=telegram_id,
         defaults={
@@ -54,6 +65,7 @@ def get_or_create_user_profile(telegram_id: int, **defaults) -> Profile:
     )
     if created:
         logger.info("Created new profile for %s", log_safe_id(telegram_id, "user"))
+    remember_profile(profile)
     return profile
 
 
@@ -97,7 +109,7 @@ def update_user_profile(telegram_id: int, **kwargs) -> Optional[Profile]:
         return None
 
 
-@sync_to_async
+@parallel_read
 def get_user_categories(telegram_id: int, include_system: bool = True) -> list[ExpenseCategory]:
     """
     Получить категории пользователя
@@ -2,12 +2,12 @@
 Shared definitions and helpers for expense categories.
 Объединенные ключевые слова для категорий расходов (русские + английские).
 """
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 # ВАЖНО: Импортируем из централизованного модуля (включает ZWJ для композитных эмодзи)
 from bot.utils.emoji_utils import strip_leading_emoji
-# НОВАЯ СИСТЕМА: Импортируем централизованную функцию матчинга
-from bot.utils.keyword_service import match_keyword_in_text
+# Предкомпилированный индекс с семантикой match_keyword_in_text()
+from bot.utils.keyword_index import KeywordIndex
 
 
 # ВАЖНО: Поле 'description' — краткое СМЫСЛОВОЕ описание границ категории (на английском,
@@ -431,26 +431,43 @@ def normalize_expense_category_key(label: Optional[str]) -> Optional[str]:
     return None
 
 
-def detect_expense_category_key(text: str) -> Optional[str]:
-    """Detect a category key by checking keywords against the text."""
-    # Track best match with score
-    best_key = None
-    best_score = 0
+def _build_expense_keyword_index() -> Tuple[KeywordIndex, List[str], Dict[str, int]]:
+    """Build the keyword index once at import time.
 
+    Returns the index, entry_id -> category key, and category key -> order
+    (for the "first category wins on equal score" tie-break).
+    """
+    index = KeywordIndex()
+    entry_keys: List[str] = []
+    key_order: Dict[str, int] = {}
     for key, data in EXPENSE_CATEGORY_DEFINITIONS.items():
         if key == DEFAULT_EXPENSE_CATEGORY_KEY:
             continue
-
-        score = 0
+        key_order[key] = len(key_order)
         for keyword in data.get('keywords', []):
-            # 2-уровневая проверка: exact (фраза целиком ±1 буква) + word (одиночное слово ±1 буква)
-            # Stop-words удаляются из keyword и text перед сравнением
-            matched, match_type = match_keyword_in_text(keyword, text)
-            if matched:
-                score += 1
+            if index.add(keyword) is not None:
+                entry_keys.append(key)
+    return index, entry_keys, key_order
+
+
+_EXPENSE_KEYWORD_INDEX, _EXPENSE_ENTRY_KEYS, _EXPENSE_KEY_ORDER = _build_expense_keyword_index()
+
 
-        if score > best_score:
-            best_score = score
-            best_key = key
+def detect_expense_category_key(text: str) -> Optional[str]:
+    """Detect a category key by checking keywords against the text.
+
+    Score = number of category keywords matched (2-уровневая проверка:
+    exact фраза ±1 буква + word ±1 буква, см. match_keyword_in_text).
+    Keywords предкомпилированы в KeywordIndex, поэтому текст нормализуется
+    один раз, а поиск — несколько dict-lookup на слово.
+    """
+    scores: Dict[str, int] = {}
+    for entry_id in _EXPENSE_KEYWORD_INDEX.match(text):
+        key = _EXPENSE_ENTRY_KEYS[entry_id]
+        scores[key] = scores.get(key, 0) + 1
+
+    if not scores:
+        return None
 
-    return best_key
+    # Максимальный score; при равенстве — категория, объявленная раньше
+    return min(scores, key=lambda key: (-scores[key], _EXPENSE_KEY_ORDER[key]))
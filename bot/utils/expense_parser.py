@@ -12,6 +12,7 @@ from asgiref.sync import sync_to_async
 from bot.utils.language import get_text
 from bot.utils.emoji_utils import strip_leading_emoji
 from bot.utils.keyword_service import match_keyword_in_text
+from bot.utils.keyword_matcher import get_expense_keyword_matcher
 from bot.utils.logging_safe import log_safe_id, summarize_text
 
 logger = logging.getLogger(__name__)
@@ -994,91 +995,28 @@ async def parse_expense_message(text: str, user_id: Optional[int] = None, profil
 
     # Сначала проверяем пользовательские категории, если есть профиль
     if profile:
-        from expenses.models import ExpenseCategory, CategoryKeyword
-        from asgiref.sync import sync_to_async
-        
-        # Получаем категории пользователя с их ключевыми словами
-        @sync_to_async
-        def get_user_categories():
-            return list(ExpenseCategory.objects.filter(profile=profile).prefetch_related('keywords'))
-        
-        user_categories = await get_user_categories()
-        
-        # Проверяем каждую категорию пользователя
-        for user_cat in user_categories:
-            # Собираем все варианты названия категории (без эмодзи) для сравнения
-            category_names_to_check = []
-
-            # Основное название (очищенное от эмодзи)
-            if user_cat.name:
-                clean_name = strip_leading_emoji(user_cat.name).lower().strip()
-                if clean_name:
-                    category_names_to_check.append(clean_name)
-
-            # Мультиязычные названия (name_ru, name_en) - также очищаем от эмодзи
-            if hasattr(user_cat, 'name_ru') and user_cat.name_ru:
-                clean_name_ru = strip_leading_emoji(user_cat.name_ru).lower().strip()
-                if clean_name_ru and clean_name_ru not in category_names_to_check:
-                    category_names_to_check.append(clean_name_ru)
-
-            if hasattr(user_cat, 'name_en') and user_cat.name_en:
-                clean_name_en = strip_leading_emoji(user_cat.name_en).lower().strip()
-                if clean_name_en and clean_name_en not in category_names_to_check:
-                    category_names_to_check.append(clean_name_en)
-
-            # Проверяем прямое вхождение названия категории в текст (ЦЕЛЫМ СЛОВОМ)
-            category_matched = False
-            for cat_name in category_names_to_check:
-                matched, match_type = match_keyword_in_text(cat_name, text_for_keywords)
-                if matched:
-                    # Используем язык пользователя для отображения категории
-                    lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
-                    category = get_category_display_name(user_cat, lang_code)
-                    max_score = 100  # Максимальный приоритет для пользовательских категорий
-                    category_matched = True
-                    logger.debug("[KEYWORD MATCH] Matched category name via %s", match_type)
-                    break
-
-            if category_matched:
-                break
-
-            # Проверяем ключевые слова пользовательской категории
-            @sync_to_async
-            def get_keywords():
-                return list(user_cat.keywords.all())
-
-            keywords = await get_keywords()
-            for kw in keywords:
-                # ИЗМЕНЕНО: Используем match_keyword_in_text вместо `in` для точного совпадения целых слов
-                # Используем text_for_keywords (текст без суммы) для поиска
-                matched, match_type = match_keyword_in_text(kw.keyword, text_for_keywords)
-                if matched:
-                    # Обновляем last_used и usage_count при использовании ключевого слова
-                    @sync_to_async
-                    def update_keyword_usage():
-                        from django.db.models import F
-                        from django.utils import timezone
-                        # Атомарный апдейт через F() — без read-modify-write,
-                        # чтобы исключить lost-update при параллельных вызовах.
-                        # При .update() auto_now не срабатывает, поэтому last_used ставим явно.
-                        CategoryKeyword.objects.filter(id=kw.id).update(
-                            usage_count=F('usage_count') + 1,
-                            last_used=timezone.now(),
-                        )
-
-                    await update_keyword_usage()
+        from bot.services.keyword_usage import arecord_keyword_usage
+
+        # Скомпилированный матчер (названия категорий + keywords) кешируется
+        # в памяти процесса и сбрасывается сигналами при изменении категорий/keywords
+        matcher = await get_expense_keyword_matcher(profile)
+        user_categories = matcher.categories
+
+        keyword_match = matcher.match(text_for_keywords)
+        if keyword_match:
+            if keyword_match.keyword_id is not None:
+                # usage_count/last_used копятся в буфере и пишутся в БД
+                # пачками задачей flush_keyword_usage (без UPDATE в обработчике)
+                await arecord_keyword_usage(keyword_match.keyword_id)
+                logger.debug("[KEYWORD MATCH] Expense keyword matched via %s", keyword_match.match_type)
+            else:
+                logger.debug("[KEYWORD MATCH] Matched category name via %s", keyword_match.match_type)
 
-                    # Используем язык пользователя для отображения категории
-                    lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
-                    category = get_category_display_name(user_cat, lang_code)
-                    logger.debug("[KEYWORD MATCH] Expense keyword matched via %s", match_type)
+            # Используем язык пользователя для отображения категории
+            lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
+            category = get_category_display_name(keyword_match.category, lang_code)
+            max_score = 100  # Максимальный приоритет для пользовательских категорий
 
-                    max_score = 100
-                    break
-            
-            if category:
-                break
-    
     # Переменная для хранения category_key
     category_key = None
 
@@ -1170,20 +1108,14 @@ async def parse_expense_message(text: str, user_id: Optional[int] = None, profil
             logger.debug("No category found by keywords, will use AI (%s)", summarize_text(text))
         else:
             # Проверяем, есть ли такая категория у пользователя
-            from expenses.models import ExpenseCategory
-            from asgiref.sync import sync_to_async
-            @sync_to_async
-            def get_user_category_names():
-                categories = ExpenseCategory.objects.filter(profile=profile)
-                lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
-                return [get_category_display_name(cat, lang_code) for cat in categories]
+            # (категории уже загружены вместе с матчером)
+            lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
+            user_category_names = [get_category_display_name(cat, lang_code) for cat in user_categories]
 
-            user_categories = await get_user_category_names()
-            
             # Проверяем точное и частичное совпадение
             category_exists = any(
-                category.lower() in cat.lower() or cat.lower() in category.lower() 
-                for cat in user_categories
+                category.lower() in cat.lower() or cat.lower() in category.lower()
+                for cat in user_category_names
             )
             
             if not category_exists:
@@ -1195,14 +1127,9 @@ async def parse_expense_message(text: str, user_id: Optional[int] = None, profil
                 from bot.services.ai_selector import get_service, get_fallback_chain, AISelector
                 
                 # Получаем категории пользователя на нужном языке
-                @sync_to_async
-                def get_profile_categories():
-                    categories = ExpenseCategory.objects.filter(profile=profile)
-                    # Используем язык пользователя для отображения категорий
-                    lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
-                    return [get_category_display_name(cat, lang_code) for cat in categories]
-
-                user_categories = await get_profile_categories()
+                # Используем язык пользователя для отображения категорий
+                lang_code = profile.language_code if hasattr(profile, 'language_code') else 'ru'
+                user_categories = [get_category_display_name(cat, lang_code) for cat in user_categories]
                 
                 if user_categories:
                     # Получаем контекст пользователя (недавние категории)
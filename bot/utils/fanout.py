@@ -0,0 +1,75 @@
+"""
+Общие части фоновых рассылок по всем пользователям (fan-out в Celery).
+
+Beat-задача делит список profile_id на чанки и ставит по задаче на чанк,
+чтобы работу разобрали все воркеры очереди, а один сбой или таймаут
+затрагивал только свой чанк. Прогресс всей рассылки — hash в Redis
+(BatchProgress), общий для всех воркеров.
+"""
+import logging
+from typing import Dict, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY_PREFIX = 'fanout_progress'
+PROGRESS_TTL = 7 * 86400
+
+
+def chunked(items: Sequence, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+
+class BatchProgress:
+    """
+    Счётчики рассылки в Redis: total и по статусам (sent, failed, ...).
+
+    remaining = total - сумма всех статусов. Ошибки Redis не прерывают
+    рассылку — прогресс только логируется.
+    """
+
+    def __init__(self, name: str, connection=None):
+        self.name = name
+        self.key = f"{PROGRESS_KEY_PREFIX}:{name}"
+        self._connection = connection
+
+    def _get_connection(self):
+        if self._connection is None:
+            from django_redis import get_redis_connection
+            self._connection = get_redis_connection("default")
+        return self._connection
+
+    def start(self, total: int) -> None:
+        try:
+            pipe = self._get_connection().pipeline(transaction=True)
+            pipe.delete(self.key)
+            pipe.hset(self.key, 'total', total)
+            pipe.expire(self.key, PROGRESS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cannot reset progress {self.name}: {e}")
+
+    def add(self, counts: Dict[str, int]) -> None:
+        counts = {status: count for status, count in counts.items() if count}
+        if not counts:
+            return
+        try:
+            pipe = self._get_connection().pipeline(transaction=True)
+            for status, count in counts.items():
+                pipe.hincrby(self.key, status, count)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cannot update progress {self.name}: {e}")
+
+    def snapshot(self) -> Dict[str, int]:
+        try:
+            raw = self._get_connection().hgetall(self.key)
+        except Exception as e:
+            logger.warning(f"Cannot read progress {self.name}: {e}")
+            return {}
+        counts = {
+            (field.decode() if isinstance(field, bytes) else field): int(value)
+            for field, value in raw.items()
+        }
+        total = counts.pop('total', 0)
+        return {'total': total, **counts, 'remaining': max(total - sum(counts.values()), 0)}
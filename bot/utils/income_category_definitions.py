@@ -1,12 +1,12 @@
 """
 Shared definitions and helpers for income categories.
 """
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 # ВАЖНО: Импортируем из централизованного модуля (включает ZWJ для композитных эмодзи)
 from bot.utils.emoji_utils import strip_leading_emoji
-# НОВАЯ СИСТЕМА: Импортируем централизованную функцию матчинга
-from bot.utils.keyword_service import match_keyword_in_text
+# Предкомпилированный индекс с семантикой match_keyword_in_text()
+from bot.utils.keyword_index import KeywordIndex
 
 
 # ВАЖНО: Поле 'description' — краткое СМЫСЛОВОЕ описание границ категории (на английском,
@@ -148,18 +148,31 @@ def normalize_income_category_key(label: Optional[str]) -> Optional[str]:
     return None
 
 
+def _build_income_keyword_index() -> Tuple[KeywordIndex, List[str]]:
+    """Build the keyword index once at import time (entry_id -> category key)."""
+    index = KeywordIndex()
+    entry_keys: List[str] = []
+    for key, data in INCOME_CATEGORY_DEFINITIONS.items():
+        if key == DEFAULT_INCOME_CATEGORY_KEY:
+            continue
+        for keyword in data.get('keywords', []):
+            if index.add(keyword) is not None:
+                entry_keys.append(key)
+    return index, entry_keys
+
+
+_INCOME_KEYWORD_INDEX, _INCOME_ENTRY_KEYS = _build_income_keyword_index()
+
+
 def detect_income_category_key(text: str) -> Optional[str]:
     """Detect a category key by checking keywords against the text.
 
     2-уровневая проверка: exact (фраза целиком ±1 буква) + word (одиночное слово ±1 буква).
     Stop-words удаляются из keyword и text перед сравнением.
     Поддерживает склонения ("зарплата" совпадет с "зарплату", "зарплаты").
+    Побеждает первая по порядку категория, у которой совпал хотя бы один keyword.
     """
-    for key, data in INCOME_CATEGORY_DEFINITIONS.items():
-        if key == DEFAULT_INCOME_CATEGORY_KEY:
-            continue
-        for keyword in data.get('keywords', []):
-            matched, match_type = match_keyword_in_text(keyword, text)
-            if matched:
-                return key
-    return None
+    found = _INCOME_KEYWORD_INDEX.first_match(text)
+    if not found:
+        return None
+    return _INCOME_ENTRY_KEYS[found[0]]
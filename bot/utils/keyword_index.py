@@ -0,0 +1,167 @@
+"""
+Предкомпилированный индекс keywords для быстрого матчинга.
+
+Семантика полностью повторяет match_keyword_in_text() из keyword_service.py:
+- Уровень 1 (Exact): очищенный текст == keyword, либо ±1 буква на всю фразу
+  (только для keywords до 15 символов)
+- Уровень 2 (Word): keyword из одного слова совпадает с любым словом текста (±1 буква)
+
+Вместо O(keywords) вызовов match_keyword_in_text() (каждый из которых заново
+нормализует и текст, и keyword) индекс строится один раз, а поиск — это
+несколько dict-lookup на каждое слово текста.
+
+Правило ±1 буквы (words_match_with_inflection) раскладывается на три случая:
+- одинаковая длина, отличается одна позиция  -> таблица "масок" (слово с \\0 на месте i)
+- keyword длиннее на 1 и текст его префикс   -> таблица keyword[:-1]
+- текст длиннее на 1 и keyword его префикс   -> exact-таблица по text[:-1]
+Оба слова должны быть длиннее 3 символов, иначе допускается только exact.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from bot.utils.keyword_service import normalize_keyword_text, remove_stop_words
+
+# Максимальная длина keyword, для которой разрешено ±1 буква на всю фразу
+PHRASE_INFLECTION_MAX_LEN = 15
+# Слова короче этого порога сравниваются только exact
+INFLECTION_MIN_LEN = 4
+
+_MASK_CHAR = '\0'  # Не может встретиться в нормализованном тексте
+
+
+def clean_text_for_matching(text: str) -> str:
+    """Нормализация + удаление stop words (как в match_keyword_in_text)."""
+    return remove_stop_words(normalize_keyword_text(text))
+
+
+def _masks(word: str):
+    """Все варианты слова с одной "замаскированной" позицией."""
+    for i in range(len(word)):
+        yield word[:i] + _MASK_CHAR + word[i + 1:]
+
+
+class KeywordIndex:
+    """
+    Индекс keywords с семантикой match_keyword_in_text().
+
+    Каждому добавленному keyword присваивается порядковый номер (entry id).
+    match() возвращает словарь {entry_id: match_type} для всех совпавших keywords,
+    поэтому вызывающий код сам решает, как агрегировать результат
+    (первое совпадение по порядку, подсчёт очков по категориям и т.д.).
+    """
+
+    __slots__ = (
+        'keywords', '_phrase_exact', '_phrase_masks', '_phrase_truncated',
+        '_word_exact', '_word_masks', '_word_truncated',
+    )
+
+    def __init__(self) -> None:
+        # entry_id -> очищенный keyword
+        self.keywords: List[str] = []
+        # Уровень 1: фраза целиком
+        self._phrase_exact: Dict[str, List[int]] = {}
+        self._phrase_masks: Dict[str, List[int]] = {}
+        self._phrase_truncated: Dict[str, List[int]] = {}
+        # Уровень 2: keywords из одного слова
+        self._word_exact: Dict[str, List[int]] = {}
+        self._word_masks: Dict[str, List[int]] = {}
+        self._word_truncated: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    @staticmethod
+    def _put(table: Dict[str, List[int]], key: str, entry_id: int) -> None:
+        table.setdefault(key, []).append(entry_id)
+
+    def add(self, keyword: str) -> Optional[int]:
+        """
+        Добавляет keyword в индекс.
+
+        Returns:
+            entry_id или None, если после очистки keyword пустой
+        """
+        cleaned = clean_text_for_matching(keyword)
+        if len(cleaned) < 2:
+            return None
+
+        entry_id = len(self.keywords)
+        self.keywords.append(cleaned)
+        length = len(cleaned)
+
+        self._put(self._phrase_exact, cleaned, entry_id)
+        if INFLECTION_MIN_LEN <= length <= PHRASE_INFLECTION_MAX_LEN:
+            for mask in _masks(cleaned):
+                self._put(self._phrase_masks, mask, entry_id)
+            if length > INFLECTION_MIN_LEN:
+                self._put(self._phrase_truncated, cleaned[:-1], entry_id)
+
+        if ' ' not in cleaned:
+            self._put(self._word_exact, cleaned, entry_id)
+            if length >= INFLECTION_MIN_LEN:
+                for mask in _masks(cleaned):
+                    self._put(self._word_masks, mask, entry_id)
+                if length > INFLECTION_MIN_LEN:
+                    self._put(self._word_truncated, cleaned[:-1], entry_id)
+
+        return entry_id
+
+    def match(self, text: str) -> Dict[int, str]:
+        """Ищет совпадения в сыром тексте (нормализуется один раз)."""
+        return self.match_cleaned(clean_text_for_matching(text))
+
+    def match_cleaned(self, cleaned_text: str) -> Dict[int, str]:
+        """
+        Ищет совпадения в уже очищенном тексте.
+
+        Returns:
+            {entry_id: "exact" | "word"} — тип совпадения как у match_keyword_in_text()
+        """
+        found: Dict[int, str] = {}
+        if not cleaned_text:
+            return found
+
+        # Уровень 1: фраза целиком
+        for entry_id in self._lookup_phrase(cleaned_text):
+            found[entry_id] = 'exact'
+
+        # Уровень 2: отдельные слова текста
+        for word in set(cleaned_text.split()):
+            for entry_id in self._lookup_word(word):
+                found.setdefault(entry_id, 'word')
+
+        return found
+
+    def first_match(self, text: str) -> Optional[Tuple[int, str]]:
+        """Совпадение с наименьшим entry_id (порядок добавления = приоритет)."""
+        found = self.match(text)
+        if not found:
+            return None
+        entry_id = min(found)
+        return entry_id, found[entry_id]
+
+    def _lookup_phrase(self, text: str):
+        yield from self._phrase_exact.get(text, ())
+
+        length = len(text)
+        if length < INFLECTION_MIN_LEN or length > PHRASE_INFLECTION_MAX_LEN + 1:
+            return
+        if length <= PHRASE_INFLECTION_MAX_LEN:
+            for mask in _masks(text):
+                yield from self._phrase_masks.get(mask, ())
+        # keyword длиннее текста на 1 букву
+        yield from self._phrase_truncated.get(text, ())
+        # текст длиннее keyword на 1 букву
+        if length > INFLECTION_MIN_LEN:
+            yield from self._phrase_exact.get(text[:-1], ())
+
+    def _lookup_word(self, word: str):
+        yield from self._word_exact.get(word, ())
+
+        length = len(word)
+        if length < INFLECTION_MIN_LEN:
+            return
+        for mask in _masks(word):
+            yield from self._word_masks.get(mask, ())
+        yield from self._word_truncated.get(word, ())
+        if length > INFLECTION_MIN_LEN:
+            yield from self._word_exact.get(word[:-1], ())
@@ -0,0 +1,156 @@
+"""
+Скомпилированный матчер пользовательских категорий расходов.
+
+parse_expense_message() раньше на каждое сообщение загружал все категории
+профиля, делал отдельный запрос keywords для каждой категории и вызывал
+match_keyword_in_text() для каждого названия и keyword. Здесь всё это
+собирается один раз в KeywordIndex и кешируется в памяти процесса.
+
+Инвалидация:
+- сигналы post_save/post_delete на ExpenseCategory и CategoryKeyword
+  (см. expenses/signals.py) вызывают invalidate_expense_keyword_matcher();
+- keywords учатся в Celery (другой процесс), поэтому помимо локального
+  сброса в Redis хранится "версия" матчера профиля, которую сверяем
+  при каждом обращении к кешу;
+- TTL как страховка на случай недоступности Redis.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from bot.utils.emoji_utils import strip_leading_emoji
+from bot.utils.keyword_index import KeywordIndex
+from bot.utils.logging_safe import log_safe_id
+
+logger = logging.getLogger(__name__)
+
+MATCHER_CACHE_TTL_SECONDS = 600
+MATCHER_CACHE_MAX_PROFILES = 2048
+MATCHER_VERSION_CACHE_TIMEOUT = 24 * 60 * 60
+MATCHER_VERSION_KEY = 'expense_keyword_matcher:version:{profile_id}'
+
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    """Результат матчинга текста по категориям пользователя"""
+    category: object  # ExpenseCategory
+    keyword_id: Optional[int]  # None, если совпало название категории
+    match_type: str  # "exact" | "word"
+
+
+class ExpenseKeywordMatcher:
+    """
+    Индекс категорий пользователя: названия (без эмодзи) + keywords.
+
+    Порядок записей в индексе повторяет прежний цикл parse_expense_message():
+    категории в порядке выборки, внутри категории сначала названия
+    (name, name_ru, name_en), затем keywords. Побеждает совпадение
+    с наименьшим порядковым номером.
+    """
+
+    def __init__(self, categories: List[object]):
+        self.categories = categories
+        self._index = KeywordIndex()
+        # entry_id -> (category, keyword_id)
+        self._entries: List[tuple] = []
+
+        for category in categories:
+            names: List[str] = []
+            for raw_name in (category.name, getattr(category, 'name_ru', None), getattr(category, 'name_en', None)):
+                if not raw_name:
+                    continue
+                clean_name = strip_leading_emoji(raw_name).lower().strip()
+                if clean_name and clean_name not in names:
+                    names.append(clean_name)
+
+            for clean_name in names:
+                self._add(clean_name, category, None)
+
+            for keyword in category.keywords.all():
+                self._add(keyword.keyword, category, keyword.id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _add(self, text: str, category, keyword_id: Optional[int]) -> None:
+        entry_id = self._index.add(text)
+        if entry_id is not None:
+            self._entries.append((category, keyword_id))
+
+    def match(self, text: str) -> Optional[KeywordMatch]:
+        """Находит категорию для текста за один проход по индексу"""
+        found = self._index.first_match(text)
+        if not found:
+            return None
+        entry_id, match_type = found
+        category, keyword_id = self._entries[entry_id]
+        return KeywordMatch(category=category, keyword_id=keyword_id, match_type=match_type)
+
+
+_matchers: 'OrderedDict[int, tuple]' = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def _version_key(profile_id: int) -> str:
+    return MATCHER_VERSION_KEY.format(profile_id=profile_id)
+
+
+def get_expense_keyword_matcher_sync(profile) -> ExpenseKeywordMatcher:
+    """
+    Возвращает матчер профиля из кеша или компилирует новый.
+
+    Сверяет версию в Redis: если keywords изменились в другом процессе
+    (например, в Celery после обучения), матчер пересобирается.
+    """
+    from expenses.models import ExpenseCategory
+
+    profile_id = profile.id
+    version = cache.get(_version_key(profile_id))
+    now = time.monotonic()
+
+    with _matchers_lock:
+        cached = _matchers.get(profile_id)
+        if cached is not None:
+            matcher, cached_version, expires_at = cached
+            if cached_version == version and now < expires_at:
+                _matchers.move_to_end(profile_id)
+                return matcher
+            del _matchers[profile_id]
+
+    categories = list(ExpenseCategory.objects.filter(profile=profile).prefetch_related('keywords'))
+    matcher = ExpenseKeywordMatcher(categories)
+
+    with _matchers_lock:
+        _matchers[profile_id] = (matcher, version, now + MATCHER_CACHE_TTL_SECONDS)
+        while len(_matchers) > MATCHER_CACHE_MAX_PROFILES:
+            _matchers.popitem(last=False)
+
+    logger.debug(
+        "Compiled expense keyword matcher for %s: %s categories, %s entries",
+        log_safe_id(profile_id, "profile"), len(categories), len(matcher),
+    )
+    return matcher
+
+
+get_expense_keyword_matcher = sync_to_async(get_expense_keyword_matcher_sync)
+
+
+def invalidate_expense_keyword_matcher(profile_id: Optional[int]) -> None:
+    """Сбрасывает матчер профиля во всех процессах (локально + версия в Redis)"""
+    if not profile_id:
+        return
+    with _matchers_lock:
+        _matchers.pop(profile_id, None)
+    cache.set(_version_key(profile_id), time.time_ns(), MATCHER_VERSION_CACHE_TIMEOUT)
+
+
+def clear_expense_keyword_matchers() -> None:
+    """Очищает локальный кеш матчеров (для тестов)"""
+    with _matchers_lock:
+        _matchers.clear()
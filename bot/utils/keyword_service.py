@@ -139,6 +139,28 @@ STOP_WORDS: Set[str] = {
 }
 
 
+# Регулярки нормализации компилируем один раз: normalize_keyword_text
+# вызывается на каждое сообщение и для каждого keyword
+_EMOJI_RE = re.compile(
+    r'[\U0001F000-\U0001F9FF'  # Emoticons, symbols, pictographs
+    r'\U00002600-\U000027BF'    # Miscellaneous Symbols
+    r'\U0001F300-\U0001F64F'    # Miscellaneous Symbols and Pictographs
+    r'\U0001F680-\U0001F6FF'    # Transport and Map Symbols
+    r'\u2600-\u27BF'            # Miscellaneous Symbols (compact)
+    r'\u2300-\u23FF'            # Miscellaneous Technical
+    r'\u2B00-\u2BFF'            # Miscellaneous Symbols and Arrows
+    r'\u26A0-\u26FF'            # Miscellaneous Symbols
+    r'\uFE00-\uFE0F'            # Variation Selectors
+    r'\U000E0100-\U000E01EF'    # Variation Selectors Supplement
+    r'\u200d'                   # Zero-Width Joiner (ZWJ)
+    r'\ufe0f'                   # Variation Selector-16
+    r']+',
+    flags=re.UNICODE
+)
+_PUNCTUATION_RE = re.compile(r'[^\w\s\-]', flags=re.UNICODE)
+_EDGE_HYPHEN_RE = re.compile(r'(?<!\w)-|-(?!\w)')
+
+
 def normalize_keyword_text(text: str) -> str:
     """
     Базовая нормализация текста для keywords.
@@ -165,30 +187,14 @@ def normalize_keyword_text(text: str) -> str:
     normalized = text.lower()
 
     # 2. Удаляем эмодзи
-    emoji_pattern = re.compile(
-        r'[\U0001F000-\U0001F9FF'  # Emoticons, symbols, pictographs
-        r'\U00002600-\U000027BF'    # Miscellaneous Symbols
-        r'\U0001F300-\U0001F64F'    # Miscellaneous Symbols and Pictographs
-        r'\U0001F680-\U0001F6FF'    # Transport and Map Symbols
-        r'\u2600-\u27BF'            # Miscellaneous Symbols (compact)
-        r'\u2300-\u23FF'            # Miscellaneous Technical
-        r'\u2B00-\u2BFF'            # Miscellaneous Symbols and Arrows
-        r'\u26A0-\u26FF'            # Miscellaneous Symbols
-        r'\uFE00-\uFE0F'            # Variation Selectors
-        r'\U000E0100-\U000E01EF'    # Variation Selectors Supplement
-        r'\u200d'                   # Zero-Width Joiner (ZWJ)
-        r'\ufe0f'                   # Variation Selector-16
-        r']+',
-        flags=re.UNICODE
-    )
-    normalized = emoji_pattern.sub('', normalized)
+    normalized = _EMOJI_RE.sub('', normalized)
 
     # 3. Удаляем пунктуацию и валютные символы
     # Оставляем буквы (кириллица + латиница), цифры, пробелы, дефис внутри слов
     # Числа НЕ удаляем — они могут быть частью названия ("бензин 95", "iPhone 15")
-    normalized = re.sub(r'[^\w\s\-]', ' ', normalized, flags=re.UNICODE)
+    normalized = _PUNCTUATION_RE.sub(' ', normalized)
     # Удаляем дефисы на границах слов (оставляем только внутри)
-    normalized = re.sub(r'(?<!\w)-|-(?!\w)', ' ', normalized)
+    normalized = _EDGE_HYPHEN_RE.sub(' ', normalized)
 
     # 4. Trim + схлопывание пробелов
     normalized = ' '.join(normalized.split())
@@ -20,12 +20,24 @@ async def get_user_language(telegram_id: int) -> str:
     Returns:
         Код языка ('ru' или 'en')
     """
+    from bot.utils.request_context import get_request_context
+
+    context = get_request_context(telegram_id)
+    if context is not None:
+        # Профиль уже загружен для текущего апдейта
+        if context.profile is not None and context.profile.language_code:
+            return context.profile.language_code
+        return 'ru'
+
     try:
         from expenses.models import Profile
-        profile = await sync_to_async(Profile.objects.filter(telegram_id=telegram_id).first)()
+        from bot.utils.db_executor import run_read
+        language_code = await run_read(
+            Profile.objects.filter(telegram_id=telegram_id).values_list('language_code', flat=True).first
+        )
         
-        if profile and profile.language_code:
-            return profile.language_code
+        if language_code:
+            return language_code
             
     except Exception as e:
         logger.error(f"Error getting user language: {e}")
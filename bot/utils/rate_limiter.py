@@ -0,0 +1,259 @@
+"""
+Token bucket rate limiter для бота.
+
+Раньше лимиты считались списками timestamp'ов на пользователя
+(Dict[int, list]) и множеством unique_users, которые росли с числом
+пользователей. Здесь у каждого лимита (Bucket) фиксированное состояние
+из двух чисел — токены и время последнего пополнения, — поэтому проверка
+O(1) по времени и памяти:
+
+- LocalBucketStore — в памяти процесса, LRU-вытеснение самых давно
+  неактивных пользователей (у давно неактивного ведро всё равно полное);
+- RedisBucketStore — атомарный Lua-скрипт для нескольких инстансов бота,
+  время берётся из Redis (TIME), при недоступности Redis — локальное
+  хранилище.
+
+Несколько лимитов проверяются атомарно «всё или ничего»: токены
+списываются, только если разрешают все ведра. Ведра одного субъекта
+лежат в одном hash slot ({subject} в ключе) — скрипт работает и в Redis
+Cluster.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SUBJECTS = 50_000
+REDIS_RETRY_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Ведро токенов: capacity запросов подряд, затем refill_per_second"""
+    name: str
+    capacity: float
+    refill_per_second: float
+
+    @classmethod
+    def per_window(cls, name: str, limit: int, window_seconds: float) -> 'Bucket':
+        """limit запросов за window_seconds"""
+        return cls(name, float(limit), limit / window_seconds)
+
+    @property
+    def refill_seconds(self) -> int:
+        """За сколько секунд пустое ведро наполняется полностью"""
+        return int(math.ceil(self.capacity / self.refill_per_second))
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    bucket: Optional[Bucket] = None  # первое ведро, в котором не хватило токенов
+    blocked: bool = False  # субъект временно заблокирован (block())
+    retry_after: float = 0.0
+
+    @property
+    def retry_after_seconds(self) -> int:
+        return int(math.ceil(self.retry_after))
+
+
+ALLOWED = Decision(allowed=True)
+
+
+def _refill(bucket: Bucket, tokens: float, updated_at: float, now: float) -> float:
+    return min(bucket.capacity, tokens + max(0.0, now - updated_at) * bucket.refill_per_second)
+
+
+class LocalBucketStore:
+    """Ведра в памяти процесса с LRU-вытеснением неактивных субъектов"""
+
+    def __init__(self, max_subjects: int = DEFAULT_MAX_SUBJECTS):
+        self.max_subjects = max_subjects
+        # subject -> {имя ведра: (токены, время)}
+        self._subjects: 'OrderedDict[str, dict]' = OrderedDict()
+        # subject -> время окончания блокировки
+        self._blocks: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subjects)
+
+    def consume(self, subject: str, buckets: Sequence[Bucket], cost: float = 1.0,
+                now: Optional[float] = None) -> Decision:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            blocked_until = self._blocks.get(subject)
+            if blocked_until is not None:
+                if now < blocked_until:
+                    return Decision(allowed=False, blocked=True, retry_after=blocked_until - now)
+                del self._blocks[subject]
+
+            state = self._subjects.get(subject) or {}
+            refilled = []
+            for bucket in buckets:
+                tokens, updated_at = state.get(bucket.name, (bucket.capacity, now))
+                tokens = _refill(bucket, tokens, updated_at, now)
+                if tokens < cost:
+                    return Decision(
+                        allowed=False, bucket=bucket,
+                        retry_after=(cost - tokens) / bucket.refill_per_second,
+                    )
+                refilled.append(tokens)
+
+            for bucket, tokens in zip(buckets, refilled):
+                state[bucket.name] = (tokens - cost, now)
+            self._subjects[subject] = state
+            self._subjects.move_to_end(subject)
+            while len(self._subjects) > self.max_subjects:
+                self._subjects.popitem(last=False)
+        return ALLOWED
+
+    def block(self, subject: str, seconds: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._blocks[subject] = now + seconds
+            self._blocks.move_to_end(subject)
+            while len(self._blocks) > self.max_subjects:
+                self._blocks.popitem(last=False)
+
+
+# KEYS[1] — ключ блокировки, KEYS[2..] — ведра.
+# ARGV[1] — стоимость, далее пары (capacity, refill_per_second).
+# Ответ: {разрешено, номер ведра (0 — блокировка), retry_after}
+_CONSUME_SCRIPT = """
+local block_ttl = redis.call('PTTL', KEYS[1])
+if block_ttl > 0 then
+  return {0, 0, tostring(block_ttl / 1000)}
+end
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+
+for i = 2, #KEYS do
+  local capacity = tonumber(ARGV[i * 2 - 2])
+  local rate = tonumber(ARGV[i * 2 - 1])
+  local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local tokens = tonumber(state[1])
+  local updated_at = tonumber(state[2])
+  if tokens == nil or updated_at == nil then
+    tokens = capacity
+    updated_at = now
+  end
+  tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+  if tokens < cost then
+    return {0, i - 1, tostring((cost - tokens) / rate)}
+  end
+  levels[i] = tokens
+end
+
+for i = 2, #KEYS do
+  local capacity = tonumber(ARGV[i * 2 - 2])
+  local rate = tonumber(ARGV[i * 2 - 1])
+  redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - cost), 'ts', tostring(now))
+  redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+return {1, 0, '0'}
+"""
+
+
+class RedisBucketStore:
+    """
+    Ведра в Redis (общие для всех инстансов бота).
+
+    При ошибке Redis проверка выполняется локально, а следующая попытка
+    обратиться к Redis — не раньше чем через REDIS_RETRY_SECONDS.
+    """
+
+    key_prefix = 'rate_limit'
+
+    def __init__(self, fallback: Optional[LocalBucketStore] = None, connection=None):
+        self.fallback = fallback or LocalBucketStore()
+        self._connection = connection
+        self._script = None
+        self._retry_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+    def _key(self, subject: str, suffix: str) -> str:
+        return f"{self.key_prefix}:{{{subject}}}:{suffix}"
+
+    def _get_script(self):
+        if self._script is None:
+            if self._connection is None:
+                from django_redis import get_redis_connection
+                self._connection = get_redis_connection("default")
+            self._script = self._connection.register_script(_CONSUME_SCRIPT)
+        return self._script
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning("Rate limiter: Redis unavailable, using local buckets: %s", error)
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def consume(self, subject: str, buckets: Sequence[Bucket], cost: float = 1.0) -> Decision:
+        if not self._redis_available():
+            return self.fallback.consume(subject, buckets, cost)
+
+        keys = [self._key(subject, 'blocked')] + [self._key(subject, bucket.name) for bucket in buckets]
+        args = [cost]
+        for bucket in buckets:
+            args.extend((bucket.capacity, bucket.refill_per_second))
+        try:
+            allowed, index, retry_after = self._get_script()(keys=keys, args=args)
+        except Exception as e:
+            self._redis_failed(e)
+            return self.fallback.consume(subject, buckets, cost)
+
+        if int(allowed):
+            return ALLOWED
+        index = int(index)
+        retry_after = float(retry_after)
+        if index == 0:
+            return Decision(allowed=False, blocked=True, retry_after=retry_after)
+        return Decision(allowed=False, bucket=buckets[index - 1], retry_after=retry_after)
+
+    def block(self, subject: str, seconds: float) -> None:
+        if self._redis_available():
+            try:
+                self._get_script()  # инициализирует соединение
+                self._connection.set(self._key(subject, 'blocked'), 1, ex=int(math.ceil(seconds)))
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        self.fallback.block(subject, seconds)
+
+
+class TokenBucketLimiter:
+    """Проверка набора лимитов для субъекта (пользователь, пользователь+команда)"""
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else LocalBucketStore()
+
+    def check(self, subject, buckets: Sequence[Bucket], cost: float = 1.0) -> Decision:
+        return self.store.consume(str(subject), buckets, cost)
+
+    def block(self, subject, seconds: float) -> None:
+        self.store.block(str(subject), seconds)
+
+    async def wait(self, subject, buckets: Sequence[Bucket], cost: float = 1.0) -> None:
+        """Ждёт, пока все ведра разрешат запрос (для фоновых рассылок)"""
+        while True:
+            decision = self.check(subject, buckets, cost)
+            if decision.allowed:
+                return
+            await asyncio.sleep(max(decision.retry_after, 0.01))
+
+    @property
+    def tracked_subjects(self) -> int:
+        return len(self.store)
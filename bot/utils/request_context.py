@@ -0,0 +1,124 @@
+"""
+Контекст обработки одного апдейта Telegram.
+
+Одно сообщение раньше читало Profile по telegram_id много раз подряд:
+PrivacyCheckMiddleware, LocalizationMiddleware, get_user_language,
+check_subscription, get_or_create_user_profile_sync,
+increment_analytics_counter и т.д. RequestContextMiddleware загружает
+профиль вместе с UserSettings одним запросом и кладёт контекст:
+
+- в data['request_context'] (для middleware и хендлеров aiogram);
+- в ContextVar, чтобы сервисы с сигнатурой (telegram_id, ...) брали
+  профиль из контекста без изменения всех вызывающих мест
+  (asgiref.sync_to_async переносит contextvars в рабочий поток).
+
+Контекст живёт только до конца обработки апдейта. Изменения профиля,
+настроек и подписок через save() подхватываются сигналами
+(expenses/signals.py); массовые update() должны вызывать
+forget_request_profile().
+"""
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+_UNSET = object()
+
+_current_context: ContextVar[Optional['RequestContext']] = ContextVar('request_context', default=None)
+
+
+@dataclass
+class RequestContext:
+    """Профиль, настройки, язык и статус подписки пользователя в рамках апдейта"""
+    telegram_id: int
+    profile: Any = None  # Profile или None, если профиля ещё нет
+    language: Optional[str] = None
+    _settings: Any = field(default=_UNSET, repr=False)
+    _subscriptions: Dict[bool, bool] = field(default_factory=dict, repr=False)
+
+    @property
+    def household_id(self) -> Optional[int]:
+        return self.profile.household_id if self.profile is not None else None
+
+    def set_profile(self, profile) -> None:
+        self.profile = profile
+        self._settings = _UNSET
+        self._subscriptions.clear()
+
+    def get_settings_sync(self):
+        """UserSettings профиля (из select_related, без повторного запроса)"""
+        if self._settings is _UNSET:
+            from expenses.models import UserSettings
+
+            settings = None
+            if self.profile is not None:
+                try:
+                    settings = self.profile.settings
+                except UserSettings.DoesNotExist:
+                    settings = None
+            self._settings = settings
+        return self._settings
+
+    def set_settings(self, settings) -> None:
+        self._settings = settings
+
+    def get_subscription(self, include_trial: bool) -> Optional[bool]:
+        return self._subscriptions.get(include_trial)
+
+    def set_subscription(self, include_trial: bool, active: bool) -> None:
+        self._subscriptions[include_trial] = active
+
+    def forget_subscription(self) -> None:
+        self._subscriptions.clear()
+
+
+def load_request_context_sync(telegram_id: int) -> RequestContext:
+    """Профиль и настройки одним запросом"""
+    from expenses.models import Profile
+
+    profile = Profile.objects.select_related('settings').filter(telegram_id=telegram_id).first()
+    return RequestContext(telegram_id=telegram_id, profile=profile)
+
+
+def activate_request_context(context: RequestContext) -> Token:
+    return _current_context.set(context)
+
+
+def deactivate_request_context(token: Token) -> None:
+    _current_context.reset(token)
+
+
+def get_request_context(telegram_id: Optional[int] = None) -> Optional[RequestContext]:
+    """
+    Контекст текущего апдейта.
+
+    Если передан telegram_id, контекст возвращается только для этого
+    пользователя (сервисы вызываются и для других пользователей —
+    например, участников семьи).
+    """
+    context = _current_context.get()
+    if context is None:
+        return None
+    if telegram_id is not None and context.telegram_id != telegram_id:
+        return None
+    return context
+
+
+def remember_profile(profile) -> None:
+    """Обновляет профиль в контексте после создания/сохранения"""
+    context = get_request_context(profile.telegram_id)
+    if context is not None and context.profile is not profile:
+        context.set_profile(profile)
+
+
+def forget_request_profile(telegram_id: Optional[int] = None) -> None:
+    """
+    Сбрасывает профиль в контексте после изменения в обход save()
+    (queryset.update) — следующий вызов сервиса перечитает его из БД.
+    """
+    context = get_request_context(telegram_id)
+    if context is not None:
+        from expenses.models import Profile
+
+        context.set_profile(
+            Profile.objects.select_related('settings').filter(telegram_id=context.telegram_id).first()
+        )
@@ -0,0 +1,197 @@
+"""
+Нечёткое сравнение слов для поиска трат и доходов.
+
+Общий модуль для find_similar_expenses, find_similar_incomes и
+_fuzzy_search_expenses. Раньше каждая функция вызывала
+_calculate_similarity() на каждую пару слов, считая полную матрицу
+Левенштейна, хотя нужен только ответ "схожесть >= порога".
+
+Что здесь ускорено:
+- расстояние Левенштейна с ограничением (полоса Укконена + выход,
+  как только минимум строки превысил допустимое расстояние);
+- порог схожести переводится в максимальное допустимое расстояние,
+  пары с большой разницей длин отсекаются без вычислений;
+- нормализация слов, разбиение описаний на слова и результаты
+  сравнения пар мемоизируются (описания у пользователя часто повторяются);
+- best_match() ищет лучшее совпадение в списке кандидатов, сужая
+  допустимое расстояние по мере нахождения более близких слов.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+_WORD_RE = re.compile(r'[а-яёa-z]+')
+
+# Русские окончания (от длинных к коротким)
+_RUSSIAN_ENDINGS = (
+    # Существительные множественное число
+    'ами', 'ями', 'ами', 'ях', 'ов', 'ев', 'ей', 'ий',
+    # Существительные единственное число
+    'ом', 'ем', 'ой', 'ей', 'ью', 'ия', 'ие', 'ье',
+    # Прилагательные
+    'ого', 'его', 'ому', 'ему', 'ым', 'им', 'ой', 'ей',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    # Глаголы
+    'ть', 'ла', 'ло', 'ли', 'ет', 'ит', 'ут', 'ют',
+    # Короткие окончания (в конце, чтобы не срезать раньше времени)
+    'ы', 'и', 'а', 'я', 'у', 'ю', 'е', 'о',
+)
+
+
+@lru_cache(maxsize=8192)
+def normalize_russian_word(word: str) -> str:
+    """
+    Простая нормализация русского слова - убирает типичные окончания.
+    Это не полноценный стеммер, но достаточно для поиска.
+
+    Примеры:
+        капельницы -> капельниц
+        капельница -> капельниц
+        продукты -> продукт
+        кофе -> кофе (не меняется)
+    """
+    word = word.lower().strip()
+    if len(word) < 4:
+        return word
+
+    for ending in _RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+
+    return word
+
+
+@lru_cache(maxsize=8192)
+def extract_words(text: str) -> Tuple[str, ...]:
+    """Слова (кириллица/латиница) из текста в нижнем регистре, без пунктуации"""
+    return tuple(_WORD_RE.findall(text.lower()))
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    Расстояние Левенштейна.
+
+    Если задан max_distance, считается только полоса шириной
+    2 * max_distance + 1 вокруг диагонали, и при превышении
+    возвращается max_distance + 1 (точное значение не нужно).
+    """
+    if s1 == s2:
+        return 0
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    len1, len2 = len(s1), len(s2)
+
+    if max_distance is None:
+        max_distance = len1
+    elif len1 - len2 > max_distance:
+        return max_distance + 1
+    if len2 == 0:
+        return len1
+
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len2 + 1)]
+
+    for i in range(1, len1 + 1):
+        c1 = s1[i - 1]
+        current = [over] * (len2 + 1)
+        current[0] = i if i <= max_distance else over
+        row_min = current[0]
+
+        lo = max(1, i - max_distance)
+        hi = min(len2, i + max_distance)
+        for j in range(lo, hi + 1):
+            value = previous[j - 1] + (c1 != s2[j - 1])
+            insertion = previous[j] + 1
+            if insertion < value:
+                value = insertion
+            deletion = current[j - 1] + 1
+            if deletion < value:
+                value = deletion
+            current[j] = value if value < over else over
+            if value < row_min:
+                row_min = value
+
+        if row_min > max_distance:
+            return over
+        previous = current
+
+    return previous[len2]
+
+
+def calculate_similarity(word1: str, word2: str) -> float:
+    """
+    Вычисляет процент схожести двух слов используя расстояние Левенштейна.
+
+    Returns:
+        Процент схожести (0.0 - 1.0): 1 - расстояние / длина большего слова
+
+    Examples:
+        >>> round(calculate_similarity("тралик", "тралики"), 3)
+        0.857
+        >>> round(calculate_similarity("магнит", "магнитрон"), 3)
+        0.667
+    """
+    if word1 == word2:
+        return 1.0
+    distance = levenshtein_distance(word1.lower(), word2.lower())
+    return 1.0 - (distance / max(len(word1), len(word2)))
+
+
+@lru_cache(maxsize=256)
+def _max_distance(max_len: int, threshold: float) -> int:
+    """Наибольшее расстояние d, при котором 1 - d / max_len >= threshold (-1, если такого нет)"""
+    distance = int((1.0 - threshold) * max_len)
+    # Добиваем до точного совпадения с float-сравнением calculate_similarity
+    while distance >= 0 and 1.0 - (distance / max_len) < threshold:
+        distance -= 1
+    while distance < max_len and 1.0 - ((distance + 1) / max_len) >= threshold:
+        distance += 1
+    return distance
+
+
+@lru_cache(maxsize=65536)
+def _bounded_similarity(word1: str, word2: str, threshold: float) -> float:
+    """Схожесть пары слов (в нижнем регистре) или 0.0, если она ниже порога"""
+    if word1 == word2:
+        return 1.0
+    max_len = max(len(word1), len(word2))
+    max_distance = _max_distance(max_len, threshold)
+    if max_distance < 0:
+        return 0.0
+    distance = levenshtein_distance(word1, word2, max_distance)
+    if distance > max_distance:
+        return 0.0
+    return 1.0 - (distance / max_len)
+
+
+def is_similar(word1: str, word2: str, threshold: float) -> bool:
+    """calculate_similarity(word1, word2) >= threshold, но без полного расчёта"""
+    if word1 == word2:
+        return True
+    return _bounded_similarity(word1.lower(), word2.lower(), threshold) >= threshold
+
+
+def best_match(word: str, candidates: Iterable[str], threshold: float) -> Optional[Tuple[str, float]]:
+    """
+    Лучшее совпадение слова среди кандидатов.
+
+    Returns:
+        (кандидат, схожесть) с максимальной схожестью >= threshold
+        (при равенстве - первый), или None
+    """
+    word = word.lower()
+    best: Optional[Tuple[str, float]] = None
+    min_similarity = threshold
+
+    for candidate in candidates:
+        candidate_lower = candidate.lower()
+        if candidate_lower == word:
+            return candidate, 1.0
+        similarity = _bounded_similarity(word, candidate_lower, min_similarity)
+        if similarity >= min_similarity and (best is None or similarity > best[1]):
+            best = (candidate, similarity)
+            # Следующий кандидат должен быть строго ближе
+            min_similarity = similarity
+
+    return best
+
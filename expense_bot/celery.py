@@ -51,11 +51,21 @@ app.conf.task_routes = {
         'routing_key': 'report.monthly',
         'priority': 5,
     },
+    'expense_bot.celery_tasks.send_monthly_reports_chunk': {
+        'queue': 'reports',
+        'routing_key': 'report.monthly_chunk',
+        'priority': 5,
+    },
     'expense_bot.celery_tasks.generate_monthly_insights': {
         'queue': 'reports',
         'routing_key': 'report.insights',
         'priority': 6,
     },
+    'expense_bot.celery_tasks.generate_monthly_insights_chunk': {
+        'queue': 'reports',
+        'routing_key': 'report.insights_chunk',
+        'priority': 6,
+    },
     'expense_bot.celery_tasks.cleanup_old_expenses': {
         'queue': 'maintenance',
         'routing_key': 'maintenance.cleanup',
@@ -81,6 +91,26 @@ app.conf.task_routes = {
         'routing_key': 'analytics.collect',
         'priority': 5,
     },
+    'expense_bot.celery_tasks.flush_keyword_usage': {
+        'queue': 'maintenance',
+        'routing_key': 'maintenance.keyword_usage',
+        'priority': 4,
+    },
+    'expense_bot.celery_tasks.reconcile_daily_totals': {
+        'queue': 'maintenance',
+        'routing_key': 'maintenance.daily_totals',
+        'priority': 3,
+    },
+    'expense_bot.celery_tasks.flush_profile_activity': {
+        'queue': 'maintenance',
+        'routing_key': 'maintenance.profile_activity',
+        'priority': 4,
+    },
+    'expense_bot.celery_tasks.refresh_top5_pin': {
+        'queue': 'reports',
+        'routing_key': 'report.top5_pin',
+        'priority': 4,
+    },
     'expenses.tasks.process_recurring_expenses': {
         'queue': 'recurring',
         'routing_key': 'recurring.process',
@@ -1,5 +1,5 @@
 from celery import shared_task
-from datetime import datetime, date, timedelta, time, timezone as dt_timezone
+from datetime import datetime, date, timedelta, timezone as dt_timezone
 import asyncio
 import logging
 import re
@@ -13,7 +13,6 @@ from django.utils import timezone
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.exceptions import TelegramBadRequest, TelegramNotFound
-from bot.utils.logging_safe import log_safe_id
 from bot.utils.telegram_client import create_telegram_bot
 
 logger = logging.getLogger(__name__)
@@ -131,20 +130,20 @@ def _shutdown_event_loop(loop: asyncio.AbstractEventLoop, *, bot: Bot = None, la
 
 @shared_task
 def send_monthly_reports():
-    """Send monthly expense reports to all users on the 1st day of month at 12:00 for previous month"""
-    bot = None
-    loop = None
+    """
+    Send monthly expense reports to all users on the 1st day of month at 12:00 for previous month.
 
+    Only enumerates recipients and enqueues send_monthly_reports_chunk tasks
+    (see bot/services/monthly_reports.py), so the reports queue is not blocked.
+    """
     try:
-        from expenses.models import Profile, Expense
-        from bot.services.notifications import NotificationService
-        from calendar import monthrange
-        # Use main bot token for user-facing notifications
-        bot_token = os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('MONITORING_BOT_TOKEN')
-        bot = create_telegram_bot(token=bot_token)
-        service = NotificationService(bot)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        from bot.services.monthly_reports import (
+            REPORTS_CHUNK_SIZE,
+            pending_report_profile_ids,
+            previous_month_period,
+            report_progress,
+        )
+        from bot.utils.fanout import chunked
 
         # Use timezone-aware datetime to match CELERY_TIMEZONE (Europe/Moscow)
         now = timezone.now()  # Returns timezone-aware datetime in Europe/Moscow
@@ -162,66 +161,94 @@ def send_monthly_reports():
 
         logger.info(f"Starting monthly reports task for {today}")
 
-        # Calculate previous month period
-        if today.month == 1:
-            prev_month = 12
-            prev_year = today.year - 1
-        else:
-            prev_month = today.month - 1
-            prev_year = today.year
+        prev_year, prev_month, month_start, month_end = previous_month_period(today)
 
-        # Get first and last day of previous month
-        month_start = today.replace(year=prev_year, month=prev_month, day=1)
-        last_day_of_prev_month = monthrange(prev_year, prev_month)[1]
-        month_end = today.replace(year=prev_year, month=prev_month, day=last_day_of_prev_month)
+        # Monthly reports are sent to ALL users with expenses (not just subscribers);
+        # users with MonthlyReportLog for the period are already delivered
+        profile_ids = pending_report_profile_ids(prev_year, prev_month, month_start, month_end)
+        report_progress(prev_year, prev_month).start(len(profile_ids))
 
-        # Get all active profiles who have expenses in previous month
-        # Monthly reports are sent to ALL users with expenses (not just subscribers)
-        profiles_with_expenses = Expense.objects.filter(
-            expense_date__gte=month_start,
-            expense_date__lte=month_end
-        ).values_list('profile_id', flat=True).distinct()
+        chunks = 0
+        for chunk in chunked(profile_ids, REPORTS_CHUNK_SIZE):
+            send_monthly_reports_chunk.delay(chunk, prev_year, prev_month)
+            chunks += 1
 
-        # Get all profiles with expenses (no subscription filter)
-        profiles = Profile.objects.filter(
-            id__in=profiles_with_expenses
-        ).distinct()
+        logger.info(
+            f"Sending monthly reports to {len(profile_ids)} users with expenses "
+            f"in {chunks} chunks (period={prev_year}-{prev_month:02d})"
+        )
+        return {'users': len(profile_ids), 'chunks': chunks}
 
-        logger.info(f"Sending monthly reports to {profiles.count()} users with expenses")
+    except Exception as e:
+        logger.error(f"Error in send_monthly_reports task: {e}")
 
-        for profile in profiles:
-            try:
-                loop.run_until_complete(
-                    service.send_monthly_report_notification(
-                        profile.telegram_id,
-                        profile,
-                        prev_year,
-                        prev_month,
-                        attempt=1,
-                    )
+
+@shared_task
+def send_monthly_reports_chunk(profile_ids: List[int], year: int, month: int):
+    """Send monthly reports to one chunk of users concurrently, within the shared Telegram send rate"""
+    bot = None
+    loop = None
+
+    try:
+        from expenses.models import MonthlyReportLog, Profile
+        from bot.services.notifications import NotificationService
+        from bot.services.monthly_reports import (
+            FAILED,
+            RETRY,
+            SKIPPED,
+            create_send_limiter,
+            create_send_throttle,
+            report_progress,
+            send_reports_chunk,
+        )
+
+        # Use main bot token for user-facing notifications
+        bot_token = os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('MONITORING_BOT_TOKEN')
+        bot = create_telegram_bot(token=bot_token)
+        service = NotificationService(bot, send_throttle=create_send_throttle(create_send_limiter()))
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        profiles = list(
+            Profile.objects.filter(id__in=profile_ids)
+            .exclude(id__in=MonthlyReportLog.objects.filter(year=year, month=month).values('profile_id'))
+        )
+
+        def handle_error(profile, error):
+            error_msg = str(error)
+            if is_retryable_error(error_msg):
+                logger.warning(
+                    f"[MONTHLY_REPORT] user={profile.telegram_id} status=retry_scheduled "
+                    f"attempt=1 delay=300s period={year}-{month:02d} error={error_msg}"
                 )
-            except Exception as e:
-                error_msg = str(e)
-                if is_retryable_error(error_msg):
-                    logger.warning(
-                        f"[MONTHLY_REPORT] user={profile.telegram_id} status=retry_scheduled "
-                        f"attempt=1 delay=300s period={prev_year}-{prev_month:02d} error={error_msg}"
-                    )
-                    retry_send_monthly_report.apply_async(
-                        args=[profile.telegram_id, prev_year, prev_month, 2],
-                        countdown=300
-                    )
-                else:
-                    logger.error(
-                        f"[MONTHLY_REPORT] user={profile.telegram_id} status=failed_permanent "
-                        f"period={prev_year}-{prev_month:02d} error={error_msg}"
-                    )
+                retry_send_monthly_report.apply_async(
+                    args=[profile.telegram_id, year, month, 2],
+                    countdown=300
+                )
+                return RETRY
+            logger.error(
+                f"[MONTHLY_REPORT] user={profile.telegram_id} status=failed_permanent "
+                f"period={year}-{month:02d} error={error_msg}"
+            )
+            return FAILED
+
+        statuses = loop.run_until_complete(send_reports_chunk(service, profiles, year, month, handle_error))
+        # Уже доставленные до запуска чанка
+        statuses[SKIPPED] += len(profile_ids) - len(profiles)
+
+        progress = report_progress(year, month)
+        progress.add(statuses)
+        logger.info(
+            f"[MONTHLY_REPORT] chunk done period={year}-{month:02d} chunk={dict(statuses)} "
+            f"progress={progress.snapshot()}"
+        )
+        return dict(statuses)
 
     except Exception as e:
-        logger.error(f"Error in send_monthly_reports task: {e}")
+        logger.error(f"Error in send_monthly_reports_chunk task: {e}")
 
     finally:
-        _shutdown_event_loop(loop, bot=bot, label="send_monthly_reports")
+        _shutdown_event_loop(loop, bot=bot, label="send_monthly_reports_chunk")
 
 
 # Константы для retry логики отправки месячных отчетов
@@ -278,20 +305,32 @@ def retry_send_monthly_report(user_id: int, year: int, month: int, attempt: int
     from django.core.cache import cache
     from expenses.models import Profile
     from bot.services.notifications import NotificationService
+    from bot.services.monthly_reports import (
+        FAILED,
+        RETRY,
+        SENT,
+        SKIPPED,
+        create_send_limiter,
+        create_send_throttle,
+        report_progress,
+    )
 
     bot = None
     loop = None
+    # Итог для прогресса рассылки (None — запланирован следующий retry)
+    outcome = None
 
     # Idempotency check - don't send duplicates
     sent_key = f"monthly_report_sent:{user_id}:{year}:{month}"
     if cache.get(sent_key):
         logger.info(f"[MONTHLY_REPORT] user={user_id} status=already_sent period={year}-{month:02d}")
+        report_progress(year, month).add({SKIPPED: 1, RETRY: -1})
         return
 
     try:
         bot_token = os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('MONITORING_BOT_TOKEN')
         bot = create_telegram_bot(token=bot_token)
-        service = NotificationService(bot)
+        service = NotificationService(bot, send_throttle=create_send_throttle(create_send_limiter()))
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
@@ -306,6 +345,7 @@ def retry_send_monthly_report(user_id: int, year: int, month: int, attempt: int
                 attempt=attempt,
             )
         )
+        outcome = SENT if sent else SKIPPED
         if not sent:
             logger.info(
                 f"[MONTHLY_REPORT] user={user_id} status=skipped "
@@ -313,6 +353,7 @@ def retry_send_monthly_report(user_id: int, year: int, month: int, attempt: int
             )
 
     except Profile.DoesNotExist:
+        outcome = FAILED
         logger.error(f"[MONTHLY_REPORT] user={user_id} status=failed error=profile_not_found")
 
     except Exception as e:
@@ -332,6 +373,7 @@ def retry_send_monthly_report(user_id: int, year: int, month: int, attempt: int
                 )
             else:
                 # All retries exhausted
+                outcome = FAILED
                 logger.error(
                     f"[MONTHLY_REPORT] user={user_id} status=failed "
                     f"attempts={attempt} period={year}-{month:02d} error={error_msg}"
@@ -352,23 +394,35 @@ def retry_send_monthly_report(user_id: int, year: int, month: int, attempt: int
                     logger.error(f"Failed to send admin alert: {alert_err}")
         else:
             # Non-retryable error (user blocked bot, etc.)
+            outcome = FAILED
             logger.error(
                 f"[MONTHLY_REPORT] user={user_id} status=failed_permanent "
                 f"period={year}-{month:02d} error={error_msg}"
             )
 
     finally:
+        if outcome is not None:
+            report_progress(year, month).add({outcome: 1, RETRY: -1})
         _shutdown_event_loop(loop, bot=bot, label="retry_send_monthly_report")
 
 
 @shared_task
 def generate_monthly_insights():
-    """Generate AI insights for all active subscribers on the 1st day of month at 11:00 for previous month"""
-    loop = None
+    """
+    Generate AI insights for all users with expenses on the 1st day of month for previous month.
+
+    Only enumerates users without an insight for the period and enqueues
+    generate_monthly_insights_chunk tasks (see bot/services/insight_pipeline.py).
+    """
     try:
-        from expenses.models import Profile, Expense
-        from bot.services.monthly_insights import MonthlyInsightsService
-        from calendar import monthrange
+        from bot.services.insight_pipeline import (
+            INSIGHTS_CHUNK_SIZE,
+            get_insights_provider,
+            insight_progress,
+            pending_insight_profile_ids,
+        )
+        from bot.services.monthly_reports import previous_month_period
+        from bot.utils.fanout import chunked
 
         # Use timezone-aware datetime to match CELERY_TIMEZONE (Europe/Moscow)
         now = timezone.now()
@@ -384,96 +438,94 @@ def generate_monthly_insights():
 
         logger.info(f"Starting monthly insights generation for {today}")
 
-        # Calculate previous month period
-        if today.month == 1:
-            prev_month = 12
-            prev_year = today.year - 1
-        else:
-            prev_month = today.month - 1
-            prev_year = today.year
-
-        # Get first and last day of previous month
-        month_start = today.replace(year=prev_year, month=prev_month, day=1)
-        last_day_of_prev_month = monthrange(prev_year, prev_month)[1]
-        month_end = today.replace(year=prev_year, month=prev_month, day=last_day_of_prev_month)
-
-        # Get profiles with expenses in previous month
-        # Monthly insights are generated for ALL users with expenses (not just subscribers)
-        profiles_with_expenses = Expense.objects.filter(
-            expense_date__gte=month_start,
-            expense_date__lte=month_end
-        ).values_list('profile_id', flat=True).distinct()
+        prev_year, prev_month, month_start, month_end = previous_month_period(today)
 
-        # Get all profiles with expenses (no subscription filter)
-        profiles = Profile.objects.filter(
-            id__in=profiles_with_expenses
-        ).distinct()
+        # Monthly insights are generated for ALL users with expenses (not just subscribers);
+        # users who already have an insight for the period are done (checkpoint)
+        profile_ids = pending_insight_profile_ids(prev_year, prev_month, month_start, month_end)
+        insight_progress(prev_year, prev_month).start(len(profile_ids))
 
-        logger.info(f"Generating AI insights for {profiles.count()} users with expenses")
+        provider = get_insights_provider()
+        chunks = 0
+        for chunk in chunked(profile_ids, INSIGHTS_CHUNK_SIZE):
+            generate_monthly_insights_chunk.delay(chunk, prev_year, prev_month, provider)
+            chunks += 1
 
-        # Initialize service
-        service = MonthlyInsightsService()
+        logger.info(
+            f"Generating AI insights for {len(profile_ids)} users with expenses "
+            f"in {chunks} chunks (provider={provider})"
+        )
+        return {'users': len(profile_ids), 'chunks': chunks}
 
-        # Run async function in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    except Exception as e:
+        logger.error(f"Error in generate_monthly_insights task: {e}")
 
-        success_count = 0
-        fail_count = 0
 
-        insights_provider = os.getenv('AI_PROVIDER_INSIGHTS') or os.getenv('AI_PROVIDER_DEFAULT') or 'deepseek'
-        insights_provider = insights_provider.lower()
-        valid_providers = {'google', 'openai', 'deepseek', 'qwen', 'openrouter'}
-        if insights_provider not in valid_providers:
-            logger.warning(f"Unknown AI provider for insights: {insights_provider}, falling back to deepseek")
-            insights_provider = 'deepseek'
+@shared_task(soft_time_limit=1500, time_limit=1800)
+def generate_monthly_insights_chunk(profile_ids: List[int], year: int, month: int, provider: str):
+    """Generate AI insights for one chunk of users concurrently, within per-provider limits"""
+    loop = None
+    try:
+        from expenses.models import MonthlyInsight, Profile
+        from bot.services.insight_pipeline import (
+            SKIPPED,
+            ProviderLimits,
+            create_insights_limiter,
+            generate_insights_chunk,
+            insight_progress,
+        )
 
-        for profile in profiles:
-            try:
-                insight = loop.run_until_complete(
-                    service.generate_insight(
-                        profile=profile,
-                        year=prev_year,
-                        month=prev_month,
-                        provider=insights_provider,
-                        force_regenerate=False
-                    )
-                )
+        # Профили, получившие инсайт до запуска чанка (повтор задачи), пропускаем
+        profiles = list(
+            Profile.objects.filter(id__in=profile_ids)
+            .exclude(id__in=MonthlyInsight.objects.filter(year=year, month=month).values('profile_id'))
+        )
 
-                if insight:
-                    success_count += 1
-                    logger.info(f"Generated insight for user {profile.telegram_id} for {prev_month}/{prev_year}")
-                else:
-                    logger.info(f"Skipped insight for user {profile.telegram_id} (insufficient data or no subscription)")
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
 
-            except Exception as e:
-                fail_count += 1
-                logger.error(f"Error generating insight for user {profile.telegram_id}: {e}")
+        statuses = loop.run_until_complete(
+            generate_insights_chunk(
+                profiles, year, month, provider, ProviderLimits(limiter=create_insights_limiter())
+            )
+        )
+        statuses[SKIPPED] += len(profile_ids) - len(profiles)
 
-        logger.info(f"Insights generation completed: {success_count} successful, {fail_count} failed")
+        progress = insight_progress(year, month)
+        progress.add(statuses)
+        logger.info(
+            f"Insights chunk completed period={year}-{month:02d} chunk={dict(statuses)} "
+            f"progress={progress.snapshot()}"
+        )
+        return dict(statuses)
 
     except Exception as e:
-        logger.error(f"Error in generate_monthly_insights task: {e}")
+        logger.error(f"Error in generate_monthly_insights_chunk task: {e}")
 
     finally:
-        _shutdown_event_loop(loop, label="generate_monthly_insights")
+        _shutdown_event_loop(loop, label="generate_monthly_insights_chunk")
 
 
 @shared_task
 def cleanup_old_expenses():
     """Clean up expenses older than retention period"""
     try:
+        from django.db import transaction
         from expenses.models import Expense
+        from expenses.signals import operations_deleted_in_bulk
         from datetime import timedelta
         
         # Keep expenses for 2 years by default
         retention_days = getattr(settings, 'EXPENSE_RETENTION_DAYS', 730)
         cutoff_date = date.today() - timedelta(days=retention_days)
         
-        # Delete old expenses
-        deleted_count, _ = Expense.objects.filter(
-            created_at__lt=cutoff_date
-        ).delete()
+        # Delete old expenses (fast delete, без построчных сигналов)
+        old_expenses = Expense.objects.filter(created_at__lt=cutoff_date)
+        with transaction.atomic():
+            profile_ids = list(old_expenses.order_by().values_list('profile_id', flat=True).distinct())
+            deleted_count, _ = old_expenses.delete()
+            # Итоги и кеши профилей, у которых удалены траты
+            operations_deleted_in_bulk('expense', profile_ids)
         
         logger.info(f"Deleted {deleted_count} expenses older than {cutoff_date}")
         
@@ -1230,167 +1282,18 @@ def system_health_check():
 def collect_daily_analytics():
     """Сбор аналитических данных за день (запускается в конце дня)"""
     try:
-        from expenses.models import (
-            Profile, Expense, Income, UserAnalytics, 
-            AIServiceMetrics, Subscription, AffiliateCommission
-        )
+        from expenses.models import UserAnalytics
+        from bot.services.user_analytics import collect_user_analytics
         from django.utils import timezone
-        from django.db.models import Count, Sum, Avg, Q
         from datetime import timedelta
-        import json
 
         logger.info("Начинаем сбор ежедневной аналитики")
         
         # Вчерашняя дата (данные за которую собираем)
         target_date = timezone.localdate() - timedelta(days=1)
-        target_start = timezone.make_aware(datetime.combine(target_date, time.min))
-        target_end = timezone.make_aware(datetime.combine(target_date, time.max))
-        
-        processed_profiles = 0
-        created_analytics = 0
-        
-        # Получаем всех пользователей, которые были активны вчера
-        # (добавляли расходы, доходы, или имели другую активность)
-        active_profiles = Profile.objects.filter(
-            Q(expenses__created_at__gte=target_start, expenses__created_at__lte=target_end) |
-            Q(incomes__created_at__gte=target_start, incomes__created_at__lte=target_end) |
-            Q(subscriptions__created_at__gte=target_start, subscriptions__created_at__lte=target_end)
-        ).distinct()
-        
-        logger.info(f"Найдено {active_profiles.count()} активных пользователей за {target_date}")
-        
-        for profile in active_profiles:
-            try:
-                # Проверяем, нет ли уже записи за этот день
-                existing_analytics = UserAnalytics.objects.filter(
-                    profile=profile,
-                    date=target_date
-                ).first()
-                
-                # Собираем статистику по расходам
-                expenses = Expense.objects.filter(
-                    profile=profile,
-                    created_at__gte=target_start,
-                    created_at__lte=target_end
-                )
-                
-                expenses_stats = expenses.aggregate(
-                    count=Count('id'),
-                    ai_categorized_count=Count('id', filter=Q(ai_categorized=True)),
-                    manual_categorized_count=Count('id', filter=Q(ai_categorized=False)),
-                )
-                
-                # Собираем статистику по доходам
-                incomes = Income.objects.filter(
-                    profile=profile,
-                    created_at__gte=target_start,
-                    created_at__lte=target_end
-                )
-                
-                incomes_count = incomes.count()
-                
-                # Собираем статистику по категориям (топ-5 используемых)
-                categories_used = {}
-                for expense in expenses:
-                    if expense.category:
-                        cat_id = str(expense.category.id)
-                        categories_used[cat_id] = categories_used.get(cat_id, 0) + 1
-                
-                # Статистика по AI сервисам (приблизительно - по количеству AI категоризаций)
-                ai_categorizations = expenses_stats['ai_categorized_count'] or 0
-                manual_categorizations = expenses_stats['manual_categorized_count'] or 0
-                
-                # Рассчитываем кешбэк (если есть логика)
-                cashback_calculated = 0  # Можно добавить расчет кешбэка если нужно
-                cashback_transactions = 0
-                
-                # Подсчитываем ошибки (пока заглушка, можно интегрировать с логами)
-                errors_encountered = 0
-                error_types = {}
-                
-                # Примерное время сессии (заглушка)
-                total_session_time = 0
-                peak_hour = None
-                
-                # PDF отчеты (заглушка - можно интегрировать с логикой отчетов)
-                pdf_reports_generated = 0
-                
-                # Recurring payments processed (для данного пользователя)
-                recurring_payments_processed = 0
-                
-                # Budget checks (заглушка)
-                budget_checks = 0
-                
-                # messages_sent — примерно по количеству расходов (заглушка)
-                messages_sent = expenses_stats['count'] or 0
-                # voice_messages и photos_sent инкрементируются в реальном времени
-                # (VoiceToTextMiddleware и handle_photo_expense),
-                # поэтому НЕ перезаписываем их нулями — сохраняем текущее значение из БД
-                
-                # Определяем команды (заглушка)
-                commands_used = {}
-                if expenses_stats['count']:
-                    commands_used['expense_add'] = expenses_stats['count']
-                if incomes_count:
-                    commands_used['income_add'] = incomes_count
-                
-                # Создаем или обновляем запись аналитики
-                if existing_analytics:
-                    # Обновляем существующую запись
-                    existing_analytics.messages_sent = messages_sent
-                    # voice_messages и photos_sent НЕ трогаем —
-                    # они инкрементируются в реальном времени из middleware/handlers
-                    existing_analytics.commands_used = commands_used
-                    existing_analytics.expenses_added = expenses_stats['count'] or 0
-                    existing_analytics.incomes_added = incomes_count
-                    existing_analytics.categories_used = categories_used
-                    existing_analytics.ai_categorizations = ai_categorizations
-                    existing_analytics.manual_categorizations = manual_categorizations
-                    existing_analytics.cashback_calculated = cashback_calculated
-                    existing_analytics.cashback_transactions = cashback_transactions
-                    existing_analytics.errors_encountered = errors_encountered
-                    existing_analytics.error_types = error_types
-                    existing_analytics.total_session_time = total_session_time
-                    existing_analytics.peak_hour = peak_hour
-                    existing_analytics.pdf_reports_generated = pdf_reports_generated
-                    existing_analytics.recurring_payments_processed = recurring_payments_processed
-                    existing_analytics.budget_checks = budget_checks
-                    existing_analytics.save()
-                    
-                    logger.info(f"Updated analytics for user {profile.telegram_id} for {target_date}")
-                else:
-                    # Создаем новую запись
-                    # voice_messages и photos_sent не передаём — используется default=0.
-                    # Если запись уже была создана через increment_analytics_counter,
-                    # она попадёт в existing_analytics выше.
-                    UserAnalytics.objects.create(
-                        profile=profile,
-                        date=target_date,
-                        messages_sent=messages_sent,
-                        commands_used=commands_used,
-                        expenses_added=expenses_stats['count'] or 0,
-                        incomes_added=incomes_count,
-                        categories_used=categories_used,
-                        ai_categorizations=ai_categorizations,
-                        manual_categorizations=manual_categorizations,
-                        cashback_calculated=cashback_calculated,
-                        cashback_transactions=cashback_transactions,
-                        errors_encountered=errors_encountered,
-                        error_types=error_types,
-                        total_session_time=total_session_time,
-                        peak_hour=peak_hour,
-                        pdf_reports_generated=pdf_reports_generated,
-                        recurring_payments_processed=recurring_payments_processed,
-                        budget_checks=budget_checks
-                    )
-                    created_analytics += 1
-                    logger.debug(f"Created analytics for user {profile.telegram_id} for {target_date}")
-                
-                processed_profiles += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing analytics for user {profile.telegram_id}: {e}")
-                continue
+
+        # Несколько GROUP BY по всем пользователям и один upsert вместо запросов на каждого
+        stats = collect_user_analytics(target_date)
         
         # Очистка старых записей аналитики (старше 90 дней)
         try:
@@ -1405,13 +1308,14 @@ def collect_daily_analytics():
         except Exception as e:
             logger.error(f"Failed to cleanup old analytics: {e}")
         
-        logger.info(f"Daily analytics collection completed: {processed_profiles} users processed, {created_analytics} new records created")
+        logger.info(
+            f"Daily analytics collection completed: {stats['processed_profiles']} users processed, "
+            f"{stats['created_analytics']} new records created"
+        )
         
         return {
             'date': target_date.isoformat(),
-            'processed_profiles': processed_profiles,
-            'created_analytics': created_analytics,
-            'updated_analytics': processed_profiles - created_analytics
+            **stats,
         }
     
     except Exception as e:
@@ -1491,7 +1395,8 @@ def process_recurring_payments():
     bot = None
     loop = None
     try:
-        from bot.services.recurring import process_recurring_payments_for_today
+        from bot.services.monthly_reports import create_send_limiter, create_send_throttle
+        from bot.services.recurring import process_recurring_payments_for_today, send_recurring_notifications
 
         # Use main bot token for user-facing notifications
         bot_token = os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('MONITORING_BOT_TOKEN')
@@ -1507,20 +1412,15 @@ def process_recurring_payments():
         )
 
         # Отправляем уведомления пользователям о списанных ежемесячных платежах
-        for payment_info in processed_payments:
-            try:
-                loop.run_until_complete(
-                    _send_recurring_operation_notification(bot, payment_info)
-                )
-                logger.info(
-                    "Sent notification to user %s about recurring payment",
-                    log_safe_id(payment_info['user_id'], "user"),
-                )
-            except Exception:
-                logger.exception(
-                    "Error sending recurring notification to user %s",
-                    log_safe_id(payment_info.get('user_id'), "user"),
-                )
+        # (после коммита операций, параллельно, с общим лимитом отправки)
+        sent_count = loop.run_until_complete(
+            send_recurring_notifications(
+                processed_payments,
+                lambda payment_info: _send_recurring_operation_notification(bot, payment_info),
+                throttle=create_send_throttle(create_send_limiter()),
+            )
+        )
+        logger.info("Sent %s/%s recurring payment notifications", sent_count, len(processed_payments))
 
         logger.info(f"Processed {processed_count} recurring payments")
 
@@ -1645,6 +1545,62 @@ def cleanup_old_keywords(profile_id: int, is_income: bool = False):
         logger.error(f"Error in cleanup_old_keywords for user {profile_id}: {e}")
 
 
+@shared_task
+def flush_keyword_usage():
+    """
+    Каждую минуту: перенести буфер использования keywords из Redis в БД
+    пачками UPDATE (расходы и доходы). См. bot/services/keyword_usage.py.
+    """
+    from bot.services.keyword_usage import EXPENSE, INCOME, flush_keyword_usage as flush
+
+    results = {}
+    for kind in (EXPENSE, INCOME):
+        try:
+            results[kind] = flush(kind)
+        except Exception as e:
+            logger.error(f"Error flushing keyword usage ({kind}): {e}", exc_info=True)
+            results[kind] = 0
+    return results
+
+
+@shared_task
+def flush_profile_activity():
+    """
+    Каждую минуту: перенести время активности пользователей из Redis
+    в Profile.last_activity пачками UPDATE. См. bot/services/profile_activity.py.
+    """
+    from bot.services.profile_activity import flush_profile_activity as flush
+
+    try:
+        return flush()
+    except Exception as e:
+        logger.error(f"Error flushing profile activity: {e}", exc_info=True)
+        return 0
+
+
+@shared_task
+def reconcile_daily_totals():
+    """
+    Каждую ночь: сверить дневные итоги (DailyCategoryTotal) с сырыми
+    операциями и исправить расхождения от записей в обход сигналов.
+    См. bot/services/daily_totals.py.
+    """
+    from bot.services.daily_totals import RECONCILE_BATCH_SIZE, rebuild_daily_totals
+    from bot.utils.fanout import chunked
+    from expenses.models import Profile
+
+    profile_ids = list(Profile.objects.order_by('id').values_list('id', flat=True))
+    fixed = 0
+    for batch in chunked(profile_ids, RECONCILE_BATCH_SIZE):
+        try:
+            fixed += rebuild_daily_totals(batch)
+        except Exception as e:
+            logger.error(f"Error reconciling daily totals for profiles {batch[0]}..{batch[-1]}: {e}", exc_info=True)
+    if fixed:
+        logger.warning(f"Daily totals drifted: fixed {fixed} rows for {len(profile_ids)} profiles")
+    return fixed
+
+
 @shared_task(bind=True)
 def learn_keywords_on_create(self, expense_id: int, category_id: int):
     """
@@ -1848,19 +1804,19 @@ def process_held_affiliate_commissions():
     return process_affiliate_commissions()
 
 
-@shared_task
-def update_top5_keyboards():
-    """Ежедневно в 05:00 MSK: пересчитать Топ‑5 и обновить клавиатуры закреплённых сообщений."""
+def _edit_top5_pins(pinned_items, label: str) -> int:
+    """Обновить клавиатуры закреплённых сообщений Топ‑5; pinned_items: profile_id -> items снепшота"""
+    from expenses.models import Top5Pin
+    from bot.services.top5 import build_top5_keyboard
+
+    pins = list(Top5Pin.objects.filter(profile_id__in=list(pinned_items)).select_related('profile'))
+    if not pins:
+        return 0
+
     bot = None
     loop = None
+    updated = 0
     try:
-        from expenses.models import Profile, Top5Snapshot, Top5Pin
-        from bot.services.top5 import (
-            calculate_top5_sync, save_snapshot, build_top5_keyboard, get_profiles_with_activity
-        )
-        from datetime import date
-        from calendar import monthrange
-
         # Бот для вызова editMessageReplyMarkup
         bot_token = os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('MONITORING_BOT_TOKEN')
         bot = create_telegram_bot(token=bot_token)
@@ -1868,76 +1824,93 @@ def update_top5_keyboards():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
-        # Окно: последние 90 дней включительно (rolling)
-        today = date.today()
-        from datetime import timedelta
-        window_end = today
-        window_start = today - timedelta(days=89)
-
-        # Пользователи с активностью
-        profiles = loop.run_until_complete(get_profiles_with_activity(window_start, window_end))
-
-        updated = 0
-        for profile in profiles:
+        for pin in pins:
+            profile = pin.profile
             try:
-                items, digest = loop.run_until_complete(calculate_top5_sync(profile, window_start, window_end))
-                snap = Top5Snapshot.objects.filter(profile=profile).first()
-                if not snap or snap.hash != digest or snap.window_start != window_start or snap.window_end != window_end:
-                    loop.run_until_complete(
-                        save_snapshot(profile, window_start, window_end, items, digest)
+                kb: InlineKeyboardMarkup = build_top5_keyboard(pinned_items[pin.profile_id])
+                loop.run_until_complete(
+                    bot.edit_message_reply_markup(chat_id=pin.chat_id, message_id=pin.message_id, reply_markup=kb)
+                )
+                updated += 1
+
+            except (TelegramBadRequest, TelegramNotFound) as e:
+                # Telegram-специфичные ошибки
+                error_text = str(e).lower()
+
+                # Сообщение удалено пользователем или не существует
+                if any(msg in error_text for msg in [
+                    "message to edit not found",
+                    "message not found",
+                    "message to delete not found"
+                ]):
+                    logger.info(
+                        f"Top-5 pin removed for user {profile.telegram_id}: "
+                        f"message {pin.message_id} not found (probably deleted by user)"
                     )
-                # Обновляем закреплённое сообщение, если знаем ids
-                pin = Top5Pin.objects.filter(profile=profile).first()
-                if pin:
                     try:
-                        kb: InlineKeyboardMarkup = build_top5_keyboard(items)
-                        loop.run_until_complete(
-                            bot.edit_message_reply_markup(chat_id=pin.chat_id, message_id=pin.message_id, reply_markup=kb)
-                        )
-                        updated += 1
-
-                    except (TelegramBadRequest, TelegramNotFound) as e:
-                        # Telegram-специфичные ошибки
-                        error_text = str(e).lower()
-
-                        # Сообщение удалено пользователем или не существует
-                        if any(msg in error_text for msg in [
-                            "message to edit not found",
-                            "message not found",
-                            "message to delete not found"
-                        ]):
-                            logger.info(
-                                f"Top-5 pin removed for user {profile.telegram_id}: "
-                                f"message {pin.message_id} not found (probably deleted by user)"
-                            )
-                            try:
-                                pin.delete()
-                            except Exception as delete_err:
-                                logger.error(
-                                    f"Failed to delete Top-5 pin for user {profile.telegram_id}: {delete_err}",
-                                    exc_info=True
-                                )
-                        else:
-                            # Другие TelegramBadRequest (например, invalid chat_id)
-                            logger.warning(
-                                f"Top-5 Telegram error for user {profile.telegram_id}: {e}"
-                            )
-
-                    except Exception as e:
-                        # Неожиданные ошибки (сеть, БД, Python)
+                        pin.delete()
+                    except Exception as delete_err:
                         logger.error(
-                            f"Top-5 unexpected error for user {profile.telegram_id}: {e}",
+                            f"Failed to delete Top-5 pin for user {profile.telegram_id}: {delete_err}",
                             exc_info=True
                         )
-            except Exception as user_err:
-                logger.error(f"Top-5 update error for user {profile.telegram_id}: {user_err}")
-                continue
-        logger.info(f"Top-5 updated for {updated} pinned messages (profiles processed: {len(profiles)})")
+                else:
+                    # Другие TelegramBadRequest (например, invalid chat_id)
+                    logger.warning(
+                        f"Top-5 Telegram error for user {profile.telegram_id}: {e}"
+                    )
+
+            except Exception as e:
+                # Неожиданные ошибки (сеть, БД, Python)
+                logger.error(
+                    f"Top-5 unexpected error for user {profile.telegram_id}: {e}",
+                    exc_info=True
+                )
+    finally:
+        _shutdown_event_loop(loop, bot=bot, label=label)
+    return updated
+
+
+@shared_task
+def update_top5_keyboards():
+    """Ежедневно в 05:00 MSK: пересчитать Топ‑5 и обновить клавиатуры закреплённых сообщений."""
+    try:
+        from bot.services.top5_batch import refresh_top5_snapshots, rolling_window
+        from bot.services.top5_counters import counters_seeded, decay_top5_counters
+
+        # Окно: последние 90 дней включительно (rolling)
+        window_start, window_end = rolling_window(date.today())
+
+        if counters_seeded():
+            # Счётчики ведутся сигналами: убираем вышедший из окна день и
+            # пересчитываем только профили, у которых он был
+            result = decay_top5_counters(window_start, window_end)
+        else:
+            # Один проход по сгруппированным операциям; пишутся только изменившиеся снепшоты
+            result = refresh_top5_snapshots(window_start, window_end)
+
+        # Закрепы обновляем только у профилей, чей Топ‑5 изменился
+        updated = _edit_top5_pins(result.pinned_items, label="update_top5_keyboards")
+        logger.info(
+            f"Top-5 updated for {updated} pinned messages "
+            f"(profiles processed: {result.processed}, snapshots changed: {result.changed})"
+        )
     except Exception as e:
         logger.error(f"Error in update_top5_keyboards: {e}")
 
-    finally:
-        _shutdown_event_loop(loop, bot=bot, label="update_top5_keyboards")
+
+@shared_task
+def refresh_top5_pin(profile_id: int):
+    """Обновить закреплённый Топ‑5 после изменения рейтинга (ставится сигналами операций)."""
+    try:
+        from expenses.models import Top5Snapshot
+
+        snapshot = Top5Snapshot.objects.filter(profile_id=profile_id).first()
+        if snapshot is None:
+            return 0
+        return _edit_top5_pins({profile_id: snapshot.items}, label="refresh_top5_pin")
+    except Exception as e:
+        logger.error(f"Error in refresh_top5_pin for profile {profile_id}: {e}")
 
 
 # ==================== INCOME KEYWORDS LEARNING ====================
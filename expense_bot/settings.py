@@ -127,6 +127,15 @@ else:
         }
     }
 
+# Соединения с БД в процессе бота (bot/middlewares/database.py):
+# переиспользуются между апдейтами с health check вместо закрытия после
+# каждого апдейта. CONN_MAX_AGE веб-процесса и Celery не меняется.
+BOT_DB_PERSISTENT_CONNECTIONS = os.getenv('BOT_DB_PERSISTENT_CONNECTIONS', 'true').lower() == 'true'
+BOT_DB_CONN_MAX_AGE = int(os.getenv('BOT_DB_CONN_MAX_AGE', '300'))
+# Горячие чтения бота в отдельном пуле потоков (bot/utils/db_executor.py)
+BOT_DB_PARALLEL_READS = os.getenv('BOT_DB_PARALLEL_READS', 'true').lower() == 'true'
+BOT_DB_READ_THREADS = int(os.getenv('BOT_DB_READ_THREADS', '4'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -465,6 +474,21 @@ try:
         'schedule': timedelta(minutes=15),  # Every 15 minutes
         'options': {'queue': 'monitoring', 'priority': 10, 'expires': 600}
     },
+    'flush-keyword-usage': {
+        'task': 'expense_bot.celery_tasks.flush_keyword_usage',
+        'schedule': timedelta(minutes=1),  # Буфер usage_count keywords -> БД
+        'options': {'queue': 'maintenance', 'expires': 50}
+    },
+    'flush-profile-activity': {
+        'task': 'expense_bot.celery_tasks.flush_profile_activity',
+        'schedule': timedelta(minutes=1),  # Буфер last_activity -> БД
+        'options': {'queue': 'maintenance', 'expires': 50}
+    },
+    'reconcile-daily-totals': {
+        'task': 'expense_bot.celery_tasks.reconcile_daily_totals',
+        'schedule': crontab(hour=4, minute=0),  # 04:00 daily — сверка DailyCategoryTotal
+        'options': {'queue': 'maintenance'}
+    },
     'process-scheduled-broadcasts': {
         'task': 'expenses.tasks.process_scheduled_broadcasts',
         'schedule': timedelta(minutes=5),  # Каждые 5 минут
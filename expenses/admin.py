@@ -3,6 +3,7 @@
 """
 from django import forms
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.db.models import Sum, Count
 from django.urls import reverse
@@ -15,7 +16,9 @@ from .models import (
     AdvertiserCampaign
 )
 from dateutil.relativedelta import relativedelta
+from bot.services.subscription_cache import invalidate_subscription_status
 from bot.utils.category_helpers import get_category_display_name
+from expenses.signals import operations_deleted
 
 
 class PromoCodeAdminForm(forms.ModelForm):
@@ -241,14 +244,20 @@ class ProfileAdmin(admin.ModelAdmin):
     
     def make_beta_tester(self, request, queryset):
         """Сделать бета-тестерами"""
+        # До update: с фильтром по is_beta_tester queryset после него пуст
+        telegram_ids = list(queryset.values_list('telegram_id', flat=True))
         updated = queryset.update(is_beta_tester=True)
+        invalidate_subscription_status(*telegram_ids)
         self.message_user(request, f'{updated} пользователей стали бета-тестерами.')
     
     make_beta_tester.short_description = 'Сделать бета-тестерами'
     
     def remove_beta_tester(self, request, queryset):
         """Убрать из бета-тестеров"""
+        # До update: с фильтром по is_beta_tester queryset после него пуст
+        telegram_ids = list(queryset.values_list('telegram_id', flat=True))
         updated = queryset.update(is_beta_tester=False)
+        invalidate_subscription_status(*telegram_ids)
         self.message_user(request, f'{updated} пользователей удалены из бета-тестеров.')
     
     remove_beta_tester.short_description = 'Убрать из бета-тестеров'
@@ -400,8 +409,25 @@ class ExpenseCategoryAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+class OperationDeleteMixin:
+    """Удаление трат/доходов не отправляет сигналов — итоги и кеши обновляются явно"""
+    operation_kind = None
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            operations_deleted(self.operation_kind, [obj])
+
+    def delete_queryset(self, request, queryset):
+        deleted = list(queryset)
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            operations_deleted(self.operation_kind, deleted)
+
+
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(OperationDeleteMixin, admin.ModelAdmin):
+    operation_kind = 'expense'
     list_display = [
         'profile',
         'display_amount',
@@ -750,7 +776,8 @@ class IncomeCategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Income)
-class IncomeAdmin(admin.ModelAdmin):
+class IncomeAdmin(OperationDeleteMixin, admin.ModelAdmin):
+    operation_kind = 'income'
     list_display = [
         'profile',
         'display_amount',
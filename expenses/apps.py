@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
-    verbose_name = 'Управление расходами'
\ No newline at end of file
+    verbose_name = 'Управление расходами'
+
+    def ready(self):
+        from expenses import signals  # noqa: F401
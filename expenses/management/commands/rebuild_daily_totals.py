@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from bot.services.daily_totals import rebuild_daily_totals
+from expenses.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Заполнить/исправить дневные итоги операций (DailyCategoryTotal) по сырым тратам и доходам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--telegram-id', type=int, action='append', dest='telegram_ids',
+            help='Только указанные пользователи (можно повторять)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько профилей сверять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать расхождения, ничего не записывать',
+        )
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by('id')
+        if options['telegram_ids']:
+            profiles = profiles.filter(telegram_id__in=options['telegram_ids'])
+        profile_ids = list(profiles.values_list('id', flat=True))
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+
+        self.stdout.write(f'Checking daily totals for {len(profile_ids)} profiles...')
+
+        mismatched = 0
+        for offset in range(0, len(profile_ids), batch_size):
+            batch = profile_ids[offset:offset + batch_size]
+            mismatched += rebuild_daily_totals(batch, dry_run=dry_run)
+            self.stdout.write(f'  {min(offset + batch_size, len(profile_ids))}/{len(profile_ids)}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Mismatched rows: {mismatched} (dry run, nothing written)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Done! Fixed rows: {mismatched}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from bot.services.top5_counters import mark_seeded, rebuild_top5_counters
+from expenses.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Заполнить/пересобрать дневные счётчики Топ‑5 (Top5Counter) по сырым тратам и доходам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--telegram-id', type=int, action='append', dest='telegram_ids',
+            help='Только указанные пользователи (можно повторять)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько профилей пересобирать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by('id')
+        if options['telegram_ids']:
+            profiles = profiles.filter(telegram_id__in=options['telegram_ids'])
+        profile_ids = list(profiles.values_list('id', flat=True))
+        batch_size = max(1, options['batch_size'])
+
+        self.stdout.write(f'Rebuilding Top-5 counters for {len(profile_ids)} profiles...')
+
+        rows = 0
+        for offset in range(0, len(profile_ids), batch_size):
+            batch = profile_ids[offset:offset + batch_size]
+            rows += rebuild_top5_counters(batch)
+            self.stdout.write(f'  {min(offset + batch_size, len(profile_ids))}/{len(profile_ids)}')
+
+        if not options['telegram_ids']:
+            # Счётчики заполнены для всех — меню и ночная задача переходят на них
+            mark_seeded()
+        self.stdout.write(self.style.SUCCESS(f'Done! Counter rows: {rows}'))
@@ -0,0 +1,53 @@
+# Generated manually
+"""
+Индексы для поиска по описанию трат и доходов на PostgreSQL
+(см. bot/services/text_search.py):
+- pg_trgm GIN (gin_trgm_ops) для оператора %> / word_similarity;
+- GIN по to_tsvector('russian', description) для полнотекстового поиска.
+
+Выражение tsvector должно совпадать с тем, что генерирует
+SearchVector('description', config='russian'), иначе планировщик
+не использует индекс.
+
+На SQLite миграция ничего не делает.
+"""
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    ('expenses_expense', 'expenses_expense_description_trgm', 'USING gin (description gin_trgm_ops)'),
+    ('expenses_expense', 'expenses_expense_description_fts',
+     "USING gin (to_tsvector('russian'::regconfig, COALESCE(description, '')))"),
+    ('incomes_income', 'incomes_income_description_trgm', 'USING gin (description gin_trgm_ops)'),
+    ('incomes_income', 'incomes_income_description_fts',
+     "USING gin (to_tsvector('russian'::regconfig, COALESCE(description, '')))"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, name, definition in SEARCH_INDEXES:
+        # CONCURRENTLY: не блокируем запись в большие таблицы во время деплоя
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0066_monthly_report_log'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
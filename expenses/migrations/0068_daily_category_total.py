@@ -0,0 +1,45 @@
+# Generated by Django 5.1.14 on 2026-10-16 20:54
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0067_description_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyCategoryTotal",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("op_type", models.CharField(choices=[("expense", "Трата"), ("income", "Доход")], max_length=10)),
+                ("category_id", models.IntegerField(default=0)),
+                ("currency", models.CharField(max_length=3)),
+                ("total", models.DecimalField(decimal_places=2, default=Decimal("0"), max_digits=14)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="daily_totals", to="expenses.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Дневной итог по категории",
+                "verbose_name_plural": "Дневные итоги по категориям",
+                "db_table": "expenses_daily_category_total",
+                "indexes": [models.Index(fields=["profile", "op_type", "date"], name="expenses_da_profile_3aa0ef_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("profile", "date", "op_type", "category_id", "currency"),
+                        name="uniq_daily_category_total",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.14 on 2026-10-16 23:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0068_daily_category_total"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Top5Counter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("group_id", models.CharField(max_length=16)),
+                ("op_type", models.CharField(choices=[("expense", "Трата"), ("income", "Доход")], max_length=10)),
+                ("title_norm", models.TextField()),
+                ("title_display", models.TextField(blank=True)),
+                ("category_id", models.IntegerField(default=0)),
+                ("amount_norm", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("currency", models.CharField(max_length=3)),
+                ("count", models.IntegerField(default=0)),
+                ("last_time", models.TimeField()),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="top5_counters", to="expenses.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Счётчик Топ‑5",
+                "verbose_name_plural": "Счётчики Топ‑5",
+                "db_table": "top5_counters",
+                "indexes": [models.Index(fields=["date"], name="top5_counters_date_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("profile", "date", "group_id"), name="uniq_top5_counter")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated manually
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+# Профили пересчитываются пачками, как в команде rebuild_daily_totals
+PROFILES_BATCH_SIZE = 200
+NO_CATEGORY = 0
+
+
+def backfill_daily_totals(apps, schema_editor):
+    """Заполняем дневные итоги по уже существующим тратам и доходам"""
+    Profile = apps.get_model('expenses', 'Profile')
+    Expense = apps.get_model('expenses', 'Expense')
+    Income = apps.get_model('expenses', 'Income')
+    DailyCategoryTotal = apps.get_model('expenses', 'DailyCategoryTotal')
+
+    # Строки, успевшие появиться от сигналов, пересчитываются вместе со всеми
+    DailyCategoryTotal.objects.all().delete()
+
+    profile_ids = list(Profile.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(profile_ids), PROFILES_BATCH_SIZE):
+        batch = profile_ids[start:start + PROFILES_BATCH_SIZE]
+        rows = []
+        for op_type, model, date_field in (('expense', Expense, 'expense_date'), ('income', Income, 'income_date')):
+            totals = {}
+            grouped = (
+                model.objects
+                .filter(profile_id__in=batch)
+                .order_by()
+                .values_list('profile_id', date_field, 'category_id', 'currency')
+                .annotate(total=Sum('amount'), count=Count('id'))
+            )
+            for profile_id, op_date, category_id, currency, total, count in grouped:
+                key = (profile_id, op_date, category_id or NO_CATEGORY, currency or '')
+                prev_total, prev_count = totals.get(key, (Decimal('0'), 0))
+                totals[key] = (prev_total + total, prev_count + count)
+            rows.extend(
+                DailyCategoryTotal(
+                    profile_id=profile_id, date=op_date, op_type=op_type,
+                    category_id=category_id, currency=currency, total=total, count=count,
+                )
+                for (profile_id, op_date, category_id, currency), (total, count) in totals.items()
+            )
+        DailyCategoryTotal.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0069_top5_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_totals, migrations.RunPython.noop),
+    ]
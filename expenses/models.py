@@ -434,7 +434,49 @@ class CategoryKeyword(models.Model):
         return f"{self.keyword} ({self.language}) -> {self.category.name}"
 
 
-class Expense(models.Model):
+class LoadedValuesModel(models.Model):
+    """
+    Запоминает значения полей в том виде, в каком они лежат в БД:
+    прочитанные (from_db, refresh_from_db) или последние сохранённые.
+
+    pre_save операций (дневные итоги, счётчики Топ‑5) берёт из них
+    состояние до изменения вместо отдельного SELECT.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.remember_loaded_values(fields)
+
+    def remember_loaded_values(self, fields=None) -> None:
+        """Текущие значения полей (все загруженные или fields) совпадают с БД"""
+        if fields is None:
+            fields = [f.attname for f in self._meta.concrete_fields]
+        deferred = self.get_deferred_fields()
+        loaded = dict(getattr(self, '_loaded_values', None) or {})
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname not in deferred:
+                loaded[attname] = getattr(self, attname)
+        self._loaded_values = loaded
+
+    def loaded_values(self, fields):
+        """Значения полей из БД (кортеж в порядке fields) или None, если часть не загружалась"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or any(name not in loaded for name in fields):
+            return None
+        return tuple(loaded[name] for name in fields)
+
+
+class Expense(LoadedValuesModel):
     """Траты согласно ТЗ"""
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='expenses')
     category = models.ForeignKey(
@@ -1089,7 +1131,7 @@ class IncomeCategory(models.Model):
             return "Прочие доходы"
 
 
-class Income(models.Model):
+class Income(LoadedValuesModel):
     """Доходы пользователя"""
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='incomes')
     category = models.ForeignKey(
@@ -1200,6 +1242,52 @@ class MonthlyReportLog(models.Model):
         return f"{self.profile_id} {self.year}-{self.month:02d}"
 
 
+class DailyCategoryTotal(models.Model):
+    """Дневные итоги операций профиля по категориям и валютам.
+
+    Материализованный rollup для аналитики (тренды, прогнозы, отчёты за 12
+    месяцев): вместо скана всех трат читается ~дни × категории строк.
+    Поддерживается сигналами Expense/Income в той же транзакции
+    (bot/services/daily_totals.py), пересобирается командой
+    rebuild_daily_totals.
+
+    category_id — id ExpenseCategory или IncomeCategory (по op_type),
+    0 — операции без категории. Не FK: одна таблица на оба типа операций.
+    """
+    OP_EXPENSE = 'expense'
+    OP_INCOME = 'income'
+    OP_TYPE_CHOICES = [
+        (OP_EXPENSE, 'Трата'),
+        (OP_INCOME, 'Доход'),
+    ]
+    NO_CATEGORY = 0
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='daily_totals')
+    date = models.DateField()
+    op_type = models.CharField(max_length=10, choices=OP_TYPE_CHOICES)
+    category_id = models.IntegerField(default=NO_CATEGORY)
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'expenses_daily_category_total'
+        verbose_name = 'Дневной итог по категории'
+        verbose_name_plural = 'Дневные итоги по категориям'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['profile', 'date', 'op_type', 'category_id', 'currency'],
+                name='uniq_daily_category_total',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['profile', 'op_type', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id} {self.date} {self.op_type} {self.category_id}: {self.total} {self.currency}"
+
+
 class IncomeBudget(models.Model):
     """Месячные цели доходов: по категории или общая цель профиля."""
 
@@ -1329,6 +1417,41 @@ class Top5Pin(models.Model):
         verbose_name_plural = 'Закрепы Топ‑5'
 
 
+class Top5Counter(models.Model):
+    """Дневные счётчики операций для Топ‑5.
+
+    Строка — операции профиля за день с одинаковым ключом группы
+    calculate_top5_sync (название, категория, сумма, валюта, тип);
+    group_id совпадает с id элемента снепшота. Топ‑5 за окно читается
+    из ~групп × дней строк вместо всех операций за 90 дней.
+    Поддерживается сигналами Expense/Income (bot/services/top5_counters.py),
+    строки старше окна удаляет ночная update_top5_keyboards,
+    пересборка — командой rebuild_top5_counters.
+    """
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='top5_counters')
+    date = models.DateField()
+    group_id = models.CharField(max_length=16)
+    op_type = models.CharField(max_length=10, choices=DailyCategoryTotal.OP_TYPE_CHOICES)
+    title_norm = models.TextField()
+    title_display = models.TextField(blank=True)
+    category_id = models.IntegerField(default=DailyCategoryTotal.NO_CATEGORY)
+    amount_norm = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    count = models.IntegerField(default=0)
+    last_time = models.TimeField()  # время самой свежей операции группы за день
+
+    class Meta:
+        db_table = 'top5_counters'
+        verbose_name = 'Счётчик Топ‑5'
+        verbose_name_plural = 'Счётчики Топ‑5'
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'date', 'group_id'], name='uniq_top5_counter'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='top5_counters_date_idx'),
+        ]
+
+
 # =============================================================================
 # Модели для мониторинга и аналитики
 # =============================================================================
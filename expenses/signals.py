@@ -0,0 +1,253 @@
+"""
+Сигналы моделей expenses.
+
+Сбрасывают in-process кеши бота, построенные поверх пользовательских данных,
+поддерживают дневные итоги операций (DailyCategoryTotal) и счётчики
+Топ‑5 (Top5Counter), контекст
+текущего апдейта (bot/utils/request_context.py) и кеш статуса подписки
+(bot/services/subscription_cache.py).
+
+Удаление трат и доходов построчных сигналов не имеет (иначе Django
+отключает fast-delete, и каскады/queryset.delete() идут по одной строке):
+места удаления вызывают operations_deleted() или, для массовых удалений,
+operations_deleted_in_bulk().
+"""
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from expenses.models import (
+    CategoryKeyword, Expense, ExpenseCategory, Income, IncomeCategory, Profile, Subscription, UserSettings,
+)
+
+
+@lru_cache(maxsize=4096)
+def _profile_id_for_category(category_id: int):
+    """Профиль категории не меняется, поэтому маппинг можно кешировать"""
+    return ExpenseCategory.objects.filter(id=category_id).values_list('profile_id', flat=True).first()
+
+
+def _invalidate_keyword_matcher(profile_id) -> None:
+    from bot.utils.keyword_matcher import invalidate_expense_keyword_matcher
+
+    # После коммита: иначе бот может пересобрать матчер по старым данным
+    transaction.on_commit(lambda: invalidate_expense_keyword_matcher(profile_id))
+
+
+def _invalidate_subscription_status(telegram_id) -> None:
+    from bot.services.subscription_cache import invalidate_subscription_status
+
+    transaction.on_commit(lambda: invalidate_subscription_status(telegram_id))
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, update_fields=None, **kwargs):
+    from bot.utils.request_context import remember_profile
+
+    # Контекст апдейта должен видеть профиль, сохранённый через другой экземпляр
+    remember_profile(instance)
+
+    # Флаг бета-тестера входит в кешированный статус подписки
+    if created or update_fields is None or 'is_beta_tester' in update_fields:
+        _invalidate_subscription_status(instance.telegram_id)
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    from bot.utils.request_context import get_request_context
+
+    context = get_request_context(instance.telegram_id)
+    if context is not None:
+        context.set_profile(None)
+    _invalidate_subscription_status(instance.telegram_id)
+    # Операции профиля удалены каскадом, без сигналов
+    for kind in ('expense', 'income'):
+        _invalidate_operation_caches(kind, instance.id)
+
+
+@receiver(post_save, sender=UserSettings)
+def user_settings_saved(sender, instance, **kwargs):
+    from bot.utils.request_context import get_request_context
+
+    context = get_request_context()
+    if context is not None and context.profile is not None and context.profile.id == instance.profile_id:
+        context.set_settings(instance)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    from bot.utils.request_context import get_request_context
+
+    context = get_request_context()
+    if context is not None and context.profile is not None and context.profile.id == instance.profile_id:
+        context.forget_subscription()
+
+    if Subscription.profile.is_cached(instance):
+        telegram_id = instance.profile.telegram_id
+    else:
+        telegram_id = Profile.objects.filter(id=instance.profile_id).values_list('telegram_id', flat=True).first()
+    if telegram_id is not None:
+        _invalidate_subscription_status(telegram_id)
+
+
+@receiver([post_save, post_delete], sender=ExpenseCategory)
+def expense_category_changed(sender, instance, **kwargs):
+    _invalidate_keyword_matcher(instance.profile_id)
+
+
+@receiver([post_save, post_delete], sender=CategoryKeyword)
+def category_keyword_changed(sender, instance, **kwargs):
+    _invalidate_keyword_matcher(_profile_id_for_category(instance.category_id))
+
+
+_PENDING_ATTR = '_operation_caches_pending'
+
+
+class _PendingOperationCaches:
+    """Кеши операций профилей, которые сбросит один on_commit текущей транзакции"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.frames = set()
+        self.indexes = set()
+
+    def scheduled(self) -> bool:
+        # После отката транзакции (или savepoint) Django забывает её on_commit
+        return any(callback[1] == self.flush for callback in self.connection.run_on_commit)
+
+    def flush(self) -> None:
+        from bot.services.analytics_engine import invalidate_operations_frames
+        from bot.services.description_index import profiles_changed
+
+        if getattr(self.connection, _PENDING_ATTR, None) is self:
+            delattr(self.connection, _PENDING_ATTR)
+        for kind in {kind for kind, _ in self.frames}:
+            invalidate_operations_frames(kind, [profile_id for frame_kind, profile_id in self.frames if frame_kind == kind])
+        for kind in {kind for kind, _ in self.indexes}:
+            profiles_changed(kind, [profile_id for index_kind, profile_id in self.indexes if index_kind == kind])
+
+
+def _invalidate_operation_caches(kind: str, profile_id, index: bool = True) -> None:
+    """
+    Срез аналитики (и индекс описаний, если index) профиля сбрасываются после
+    коммита — один раз на профиль за транзакцию, сколько бы операций ни изменилось.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, _PENDING_ATTR, None)
+    created = pending is None or not pending.scheduled()
+    if created:
+        pending = _PendingOperationCaches(connection)
+        setattr(connection, _PENDING_ATTR, pending)
+    pending.frames.add((kind, profile_id))
+    if index:
+        pending.indexes.add((kind, profile_id))
+    if created:
+        # Вне транзакции выполняется сразу
+        transaction.on_commit(pending.flush)
+
+
+def _on_operation_saved(kind: str, instance, created: bool, update_fields=None) -> None:
+    from bot.services import daily_totals, top5_counters
+    from bot.services.description_index import operation_saved
+
+    # Итоги — в той же транзакции, что и сама операция
+    daily_totals.operation_saved(kind, instance, created)
+    top5_counters.operation_saved(kind, instance, created)
+    # Следующее сохранение экземпляра возьмёт исходное состояние без SELECT
+    instance.remember_loaded_values(update_fields)
+    # Одиночное сохранение применяется к индексу описаний инкрементально
+    transaction.on_commit(lambda: operation_saved(kind, instance, created))
+    _invalidate_operation_caches(kind, instance.profile_id, index=False)
+
+
+def operations_bulk_created(kind: str, instances) -> None:
+    """bulk_create не отправляет post_save — обновляем итоги и сбрасываем кеши профилей"""
+    from bot.services import daily_totals, top5_counters
+
+    for instance in instances:
+        daily_totals.operation_saved(kind, instance, True)
+        top5_counters.operation_saved(kind, instance, True)
+        instance.remember_loaded_values()
+        _invalidate_operation_caches(kind, instance.profile_id)
+
+
+def operations_deleted(kind: str, instances) -> None:
+    """
+    Вызывается после удаления операций (instance.delete() в той же транзакции):
+    вычитает их из итогов и счётчиков, кеши сбрасываются один раз на профиль.
+    """
+    from bot.services import daily_totals, top5_counters
+
+    for instance in instances:
+        daily_totals.operation_deleted(kind, instance)
+        top5_counters.operation_deleted(kind, instance)
+        _invalidate_operation_caches(kind, instance.profile_id)
+
+
+def operations_deleted_in_bulk(kind: str, profile_ids) -> None:
+    """
+    После queryset.delete(): итоги и счётчики профилей сверяются с оставшимися
+    операциями, кеши сбрасываются один раз на профиль.
+    """
+    from bot.services import daily_totals, top5_counters
+
+    profile_ids = sorted(set(profile_ids))
+    if not profile_ids:
+        return
+    daily_totals.rebuild_daily_totals(profile_ids)
+    if top5_counters.counters_seeded():
+        transaction.on_commit(lambda: top5_counters.rebuild_top5_counters(profile_ids))
+    for profile_id in profile_ids:
+        _invalidate_operation_caches(kind, profile_id)
+
+
+def _remember_previous(kind: str, instance) -> None:
+    from bot.services import daily_totals, top5_counters
+
+    daily_totals.remember_previous(kind, instance)
+    top5_counters.remember_previous(kind, instance)
+
+
+@receiver(pre_save, sender=Expense)
+def expense_pre_save(sender, instance, **kwargs):
+    _remember_previous('expense', instance)
+
+
+@receiver(pre_save, sender=Income)
+def income_pre_save(sender, instance, **kwargs):
+    _remember_previous('income', instance)
+
+
+def operations_category_cleared(kind: str, category) -> None:
+    """
+    Перед тем как операции потеряют категорию (её удаление с SET_NULL или
+    queryset.update(category=None)): итоги переносятся в "без категории",
+    счётчики Топ‑5 пересобираются, кеши профиля сбрасываются.
+    """
+    from bot.services import daily_totals, top5_counters
+
+    daily_totals.category_deleted(kind, category.id)
+    top5_counters.category_deleted(kind, category.id)
+    _invalidate_operation_caches(kind, category.profile_id)
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def expense_category_pre_delete(sender, instance, **kwargs):
+    operations_category_cleared('expense', instance)
+
+
+@receiver(pre_delete, sender=IncomeCategory)
+def income_category_pre_delete(sender, instance, **kwargs):
+    operations_category_cleared('income', instance)
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, created, update_fields=None, **kwargs):
+    _on_operation_saved('expense', instance, created, update_fields)
+
+
+@receiver(post_save, sender=Income)
+def income_saved(sender, instance, created, update_fields=None, **kwargs):
+    _on_operation_saved('income', instance, created, update_fields)
@@ -3,11 +3,9 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import logging
-import time
 from uuid import uuid4
 
 from admin_panel.models import BroadcastMessage, BroadcastRecipient
-from bot.telegram_utils import send_telegram_message
 from django.core.cache import cache
 
 from expenses.models import AffiliateCommission
@@ -18,10 +16,22 @@ logger = logging.getLogger(__name__)
 
 @shared_task
 def send_broadcast_message(broadcast_id):
-    """Задача для отправки массовой рассылки"""
-    lock_key = f"broadcast:send:{broadcast_id}"
+    """
+    Задача для отправки массовой рассылки.
+
+    Отправка постраничная, с контрольной точкой в BroadcastMessage
+    (см. bot.services.broadcasts): повторный запуск продолжает с места остановки.
+    """
+    import asyncio
+    import os
+    from bot.services.broadcasts import BROADCAST_LOCK_TIMEOUT, broadcast_lock_key, run_broadcast, send_page
+    from bot.services.monthly_reports import create_send_limiter
+    from bot.utils.telegram_client import create_telegram_bot
+    from expense_bot.celery_tasks import _shutdown_event_loop
+
+    lock_key = broadcast_lock_key(broadcast_id)
     lock_token = uuid4().hex
-    if not cache.add(lock_key, lock_token, timeout=6 * 60 * 60):
+    if not cache.add(lock_key, lock_token, timeout=BROADCAST_LOCK_TIMEOUT):
         logger.info("Broadcast %s skipped: already locked by another worker", broadcast_id)
         return False
 
@@ -83,106 +93,34 @@ def send_broadcast_message(broadcast_id):
                 log_safe_id(allowed_telegram_id, "user"),
             )
 
-        # Получаем ID получателей и синхронизируем записи
-        recipient_ids = set(
-            recipient_qs.values_list('id', flat=True)
-        )
-        if recipient_ids:
-            BroadcastRecipient.objects.filter(broadcast=broadcast).exclude(
-                profile_id__in=recipient_ids
-            ).delete()
-        else:
-            BroadcastRecipient.objects.filter(broadcast=broadcast).delete()
+        def keep_lock():
+            if cache.get(lock_key) == lock_token:
+                cache.touch(lock_key, BROADCAST_LOCK_TIMEOUT)
 
-        existing_recipient_ids = set(
-            BroadcastRecipient.objects.filter(broadcast=broadcast).values_list('profile_id', flat=True)
-        )
-        new_recipient_ids = recipient_ids - existing_recipient_ids
-        BroadcastRecipient.objects.bulk_create([
-            BroadcastRecipient(
-                broadcast=broadcast,
-                profile_id=profile_id,
-                status='pending'
+        bot = None
+        loop = None
+        try:
+            bot = create_telegram_bot(token=os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN'))
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            limiter = create_send_limiter()
+            finished = run_broadcast(
+                broadcast,
+                recipient_qs,
+                lambda page: loop.run_until_complete(
+                    send_page(bot, page, broadcast.message_text, limiter, keep_lock=keep_lock)
+                ),
+                on_page=keep_lock,
             )
-            for profile_id in new_recipient_ids
-        ])
-
-        if broadcast.total_recipients != len(recipient_ids):
-            broadcast.total_recipients = len(recipient_ids)
-            broadcast.save(update_fields=['total_recipients'])
-
-        def persist_counters(*, final=False):
-            broadcast.sent_count = sent_count
-            broadcast.failed_count = failed_count
-            update_fields = ['sent_count', 'failed_count']
-            if final:
-                if failed_count > 0 and sent_count == 0:
-                    broadcast.status = 'failed'
-                else:
-                    broadcast.status = 'completed'
-                broadcast.completed_at = timezone.now()
-                update_fields.extend(['status', 'completed_at'])
-            broadcast.save(update_fields=update_fields)
-
-        # Отправляем сообщения. Считаем от фактического состояния записей получателей,
-        # чтобы корректно переживать повторы/частичный рестарт.
-        sent_count = BroadcastRecipient.objects.filter(
-            broadcast=broadcast,
-            status='sent',
-        ).count()
-        failed_count = BroadcastRecipient.objects.filter(
-            broadcast=broadcast,
-            status='failed',
-        ).count()
-
-        for recipient in BroadcastRecipient.objects.filter(
-            broadcast=broadcast,
-            status='pending',
-        ).select_related('profile'):
-            # Проверяем, не отменена ли рассылка
-            broadcast.refresh_from_db(fields=['status'])
-            if broadcast.status == 'cancelled':
-                persist_counters()
-                logger.info(f"Broadcast {broadcast_id} was cancelled during sending")
-                return False
+        finally:
+            _shutdown_event_loop(loop, bot=bot, label="send_broadcast_message")
 
-            try:
-                # Отправляем сообщение
-                send_telegram_message(
-                    chat_id=recipient.profile.telegram_id,
-                    text=broadcast.message_text,
-                    parse_mode='Markdown'
-                )
-
-                # Обновляем статус получателя
-                recipient.status = 'sent'
-                recipient.sent_at = timezone.now()
-                recipient.save(update_fields=['status', 'sent_at'])
-
-                sent_count += 1
-
-                # Небольшая задержка между сообщениями (защита от лимитов Telegram)
-                time.sleep(0.05)  # 50ms между сообщениями
-
-            except Exception as e:
-                logger.error(
-                    "Error sending broadcast message to %s: %s",
-                    log_safe_id(recipient.profile.telegram_id, "user"),
-                    e,
-                )
-                recipient.status = 'failed'
-                recipient.error_message = str(e)
-                recipient.save(update_fields=['status', 'error_message'])
-                failed_count += 1
-
-            # Обновляем счетчики в рассылке пакетно
-            processed_count = sent_count + failed_count
-            if processed_count and processed_count % 10 == 0:
-                persist_counters()
-
-        persist_counters(final=True)
+        if not finished:
+            return False
 
-        logger.info(f"Broadcast {broadcast_id} completed: {sent_count} sent, {failed_count} failed")
+        logger.info(
+            f"Broadcast {broadcast_id} completed: {broadcast.sent_count} sent, {broadcast.failed_count} failed"
+        )
         return True
     finally:
         if cache.get(lock_key) == lock_token:
@@ -216,6 +154,15 @@ def process_scheduled_broadcasts():
         send_broadcast_message.delay(broadcast.id)
         started += 1
 
+    # Рассылки, чей воркер упал: статус sending, но блокировку никто не продлевает.
+    # Продолжаются с контрольной точки last_recipient_id.
+    from bot.services.broadcasts import broadcast_lock_key
+
+    for broadcast_id in BroadcastMessage.objects.filter(status='sending').values_list('id', flat=True):
+        if cache.get(broadcast_lock_key(broadcast_id)) is None:
+            logger.info("Resuming interrupted broadcast %s", broadcast_id)
+            send_broadcast_message.delay(broadcast_id)
+
     return started
 
 
@@ -459,145 +406,52 @@ def send_expense_reminders():
     - Единственный способ сбросить флаг - внести любую операцию (трату или доход)
     - После внесения операции через 24-48ч бездействия придет новое напоминание
     """
-    from django.core.cache import cache
-    from expenses.models import Profile, Expense, Income
+    import asyncio
+    import os
+    from bot.services.expense_reminders import (
+        SENT,
+        mark_bot_blocked,
+        reminder_candidates,
+        send_reminders,
+        split_already_reminded,
+    )
+    from bot.services.monthly_reports import create_send_limiter, create_send_throttle
+    from bot.utils.telegram_client import create_telegram_bot
+    from expense_bot.celery_tasks import _shutdown_event_loop
 
     now = timezone.now()
-    yesterday = now - timedelta(hours=24)
-    two_days_ago = now - timedelta(hours=48)
 
-    sent_count = 0
-    skipped_count = 0
+    # Окно 24-48 часов и блокировка бота проверяются в SQL, флаги — одним MGET
+    candidates = reminder_candidates(now)
+    pending, already_reminded = split_already_reminded(candidates)
 
-    # Получаем всех активных пользователей
-    active_profiles = Profile.objects.filter(is_active=True)
-
-    for profile in active_profiles:
+    statuses = {}
+    bot = None
+    loop = None
+    if pending:
         try:
-            # Ключ в Redis для отслеживания отправленного напоминания
-            reminder_key = f"expense_reminder_sent:{profile.telegram_id}"
-
-            # Проверяем, было ли уже отправлено напоминание
-            if cache.get(reminder_key):
-                skipped_count += 1
-                continue
-
-            # Получаем последнюю трату пользователя
-            last_expense = Expense.objects.filter(
-                profile=profile
-            ).order_by('-created_at').first()
-
-            # Получаем последний доход пользователя
-            last_income = Income.objects.filter(
-                profile=profile
-            ).order_by('-created_at').first()
-
-            # Определяем последнюю финансовую операцию (трата или доход)
-            last_operation = None
-            last_operation_type = None
-
-            if last_expense and last_income:
-                # Есть и траты, и доходы - берем самое свежее
-                if last_expense.created_at > last_income.created_at:
-                    last_operation = last_expense
-                    last_operation_type = 'expense'
-                else:
-                    last_operation = last_income
-                    last_operation_type = 'income'
-            elif last_expense:
-                last_operation = last_expense
-                last_operation_type = 'expense'
-            elif last_income:
-                last_operation = last_income
-                last_operation_type = 'income'
-
-            # Условие для отправки напоминания
-            should_remind = False
-
-            if not last_operation:
-                # Новый пользователь без операций
-                # Проверяем, что прошло от 24 до 48 часов с регистрации
-                if profile.created_at and two_days_ago < profile.created_at < yesterday:
-                    should_remind = True
-                    logger.info(
-                        "[REMINDER] New user %s needs reminder (no operations, registered 24-48h ago)",
-                        log_safe_id(profile.telegram_id, "user"),
-                    )
-            else:
-                # Пользователь с операциями - проверяем что последняя операция была 24-48 часов назад
-                if two_days_ago < last_operation.created_at < yesterday:
-                    should_remind = True
-                    logger.info(
-                        "[REMINDER] User %s needs reminder (last %s 24-48h ago: %s)",
-                        log_safe_id(profile.telegram_id, "user"),
-                        last_operation_type,
-                        last_operation.created_at,
-                    )
-
-            if should_remind:
-                # Проверяем не заблокирован ли бот ПЕРЕД попыткой отправки
-                if profile.bot_blocked:
-                    logger.debug("[REMINDER] Skipping %s (bot blocked)", log_safe_id(profile.telegram_id, "user"))
-                    skipped_count += 1
-                    continue
-
-                # Получаем язык пользователя
-                lang = profile.language_code or 'ru'
-
-                # Отправляем напоминание
-                from bot.telegram_utils import send_telegram_message
-                from bot.texts import get_text
-
-                message = get_text('expense_reminder', lang)
-
-                try:
-                    send_telegram_message(
-                        chat_id=profile.telegram_id,
-                        text=message,
-                        parse_mode='HTML'
-                    )
-
-                    # Устанавливаем флаг в Redis БЕЗ ограничения по времени
-                    # Флаг будет сброшен только при создании новой операции
-                    cache.set(reminder_key, True, timeout=None)  # Бессрочно
-
-                    sent_count += 1
-                    logger.info("[REMINDER] Sent reminder to %s", log_safe_id(profile.telegram_id, "user"))
-
-                    # Небольшая задержка между отправками
-                    time.sleep(0.05)
-
-                except Exception as e:
-                    error_message = str(e).lower()
-
-                    # Если бот заблокирован - устанавливаем флаг
-                    if "bot was blocked by the user" in error_message or "forbidden" in error_message:
-                        profile.bot_blocked = True
-                        profile.bot_blocked_at = timezone.now()
-                        profile.save(update_fields=['bot_blocked', 'bot_blocked_at'])
-                        logger.info(
-                            "[REMINDER] %s has blocked the bot. Profile marked.",
-                            log_safe_id(profile.telegram_id, "user"),
-                        )
-                    else:
-                        # Другие ошибки логируем как ERROR
-                        logger.error(
-                            "[REMINDER] Failed to send reminder to %s: %s",
-                            log_safe_id(profile.telegram_id, "user"),
-                            e,
-                        )
-            else:
-                skipped_count += 1
-
+            bot = create_telegram_bot(token=os.getenv('BOT_TOKEN') or os.getenv('TELEGRAM_BOT_TOKEN'))
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            statuses, blocked = loop.run_until_complete(
+                send_reminders(bot, pending, throttle=create_send_throttle(create_send_limiter()))
+            )
+            mark_bot_blocked(blocked, timezone.now())
         except Exception as e:
-            logger.error("[REMINDER] Error processing %s: %s", log_safe_id(profile.telegram_id, "user"), e)
-            continue
+            logger.error(f"[REMINDER] Error sending reminders: {e}")
+        finally:
+            _shutdown_event_loop(loop, bot=bot, label="send_expense_reminders")
+
+    sent_count = statuses.get(SENT, 0)
+    skipped_count = len(candidates) - sent_count
 
     logger.info(
-        f"[REMINDER] Completed: {sent_count} reminders sent, {skipped_count} users skipped"
+        f"[REMINDER] Completed: {sent_count} reminders sent, {skipped_count} candidates skipped "
+        f"(candidates={len(candidates)} already_reminded={already_reminded} statuses={dict(statuses)})"
     )
 
     return {
+        'candidates': len(candidates),
         'sent': sent_count,
         'skipped': skipped_count,
         'timestamp': now.isoformat()
@@ -620,8 +474,19 @@ def clear_expense_reminder(telegram_id: int):
         telegram_id: ID пользователя в Telegram
     """
     from django.core.cache import cache
+    from bot.services.expense_reminders import reminder_flag_key
 
-    reminder_key = f"expense_reminder_sent:{telegram_id}"
-    cache.delete(reminder_key)
+    cache.delete(reminder_flag_key(telegram_id))
 
     logger.debug("[REMINDER] Cleared reminder flag for %s", log_safe_id(telegram_id, "user"))
+
+
+def clear_expense_reminders(telegram_ids):
+    """Сброс флагов напоминания сразу для нескольких пользователей (один DELETE в Redis)"""
+    from django.core.cache import cache
+    from bot.services.expense_reminders import reminder_flag_key
+
+    keys = [reminder_flag_key(telegram_id) for telegram_id in set(telegram_ids)]
+    if keys:
+        cache.delete_many(keys)
+        logger.debug("[REMINDER] Cleared reminder flags for %s users", len(keys))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for default category detection (expense + income).
+
+Compares the indexed detect_expense_category_key / detect_income_category_key
+with the legacy O(categories x keywords) loop over match_keyword_in_text().
+The corpus is every string literal from tests/test_expense_parser.py (plus the
+same strings without digits, as the parser passes text without the amount).
+Exits with code 1 if any result differs.
+
+Usage:
+  python -u scripts/bench_category_detection.py [--repeat 20]
+"""
+import argparse
+import ast
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bot.utils.expense_category_definitions import (  # noqa: E402
+    DEFAULT_EXPENSE_CATEGORY_KEY,
+    EXPENSE_CATEGORY_DEFINITIONS,
+    detect_expense_category_key,
+)
+from bot.utils.income_category_definitions import (  # noqa: E402
+    DEFAULT_INCOME_CATEGORY_KEY,
+    INCOME_CATEGORY_DEFINITIONS,
+    detect_income_category_key,
+)
+from bot.utils.keyword_service import match_keyword_in_text  # noqa: E402
+
+CORPUS_FILE = ROOT / 'tests' / 'test_expense_parser.py'
+
+
+def legacy_detect_expense(text):
+    best_key = None
+    best_score = 0
+    for key, data in EXPENSE_CATEGORY_DEFINITIONS.items():
+        if key == DEFAULT_EXPENSE_CATEGORY_KEY:
+            continue
+        score = sum(1 for keyword in data.get('keywords', []) if match_keyword_in_text(keyword, text)[0])
+        if score > best_score:
+            best_score = score
+            best_key = key
+    return best_key
+
+
+def legacy_detect_income(text):
+    for key, data in INCOME_CATEGORY_DEFINITIONS.items():
+        if key == DEFAULT_INCOME_CATEGORY_KEY:
+            continue
+        for keyword in data.get('keywords', []):
+            if match_keyword_in_text(keyword, text)[0]:
+                return key
+    return None
+
+
+def load_corpus():
+    tree = ast.parse(CORPUS_FILE.read_text(encoding='utf-8'))
+    texts = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip():
+            value = node.value.lower()
+            texts.add(value)
+            texts.add(' '.join(re.sub(r'\d+([.,]\d+)?', ' ', value).split()))
+    texts.discard('')
+    return sorted(texts)
+
+
+def run_pass(detect, corpus):
+    for text in corpus:
+        detect(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"Corpus: {len(corpus)} texts from {CORPUS_FILE.relative_to(ROOT)}")
+
+    mismatches = 0
+    pairs = (
+        ('expense', legacy_detect_expense, detect_expense_category_key),
+        ('income', legacy_detect_income, detect_income_category_key),
+    )
+    for name, legacy, indexed in pairs:
+        for text in corpus:
+            expected, actual = legacy(text), indexed(text)
+            if expected != actual:
+                mismatches += 1
+                print(f"  MISMATCH [{name}] {text!r}: legacy={expected} indexed={actual}")
+
+        legacy_time = min(timeit.repeat(lambda: run_pass(legacy, corpus), number=1, repeat=3))
+        indexed_time = min(timeit.repeat(lambda: run_pass(indexed, corpus), number=args.repeat, repeat=3))
+        indexed_time /= args.repeat
+        per_text_legacy = legacy_time / len(corpus) * 1e6
+        per_text_indexed = indexed_time / len(corpus) * 1e6
+        print(
+            f"{name:8s} legacy: {per_text_legacy:9.1f} us/text   indexed: {per_text_indexed:7.1f} us/text   "
+            f"speedup: x{legacy_time / indexed_time:.0f}"
+        )
+
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        return 1
+    print("OK: results are identical")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark for hot bot reads (bot/utils/db_executor.py).
+
+Simulates N simultaneous updates from different users. Each update calls
+get_user_language, get_user_categories, get_today_summary,
+get_expenses_summary and get_last_expenses. The benchmark runs twice:
+once with all ORM work in the shared thread_sensitive thread (old
+behaviour, BOT_DB_PARALLEL_READS=False) and once with the read pool.
+It prints p50/p95/max latency per update.
+
+A throwaway test database is created (Postgres when DB_HOST is set,
+otherwise in-memory SQLite). --query-latency-ms adds a sleep to every
+query to model the network round-trip to Postgres, which local SQLite
+does not have.
+
+Usage:
+  python -u scripts/bench_db_concurrency.py [--updates 50] [--rounds 5] [--query-latency-ms 2]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_bot.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+BASE_TELEGRAM_ID = 900_000_000
+
+
+def add_query_latency(latency_seconds):
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(latency_seconds)
+        return execute(sql, params, many, context)
+
+    def on_connection(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(on_connection, weak=False)
+    connection.execute_wrappers.append(wrapper)
+
+
+def seed(users):
+    from expenses.models import Expense, ExpenseCategory, Profile
+
+    today = date.today()
+    for index in range(users):
+        profile = Profile.objects.create(telegram_id=BASE_TELEGRAM_ID + index, language_code='ru')
+        categories = [
+            ExpenseCategory.objects.create(profile=profile, name=f'Категория {number}', icon='💰')
+            for number in range(8)
+        ]
+        Expense.objects.bulk_create([
+            Expense(
+                profile=profile, category=categories[number % len(categories)],
+                amount=Decimal(100 + number), currency='RUB',
+                expense_date=today - timedelta(days=number % 20), description=f'Трата {number}',
+            )
+            for number in range(40)
+        ])
+
+
+async def one_update(telegram_id):
+    from bot.services.category import get_user_categories
+    from bot.services.expense import get_expenses_summary, get_last_expenses, get_today_summary
+    from bot.utils.language import get_user_language
+
+    today = date.today()
+    started = time.perf_counter()
+    await get_user_language(telegram_id)
+    await get_user_categories(telegram_id)
+    await get_today_summary(telegram_id)
+    await get_expenses_summary(telegram_id, today.replace(day=1), today)
+    await get_last_expenses(telegram_id)
+    return time.perf_counter() - started
+
+
+async def run_mode(parallel, updates, rounds):
+    settings.BOT_DB_PARALLEL_READS = parallel
+    # Прогрев: соединения потоков и кеши
+    await asyncio.gather(*(one_update(BASE_TELEGRAM_ID + index) for index in range(updates)))
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        latencies.extend(await asyncio.gather(
+            *(one_update(BASE_TELEGRAM_ID + index) for index in range(updates))
+        ))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--updates', type=int, default=50, help='simultaneous updates')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--query-latency-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(args.updates)
+        if args.query_latency_ms:
+            add_query_latency(args.query_latency_ms / 1000)
+
+        print(
+            f"{args.updates} simultaneous updates x {args.rounds} rounds, "
+            f"{connection.vendor}, +{args.query_latency_ms} ms/query, "
+            f"read threads: {settings.BOT_DB_READ_THREADS}"
+        )
+        for name, parallel in (('shared thread', False), ('read pool', True)):
+            latencies, elapsed = asyncio.run(run_mode(parallel, args.updates, args.rounds))
+            print(
+                f"{name:14s} p50: {statistics.median(latencies) * 1000:8.1f} ms   "
+                f"p95: {percentile(latencies, 0.95) * 1000:8.1f} ms   "
+                f"max: {max(latencies) * 1000:8.1f} ms   "
+                f"throughput: {len(latencies) / elapsed:6.1f} updates/s"
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for SecurityCheckMiddleware content checks.
+
+Compares the compiled single-pass PatternScanner and the regex run-length
+spam check with the legacy per-pattern `in` loop and the nested
+repeated-character scan. The corpus is every string literal from
+tests/test_expense_parser.py (realistic expense messages), the same
+messages padded to typical chat length, plus injection / spam samples.
+Exits with code 1 if any result differs.
+
+Usage:
+  python -u scripts/bench_security_scan.py [--repeat 20]
+"""
+import argparse
+import ast
+import os
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_bot.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from bot.middlewares.security_check import SecurityCheckMiddleware  # noqa: E402
+
+CORPUS_FILE = ROOT / 'tests' / 'test_expense_parser.py'
+
+ATTACK_SAMPLES = [
+    '<script>alert(1)</script>',
+    'кофе 200 javascript:void(0)',
+    '<img src=x onerror=alert(1)>',
+    "1' OR 1=1 --",
+    'drop table expenses',
+    'please DELETE FROM users now',
+    "__import__('os').system('ls')",
+    'eval(input())',
+    '../../etc/passwd',
+    'мой password123 от банка',
+    'такси 500 root',
+    'ааааааааааааааааа 100',
+    'ОЧЕНЬ ГРОМКОЕ СООБЩЕНИЕ 500',
+    'description transcript 300',
+    'update set',
+]
+
+
+def legacy_check_patterns(patterns, text):
+    text_lower = text.lower()
+    detected = []
+    for pattern in patterns:
+        pattern_lower = pattern.lower()
+        if pattern_lower.startswith('<') or '=' in pattern_lower or pattern_lower.startswith('javascript'):
+            if pattern_lower in text_lower:
+                detected.append(pattern)
+        elif pattern_lower.startswith('drop') or pattern_lower.startswith('delete') or pattern_lower.startswith('insert') or pattern_lower.startswith('update'):
+            if f' {pattern_lower} ' in f' {text_lower} ':
+                detected.append(pattern)
+        elif pattern_lower == 'script':
+            if any(context in text_lower for context in ['<script', 'javascript:', 'src=', 'onload=', 'onerror=']):
+                detected.append(pattern)
+        elif pattern_lower in text_lower:
+            detected.append(pattern)
+    return detected
+
+
+def legacy_check_honeypot(tokens, text):
+    text_lower = text.lower()
+    return any(token in text_lower for token in tokens)
+
+
+def legacy_check_spam(text):
+    for i in range(len(text) - 2):
+        if text[i] == text[i + 1] == text[i + 2]:
+            char_count = 3
+            for j in range(i + 3, len(text)):
+                if text[j] == text[i]:
+                    char_count += 1
+                else:
+                    break
+            if char_count > 10:
+                return True
+    upper_count = sum(1 for c in text if c.isupper())
+    if len(text) > 10 and upper_count / len(text) > 0.7:
+        return True
+    return False
+
+
+def load_corpus():
+    tree = ast.parse(CORPUS_FILE.read_text(encoding='utf-8'))
+    texts = set(ATTACK_SAMPLES)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip():
+            texts.add(node.value)
+            # Сообщение средней длины для чата/описаний
+            texts.add(' '.join([node.value] * 8))
+    return sorted(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    middleware = SecurityCheckMiddleware()
+    patterns, tokens = middleware.suspicious_patterns, middleware.honeypot_tokens
+    corpus = load_corpus()
+    print(f"Corpus: {len(corpus)} texts from {CORPUS_FILE.relative_to(ROOT)} + attack samples")
+
+    def legacy(text):
+        return (
+            legacy_check_patterns(patterns, text),
+            legacy_check_honeypot(tokens, text),
+            legacy_check_spam(text),
+        )
+
+    def compiled(text):
+        detected, honeypot = middleware.scanner.scan(text)
+        return detected, honeypot, middleware._check_spam_patterns(text)
+
+    mismatches = 0
+    for text in corpus:
+        expected, actual = legacy(text), compiled(text)
+        if expected != actual:
+            mismatches += 1
+            print(f"  MISMATCH {text!r}: legacy={expected} compiled={actual}")
+
+    def run_pass(check):
+        for text in corpus:
+            check(text)
+
+    legacy_time = min(timeit.repeat(lambda: run_pass(legacy), number=args.repeat, repeat=3)) / args.repeat
+    compiled_time = min(timeit.repeat(lambda: run_pass(compiled), number=args.repeat, repeat=3)) / args.repeat
+    print(
+        f"legacy: {legacy_time / len(corpus) * 1e6:7.1f} us/text   "
+        f"compiled: {compiled_time / len(corpus) * 1e6:7.1f} us/text   "
+        f"speedup: x{legacy_time / compiled_time:.1f}"
+    )
+
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        return 1
+    print("OK: results are identical")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
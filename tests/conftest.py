@@ -211,6 +211,25 @@ def mock_redis():
         yield mock_cache
 
 
+@pytest.fixture(autouse=True)
+def clear_in_process_caches():
+    """Reset in-process caches so data never leaks between tests."""
+    from bot.services.analytics_engine import clear_operations_frames
+    from bot.services.description_index import clear_description_indexes
+    from bot.services.subscription_cache import clear_local_subscription_cache
+    from bot.utils.keyword_matcher import clear_expense_keyword_matchers
+
+    clear_expense_keyword_matchers()
+    clear_description_indexes()
+    clear_operations_frames()
+    clear_local_subscription_cache()
+    yield
+    clear_expense_keyword_matchers()
+    clear_description_indexes()
+    clear_operations_frames()
+    clear_local_subscription_cache()
+
+
 @pytest.fixture
 def mock_ai_service():
     """Mock AI categorization service."""
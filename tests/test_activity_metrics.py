@@ -0,0 +1,126 @@
+"""
+Tests for bounded activity metrics and ActivityTrackerMiddleware flushing.
+"""
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from bot.middleware.activity_tracker import ActivityTrackerMiddleware
+from bot.utils.activity_metrics import (
+    ActivityMetrics,
+    HyperLogLog,
+    TopKCounter,
+    flush_activity_batch,
+    read_activity_snapshot,
+)
+
+
+def _message(user_id: int, text: str = 'кофе 200') -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='Test'),
+        text=text,
+    )
+
+
+def test_hyperloglog_estimates_unique_count_in_fixed_memory():
+    hll = HyperLogLog()
+    for user_id in range(50_000):
+        hll.add(user_id)
+        hll.add(user_id)
+
+    assert len(hll.registers) == 4096
+    assert abs(len(hll) - 50_000) / 50_000 < 0.05
+
+    small = HyperLogLog()
+    for user_id in range(10):
+        small.add(user_id)
+    assert len(small) == 10
+
+
+def test_topk_counter_keeps_heavy_hitters_within_capacity():
+    counter = TopKCounter(capacity=10)
+    for _ in range(100):
+        counter.add('/start')
+    for _ in range(50):
+        counter.add('/today')
+    for i in range(200):
+        counter.add(f'callback:noise_{i}')
+
+    assert len(counter) == 10
+    top = dict(counter.most_common(2))
+    assert top['/start'] == 100
+    assert '/today' in top
+
+
+def test_metrics_memory_is_flat_and_drain_resets_pending():
+    metrics = ActivityMetrics(top_commands=5, max_errors=3, max_pending_users=100)
+    for user_id in range(200):
+        metrics.record_request(user_id, f'/cmd{user_id}')
+    for i in range(10):
+        metrics.record_error({'error': str(i)})
+
+    assert metrics.pending_full
+    assert len(metrics.commands) == 5
+    assert [error['error'] for error in metrics.errors] == ['7', '8', '9']
+
+    batch = metrics.drain()
+    assert batch.requests == 200
+    assert len(batch.commands) == 5
+    assert len(batch.errors) == 3
+    assert not metrics.pending_full
+    assert not metrics.drain()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['total_requests'] == 200
+    assert snapshot['errors_count'] == 10
+
+
+def test_flush_and_snapshot_roundtrip_through_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    connection = fakeredis.FakeStrictRedis()
+    now = datetime(2026, 3, 1, 12, 30)
+
+    metrics = ActivityMetrics()
+    for _ in range(3):
+        metrics.record_request(1, '/start')
+    metrics.record_request(2)
+    metrics.record_error({'error': 'boom', 'command': '/start'})
+
+    hourly = flush_activity_batch(connection, metrics.drain(), now=now)
+    assert hourly == {1: 3, 2: 1}
+
+    metrics.record_request(1)
+    hourly = flush_activity_batch(connection, metrics.drain(), now=now)
+    assert hourly == {1: 4}
+
+    snapshot = read_activity_snapshot(connection, now.date())
+    assert snapshot['total_requests'] == 5
+    assert snapshot['unique_users'] == 2
+    assert snapshot['popular_commands'] == [('/start', 3)]
+    assert snapshot['recent_errors'] == [{'error': 'boom', 'command': '/start'}]
+
+
+@pytest.mark.asyncio
+async def test_middleware_flushes_on_interval_and_alerts_on_hourly_activity(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    middleware = ActivityTrackerMiddleware(flush_interval=3600, connection=fakeredis.FakeStrictRedis())
+    alert = AsyncMock()
+    monkeypatch.setattr(middleware, '_send_suspicious_activity_alert', alert)
+    monkeypatch.setattr('bot.middleware.activity_tracker.SUSPICIOUS_REQUESTS_PER_HOUR', 2)
+    monkeypatch.setattr('bot.middleware.activity_tracker.record_profile_activity', lambda user_id: True)
+    handler = AsyncMock(return_value='ok')
+
+    for _ in range(3):
+        assert await middleware(handler, _message(7), {}) == 'ok'
+    alert.assert_not_awaited()
+
+    await middleware.flush()
+    alert.assert_awaited_once_with(7, 3)
+    stats = await middleware.get_daily_stats()
+    assert stats['total_requests'] == 3
+    assert stats['unique_users'] == 1
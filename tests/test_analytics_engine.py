@@ -0,0 +1,139 @@
+"""
+Tests for the columnar operations frame behind ExpenseFunctions analytics.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from bot.services import analytics_engine
+from bot.services.analytics_engine import OperationsFrame
+from bot.services.expense_functions import ExpenseFunctions
+from expenses.models import Expense, Income
+
+
+def _frame(rows):
+    return OperationsFrame.from_rows([
+        (op_id, op_date, Decimal(amount), category_id, currency)
+        for op_id, op_date, amount, category_id, currency in rows
+    ])
+
+
+def test_frame_aggregates_days_weekdays_and_months():
+    monday = date(2026, 3, 2)
+    frame = _frame([
+        (1, monday, '100.10', 5, 'RUB'),
+        (2, monday, '0.20', None, 'RUB'),
+        (3, monday + timedelta(days=1), '50.00', 5, 'USD'),
+        (4, date(2026, 2, 27), '300.00', 7, 'RUB'),
+    ])
+
+    assert frame.total() == 450.3
+    assert frame.active_days() == 3
+    assert frame.max_day() == (date(2026, 2, 27), 300.0)
+    totals, counts = frame.weekday_totals()
+    assert totals[:2] == [100.3, 50.0]
+    assert counts == [2, 1, 0, 0, 1, 0, 0]
+    assert frame.monthly_totals() == {(2026, 2): 300.0, (2026, 3): 150.3}
+    assert frame.max_id() == 4 and frame.min_id() == 2
+    assert frame.currencies == ['RUB', 'USD']
+    assert list(frame.category_ids) == [5, 0, 5, 7]
+
+
+def test_frame_filters_by_dates_and_amounts():
+    frame = _frame([
+        (1, date(2026, 3, 1), '10.00', 1, 'RUB'),
+        (2, date(2026, 3, 2), '100.00', 1, 'RUB'),
+        (3, date(2026, 3, 3), '100.00', 1, 'RUB'),
+        (4, date(2026, 3, 4), '1000.00', 1, 'RUB'),
+    ])
+
+    assert len(frame.between(date(2026, 3, 2), date(2026, 3, 3))) == 2
+    in_range = frame.amount_between(min_amount=99.999, max_amount=100.004)
+    # По убыванию суммы, при равенстве — сначала более поздние
+    assert in_range.top_ids(10) == [3, 2]
+    assert frame.top_ids(2) == [4, 3]
+    assert len(_frame([]).between(date(2026, 1, 1))) == 0
+    assert _frame([]).max_day() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_chained_expense_functions_share_one_frame(test_profile, test_expense_category, monkeypatch):
+    today = date.today()
+    for amount, expense_date in (('120.50', today), ('80.00', today), ('15.25', today), ('999.00', today - timedelta(days=400))):
+        await Expense.objects.acreate(
+            profile=test_profile, category=test_expense_category, amount=Decimal(amount),
+            currency='RUB', expense_date=expense_date, description='Обед',
+        )
+
+    windows = []
+    build = analytics_engine.build_operations_frame
+    monkeypatch.setattr(
+        analytics_engine, 'build_operations_frame',
+        lambda profile_id, kind, start_date, end_date: (
+            windows.append((start_date, end_date)) or build(profile_id, kind, start_date, end_date)
+        ),
+    )
+
+    max_day = await ExpenseFunctions.get_max_expense_day(test_profile.telegram_id)
+    average = await ExpenseFunctions.get_average_expenses(test_profile.telegram_id, period_days=30)
+    maximum = await ExpenseFunctions.get_max_single_expense(test_profile.telegram_id)
+
+    # Из БД читается только окно запроса; следующие периоды внутри него берутся из кеша
+    assert windows == [(today - timedelta(days=60), today)]
+    assert max_day['total'] == 215.75
+    assert (average['total'], average['count']) == (215.75, 3)
+    assert maximum['amount'] == 120.5
+
+    # Пересекающийся период расширяет окно одним запросом
+    await ExpenseFunctions.get_average_expenses(test_profile.telegram_id, period_days=90)
+    assert windows[-1] == (today - timedelta(days=90), today)
+
+    # Новая трата сбрасывает срез профиля
+    await Expense.objects.acreate(
+        profile=test_profile, category=test_expense_category, amount=Decimal('4.25'),
+        currency='RUB', expense_date=today, description='Чай',
+    )
+    minimum = await ExpenseFunctions.get_min_single_expense(test_profile.telegram_id)
+    assert minimum['amount'] == 4.25
+
+
+@pytest.mark.django_db
+def test_frame_is_rebuilt_when_version_changes_in_another_process(test_profile, monkeypatch):
+    versions = {}
+    monkeypatch.setattr(analytics_engine.cache, 'get', lambda key: versions.get(key))
+    today = date.today()
+
+    frame = analytics_engine.get_operations_frame_sync(test_profile.id, analytics_engine.EXPENSE, today, today)
+    assert len(frame) == 0
+    Expense.objects.bulk_create([
+        Expense(profile=test_profile, amount=Decimal('10'), currency='RUB', expense_date=today, description='Кофе'),
+    ])
+    assert len(analytics_engine.get_operations_frame_sync(test_profile.id, analytics_engine.EXPENSE, today, today)) == 0
+
+    # Версию сменил другой процесс (Celery создал операцию)
+    versions[analytics_engine._version_key(analytics_engine.EXPENSE, test_profile.id)] = 1
+    assert len(analytics_engine.get_operations_frame_sync(test_profile.id, analytics_engine.EXPENSE, today, today)) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_income_functions_use_frame(test_profile, test_income_category):
+    today = date.today()
+    for amount in ('1000.00', '250.00'):
+        await Income.objects.acreate(
+            profile=test_profile, category=test_income_category, amount=Decimal(amount),
+            currency='RUB', income_date=today, description='Зарплата',
+        )
+
+    max_day = await ExpenseFunctions.get_max_income_day(test_profile.telegram_id)
+    assert max_day['total'] == 1250.0
+    assert max_day['count'] == 2
+
+    weekdays = await ExpenseFunctions.get_income_weekday_statistics(test_profile.telegram_id)
+    assert sum(stats['count'] for stats in weekdays['weekday_statistics'].values()) == 2
+
+    single = await ExpenseFunctions.get_max_single_income(test_profile.telegram_id)
+    assert single['income']['amount'] == 1000.0
+    assert len(analytics_engine._frames) == 1
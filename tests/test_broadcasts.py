@@ -0,0 +1,125 @@
+"""
+Tests for the resumable broadcast engine (bot/services/broadcasts.py).
+"""
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from admin_panel.models import BroadcastMessage, BroadcastRecipient
+from bot.services import broadcasts
+from bot.services.broadcasts import BLOCKED, FAILED, SENT, run_broadcast, send_page
+from expenses.models import Profile
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.waits = 0
+        self.blocks = []
+
+    async def wait(self, subject, buckets, cost=1.0):
+        self.waits += 1
+
+    def block(self, subject, seconds):
+        self.blocks.append(seconds)
+
+
+class FakeBot:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode):
+        error = self.errors.get(chat_id)
+        if error:
+            raise error.pop(0)
+        self.sent.append(chat_id)
+
+
+def test_send_page_retries_after_flood_wait_and_detects_blocked_users():
+    bot = FakeBot({
+        2: [TelegramRetryAfter(method=None, message='Flood control', retry_after=3)],
+        3: [TelegramForbiddenError(method=None, message='Forbidden: bot was blocked by the user')],
+        4: [RuntimeError('boom')],
+    })
+    limiter = FakeLimiter()
+
+    results = asyncio.run(send_page(bot, [(11, 1), (12, 2), (13, 3), (14, 4)], 'Привет', limiter))
+
+    assert [(profile_id, status) for profile_id, status, _ in results] == [
+        (11, SENT), (12, SENT), (13, BLOCKED), (14, FAILED),
+    ]
+    assert sorted(bot.sent) == [1, 2]
+    assert limiter.blocks == [3]
+    assert limiter.waits == 5
+
+
+def test_send_page_keeps_lock_during_long_flood_wait(monkeypatch):
+    monkeypatch.setattr(broadcasts, 'BROADCAST_LOCK_REFRESH_SECONDS', 0.01)
+
+    class SlowLimiter(FakeLimiter):
+        async def wait(self, subject, buckets, cost=1.0):
+            await super().wait(subject, buckets, cost)
+            if self.blocks:
+                # retry_after дольше, чем живёт блокировка рассылки
+                await asyncio.sleep(0.1)
+
+    bot = FakeBot({1: [TelegramRetryAfter(method=None, message='Flood control', retry_after=900)]})
+    refreshed = []
+
+    results = asyncio.run(send_page(bot, [(11, 1)], 'Привет', SlowLimiter(), keep_lock=lambda: refreshed.append(1)))
+
+    assert results == [(11, SENT, '')]
+    assert len(refreshed) >= 2
+
+
+@pytest.mark.django_db
+def test_broadcast_resumes_from_checkpoint_after_crash():
+    profiles = [Profile.objects.create(telegram_id=900 + i) for i in range(5)]
+    Profile.objects.create(telegram_id=999, bot_blocked=True)
+    broadcast = BroadcastMessage.objects.create(title='Новости', message_text='Текст', status='sending')
+    recipient_qs = broadcast.get_recipients_queryset()
+    sent_pages = []
+
+    def crash_on_second_page(page):
+        if sent_pages:
+            raise RuntimeError('worker died')
+        sent_pages.append(page)
+        return [(profile_id, SENT, '') for profile_id, _ in page]
+
+    with pytest.raises(RuntimeError):
+        run_broadcast(broadcast, recipient_qs, crash_on_second_page, page_size=2)
+
+    broadcast = BroadcastMessage.objects.get(pk=broadcast.pk)
+    assert broadcast.total_recipients == 5
+    assert broadcast.last_recipient_id == profiles[1].id
+    assert broadcast.sent_count == 2
+
+    def send_rest(page):
+        sent_pages.append(page)
+        return [(profile_id, BLOCKED if telegram_id == 904 else SENT, '') for profile_id, telegram_id in page]
+
+    assert run_broadcast(broadcast, recipient_qs, send_rest, page_size=2)
+
+    assert [telegram_id for page in sent_pages for _, telegram_id in page] == [900, 901, 902, 903, 904]
+    broadcast.refresh_from_db()
+    assert (broadcast.status, broadcast.sent_count, broadcast.failed_count) == ('completed', 4, 1)
+    assert BroadcastRecipient.objects.filter(broadcast=broadcast, status='sent').count() == 4
+    assert Profile.objects.get(telegram_id=904).bot_blocked
+
+
+@pytest.mark.django_db
+def test_broadcast_stops_when_cancelled():
+    for i in range(3):
+        Profile.objects.create(telegram_id=950 + i)
+    broadcast = BroadcastMessage.objects.create(title='Новости', message_text='Текст', status='sending')
+
+    def cancel_after_first_page(page):
+        BroadcastMessage.objects.filter(pk=broadcast.pk).update(status='cancelled')
+        return [(profile_id, SENT, '') for profile_id, _ in page]
+
+    assert not run_broadcast(broadcast, broadcast.get_recipients_queryset(), cancel_after_first_page, page_size=2)
+
+    broadcast.refresh_from_db()
+    assert broadcast.status == 'cancelled'
+    assert broadcast.sent_count == 2
@@ -244,3 +244,24 @@ async def test_create_category_rejects_limit_reached(test_profile):
 
     with pytest.raises(ValueError, match="Достигнут лимит категорий"):
         await create_category(test_profile.telegram_id, "Лишняя", "➕")
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_get_user_categories_creates_missing_profile_outside_read_pool(profile_data, monkeypatch):
+    from bot.utils import db_executor
+
+    read_pool_calls = []
+    run_read = db_executor.run_read
+
+    async def tracking_run_read(func, *args, **kwargs):
+        read_pool_calls.append(func.__name__)
+        return await run_read(func, *args, **kwargs)
+
+    monkeypatch.setattr(db_executor, "run_read", tracking_run_read)
+    telegram_id = profile_data["telegram_id"] + 902
+
+    assert await get_user_categories(telegram_id) == []
+    assert await sync_to_async(Profile.objects.filter(telegram_id=telegram_id).exists)()
+    # В пуле чтений — только чтение; профиль создан в общем потоке ORM
+    assert read_pool_calls == ["_read_user_categories"]
@@ -0,0 +1,218 @@
+"""
+Tests for the DailyCategoryTotal rollup and the analytics paths reading it.
+"""
+import importlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from bot.services import daily_totals
+from bot.services.expense_functions import ExpenseFunctions
+from bot.services.export_service import ExportService
+from bot.services.income import delete_income_category
+from expense_bot.celery_tasks import reconcile_daily_totals
+from expenses.models import DailyCategoryTotal, Expense, ExpenseCategory, Income
+from expenses.signals import operations_deleted
+
+
+def _rows(profile, op_type=daily_totals.EXPENSE):
+    return {
+        (row.date, row.category_id, row.currency): (row.total, row.count)
+        for row in DailyCategoryTotal.objects.filter(profile=profile, op_type=op_type)
+    }
+
+
+def _expense(profile, category, amount, expense_date, **kwargs):
+    return Expense.objects.create(
+        profile=profile, category=category, amount=amount, currency='RUB',
+        expense_date=expense_date, description='Тест', **kwargs
+    )
+
+
+@pytest.mark.django_db
+def test_rollup_follows_create_update_and_delete(test_profile, test_expense_category):
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    first = _expense(test_profile, test_expense_category, Decimal('100'), today)
+    second = _expense(test_profile, test_expense_category, 50.5, today)
+
+    cid = test_expense_category.id
+    assert _rows(test_profile) == {(today, cid, 'RUB'): (Decimal('150.50'), 2)}
+
+    second.amount = Decimal('20')
+    second.expense_date = yesterday
+    second.save()
+    assert _rows(test_profile) == {
+        (today, cid, 'RUB'): (Decimal('100'), 1),
+        (yesterday, cid, 'RUB'): (Decimal('20'), 1),
+    }
+
+    first.delete()
+    operations_deleted('expense', [first])
+    assert _rows(test_profile) == {(yesterday, cid, 'RUB'): (Decimal('20'), 1)}
+
+
+@pytest.mark.django_db
+def test_rollup_tracks_incomes_and_category_deletion(test_profile, test_income_category):
+    today = date.today()
+    Income.objects.create(
+        profile=test_profile, category=test_income_category, amount=Decimal('1000'),
+        currency='RUB', income_date=today, description='Зарплата',
+    )
+    Income.objects.create(
+        profile=test_profile, category=None, amount=Decimal('200'),
+        currency='RUB', income_date=today, description='Подарок',
+    )
+
+    test_income_category.delete()
+
+    assert _rows(test_profile, daily_totals.INCOME) == {
+        (today, DailyCategoryTotal.NO_CATEGORY, 'RUB'): (Decimal('1200'), 2),
+    }
+    assert daily_totals.rebuild_daily_totals([test_profile.id], dry_run=True) == 0
+
+
+@pytest.mark.django_db
+def test_updates_take_previous_state_from_loaded_values(test_profile, test_expense_category):
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    cid = test_expense_category.id
+    expense = Expense.objects.get(pk=_expense(test_profile, test_expense_category, Decimal('100'), today).pk)
+
+    with CaptureQueriesContext(connection) as queries:
+        expense.amount = Decimal('70')
+        expense.save()
+        # Повторное сохранение того же экземпляра вычитает уже сохранённое состояние
+        expense.expense_date = yesterday
+        expense.save()
+
+    by_pk = f'"expenses_expense"."id" = {expense.pk}'
+    assert not [q['sql'] for q in queries if q['sql'].startswith('SELECT') and by_pk in q['sql']]
+    assert _rows(test_profile) == {(yesterday, cid, 'RUB'): (Decimal('70'), 1)}
+
+    # Поля не загружались — состояние до изменения читается из БД
+    partial = Expense.objects.only('id', 'amount').get(pk=expense.pk)
+    partial.amount = Decimal('10')
+    partial.save()
+    assert _rows(test_profile) == {(yesterday, cid, 'RUB'): (Decimal('10'), 1)}
+
+
+@pytest.mark.django_db
+def test_soft_deleted_income_category_moves_totals(test_profile, test_income_category):
+    today = date.today()
+    Income.objects.create(
+        profile=test_profile, category=test_income_category, amount=Decimal('500'),
+        currency='RUB', income_date=today, description='Премия',
+    )
+
+    assert async_to_sync(delete_income_category)(test_profile.telegram_id, test_income_category.id)
+
+    assert _rows(test_profile, daily_totals.INCOME) == {
+        (today, DailyCategoryTotal.NO_CATEGORY, 'RUB'): (Decimal('500'), 1),
+    }
+    assert daily_totals.rebuild_daily_totals([test_profile.id], dry_run=True) == 0
+
+
+@pytest.mark.django_db
+def test_backfill_migration_fills_existing_history(test_profile, test_expense_category):
+    today = date.today()
+    _expense(test_profile, test_expense_category, Decimal('100'), today)
+    _expense(test_profile, None, Decimal('25'), today)
+    Income.objects.create(
+        profile=test_profile, amount=Decimal('1000'), currency='RUB', income_date=today, description='Зарплата',
+    )
+    DailyCategoryTotal.objects.all().delete()
+
+    migration = importlib.import_module('expenses.migrations.0070_backfill_daily_category_total')
+    migration.backfill_daily_totals(apps, None)
+
+    assert _rows(test_profile) == {
+        (today, test_expense_category.id, 'RUB'): (Decimal('100'), 1),
+        (today, DailyCategoryTotal.NO_CATEGORY, 'RUB'): (Decimal('25'), 1),
+    }
+    assert _rows(test_profile, daily_totals.INCOME) == {
+        (today, DailyCategoryTotal.NO_CATEGORY, 'RUB'): (Decimal('1000'), 1),
+    }
+
+
+@pytest.mark.django_db
+def test_rebuild_command_repairs_drift_from_bulk_operations(test_profile, test_expense_category):
+    today = date.today()
+    _expense(test_profile, test_expense_category, Decimal('100'), today)
+    # bulk_create и queryset.update обходят сигналы
+    Expense.objects.bulk_create([
+        Expense(profile=test_profile, category=test_expense_category, amount=Decimal('30'),
+                currency='RUB', expense_date=today, description='Импорт'),
+    ])
+    Expense.objects.filter(profile=test_profile).update(currency='USD')
+
+    assert daily_totals.rebuild_daily_totals([test_profile.id], dry_run=True) == 2
+    call_command('rebuild_daily_totals', telegram_ids=[test_profile.telegram_id], verbosity=0)
+
+    assert _rows(test_profile) == {(today, test_expense_category.id, 'USD'): (Decimal('130'), 2)}
+    assert daily_totals.rebuild_daily_totals([test_profile.id]) == 0
+
+
+@pytest.mark.django_db
+def test_nightly_reconcile_fixes_drift(test_profile, test_expense_category):
+    today = date.today()
+    _expense(test_profile, test_expense_category, Decimal('100'), today)
+    Expense.objects.filter(profile=test_profile).update(amount=Decimal('60'))
+
+    assert reconcile_daily_totals() == 1
+    assert _rows(test_profile) == {(today, test_expense_category.id, 'RUB'): (Decimal('60'), 1)}
+    assert reconcile_daily_totals() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_daily_analytics_read_rollup(test_profile, test_expense_category):
+    today = date.today()
+    await Expense.objects.acreate(
+        profile=test_profile, category=test_expense_category, amount=Decimal('300'),
+        currency='RUB', expense_date=today, description='Обед',
+    )
+    await Expense.objects.acreate(
+        profile=test_profile, category=None, amount=Decimal('200'),
+        currency='RUB', expense_date=today, description='Кофе',
+    )
+
+    daily = await ExpenseFunctions.get_daily_totals(test_profile.telegram_id, days=7)
+    assert daily['daily_totals'][today.isoformat()] == {'amount': 500.0, 'count': 2}
+
+    prediction = await ExpenseFunctions.predict_month_expense(test_profile.telegram_id)
+    assert prediction['current_total'] == 500.0
+
+    weekdays = await ExpenseFunctions.get_weekday_statistics(test_profile.telegram_id, period_days=7)
+    assert sum(day['count'] for day in weekdays['statistics']) == 2
+
+    trend = await ExpenseFunctions.get_expense_trend(test_profile.telegram_id, periods=2)
+    assert trend['trends'][-1] == {'period': today.strftime('%Y-%m'), 'total': 500.0}
+
+
+@pytest.mark.django_db
+def test_export_12_months_data_uses_rollup_totals(test_profile, test_expense_category, django_assert_max_num_queries):
+    today = date.today()
+    for _ in range(3):
+        _expense(test_profile, test_expense_category, Decimal('100'), today)
+    other = ExpenseCategory.objects.create(profile=test_profile, name='🚕 Такси', name_ru='Такси', icon='🚕')
+    _expense(test_profile, other, Decimal('40'), today)
+
+    with django_assert_max_num_queries(8):
+        expenses_by_month, _, counts_by_month, _, months_list, operations, _ = ExportService._load_12_months_data(
+            test_profile.id, today.year, today.month, 'ru'
+        )
+
+    current = months_list[-1]
+    assert sum(expenses_by_month[current].values()) == 340.0
+    assert sum(counts_by_month[current].values()) == 4
+    assert len(expenses_by_month[current]) == 2
+    operation = operations[('тест', 'RUB')]
+    assert operation['total'] == 340.0
+    assert operation['monthly_counts'][-1] == 4
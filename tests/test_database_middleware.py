@@ -0,0 +1,72 @@
+"""
+Tests for connection reuse in DatabaseMiddleware.
+"""
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from bot.middlewares import database
+from bot.middlewares.database import DatabaseMiddleware, get_connection_stats
+
+
+class FakeConnection:
+    def __init__(self, obsolete: bool):
+        self.connection = object()
+        self.obsolete = obsolete
+
+    def close_if_unusable_or_obsolete(self):
+        if self.obsolete:
+            self.connection = None
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    database.reset_connection_stats()
+    yield
+    database.reset_connection_stats()
+
+
+@pytest.fixture
+def fake_connections(monkeypatch):
+    conns = [FakeConnection(obsolete=False), FakeConnection(obsolete=True)]
+    monkeypatch.setattr(
+        database, 'connections', SimpleNamespace(all=lambda initialized_only=False: conns)
+    )
+    return conns
+
+
+@pytest.mark.asyncio
+async def test_persistent_mode_keeps_healthy_connections(fake_connections):
+    handler = AsyncMock(return_value='ok')
+
+    assert await DatabaseMiddleware(persistent=True)(handler, object(), {}) == 'ok'
+
+    healthy, obsolete = fake_connections
+    assert healthy.connection is not None
+    assert obsolete.connection is None
+    assert get_connection_stats() == {'opened': 0, 'reused': 1, 'closed': 1, 'updates': 1}
+
+
+@pytest.mark.asyncio
+async def test_close_mode_closes_after_handler_error(monkeypatch):
+    closed = []
+    monkeypatch.setattr(database, 'close_connections', lambda: closed.append(True))
+    handler = AsyncMock(side_effect=RuntimeError('boom'))
+
+    with pytest.raises(RuntimeError):
+        await DatabaseMiddleware(persistent=False)(handler, object(), {})
+
+    assert closed == [True]
+
+
+def test_new_connections_get_bot_max_age_and_health_checks(settings):
+    settings.BOT_DB_CONN_MAX_AGE = 60
+    connection = SimpleNamespace(close_at=None, health_check_enabled=False)
+
+    database._connection_opened(sender=None, connection=connection)
+
+    assert 55 < connection.close_at - time.monotonic() <= 60
+    assert connection.health_check_enabled is True
+    assert get_connection_stats()['opened'] == 1
@@ -0,0 +1,63 @@
+"""
+Tests for parallel DB reads in the bot process.
+"""
+import asyncio
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from bot.services.expense import get_last_expenses, get_today_summary
+from bot.utils.db_executor import parallel_read, run_read
+from expenses.models import Expense
+
+
+def _slow_read():
+    time.sleep(0.2)
+    return threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_parallel_reads_do_not_queue_behind_each_other(settings):
+    settings.BOT_DB_PARALLEL_READS = True
+
+    started = time.monotonic()
+    threads = await asyncio.gather(*(run_read(_slow_read) for _ in range(4)))
+
+    assert time.monotonic() - started < 0.6
+    assert all(name.startswith('db-read') for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_parallel_reads_can_be_disabled(settings):
+    settings.BOT_DB_PARALLEL_READS = False
+
+    @parallel_read
+    def current_thread(value):
+        return value, threading.current_thread().name
+
+    value, thread = await current_thread(42)
+
+    assert value == 42
+    assert not thread.startswith('db-read')
+    assert current_thread.__wrapped__(1)[0] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_hot_reads_run_in_read_pool(settings, test_profile, test_expense_category):
+    settings.BOT_DB_PARALLEL_READS = True
+    await Expense.objects.acreate(
+        profile=test_profile, category=test_expense_category, amount=Decimal('250'),
+        currency='RUB', expense_date=date.today(), description='Обед',
+    )
+
+    last, summary = await asyncio.gather(
+        get_last_expenses(test_profile.telegram_id),
+        get_today_summary(test_profile.telegram_id),
+    )
+
+    assert [expense.description for expense in last] == ['Обед']
+    assert summary['total'] == 250.0
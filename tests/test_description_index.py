@@ -0,0 +1,143 @@
+"""
+Tests for the per-profile description index used by find_similar_expenses/incomes.
+"""
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+
+from bot.services import description_index
+from bot.services.description_index import EXPENSE, get_description_index_sync
+from bot.services.expense import find_similar_expenses
+from bot.services.income import find_similar_incomes
+from expenses.models import Expense, Income
+from expenses.signals import operations_deleted
+
+
+def _create_expense(profile, category, description, amount, expense_date, expense_time=time(12, 0)):
+    return Expense.objects.create(
+        profile=profile, category=category, description=description, amount=Decimal(amount),
+        currency='RUB', expense_date=expense_date, expense_time=expense_time,
+    )
+
+
+@pytest.mark.django_db
+def test_index_groups_operations_by_description(test_profile, test_expense_category):
+    today = date.today()
+    _create_expense(test_profile, test_expense_category, 'Кофе', '200', today)
+    _create_expense(test_profile, test_expense_category, 'кофе', '200', today - timedelta(days=3))
+    _create_expense(test_profile, test_expense_category, 'Кофе', '250', today - timedelta(days=1))
+    _create_expense(test_profile, test_expense_category, 'Кофе', '180', today - timedelta(days=400))
+
+    index = get_description_index_sync(test_profile, EXPENSE)
+
+    assert list(index.entries) == ['кофе']
+    stats = sorted(index.entries['кофе'].stats(today - timedelta(days=365), today))
+    assert stats == [
+        ((Decimal('200.00'), 'RUB', test_expense_category.id), 2, (today, time(12, 0))),
+        ((Decimal('250.00'), 'RUB', test_expense_category.id), 1, (today - timedelta(days=1), time(12, 0))),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_index_follows_create_delete_and_update(test_profile, test_expense_category):
+    today = date.today()
+    _create_expense(test_profile, test_expense_category, 'Такси', '700', today)
+    index = get_description_index_sync(test_profile, EXPENSE)
+
+    expense = _create_expense(test_profile, test_expense_category, 'такси', 700.0, today)
+    assert get_description_index_sync(test_profile, EXPENSE) is index
+    [(_, count, _)] = index.entries['такси'].stats(today, today)
+    assert count == 2
+
+    expense.delete()
+    operations_deleted('expense', [expense])
+    index = get_description_index_sync(test_profile, EXPENSE)
+    [(_, count, _)] = index.entries['такси'].stats(today, today)
+    assert count == 1
+
+    expense = Expense.objects.get(profile=test_profile)
+    expense.description = 'Метро'
+    expense.save()
+    rebuilt = get_description_index_sync(test_profile, EXPENSE)
+    assert rebuilt is not index
+    assert list(rebuilt.entries) == ['метро']
+
+
+@pytest.mark.django_db
+def test_index_is_rebuilt_when_version_changes_in_another_process(test_profile, test_expense_category, monkeypatch):
+    versions = {}
+    monkeypatch.setattr(description_index.cache, 'get', lambda key: versions.get(key))
+
+    index = get_description_index_sync(test_profile, EXPENSE)
+    versions[description_index._version_key(EXPENSE, test_profile.id)] = 1
+
+    assert get_description_index_sync(test_profile, EXPENSE) is not index
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_find_similar_expenses_prefers_latest_price(test_profile, test_expense_category):
+    today = date.today()
+    await sync_to_async(_create_expense)(test_profile, test_expense_category, 'Капучино', '300', today, time(9, 0))
+    await sync_to_async(_create_expense)(test_profile, test_expense_category, 'капучино', '350', today, time(18, 0))
+    await sync_to_async(_create_expense)(test_profile, test_expense_category, 'Капучино', '300', today - timedelta(days=2))
+
+    result = await find_similar_expenses(test_profile.telegram_id, 'капучино')
+
+    assert [(item['amount'], item['count'], item['last_date']) for item in result] == [
+        (350.0, 1, today),
+        (300.0, 2, today),
+    ]
+    assert result[0]['category'] == test_expense_category.get_display_name('ru')
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_find_similar_incomes_uses_latest_description(test_profile, test_income_category):
+    today = timezone.localdate()
+    for description, income_date in [('Зарплата за ноябрь', today - timedelta(days=30)), ('Зарплата за декабрь', today)]:
+        await sync_to_async(Income.objects.create)(
+            profile=test_profile, category=test_income_category, amount=Decimal('50000'),
+            currency='RUB', description=description, income_date=income_date,
+        )
+
+    result = await find_similar_incomes(test_profile.telegram_id, 'зарплата')
+
+    assert len(result) == 1
+    assert result[0]['count'] == 2
+    assert result[0]['description'] == 'Зарплата за декабрь'
+    assert result[0]['last_date'] == today
+
+
+def test_fuzzy_candidates_keep_most_recent_descriptions():
+    today = date.today()
+    index = description_index.DescriptionIndex(today - timedelta(days=365))
+    for days_ago, description in enumerate(['Такси', 'Кофе', 'Обед']):
+        index.add(description, Decimal('100'), 'RUB', None, today - timedelta(days=days_ago), time(12, 0))
+
+    assert index.fuzzy_candidates(limit=2) == {'такси', 'кофе'}
+    assert index.fuzzy_candidates() == {'такси', 'кофе', 'обед'}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deletes_use_fast_path_and_invalidate_once_per_transaction(test_profile, test_expense_category, monkeypatch):
+    today = date.today()
+    expenses = [_create_expense(test_profile, test_expense_category, 'Кофе', '100', today) for _ in range(3)]
+    calls = []
+    monkeypatch.setattr(description_index, 'profiles_changed', lambda kind, ids: calls.append((kind, sorted(ids))))
+
+    # Без построчных сигналов удаления queryset.delete() идёт одним DELETE
+    assert Collector(using='default').can_fast_delete(Expense.objects.all())
+
+    with transaction.atomic():
+        for expense in expenses:
+            expense.delete()
+        operations_deleted('expense', expenses)
+        assert calls == []
+
+    assert calls == [('expense', [test_profile.id])]
@@ -19,6 +19,17 @@ from bot.utils.expense_parser import (
     parse_expense_message,
     parse_income_message,
 )
+from bot.utils.expense_category_definitions import (
+    DEFAULT_EXPENSE_CATEGORY_KEY,
+    EXPENSE_CATEGORY_DEFINITIONS,
+    detect_expense_category_key,
+)
+from bot.utils.income_category_definitions import (
+    DEFAULT_INCOME_CATEGORY_KEY,
+    INCOME_CATEGORY_DEFINITIONS,
+    detect_income_category_key,
+)
+from bot.utils.keyword_service import match_keyword_in_text
 
 
 # =============================================================================
@@ -800,3 +811,57 @@ class TestExpenseLeadingAmountRegression:
         result = await parse_expense_message("25-11-2025 кофе 300", use_ai=False)
         assert result is not None
         assert result["amount"] == pytest.approx(300)
+
+
+# =============================================================================
+# Default Category Detection Tests
+# =============================================================================
+
+DETECTION_CORPUS = [
+    'кофе в старбаксе', 'такси до дома', 'бензин 95', 'продукты в пятерочке', 'кб', 'кв',
+    'зарплату перевели', 'ремонт машины', 'молоко хлеб сыр', 'премия за квартал',
+    'аптека витамины', 'кафе и рестораны', 'подарок маме', 'whole foods', 'fuel', '',
+]
+
+
+def _legacy_detect_expense_category_key(text):
+    best_key, best_score = None, 0
+    for key, data in EXPENSE_CATEGORY_DEFINITIONS.items():
+        if key == DEFAULT_EXPENSE_CATEGORY_KEY:
+            continue
+        score = sum(1 for keyword in data['keywords'] if match_keyword_in_text(keyword, text)[0])
+        if score > best_score:
+            best_key, best_score = key, score
+    return best_key
+
+
+def _legacy_detect_income_category_key(text):
+    for key, data in INCOME_CATEGORY_DEFINITIONS.items():
+        if key == DEFAULT_INCOME_CATEGORY_KEY:
+            continue
+        if any(match_keyword_in_text(keyword, text)[0] for keyword in data['keywords']):
+            return key
+    return None
+
+
+class TestDefaultCategoryDetection:
+    """Indexed detection must keep the scoring semantics of the keyword loop."""
+
+    @pytest.mark.parametrize('text', DETECTION_CORPUS)
+    def test_expense_detection_matches_keyword_loop(self, text):
+        assert detect_expense_category_key(text) == _legacy_detect_expense_category_key(text)
+
+    @pytest.mark.parametrize('text', DETECTION_CORPUS)
+    def test_income_detection_matches_keyword_loop(self, text):
+        assert detect_income_category_key(text) == _legacy_detect_income_category_key(text)
+
+    def test_expense_detection_handles_inflection(self):
+        assert detect_expense_category_key('продукты в пятерочке') == 'groceries'
+        assert detect_expense_category_key('такси до дома') == 'transport'
+
+    def test_short_keywords_match_only_exactly(self):
+        assert detect_expense_category_key('кб') == 'groceries'
+        assert detect_expense_category_key('кв') is None
+
+    def test_income_detection_handles_inflection(self):
+        assert detect_income_category_key('зарплату перевели') == 'salary'
@@ -0,0 +1,95 @@
+"""
+Tests for set-based expense reminders: candidate query, flag lookup and concurrent sending.
+"""
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from bot.services import expense_reminders
+from expenses.models import Expense, Income, Profile
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    settings.CACHES = LOCMEM_CACHE
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def _profile(telegram_id, registered_ago, **extra):
+    profile = Profile.objects.create(telegram_id=telegram_id, **extra)
+    Profile.objects.filter(pk=profile.pk).update(created_at=timezone.now() - registered_ago)
+    return profile
+
+
+def _operation(model, profile, created_ago, **extra):
+    operation = model.objects.create(profile=profile, amount=100, description='кофе', **extra)
+    model.objects.filter(pk=operation.pk).update(created_at=timezone.now() - created_ago)
+    return operation
+
+
+@pytest.mark.django_db
+def test_reminder_candidates_filters_window_in_sql():
+    today = timezone.localdate()
+    new_user = _profile(1001, timedelta(hours=30))
+    idle = _profile(1002, timedelta(days=10))
+    _operation(Expense, idle, timedelta(hours=30), expense_date=today)
+    active = _profile(1003, timedelta(days=10))
+    _operation(Expense, active, timedelta(hours=30), expense_date=today)
+    _operation(Income, active, timedelta(hours=2), income_date=today)
+    income_only = _profile(1004, timedelta(days=10))
+    _operation(Income, income_only, timedelta(hours=40), income_date=today)
+    stale = _profile(1005, timedelta(days=10))
+    _operation(Expense, stale, timedelta(hours=60), expense_date=today)
+    _profile(1006, timedelta(hours=30), bot_blocked=True)
+    _profile(1007, timedelta(hours=2))
+
+    candidates = expense_reminders.reminder_candidates(timezone.now())
+
+    assert [profile.telegram_id for profile in candidates] == [
+        new_user.telegram_id, idle.telegram_id, income_only.telegram_id,
+    ]
+
+
+def test_split_already_reminded_uses_one_lookup(locmem_cache):
+    profiles = [SimpleNamespace(telegram_id=user_id) for user_id in (1, 2, 3)]
+    locmem_cache.set(expense_reminders.reminder_flag_key(2), True, timeout=None)
+
+    pending, reminded = expense_reminders.split_already_reminded(profiles)
+
+    assert [profile.telegram_id for profile in pending] == [1, 3]
+    assert reminded == 1
+
+
+@pytest.mark.asyncio
+async def test_send_reminders_sets_flags_and_collects_blocked(locmem_cache):
+    active = peak = 0
+
+    class FakeBot:
+        async def send_message(self, chat_id, text, parse_mode):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if chat_id == 3:
+                raise RuntimeError('Forbidden: bot was blocked by the user')
+            if chat_id == 4:
+                raise RuntimeError('Bad Gateway')
+
+    profiles = [SimpleNamespace(id=user_id * 10, telegram_id=user_id, language_code='en') for user_id in range(8)]
+
+    statuses, blocked = await expense_reminders.send_reminders(FakeBot(), profiles, concurrency=2)
+
+    assert peak == 2
+    assert statuses == {expense_reminders.SENT: 6, expense_reminders.BLOCKED: 1, expense_reminders.FAILED: 1}
+    assert blocked == {30}
+    assert locmem_cache.get(expense_reminders.reminder_flag_key(0)) is True
+    assert locmem_cache.get(expense_reminders.reminder_flag_key(3)) is None
@@ -0,0 +1,90 @@
+"""
+Tests for expense/income text search (PostgreSQL backend + SQLite fallback).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+from bot.services.expense_functions import ExpenseFunctions, _search_expenses_queryset
+from bot.services.text_search import is_postgres_search_available, postgres_search
+from expenses.models import Expense
+
+
+def _postgres_sql(queryset):
+    """Compiles queryset with the PostgreSQL backend without connecting to a server."""
+    pg_connection = PostgresDatabaseWrapper(
+        {**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql', 'NAME': 'search_sql'},
+        alias='search_sql',
+    )
+    sql, params = queryset.query.get_compiler(connection=pg_connection).as_sql()
+    return sql, params
+
+
+@pytest.fixture
+def search_expenses_data(test_profile, test_expense_category):
+    today = date.today()
+    rows = [
+        ('Кофе с собой', Decimal('250'), today),
+        ('Капучино', Decimal('300'), today - timedelta(days=1)),
+        ('Такси домой', Decimal('700'), today - timedelta(days=2)),
+    ]
+    return [
+        Expense.objects.create(
+            profile=test_profile, category=test_expense_category,
+            description=description, amount=amount, currency='RUB', expense_date=expense_date,
+        )
+        for description, amount, expense_date in rows
+    ]
+
+
+@pytest.mark.django_db
+def test_search_expenses_queryset_uses_substring_fallback_on_sqlite(test_profile, search_expenses_data):
+    queryset = Expense.objects.filter(profile=test_profile)
+
+    assert not is_postgres_search_available(queryset)
+    # SQLite LIKE регистронезависим только для ASCII — поэтому отдельный fuzzy-поиск
+    found = list(_search_expenses_queryset(queryset, ['Кофе', 'Такси']))
+
+    assert [exp.description for exp in found] == ['Кофе с собой', 'Такси домой']
+    assert _search_expenses_queryset(queryset, []) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_search_expenses_matches_category_name_and_totals(test_profile, search_expenses_data):
+    result = await ExpenseFunctions.search_expenses(test_profile.telegram_id, 'еда')
+
+    assert result['success'] is True
+    assert result['count'] == 3
+    assert result['total'] == 1250.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_search_expenses_falls_back_to_fuzzy_search_on_sqlite(test_profile, search_expenses_data):
+    result = await ExpenseFunctions.search_expenses(test_profile.telegram_id, 'капучина')
+
+    assert result['success'] is True
+    assert [item['description'] for item in result['results']] == ['Капучино']
+
+
+@pytest.mark.django_db
+def test_postgres_search_uses_trigram_and_fulltext_operators(test_profile):
+    queryset = postgres_search(
+        Expense.objects.filter(profile=test_profile),
+        ['кофе', 'кб'],
+        'description',
+        ('category__name',),
+    ).order_by('-search_rank')
+
+    sql, params = _postgres_sql(queryset)
+
+    # Короткие части запроса ищутся только как подстрока
+    assert sql.count('%>') == 1
+    assert '@@' in sql
+    assert 'WORD_SIMILARITY' in sql
+    assert "to_tsvector(%s::regconfig, COALESCE(\"expenses_expense\".\"description\", %s))" in sql
+    assert 'russian' in params
@@ -7,8 +7,16 @@ from asgiref.sync import sync_to_async
 from django.utils import timezone
 
 from bot.constants import MAX_DAILY_OPERATIONS, MAX_OPERATION_DESCRIPTION_LENGTH, MAX_TRANSACTION_AMOUNT, ONE_YEAR_DAYS
-from bot.services.expense import create_expense, delete_expense, get_expense_by_id, get_expenses_by_period, update_expense
-from expenses.models import Expense, ExpenseCategory, Profile, Subscription
+from bot.services.expense import (
+    _read_expenses_summary,
+    create_expense,
+    delete_expense,
+    get_expense_by_id,
+    get_expenses_by_period,
+    get_expenses_summary,
+    update_expense,
+)
+from expenses.models import Cashback, Expense, ExpenseCategory, Household, Income, Profile, Subscription
 
 
 @pytest.mark.asyncio
@@ -307,3 +315,106 @@ async def test_create_expense_rejects_foreign_category(test_expense_category, pr
             description="Foreign category expense",
             expense_date=date.today(),
         )
+
+
+def _summary_fixture_rows(profile, category, other_category):
+    today = date.today()
+    rows = [
+        (category, "100.00", "RUB"),
+        (category, "50.00", "RUB"),
+        (other_category, "300.00", "RUB"),
+        (None, "20.00", "RUB"),
+        (category, "10.00", "USD"),
+    ]
+    for expense_category, amount, currency in rows:
+        Expense.objects.create(
+            profile=profile,
+            category=expense_category,
+            amount=Decimal(amount),
+            currency=currency,
+            description="Summary",
+            expense_date=today,
+        )
+    Income.objects.create(profile=profile, amount=Decimal("1000.00"), currency="RUB", income_date=today)
+
+
+@pytest.mark.django_db
+def test_get_expenses_summary_aggregates_without_loading_rows(test_expense_category, django_assert_max_num_queries):
+    profile = test_expense_category.profile
+    other_category = ExpenseCategory.objects.create(profile=profile, name="🚕 Такси", icon="🚕")
+    _summary_fixture_rows(profile, test_expense_category, other_category)
+    Cashback.objects.create(
+        profile=profile,
+        category=test_expense_category,
+        bank_name="Банк",
+        cashback_percent=Decimal("10"),
+        month=date.today().month,
+    )
+
+    # profile, expense groups, categories, income groups, cashback
+    with django_assert_max_num_queries(5):
+        summary = _read_expenses_summary.__wrapped__(profile.telegram_id, date.today(), date.today())
+
+    assert summary['currency'] == "RUB"
+    assert summary['total'] == Decimal("470.00")
+    assert summary['count'] == 5
+    assert summary['currency_totals'] == {"RUB": 470.0, "USD": 10.0}
+    assert [(cat['id'], cat['count']) for cat in summary['by_category']] == [
+        (other_category.id, 1),
+        (test_expense_category.id, 3),
+        (0, 1),
+    ]
+    assert summary['by_category'][1]['amounts'] == {"RUB": Decimal("150.00"), "USD": Decimal("10.00")}
+    assert summary['potential_cashback'] == Decimal("15.00")
+    assert summary['income_total'] == Decimal("1000.00")
+    assert summary['income_count'] == 1
+    assert summary['balance'] == Decimal("530.00")
+
+
+@pytest.mark.django_db
+def test_get_expenses_summary_household_mode_includes_members_cashback(test_expense_category, profile_data):
+    profile = test_expense_category.profile
+    household = Household.objects.create(name="Семья", creator=profile)
+    profile.household = household
+    profile.save(update_fields=['household'])
+    member = Profile.objects.create(**{**profile_data, "telegram_id": 123456791, "household": household})
+    member_category = ExpenseCategory.objects.create(profile=member, name="🛒 Продукты", icon="🛒")
+
+    today = date.today()
+    Expense.objects.create(profile=profile, category=test_expense_category, amount=Decimal("100"), currency="RUB", expense_date=today)
+    Expense.objects.create(profile=member, category=member_category, amount=Decimal("200"), currency="RUB", expense_date=today)
+    Cashback.objects.create(
+        profile=member, category=member_category, bank_name="Банк", cashback_percent=Decimal("5"), month=today.month,
+    )
+
+    personal = _read_expenses_summary.__wrapped__(profile.telegram_id, today, today)
+    household_summary = _read_expenses_summary.__wrapped__(profile.telegram_id, today, today, household_mode=True)
+
+    assert personal['total'] == Decimal("100")
+    assert household_summary['total'] == Decimal("300")
+    assert household_summary['count'] == 2
+    assert household_summary['potential_cashback'] == Decimal("10")
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_get_expenses_summary_creates_missing_profile_outside_read_pool(profile_data, monkeypatch):
+    from bot.utils import db_executor
+
+    read_pool_calls = []
+    run_read = db_executor.run_read
+
+    async def tracking_run_read(func, *args, **kwargs):
+        read_pool_calls.append(func.__name__)
+        return await run_read(func, *args, **kwargs)
+
+    monkeypatch.setattr(db_executor, "run_read", tracking_run_read)
+    telegram_id = profile_data["telegram_id"] + 903
+    today = date.today()
+
+    summary = await get_expenses_summary(telegram_id, today, today)
+
+    assert (summary['total'], summary['count']) == (Decimal('0'), 0)
+    assert await sync_to_async(Profile.objects.filter(telegram_id=telegram_id).exists)()
+    # В пуле чтений — только чтение; профиль создан в общем потоке ORM
+    assert read_pool_calls == ["_read_expenses_summary", "_read_expenses_summary"]
@@ -0,0 +1,105 @@
+"""
+Tests for the concurrent monthly insight pipeline.
+"""
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from bot.services import insight_pipeline
+from bot.utils.rate_limiter import LocalBucketStore, TokenBucketLimiter
+from expenses.models import Expense, MonthlyInsight, Profile
+
+
+def test_provider_limits_defaults_and_env_override(monkeypatch):
+    monkeypatch.setenv('AI_INSIGHTS_CONCURRENCY_GOOGLE', '2')
+    limits = insight_pipeline.ProviderLimits({'qwen': 0})
+
+    assert limits.limit('deepseek') == 8
+    assert limits.limit('google') == 2
+    assert limits.limit('qwen') == 1
+    assert limits.limit('unknown') == insight_pipeline.FALLBACK_PROVIDER_CONCURRENCY
+
+
+def test_provider_rate_limits_defaults_and_env_override(monkeypatch):
+    monkeypatch.setenv('AI_INSIGHTS_RPM_OPENAI', '120')
+    limits = insight_pipeline.ProviderLimits(rate_limits={'qwen': 0})
+
+    assert limits.bucket('deepseek').capacity == 60
+    assert limits.bucket('openai').refill_per_second == 2
+    assert limits.bucket('qwen').capacity == 1
+    assert limits.bucket('unknown').capacity == insight_pipeline.FALLBACK_PROVIDER_RATE_LIMIT
+
+
+@pytest.mark.asyncio
+async def test_provider_rate_limit_is_shared_between_workers():
+    # Два чанка в разных воркерах с общим хранилищем ведер (в проде — Redis)
+    limiter = TokenBucketLimiter(LocalBucketStore())
+    workers = [insight_pipeline.ProviderLimits(rate_limits={'deepseek': 2}, limiter=limiter) for _ in range(2)]
+
+    for limits in workers:
+        async with limits.slot('deepseek'):
+            pass
+
+    async def third_request():
+        async with workers[0].slot('deepseek'):
+            pass
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(third_request(), timeout=0.05)
+    # Лимит одного провайдера не расходует ведро другого
+    async with workers[1].slot('openai'):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_generate_insights_chunk_respects_provider_limit():
+    limits = insight_pipeline.ProviderLimits({'deepseek': 3})
+    active = peak = 0
+
+    class FakeService:
+        async def generate_insight(self, profile, year, month, provider, force_regenerate):
+            nonlocal active, peak
+            async with limits.slot(provider):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+            if profile.telegram_id == 5:
+                raise RuntimeError('boom')
+            return None if profile.telegram_id == 6 else object()
+
+    profiles = [SimpleNamespace(telegram_id=user_id) for user_id in range(12)]
+
+    statuses = await insight_pipeline.generate_insights_chunk(
+        profiles, 2026, 1, 'deepseek', limits, service_factory=FakeService,
+    )
+
+    assert peak == 3
+    assert statuses == {
+        insight_pipeline.GENERATED: 10,
+        insight_pipeline.SKIPPED: 1,
+        insight_pipeline.FAILED: 1,
+    }
+
+
+@pytest.mark.django_db
+def test_pending_insight_profile_ids_skips_checkpointed_profiles(test_expense):
+    other = Profile.objects.create(telegram_id=987654)
+    Expense.objects.create(profile=other, amount=100, description='такси', expense_date=test_expense.expense_date)
+    period_start = test_expense.expense_date.replace(day=1)
+    MonthlyInsight.objects.create(
+        profile=other,
+        year=period_start.year,
+        month=period_start.month,
+        total_expenses=Decimal('100'),
+        ai_summary='summary',
+        ai_analysis='analysis',
+    )
+
+    ids = insight_pipeline.pending_insight_profile_ids(
+        period_start.year, period_start.month, period_start, test_expense.expense_date,
+    )
+
+    assert ids == [test_expense.profile_id]
@@ -0,0 +1,98 @@
+"""
+Tests for the compiled keyword index and per-profile expense keyword matcher.
+"""
+import pytest
+
+from bot.utils.keyword_index import KeywordIndex
+from bot.utils.keyword_matcher import get_expense_keyword_matcher_sync
+from bot.utils.keyword_service import match_keyword_in_text
+from expenses.models import CategoryKeyword, ExpenseCategory
+
+
+KEYWORDS = [
+    'кофе', 'зарплата', 'кб', 'вв', 'трухлявые консервы', 'азбука вкуса', 'бензин 95',
+    'продукты', 'такси', 'метро', 'кафе и рестораны', 'wi-fi', 'iphone 15', 'лор',
+    'пятерочка', 'сосиска в тесте', 'аптека', 'консервы', 'whole foods', 'очень длинная фраза для проверки',
+]
+
+TEXTS = [
+    'Кофе', 'купил кофе вчера', 'мне перевели зарплату', 'кб', 'кв', 'Трухлявые консервы',
+    'трухлявые просроченные консервы', 'бензин 95', 'бензин 92', 'продукт', 'продуктыы',
+    'такси до дома', 'метро', 'кафе и ресторан', 'WiFi', 'wi-fi роутер', 'iphone 16', 'лар',
+    'пятерочка у дома', 'сосиска в тесте и чай', 'аптеке', 'консерв', '🍕 Пицца!', '',
+    'whole food', 'азбука вкус', 'очень длинная фраза для проверки', 'зарплатаа', 'зарплат',
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_keyword_index_matches_match_keyword_in_text(text):
+    index = KeywordIndex()
+    ids = {index.add(keyword): keyword for keyword in KEYWORDS}
+
+    found = index.match(text.lower())
+
+    expected = {}
+    for entry_id, keyword in ids.items():
+        matched, match_type = match_keyword_in_text(keyword, text.lower())
+        if matched:
+            expected[entry_id] = match_type
+    assert found == expected
+
+
+def test_keyword_index_first_match_respects_insertion_order():
+    index = KeywordIndex()
+    first = index.add('кофе')
+    index.add('кофейня кофе')
+    index.add('кофе')
+
+    assert index.first_match('кофе с молоком') == (first, 'word')
+
+
+def test_keyword_index_skips_keywords_that_clean_to_nothing():
+    index = KeywordIndex()
+
+    assert index.add('купил') is None
+    assert len(index) == 0
+
+
+@pytest.mark.django_db
+def test_expense_keyword_matcher_prefers_category_order_and_names(test_profile):
+    cafe = ExpenseCategory.objects.create(
+        profile=test_profile, name='☕ Кафе', name_ru='Кафе', name_en='Cafe', icon='☕'
+    )
+    food = ExpenseCategory.objects.create(
+        profile=test_profile, name='🍔 Еда', name_ru='Еда', name_en='Food', icon='🍔'
+    )
+    keyword = CategoryKeyword.objects.create(category=food, keyword='шаурма')
+
+    matcher = get_expense_keyword_matcher_sync(test_profile)
+
+    by_name = matcher.match('обед в кафе')
+    assert by_name.category.id == cafe.id
+    assert by_name.keyword_id is None
+
+    by_keyword = matcher.match('шаурму')
+    assert by_keyword.category.id == food.id
+    assert by_keyword.keyword_id == keyword.id
+    assert by_keyword.match_type == 'exact'
+
+    assert matcher.match('ремонт машины') is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_expense_keyword_matcher_is_cached_and_invalidated_on_keyword_changes(test_profile):
+    category = ExpenseCategory.objects.create(
+        profile=test_profile, name='🍔 Еда', name_ru='Еда', name_en='Food', icon='🍔'
+    )
+
+    matcher = get_expense_keyword_matcher_sync(test_profile)
+    assert get_expense_keyword_matcher_sync(test_profile) is matcher
+    assert matcher.match('шаурма') is None
+
+    keyword = CategoryKeyword.objects.create(category=category, keyword='шаурма')
+    rebuilt = get_expense_keyword_matcher_sync(test_profile)
+    assert rebuilt is not matcher
+    assert rebuilt.match('шаурма').keyword_id == keyword.id
+
+    keyword.delete()
+    assert get_expense_keyword_matcher_sync(test_profile).match('шаурма') is None
@@ -0,0 +1,93 @@
+"""
+Tests for buffered keyword usage accounting.
+"""
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bot.services import keyword_usage
+from expenses.models import CategoryKeyword, ExpenseCategory, IncomeCategory, IncomeCategoryKeyword
+
+
+@pytest.fixture
+def expense_keyword(test_profile):
+    category = ExpenseCategory.objects.create(profile=test_profile, name='🍔 Еда', name_ru='Еда', icon='🍔')
+    return CategoryKeyword.objects.create(category=category, keyword='шаурма', usage_count=3)
+
+
+@pytest.mark.django_db
+def test_record_keyword_usage_buffers_in_redis_without_db_write(expense_keyword):
+    conn = MagicMock()
+    pipe = conn.pipeline.return_value
+
+    with patch.object(keyword_usage, '_get_connection', return_value=conn):
+        keyword_usage.record_keyword_usage(expense_keyword.id)
+
+    pipe.hincrby.assert_called_once_with('keyword_usage:expense:counts', expense_keyword.id, 1)
+    pipe.execute.assert_called_once()
+    expense_keyword.refresh_from_db()
+    assert expense_keyword.usage_count == 3
+
+
+@pytest.mark.django_db
+def test_record_keyword_usage_falls_back_to_direct_update_without_redis(expense_keyword):
+    with patch.object(keyword_usage, '_get_connection', side_effect=ConnectionError('redis down')):
+        keyword_usage.record_keyword_usage(expense_keyword.id)
+
+    expense_keyword.refresh_from_db()
+    assert expense_keyword.usage_count == 4
+
+
+@pytest.mark.django_db
+def test_apply_keyword_usage_updates_counts_and_last_used_in_batches(test_profile, expense_keyword, monkeypatch):
+    category = IncomeCategory.objects.create(profile=test_profile, name='💼 Зарплата', name_ru='Зарплата', icon='💼')
+    income_keywords = [
+        IncomeCategoryKeyword.objects.create(category=category, keyword=f'аванс{i}', usage_count=i)
+        for i in range(3)
+    ]
+    used_at = datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+    monkeypatch.setattr(keyword_usage, 'FLUSH_BATCH_SIZE', 2)
+
+    updated = keyword_usage.apply_keyword_usage(
+        keyword_usage.INCOME,
+        {kw.id: 5 for kw in income_keywords},
+        {income_keywords[0].id: used_at},
+    )
+
+    assert updated == 3
+    for i, kw in enumerate(income_keywords):
+        kw.refresh_from_db()
+        assert kw.usage_count == i + 5
+    assert income_keywords[0].last_used == used_at
+    expense_keyword.refresh_from_db()
+    assert expense_keyword.usage_count == 3
+
+
+@pytest.mark.django_db
+def test_flush_keyword_usage_applies_claimed_batch_and_clears_it(expense_keyword):
+    conn = MagicMock()
+    conn.eval.return_value = 1
+    conn.hgetall.side_effect = [
+        {str(expense_keyword.id).encode(): b'2'},
+        {str(expense_keyword.id).encode(): b'1768478400.0'},
+    ]
+
+    with patch.object(keyword_usage, '_get_connection', return_value=conn):
+        assert keyword_usage.flush_keyword_usage(keyword_usage.EXPENSE) == 1
+
+    conn.delete.assert_called_once_with('keyword_usage:expense:counts:flushing', 'keyword_usage:expense:last_used:flushing')
+    expense_keyword.refresh_from_db()
+    assert expense_keyword.usage_count == 5
+
+
+@pytest.mark.django_db
+def test_flush_keyword_usage_is_noop_when_buffer_is_empty(expense_keyword):
+    conn = MagicMock()
+    conn.eval.return_value = 0
+
+    with patch.object(keyword_usage, '_get_connection', return_value=conn):
+        assert keyword_usage.flush_keyword_usage(keyword_usage.EXPENSE) == 0
+
+    conn.hgetall.assert_not_called()
+    conn.delete.assert_not_called()
@@ -0,0 +1,126 @@
+"""
+Tests for the monthly report fan-out: recipient selection, chunk concurrency and send throttling.
+"""
+import asyncio
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from bot.services import monthly_reports
+from bot.utils.fanout import chunked
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, TokenBucketLimiter
+from expenses.models import Expense, MonthlyReportLog, Profile
+
+
+def test_previous_month_period_wraps_year():
+    assert monthly_reports.previous_month_period(date(2026, 1, 1)) == (
+        2025, 12, date(2025, 12, 1), date(2025, 12, 31),
+    )
+    assert monthly_reports.previous_month_period(date(2026, 3, 1))[3] == date(2026, 2, 28)
+
+
+def test_chunked_splits_ids():
+    assert list(chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+
+@pytest.mark.django_db
+def test_pending_report_profile_ids_skips_delivered_users(test_expense):
+    other = Profile.objects.create(telegram_id=987654)
+    Expense.objects.create(profile=other, amount=100, description='такси', expense_date=test_expense.expense_date)
+    period_start = test_expense.expense_date.replace(day=1)
+    year, month = period_start.year, period_start.month
+    MonthlyReportLog.objects.create(profile=other, year=year, month=month)
+    # Отчёт за другой период не мешает
+    MonthlyReportLog.objects.create(profile=test_expense.profile, year=year - 1, month=month)
+
+    ids = monthly_reports.pending_report_profile_ids(year, month, period_start, test_expense.expense_date)
+
+    assert ids == [test_expense.profile_id]
+
+
+@pytest.mark.asyncio
+async def test_send_reports_chunk_bounds_concurrency_and_counts_statuses():
+    active = peak = 0
+
+    class FakeService:
+        async def send_monthly_report_notification(self, user_id, profile, year, month, attempt=1):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if user_id == 3:
+                raise RuntimeError('Bad Gateway')
+            return user_id != 4
+
+    profiles = [SimpleNamespace(telegram_id=user_id) for user_id in range(10)]
+    errors = []
+
+    def handle_error(profile, error):
+        errors.append((profile.telegram_id, str(error)))
+        return monthly_reports.RETRY
+
+    statuses = await monthly_reports.send_reports_chunk(
+        FakeService(), profiles, 2026, 1, handle_error, concurrency=3,
+    )
+
+    assert peak == 3
+    assert statuses == {monthly_reports.SENT: 8, monthly_reports.SKIPPED: 1, monthly_reports.RETRY: 1}
+    assert errors == [(3, 'Bad Gateway')]
+
+
+@pytest.mark.asyncio
+async def test_send_throttle_waits_for_shared_bucket():
+    limiter = TokenBucketLimiter(LocalBucketStore())
+    bucket = (Bucket('send', capacity=1, refill_per_second=50),)
+
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.wait('bulk', bucket)
+
+    assert time.monotonic() - started >= 0.035
+
+
+@pytest.mark.django_db
+def test_send_monthly_reports_chunk_task_counts_already_delivered(monkeypatch):
+    from bot.services import notifications
+    from expense_bot import celery_tasks
+
+    class FakeBot:
+        async def close(self):
+            pass
+
+    class FakeService:
+        def __init__(self, bot, send_throttle=None):
+            self.send_throttle = send_throttle
+
+        async def send_monthly_report_notification(self, user_id, profile, year, month, attempt=1):
+            await self.send_throttle()
+            return True
+
+    class FakeProgress:
+        def __init__(self):
+            self.added = []
+
+        def add(self, statuses):
+            self.added.append(dict(statuses))
+
+        def snapshot(self):
+            return {}
+
+    progress = FakeProgress()
+    monkeypatch.setattr(celery_tasks, 'create_telegram_bot', lambda token=None: FakeBot())
+    monkeypatch.setattr(notifications, 'NotificationService', FakeService)
+    monkeypatch.setattr(monthly_reports, 'create_send_limiter', lambda: TokenBucketLimiter(LocalBucketStore()))
+    monkeypatch.setattr(monthly_reports, 'report_progress', lambda year, month: progress)
+
+    pending = Profile.objects.create(telegram_id=987001)
+    delivered = Profile.objects.create(telegram_id=987002)
+    MonthlyReportLog.objects.create(profile=delivered, year=2026, month=1)
+
+    result = celery_tasks.send_monthly_reports_chunk([pending.id, delivered.id], 2026, 1)
+
+    assert result == {monthly_reports.SENT: 1, monthly_reports.SKIPPED: 1}
+    assert progress.added == [result]
@@ -0,0 +1,88 @@
+"""
+Tests for buffered Profile.last_activity writes.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bot.services import profile_activity
+from expenses.models import Profile
+
+
+@pytest.fixture(autouse=True)
+def reset_retry_window(monkeypatch):
+    monkeypatch.setattr(profile_activity, '_retry_at', 0.0)
+
+
+@pytest.mark.django_db
+def test_record_profile_activity_writes_sorted_sets_without_db_write(test_profile):
+    conn = MagicMock()
+    pipe = conn.pipeline.return_value
+    now = datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+
+    with patch.object(profile_activity, '_get_connection', return_value=conn):
+        assert profile_activity.record_profile_activity(test_profile.telegram_id, now=now)
+
+    pipe.zadd.assert_any_call('profile_activity:last_seen', {test_profile.telegram_id: now.timestamp()})
+    pipe.zadd.assert_any_call('profile_activity:pending', {test_profile.telegram_id: now.timestamp()})
+    test_profile.refresh_from_db()
+    assert test_profile.last_activity is None
+
+
+def test_record_profile_activity_backs_off_when_redis_is_down():
+    with patch.object(profile_activity, '_get_connection', side_effect=ConnectionError('redis down')) as get_conn:
+        assert not profile_activity.record_profile_activity(1)
+        assert not profile_activity.record_profile_activity(1)
+
+    assert get_conn.call_count == 1
+
+
+@pytest.mark.django_db
+def test_apply_profile_activity_updates_in_batches(monkeypatch):
+    profiles = [Profile.objects.create(telegram_id=1000 + i) for i in range(3)]
+    used_at = datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+    monkeypatch.setattr(profile_activity, 'FLUSH_BATCH_SIZE', 2)
+
+    updated = profile_activity.apply_profile_activity({
+        profile.telegram_id: used_at + timedelta(minutes=i) for i, profile in enumerate(profiles)
+    })
+
+    assert updated == 3
+    for i, profile in enumerate(profiles):
+        profile.refresh_from_db()
+        assert profile.last_activity == used_at + timedelta(minutes=i)
+
+
+@pytest.mark.django_db
+def test_flush_profile_activity_applies_claimed_batch_and_clears_it(test_profile):
+    conn = MagicMock()
+    conn.exists.return_value = 1
+    conn.eval.return_value = 1
+    conn.zrange.return_value = [(str(test_profile.telegram_id).encode(), 1768478400.0)]
+
+    with patch.object(profile_activity, '_get_connection', return_value=conn):
+        assert profile_activity.flush_profile_activity() == 1
+
+    conn.delete.assert_called_once_with('profile_activity:pending:flushing')
+    test_profile.refresh_from_db()
+    assert test_profile.last_activity == datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+
+
+@pytest.mark.django_db
+def test_active_counts_read_sorted_set_after_seeding(test_profile):
+    fakeredis = pytest.importorskip('fakeredis')
+    conn = fakeredis.FakeStrictRedis()
+    now = datetime.now(dt_timezone.utc)
+    Profile.objects.filter(pk=test_profile.pk).update(last_activity=now - timedelta(days=2))
+
+    with patch.object(profile_activity, '_get_connection', return_value=conn):
+        # До заполнения из БД — считать по Profile.last_activity
+        assert profile_activity.count_active_profiles(now - timedelta(days=7)) is None
+
+        profile_activity.record_profile_activity(555, now=now)
+        profile_activity.flush_profile_activity()
+
+        assert profile_activity.count_active_profiles(now - timedelta(days=7)) == 2
+        assert profile_activity.count_active_profiles(now - timedelta(days=1)) == 1
+        assert profile_activity.count_active_profiles(now - timedelta(days=7), now - timedelta(days=1)) == 1
@@ -0,0 +1,108 @@
+"""
+Tests for the token bucket rate limiter and the unified RateLimitMiddleware.
+"""
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from bot.middlewares.rate_limit import RateLimitMiddleware
+from bot.utils.rate_limiter import Bucket, LocalBucketStore, RedisBucketStore
+
+
+def _message(user_id: int, text: str = 'кофе 200') -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='Test'),
+        text=text,
+    )
+
+
+def test_local_buckets_refill_and_consume_all_or_nothing():
+    store = LocalBucketStore()
+    fast = Bucket('fast', capacity=2, refill_per_second=1)
+    slow = Bucket.per_window('slow', 3, 60)
+
+    assert store.consume('u', (fast, slow), now=0).allowed
+    assert store.consume('u', (fast, slow), now=0).allowed
+    denied = store.consume('u', (fast, slow), now=0)
+    assert not denied.allowed and denied.bucket is fast
+    assert denied.retry_after_seconds == 1
+
+    # Через секунду fast пополнился, slow — ещё нет, но последний токен есть
+    assert store.consume('u', (fast, slow), now=1).allowed
+    denied = store.consume('u', (fast, slow), now=2)
+    assert denied.bucket is slow
+    # Отказ в slow не списал токен из fast
+    assert store.consume('u', (fast,), now=2).allowed
+
+
+def test_local_store_memory_is_bounded():
+    store = LocalBucketStore(max_subjects=100)
+    bucket = Bucket('minute', capacity=1, refill_per_second=0.01)
+
+    for user_id in range(1000):
+        store.consume(str(user_id), (bucket,), now=0)
+
+    assert len(store) == 100
+    # Недавние пользователи остаются в LRU
+    assert not store.consume('999', (bucket,), now=0).allowed
+
+    store.block('999', 10, now=0)
+    assert store.consume('999', (bucket,), now=5).blocked
+    assert not store.consume('999', (bucket,), now=10).blocked
+
+
+def test_redis_store_runs_lua_script_and_falls_back():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    server = fakeredis.FakeServer()
+    store = RedisBucketStore(connection=fakeredis.FakeStrictRedis(server=server))
+    other_instance = RedisBucketStore(connection=fakeredis.FakeStrictRedis(server=server))
+    bucket = Bucket.per_window('minute', 2, 60)
+
+    assert store.consume('42', (bucket,)).allowed
+    assert other_instance.consume('42', (bucket,)).allowed
+    denied = store.consume('42', (bucket,))
+    assert not denied.allowed and denied.bucket == bucket
+    assert 25 < denied.retry_after <= 30
+
+    other_instance.block('7', 60)
+    assert store.consume('7', (bucket,)).blocked
+
+    broken = RedisBucketStore(connection=AsyncMock(register_script=lambda script: 1 / 0))
+    assert broken.consume('42', (bucket,)).allowed
+    assert len(broken.fallback) == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_blocks_bursts_and_limits_commands():
+    middleware = RateLimitMiddleware(
+        requests_per_minute=100, requests_per_hour=1000, burst_size=3, use_redis=False
+    )
+    handler = AsyncMock(return_value='ok')
+
+    results = []
+    for _ in range(4):
+        message = _message(1)
+        object.__setattr__(message, 'answer', AsyncMock())
+        results.append(await middleware(handler, message, {}))
+    assert results == ['ok', 'ok', 'ok', None]
+    assert 'заблокированы на 5 минут' in message.answer.await_args.args[0]
+
+    # Заблокированный пользователь не проходит, даже когда burst-ведро пополнилось
+    middleware.limiter.store._subjects.clear()
+    assert await middleware(handler, _message(1), {}) is None
+
+    start_results = []
+    for _ in range(11):
+        message = _message(2, '/start')
+        object.__setattr__(message, 'answer', AsyncMock())
+        start_results.append(await middleware(handler, message, {}))
+        middleware.limiter.store._subjects.pop('2', None)  # не упираться в burst
+    assert start_results.count('ok') == 10
+    assert 'команды /start' in message.answer.await_args.args[0]
+    assert handler.await_count == 13
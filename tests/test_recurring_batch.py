@@ -0,0 +1,139 @@
+"""
+Tests for batched recurring payments processing (bot/services/recurring.py).
+"""
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import IntegrityError
+
+from bot.services import conversion_helper
+from bot.services.recurring import process_recurring_payments_for_today, send_recurring_notifications
+from expenses.models import (
+    Expense,
+    ExpenseCategory,
+    Income,
+    IncomeCategory,
+    Profile,
+    RecurringPayment,
+    UserSettings,
+)
+
+
+@pytest.mark.django_db
+def test_payments_are_created_in_bulk_with_one_rate_per_pair(monkeypatch):
+    today = date.today()
+    requested = []
+
+    async def fake_rates(pairs, operation_date):
+        pairs = list(pairs)
+        requested.append((sorted(pairs), operation_date))
+        return {pair: Decimal('90') for pair in pairs}
+
+    monkeypatch.setattr(conversion_helper, 'fetch_conversion_rates', fake_rates)
+
+    first = Profile.objects.create(telegram_id=801, currency='RUB')
+    second = Profile.objects.create(telegram_id=802, currency='RUB')
+    manual = Profile.objects.create(telegram_id=803, currency='RUB')
+    UserSettings.objects.create(profile=manual, auto_convert_currency=False)
+    rent = ExpenseCategory.objects.create(profile=first, name='Жильё')
+    salary = IncomeCategory.objects.create(profile=first, name='Зарплата')
+    services = ExpenseCategory.objects.create(profile=second, name='Сервисы')
+    hosting = ExpenseCategory.objects.create(profile=manual, name='Хостинг')
+
+    def payment(profile, amount, currency, description, **extra):
+        return RecurringPayment.objects.create(
+            profile=profile, amount=Decimal(amount), currency=currency,
+            description=description, day_of_month=today.day, **extra,
+        )
+
+    payment(first, '30000', 'RUB', 'Аренда', expense_category=rent)
+    payment(first, '1000', 'USD', 'Зарплата', operation_type=RecurringPayment.OPERATION_TYPE_INCOME,
+            income_category=salary)
+    payment(second, '10', 'USD', 'Подписка', expense_category=services)
+    payment(manual, '5', 'USD', 'Хостинг', expense_category=hosting)
+    payment(second, '1', 'RUB', 'Уже списан', expense_category=services, last_processed=today)
+
+    count, processed = async_to_sync(process_recurring_payments_for_today)()
+
+    assert count == 4
+    assert requested == [([('USD', 'RUB')], today)]
+    assert {info['user_id'] for info in processed} == {801, 802, 803}
+
+    converted = Income.objects.get(profile=first)
+    assert converted.amount == Decimal('90000.00')
+    assert (converted.original_amount, converted.original_currency) == (Decimal('1000'), 'USD')
+    assert converted.description == '[Ежемесячный] Зарплата'
+    assert converted.is_recurring
+    assert Expense.objects.get(profile=second).amount == Decimal('900.00')
+    kept = Expense.objects.get(profile=manual)
+    assert (kept.amount, kept.currency, kept.original_amount) == (Decimal('5'), 'USD', None)
+    assert Expense.objects.get(profile=first).category == rent
+    assert all(info['operation'].pk for info in processed)
+    assert not RecurringPayment.objects.exclude(last_processed=today).exists()
+
+    # Повторный запуск в тот же день ничего не создаёт
+    assert async_to_sync(process_recurring_payments_for_today)() == (0, [])
+    assert Expense.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_failed_payment_is_skipped_without_rolling_back_others(monkeypatch):
+    today = date.today()
+    profile = Profile.objects.create(telegram_id=811, currency='RUB')
+    category = ExpenseCategory.objects.create(profile=profile, name='Подписки')
+    for description in ('Музыка', 'Сломанный', 'Кино'):
+        RecurringPayment.objects.create(
+            profile=profile, amount=Decimal('100'), currency='RUB', description=description,
+            day_of_month=today.day, expense_category=category,
+        )
+
+    bulk_create = Expense.objects.bulk_create
+
+    def failing_bulk_create(objs, *args, **kwargs):
+        # Ошибка БД на одной строке пакета (нарушение ограничения, переполнение суммы и т.п.)
+        if any('Сломанный' in obj.description for obj in objs):
+            raise IntegrityError('broken row')
+        return bulk_create(objs, *args, **kwargs)
+
+    monkeypatch.setattr(Expense.objects, 'bulk_create', failing_bulk_create)
+
+    count, processed = async_to_sync(process_recurring_payments_for_today)()
+
+    assert count == 2
+    assert sorted(Expense.objects.values_list('description', flat=True)) == [
+        '[Ежемесячный] Кино', '[Ежемесячный] Музыка',
+    ]
+    # Упавший платёж остаётся необработанным и повторится при следующем запуске
+    assert list(
+        RecurringPayment.objects.exclude(last_processed=today).values_list('description', flat=True)
+    ) == ['Сломанный']
+
+
+def test_notifications_keep_per_user_order_and_survive_failures():
+    sent = []
+    throttled = []
+
+    async def notify(payment_info):
+        await asyncio.sleep(0)
+        if payment_info['payment'] == 'broken':
+            raise RuntimeError('telegram down')
+        sent.append((payment_info['user_id'], payment_info['payment']))
+
+    async def throttle():
+        throttled.append(1)
+
+    processed = [
+        {'user_id': 1, 'payment': 'a'},
+        {'user_id': 2, 'payment': 'broken'},
+        {'user_id': 1, 'payment': 'b'},
+        {'user_id': 3, 'payment': 'c'},
+    ]
+
+    result = asyncio.run(send_recurring_notifications(processed, notify, throttle=throttle, concurrency=2))
+
+    assert result == 3
+    assert len(throttled) == 4
+    assert [p for user, p in sent if user == 1] == ['a', 'b']
@@ -0,0 +1,111 @@
+"""
+Tests for the per-update request context (profile, settings, language, subscription).
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Chat, Message, User
+from django.utils import timezone
+
+from bot.middlewares.request_context import RequestContextMiddleware
+from bot.services.profile import get_user_settings
+from bot.services.subscription import check_subscription
+from bot.utils.analytics import increment_analytics_counter
+from bot.utils.db_utils import get_or_create_user_profile_sync
+from bot.utils.language import get_user_language
+from bot.utils.request_context import (
+    activate_request_context,
+    deactivate_request_context,
+    get_request_context,
+    load_request_context_sync,
+)
+from expenses.models import Profile, Subscription, UserAnalytics, UserSettings
+
+
+@pytest.fixture
+def active_context(test_profile):
+    UserSettings.objects.create(profile=test_profile)
+    context = load_request_context_sync(test_profile.telegram_id)
+    token = activate_request_context(context)
+    yield context
+    deactivate_request_context(token)
+
+
+def _message(telegram_id: int) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=telegram_id, type='private'),
+        from_user=User(id=telegram_id, is_bot=False, first_name='Test', language_code='ru'),
+        text='кофе 200',
+    )
+
+
+@pytest.mark.django_db
+def test_services_reuse_profile_and_settings_from_context(active_context, test_profile, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert get_or_create_user_profile_sync(test_profile.telegram_id) is active_context.profile
+        assert get_user_settings.__wrapped__(test_profile.telegram_id) == active_context.get_settings_sync()
+
+    # Только UPDATE/INSERT счётчика, без повторного чтения профиля
+    with django_assert_num_queries(2):
+        increment_analytics_counter.__wrapped__(test_profile.telegram_id, 'voice_messages')
+    assert UserAnalytics.objects.get(profile=test_profile).voice_messages == 1
+
+    # Другие пользователи по-прежнему читаются из БД
+    assert get_request_context(test_profile.telegram_id + 1) is None
+
+
+@pytest.mark.django_db
+def test_context_follows_saves_through_other_instances(active_context, test_profile):
+    other = Profile.objects.get(pk=test_profile.pk)
+    other.language_code = 'en'
+    other.save()
+
+    assert active_context.profile.language_code == 'en'
+
+    settings = UserSettings.objects.get(profile=test_profile)
+    settings.view_scope = 'household'
+    settings.save()
+    assert active_context.get_settings_sync().view_scope == 'household'
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_middleware_exposes_context_to_services(test_profile):
+    await Subscription.objects.acreate(
+        profile=test_profile, type='month', payment_method='stars', amount=100,
+        start_date=timezone.now(), end_date=timezone.now() + timedelta(days=30),
+    )
+    seen = {}
+
+    async def handler(event, data):
+        context = data['request_context']
+        # Изменение в обход save() не видно: данные берутся из контекста
+        await Profile.objects.filter(pk=test_profile.pk).aupdate(language_code='en')
+        seen['language'] = await get_user_language(test_profile.telegram_id)
+        seen['subscription'] = await check_subscription(test_profile.telegram_id)
+        await Subscription.objects.filter(profile=test_profile).aupdate(is_active=False)
+        seen['cached_subscription'] = await check_subscription(test_profile.telegram_id)
+        seen['context'] = context
+        return 'ok'
+
+    result = await RequestContextMiddleware()(handler, _message(test_profile.telegram_id), {})
+
+    assert result == 'ok'
+    assert seen['language'] == 'ru'
+    assert seen['subscription'] is True
+    assert seen['cached_subscription'] is True
+    assert seen['context'].profile.id == test_profile.id
+    # После обработки апдейта контекст сброшен
+    assert get_request_context() is None
+    assert await get_user_language(test_profile.telegram_id) == 'en'
+
+
+@pytest.mark.asyncio
+async def test_middleware_skips_events_without_user():
+    handler = AsyncMock(return_value='ok')
+
+    assert await RequestContextMiddleware()(handler, object(), {}) == 'ok'
+    handler.assert_awaited_once()
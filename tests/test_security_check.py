@@ -0,0 +1,43 @@
+"""
+Tests for the compiled pattern scanner used by SecurityCheckMiddleware.
+"""
+from bot.middlewares.security_check import PatternScanner, SecurityCheckMiddleware
+
+
+def _scanner() -> PatternScanner:
+    middleware = SecurityCheckMiddleware()
+    return middleware.scanner
+
+
+def test_regular_expense_messages_pass():
+    scanner = _scanner()
+    for text in ('кофе 200', 'такси до дома 450 руб', 'description transcript 300', 'обновление update'):
+        assert scanner.scan(text) == ([], False)
+
+
+def test_substring_patterns_keep_list_order():
+    detected, honeypot = _scanner().scan('<img src=x onerror=alert(1)> eval')
+    assert detected == ['script', 'eval', 'onerror=']
+    assert not honeypot
+
+
+def test_sql_patterns_match_whole_words_only():
+    scanner = _scanner()
+    assert scanner.scan('drop table expenses')[0] == ['DROP TABLE']
+    assert scanner.scan('please DELETE FROM users')[0] == ['DELETE FROM']
+    assert scanner.scan('backdrop tables') == ([], False)
+
+
+def test_honeypot_tokens_and_overlapping_prefixes():
+    scanner = _scanner()
+    assert scanner.scan('мой password123') == ([], True)
+    # '..%2F' и '../' начинаются на одной позиции — находятся оба
+    assert scanner.scan('..%2F../')[0] == ['../', '..%2F']
+
+
+def test_spam_check_counts_run_length():
+    middleware = SecurityCheckMiddleware()
+    assert not middleware._check_spam_patterns('а' * 10 + ' 100')
+    assert middleware._check_spam_patterns('а' * 11 + ' 100')
+    assert middleware._check_spam_patterns('ОЧЕНЬ ГРОМКОЕ СООБЩЕНИЕ')
+    assert not middleware._check_spam_patterns('Кофе 200')
@@ -0,0 +1,108 @@
+"""
+Tests for the shared subscription status cache behind check_subscription.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from bot.services import subscription_cache
+from bot.services.subscription import check_subscription
+from bot.services.subscription_cache import Entitlement, get_entitlement_sync
+from expenses.models import Profile, Subscription
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    shared = LocMemCache('subscription-cache-tests', {})
+    monkeypatch.setattr(subscription_cache, 'cache', shared)
+    yield shared
+    shared.clear()
+
+
+def _subscription(profile, sub_type='month', days=30, **kwargs):
+    now = timezone.now()
+    return Subscription.objects.create(
+        profile=profile, type=sub_type, payment_method='stars', amount=100,
+        start_date=now, end_date=now + timedelta(days=days), **kwargs
+    )
+
+
+def test_entitlement_compares_end_dates_with_now():
+    entitlement = Entitlement(paid_until=None, any_until=1000.0)
+
+    assert entitlement.is_active(include_trial=True, now=999.0)
+    assert not entitlement.is_active(include_trial=False, now=999.0)
+    assert not entitlement.is_active(include_trial=True, now=1000.0)
+    assert Entitlement(beta=True).is_active(include_trial=False)
+    # TTL в Redis заканчивается вместе с подпиской
+    assert entitlement.cache_ttl(now=400.0) == 601
+    assert Entitlement(any_until=10 ** 12).cache_ttl(now=0.0) == subscription_cache.ENTITLEMENT_MAX_TTL_SECONDS
+    assert Entitlement().cache_ttl(now=0.0) == subscription_cache.ENTITLEMENT_EMPTY_TTL_SECONDS
+
+
+@pytest.mark.django_db(transaction=True)
+def test_status_is_cached_and_reset_by_subscription_changes(
+    shared_cache, test_profile, django_assert_num_queries
+):
+    telegram_id = test_profile.telegram_id
+    _subscription(test_profile, sub_type='trial', days=3)
+
+    with django_assert_num_queries(1):
+        entitlement = get_entitlement_sync(telegram_id)
+    assert entitlement.is_active(include_trial=True)
+    assert not entitlement.is_active(include_trial=False)
+
+    # Другой процесс: локального кеша нет, но запись есть в Redis
+    subscription_cache.clear_local_subscription_cache()
+    with django_assert_num_queries(0):
+        assert get_entitlement_sync(telegram_id) == entitlement
+    assert shared_cache.get(subscription_cache._cache_key(telegram_id)) == entitlement.to_dict()
+
+    paid = _subscription(test_profile)
+    assert get_entitlement_sync(telegram_id).is_active(include_trial=False)
+
+    paid.is_active = False
+    paid.save()
+    assert not get_entitlement_sync(telegram_id).is_active(include_trial=False)
+
+    Subscription.objects.filter(profile=test_profile).delete()
+    assert get_entitlement_sync(telegram_id) == Entitlement()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_beta_flag_changes_reset_status(shared_cache, test_profile):
+    from expenses.admin import ProfileAdmin
+
+    assert not get_entitlement_sync(test_profile.telegram_id).is_active()
+
+    test_profile.is_beta_tester = True
+    test_profile.save(update_fields=['is_beta_tester'])
+    assert get_entitlement_sync(test_profile.telegram_id).is_active(include_trial=False)
+
+    admin = ProfileAdmin(Profile, None)
+    admin.message_user = lambda *args, **kwargs: None
+    # Фильтр списка в админке по флагу: после update queryset уже пуст
+    admin.remove_beta_tester(None, Profile.objects.filter(pk=test_profile.pk, is_beta_tester=True))
+    assert not get_entitlement_sync(test_profile.telegram_id).is_active()
+
+    # Сохранения без флага бета-тестера кеш не трогают
+    test_profile.language_code = 'en'
+    test_profile.save(update_fields=['language_code'])
+    assert shared_cache.get(subscription_cache._cache_key(test_profile.telegram_id)) is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_check_subscription_uses_cache(test_profile):
+    assert await check_subscription(test_profile.telegram_id) is False
+    assert await check_subscription(999999999) is False
+
+    await Subscription.objects.acreate(
+        profile=test_profile, type='trial', payment_method='stars', amount=0,
+        start_date=timezone.now(), end_date=timezone.now() + timedelta(days=3),
+    )
+
+    assert await check_subscription(test_profile.telegram_id) is True
+    assert await check_subscription(test_profile.telegram_id, include_trial=False) is False
@@ -0,0 +1,99 @@
+"""
+Tests for the shared fuzzy word matching module and its call sites.
+"""
+import itertools
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from bot.services.expense import find_similar_expenses
+from bot.services.income import find_similar_incomes
+from bot.utils.text_similarity import (
+    best_match,
+    calculate_similarity,
+    extract_words,
+    is_similar,
+    levenshtein_distance,
+    normalize_russian_word,
+)
+from expenses.models import Expense, Income
+
+WORDS = ['', 'кофе', 'кофэ', 'кофейня', 'тралик', 'тралики', 'магнит', 'магнитрон', 'такси', 'тaкси', 'abc']
+
+
+def _full_levenshtein(s1, s2):
+    previous = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1, 1):
+        current = [i]
+        for j, c2 in enumerate(s2, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (c1 != c2)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize('word1,word2', list(itertools.product(WORDS, repeat=2)))
+def test_bounded_levenshtein_matches_full_matrix(word1, word2):
+    expected = _full_levenshtein(word1, word2)
+
+    assert levenshtein_distance(word1, word2) == expected
+    for max_distance in range(4):
+        bounded = levenshtein_distance(word1, word2, max_distance)
+        assert bounded == (expected if expected <= max_distance else max_distance + 1)
+
+
+@pytest.mark.parametrize('threshold', [0.75, 0.85])
+def test_is_similar_agrees_with_calculate_similarity(threshold):
+    for word1, word2 in itertools.product(WORDS[1:], repeat=2):
+        assert is_similar(word1, word2, threshold) == (calculate_similarity(word1, word2) >= threshold)
+
+
+def test_calculate_similarity_examples():
+    assert calculate_similarity('тралик', 'тралики') == pytest.approx(6 / 7)
+    assert calculate_similarity('Кофе', 'кофе') == 1.0
+
+
+def test_best_match_returns_closest_candidate():
+    assert best_match('тралик', ['магнит', 'тралики', 'тралик'], 0.85) == ('тралик', 1.0)
+    # При одинаковом расстоянии ближе более длинное слово (схожесть 7/8 > 6/7)
+    assert best_match('траликк', ['тралики', 'траликк1'], 0.8)[0] == 'траликк1'
+    assert best_match('кофе', ['такси', 'магнит'], 0.75) is None
+
+
+def test_normalize_and_extract_words():
+    assert normalize_russian_word('Капельницы') == 'капельниц'
+    assert normalize_russian_word('кофе') == 'коф'
+    assert extract_words('Кофе, круассан!') == ('кофе', 'круассан')
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_find_similar_expenses_tolerates_typos(test_profile, test_expense_category):
+    from asgiref.sync import sync_to_async
+
+    for description, amount in [('Тралики', '100'), ('тралики', '100'), ('Магнитрон', '900')]:
+        await sync_to_async(Expense.objects.create)(
+            profile=test_profile, category=test_expense_category, amount=Decimal(amount),
+            currency='RUB', description=description, expense_date=date.today(),
+        )
+
+    result = await find_similar_expenses(test_profile.telegram_id, 'тралик')
+
+    assert [(item['amount'], item['count']) for item in result] == [(100.0, 2)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_find_similar_incomes_matches_substring_and_typos(test_profile, test_income_category):
+    from asgiref.sync import sync_to_async
+
+    for description, amount in [('Зарплата за ноябрь', '50000'), ('Зарплота', '40000'), ('Кэшбэк', '500')]:
+        await sync_to_async(Income.objects.create)(
+            profile=test_profile, category=test_income_category, amount=Decimal(amount),
+            currency='RUB', description=description, income_date=timezone.localdate(),
+        )
+
+    result = await find_similar_incomes(test_profile.telegram_id, 'зарплата')
+
+    assert sorted(item['amount'] for item in result) == [40000.0, 50000.0]
@@ -0,0 +1,81 @@
+"""
+Tests for the set-based Top-5 recomputation (bot/services/top5_batch.py).
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from bot.services.top5 import calculate_top5_sync
+from bot.services.top5_batch import _parse_last_at, refresh_top5_snapshots, rolling_window
+from expenses.models import Expense, Income, Profile, Top5Snapshot
+
+
+def _make_expense(profile, description, amount, days_ago, at=time(12, 0), **extra):
+    return Expense.objects.create(
+        profile=profile,
+        amount=Decimal(amount),
+        currency='RUB',
+        description=description,
+        expense_date=date.today() - timedelta(days=days_ago),
+        expense_time=at,
+        **extra,
+    )
+
+
+def test_parse_last_at_pads_fraction():
+    assert _parse_last_at('2026-01-05 12:30:00') == datetime(2026, 1, 5, 12, 30)
+    assert _parse_last_at('2026-01-05 12:30:00.5') == datetime(2026, 1, 5, 12, 30, 0, 500000)
+
+
+@pytest.mark.django_db
+def test_refresh_matches_per_profile_calculation():
+    window_start, window_end = rolling_window(date.today())
+    first = Profile.objects.create(telegram_id=111, language_code='ru', currency='RUB')
+    second = Profile.objects.create(telegram_id=222, language_code='en', currency='USD')
+    _make_expense(first, 'Кофе', '200', 1, time(9, 15, 30, 120000))
+    _make_expense(first, ' кофе ', '200.3', 2)
+    _make_expense(first, 'Такси', '500', 3)
+    _make_expense(first, 'Такси', '500', 4)
+    _make_expense(first, 'Такси', '500', 5)
+    _make_expense(first, 'Аренда', '30000', 6, is_recurring=True)
+    _make_expense(first, 'Аренда', '30000', 36, is_recurring=True)
+    Income.objects.create(
+        profile=second, amount=Decimal('50'), currency='', description='Tips',
+        income_date=date.today() - timedelta(days=1), income_time=time(18, 0),
+    )
+    Income.objects.create(
+        profile=second, amount=Decimal('50'), currency='', description='Tips',
+        income_date=date.today() - timedelta(days=2), income_time=time(18, 0),
+    )
+
+    result = refresh_top5_snapshots(window_start, window_end)
+
+    assert result.processed == 2
+    assert result.changed == 2
+    for profile in (first, second):
+        items, digest = async_to_sync(calculate_top5_sync)(profile, window_start, window_end)
+        snapshot = Top5Snapshot.objects.get(profile=profile)
+        assert snapshot.hash == digest
+        assert snapshot.items == items
+
+
+@pytest.mark.django_db
+def test_refresh_touches_only_changed_profiles():
+    window_start, window_end = rolling_window(date.today())
+    profile = Profile.objects.create(telegram_id=333)
+    _make_expense(profile, 'Кофе', '200', 1)
+    _make_expense(profile, 'Кофе', '200', 2)
+    gone = Profile.objects.create(telegram_id=444)
+    Top5Snapshot.objects.create(
+        profile=gone, window_start=window_start, window_end=window_end, items=[{'id': 'x'}], hash='stale',
+    )
+
+    first = refresh_top5_snapshots(window_start, window_end)
+    second = refresh_top5_snapshots(window_start, window_end)
+
+    assert first.changed == 2
+    assert Top5Snapshot.objects.get(profile=gone).items == []
+    assert second.processed == 1
+    assert second.changed == 0
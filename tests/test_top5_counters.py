@@ -0,0 +1,141 @@
+"""
+Tests for incremental Top-5 counters (bot/services/top5_counters.py).
+"""
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from bot.services import top5_counters
+from bot.services.top5 import calculate_top5_sync
+from bot.services.top5_batch import rolling_window
+from expenses.models import Expense, Profile, Top5Counter, Top5Pin, Top5Snapshot
+from expenses.signals import operations_deleted
+
+
+def _expense(profile, description, amount, days_ago, at=time(12, 0), **extra):
+    return Expense.objects.create(
+        profile=profile,
+        amount=Decimal(amount),
+        currency='RUB',
+        description=description,
+        expense_date=date.today() - timedelta(days=days_ago),
+        expense_time=at,
+        **extra,
+    )
+
+
+def _stored(profile):
+    return {
+        (row.date, row.group_id): (row.count, row.last_time, row.title_display)
+        for row in Top5Counter.objects.filter(profile=profile)
+    }
+
+
+def _expected(profile):
+    window_start, _ = rolling_window(date.today())
+    return {
+        (cell['key'][1], cell['key'][2]): (cell['count'], cell['last_time'], cell['title_display'])
+        for cell in top5_counters.compute_top5_counters([profile.id], window_start).values()
+    }
+
+
+@pytest.mark.django_db
+def test_counters_follow_create_update_and_delete():
+    profile = Profile.objects.create(telegram_id=555)
+    first = _expense(profile, 'Кофе', '200', 1, time(9, 0))
+    second = _expense(profile, 'кофе ', '200', 1, time(18, 0))
+    _expense(profile, 'Такси', '500', 2)
+    _expense(profile, 'Аренда', '30000', 3, is_recurring=True)
+
+    assert _stored(profile) == _expected(profile)
+    assert sorted(count for count, _, _ in _stored(profile).values()) == [1, 2]
+
+    second.amount = Decimal('250')
+    second.save()
+    assert _stored(profile) == _expected(profile)
+
+    first.delete()
+    operations_deleted('expense', [first])
+    assert _stored(profile) == _expected(profile)
+    assert len(_stored(profile)) == 2
+
+
+@pytest.mark.django_db
+def test_top5_from_counters_matches_raw_calculation():
+    profile = Profile.objects.create(telegram_id=556, currency='RUB')
+    for days_ago in (1, 2, 3):
+        _expense(profile, 'Такси', '500', days_ago)
+    _expense(profile, 'Кофе', '200.4', 1, time(8, 30))
+    _expense(profile, 'КОФЕ', '200', 4)
+    window_start, window_end = rolling_window(date.today())
+
+    items, digest = top5_counters.calculate_top5_from_counters(profile, window_start, window_end)
+
+    assert (items, digest) == async_to_sync(calculate_top5_sync)(profile, window_start, window_end)
+    assert [it['count'] for it in items] == [3, 2]
+
+
+@pytest.mark.django_db
+def test_rebuild_restores_counters_after_bulk_insert():
+    profile = Profile.objects.create(telegram_id=557)
+    _expense(profile, 'Кофе', '200', 1)
+    # bulk_create обходит сигналы
+    Expense.objects.bulk_create([
+        Expense(profile=profile, amount=Decimal('200'), currency='RUB', description='Кофе',
+                expense_date=date.today() - timedelta(days=1), expense_time=time(7, 0)),
+    ])
+    assert _stored(profile) != _expected(profile)
+
+    top5_counters.rebuild_top5_counters([profile.id])
+
+    assert _stored(profile) == _expected(profile)
+    assert Top5Snapshot.objects.get(profile=profile).items[0]['count'] == 2
+
+
+@pytest.mark.django_db
+def test_decay_refreshes_only_profiles_with_expired_days():
+    window_start, window_end = rolling_window(date.today())
+    fading = Profile.objects.create(telegram_id=558)
+    _expense(fading, 'Кофе', '200', 1)
+    _expense(fading, 'Кофе', '200', 2)
+    steady = Profile.objects.create(telegram_id=559)
+    _expense(steady, 'Такси', '500', 1)
+    _expense(steady, 'Такси', '500', 2)
+    top5_counters.rebuild_top5_counters([fading.id, steady.id])
+    # Дни, вышедшие из окна
+    for shift, row in enumerate(Top5Counter.objects.filter(profile=fading), start=1):
+        row.date = window_start - timedelta(days=shift)
+        row.save(update_fields=['date'])
+
+    result = top5_counters.decay_top5_counters(window_start, window_end)
+
+    assert result.processed == 1
+    assert result.changed == 1
+    assert not Top5Counter.objects.filter(profile=fading).exists()
+    assert Top5Snapshot.objects.get(profile=fading).items == []
+    assert Top5Snapshot.objects.get(profile=steady).items[0]['count'] == 2
+
+
+@pytest.mark.django_db
+def test_pin_refresh_is_queued_only_when_ranking_changes(monkeypatch, django_capture_on_commit_callbacks):
+    from expense_bot import celery_tasks
+
+    queued = []
+    monkeypatch.setattr(top5_counters, 'counters_seeded', lambda: True)
+    monkeypatch.setattr(celery_tasks.refresh_top5_pin, 'delay', queued.append)
+    profile = Profile.objects.create(telegram_id=560)
+    Top5Pin.objects.create(profile=profile, chat_id=560, message_id=1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        _expense(profile, 'Кофе', '200', 1)
+    assert queued == []  # одна операция — Топ‑5 по-прежнему пуст
+
+    with django_capture_on_commit_callbacks(execute=True):
+        _expense(profile, 'Кофе', '200', 2)
+    assert queued == [profile.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        _expense(profile, 'Такси', '500', 3)
+    assert queued == [profile.id]
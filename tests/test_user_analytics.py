@@ -0,0 +1,53 @@
+"""
+Tests for the set-based daily UserAnalytics collection (bot/services/user_analytics.py).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from bot.services.user_analytics import collect_user_analytics
+from expenses.models import Expense, ExpenseCategory, Income, Profile, UserAnalytics
+
+
+def _at_yesterday(model, obj):
+    model.objects.filter(pk=obj.pk).update(created_at=timezone.now() - timedelta(days=1))
+
+
+@pytest.mark.django_db
+def test_collect_user_analytics_groups_all_profiles_and_keeps_realtime_counters():
+    target_date = timezone.localdate() - timedelta(days=1)
+    first = Profile.objects.create(telegram_id=701)
+    second = Profile.objects.create(telegram_id=702)
+    idle = Profile.objects.create(telegram_id=703)
+    food = ExpenseCategory.objects.create(profile=first, name='Еда')
+
+    for category, ai in ((food, True), (food, False), (None, False)):
+        expense = Expense.objects.create(
+            profile=first, category=category, amount=Decimal('100'), description='обед', ai_categorized=ai,
+        )
+        _at_yesterday(Expense, expense)
+    income = Income.objects.create(profile=second, amount=Decimal('500'), description='фриланс')
+    _at_yesterday(Income, income)
+    # Сегодняшняя операция в статистику за вчера не попадает
+    Expense.objects.create(profile=idle, amount=Decimal('10'), description='кофе')
+    # Счётчик реального времени, накопленный за день
+    UserAnalytics.objects.create(profile=second, date=target_date, voice_messages=4)
+
+    stats = collect_user_analytics(target_date)
+
+    assert stats == {'processed_profiles': 2, 'created_analytics': 1, 'updated_analytics': 1}
+    first_row = UserAnalytics.objects.get(profile=first, date=target_date)
+    assert first_row.expenses_added == 3
+    assert first_row.ai_categorizations == 1
+    assert first_row.manual_categorizations == 2
+    assert first_row.categories_used == {str(food.id): 2}
+    assert first_row.commands_used == {'expense_add': 3}
+    second_row = UserAnalytics.objects.get(profile=second, date=target_date)
+    assert second_row.incomes_added == 1
+    assert second_row.voice_messages == 4
+    assert not UserAnalytics.objects.filter(profile=idle).exists()
+
+    # Повторный запуск только обновляет строки
+    assert collect_user_analytics(target_date)['updated_analytics'] == 2